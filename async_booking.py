@@ -0,0 +1,1284 @@
+"""
+异步预约核心
+AsyncLibraryBooking以协程形式提供ic-web接口操作（房间、座位、预约、预约查询、签到、删除、用户信息），
+同步的LibraryBooking是它的一层薄封装
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http_client import DEFAULT_BASE_URL, AsyncPooledHTTPClient, site_url
+from logs import Payload, RedactedHeaders, get_logger
+from metrics import METRICS
+from feed import SnapshotStore, payload_digest
+from models import Room
+from snapshot import LibrarySnapshot
+from occupancy import OccupancyMatrix
+from scheduler import estimate_clock_offset_async
+
+logger = get_logger("booking")
+
+
+def strip_surrogates(text):
+    """清理字符串中可能存在的非法Unicode代理字符"""
+    return ''.join(char for char in text if ord(char) < 0xD800 or ord(char) > 0xDFFF)
+
+
+async def gather_bounded(coros, limit):
+    """以最多limit个并发执行一组协程，按输入顺序返回结果
+
+    Args:
+        coros: 协程列表
+        limit: 最大并发数，None或0表示不限制
+    """
+    if not limit:
+        return await asyncio.gather(*coros)
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros))
+
+
+class RetryPolicy:
+    """单个时间段预约请求的重试策略
+
+    Args:
+        attempts: 最多尝试次数（含第一次）
+        delay: 两次尝试之间等待的秒数
+        give_up_messages: 服务器返回消息包含这些文字时不再重试
+    """
+    __slots__ = ("attempts", "delay", "give_up_messages")
+
+    def __init__(self, attempts=2, delay=0.2, give_up_messages=("已经预约",)):
+        self.attempts = attempts
+        self.delay = delay
+        self.give_up_messages = give_up_messages
+
+    def should_retry(self, result):
+        """判断失败的结果是否值得重试"""
+        message = str(result.get("message", result.get("MESSAGE", ""))) if result else ""
+        return not any(text in message for text in self.give_up_messages)
+
+
+def result_code(result):
+    """取出预约结果中的服务器返回码"""
+    if not result:
+        return None
+    return result.get("code", result.get("CODE"))
+
+
+class PreparedReservation:
+    """预先序列化好的预约请求"""
+    __slots__ = ("seat_sn", "begin_time", "end_time", "url", "body", "headers", "sent_at")
+
+    def __init__(self, seat_sn, begin_time, end_time, url, body, headers):
+        self.seat_sn = seat_sn
+        self.begin_time = begin_time
+        self.end_time = end_time
+        self.url = url
+        self.body = body
+        self.headers = headers
+        self.sent_at = None  # 最近一次发送时请求头写出的时刻
+
+
+class EventLoopThread:
+    """在后台线程中运行事件循环，供同步代码提交协程并等待结果"""
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def run(self, coro, timeout=None):
+        """在后台事件循环中执行协程，阻塞直到返回结果"""
+        return self.submit(coro).result(timeout)
+
+    def submit(self, coro):
+        """在后台事件循环中执行协程，不等待，返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, callback, *args):
+        """在后台事件循环线程中调用callback"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+        self.loop.close()
+
+
+class AsyncLibraryBooking:
+    """ic-web接口的异步客户端
+
+    Args:
+        client: 共享的AsyncPooledHTTPClient（可选），多个账号可以共用同一个连接池
+        pool_size: 未传入client时新建连接池的大小
+        base_url: 预约系统主机名（可带端口），默认为学校的预约系统，测试时可指向fake_server
+        scheme: 强制所有接口使用的协议（如本地fake_server只提供"http"），为None时各接口沿用原来的协议
+    """
+    def __init__(self, client=None, pool_size=100, base_url=None, scheme=None):
+        self.base_url = base_url or DEFAULT_BASE_URL
+        self.scheme = scheme
+        # 随机UA列表
+        self.user_agents = [
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
+            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
+            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) Gecko/20100101 Firefox/124.0",
+            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:123.0) Gecko/20100101 Firefox/123.0",
+        ]
+        self.headers = {
+            "User-Agent": self.get_random_ua(),
+            "Accept": "application/json, text/plain, */*",
+            "Sec-Fetch-Site": "same-origin",
+            "Accept-Language": "zh-CN,zh-Hans;q=0.9",
+            "Sec-Fetch-Mode": "cors",
+            "Content-Type": "application/json;charset=utf-8",
+            "Sec-Fetch-Dest": "empty"
+        }
+        self.cookie = None
+        self.year = str(datetime.now().year)  # 获取当前年份
+        self.rooms_info = {}  # 存储房间信息的字典
+        self.debug = False  # 调试模式开关，开启后经libbooking.booking日志输出调试信息
+        self.app_acc_no = None  # 存储用户的appAccNo值，用于预约
+        self.occupancy = {}  # (date_str, room_id) -> OccupancyMatrix
+        self.store = SnapshotStore()  # 每个房间最近一次的座位状态，查询后向订阅者推送变化
+        # 未传入共享连接池时，由本实例持有并负责关闭
+        self._owns_client = client is None
+        self.http = client or AsyncPooledHTTPClient(pool_size=pool_size)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def get_random_ua(self):
+        """获取随机User-Agent"""
+        return random.choice(self.user_agents)
+
+    def url(self, path, default_scheme="https"):
+        """接口路径对应的完整URL，default_scheme为该接口原来使用的协议"""
+        return site_url(path, self.base_url, self.scheme, default_scheme)
+
+    def set_cookie(self, cookie):
+        """设置请求使用的cookie"""
+        self.cookie = cookie
+        self.headers["Cookie"] = cookie
+
+    def debug_print(self, message, *args, exc_info=False):
+        """调试信息，经libbooking.booking日志输出；args在真正输出时才格式化进message，exc_info为True时附上当前异常的堆栈"""
+        if self.debug:
+            logger.debug(message, *args, exc_info=exc_info)
+
+    async def request(self, method, url, endpoint=None, **kwargs):
+        """请求包装器，默认带上当前请求头，并通过共享连接池发送
+
+        Args:
+            method: 请求方法，如'get', 'post'等
+            url: 请求URL
+            endpoint: 统计连接复用时使用的接口名（可选）
+            **kwargs: 请求的其他参数
+
+        Returns:
+            HTTPResponse: 响应对象
+        """
+        if 'headers' not in kwargs:
+            kwargs['headers'] = self.headers
+
+        self.debug_print("发送 %s 请求: %s", method.upper(), url)
+        response = await self.http.request(method, url, endpoint=endpoint, **kwargs)
+        self.debug_print("响应状态码: %s", response.status_code)
+
+        return response
+
+    async def get_person_appAccNo(self):
+        """从用户信息API获取appAccNo"""
+        try:
+            self.debug_print("尝试从userInfo API获取用户ID")
+            # 确保使用正确的URL
+            url = self.url("/ic-web/auth/userInfo", "http")
+
+            self.debug_print("请求用户信息URL: %s", url)
+
+            # 发送请求 - 通过共享连接池发送
+            response = await self.request("get", url)
+
+            self.debug_print("userInfo API响应状态码: %s", response.status_code)
+            self.debug_print("userInfo API响应内容: %.500s", response.text)
+
+            if response.status_code == 200:
+                data = response.json()
+                # 兼容大小写的code字段
+                code = data.get("code", data.get("CODE"))
+                if (code == 0 or code == "0") and "data" in data:
+                    app_acc_no = data["data"].get("accNo")
+                    if app_acc_no:
+                        self.app_acc_no = app_acc_no
+                        self.debug_print("成功获取用户ID: %s", app_acc_no)
+                        return app_acc_no
+                    else:
+                        self.debug_print("用户信息中没有accNo字段")
+                else:
+                    # 兼容大小写的message字段
+                    message = data.get("message") or data.get("MESSAGE", "未知错误")
+                    self.debug_print("API返回错误: %s", message)
+            else:
+                self.debug_print("获取用户信息失败，状态码: %s", response.status_code)
+
+            return None
+        except Exception as e:
+            self.debug_print("获取用户ID时发生异常: %s", e)
+            self.debug_print("异常详情:", exc_info=True)
+            return None
+
+    async def get_app_acc_no(self):
+        """获取用户的appAccNo，首先尝试userInfo接口，然后尝试从预约列表中获取"""
+        # 先尝试从userInfo接口获取
+        app_acc_no = await self.get_person_appAccNo()
+        if app_acc_no:
+            self.debug_print("从userInfo接口获取到appAccNo: %s", app_acc_no)
+            return app_acc_no
+
+        # 如果失败，再尝试从预约列表获取
+        try:
+            self.debug_print("尝试从预约列表获取用户appAccNo...")
+
+            # 计算查询日期范围
+            today = datetime.now()
+            params = {
+                "beginDate": (today - timedelta(days=1)).strftime("%Y-%m-%d"),
+                "endDate": (today + timedelta(days=7)).strftime("%Y-%m-%d"),
+                "needStatus": "6",
+                "page": "1",
+                "pageNum": "50",
+                "orderKey": "gmt_create",
+                "orderModel": "desc"
+            }
+
+            response = await self.request("get", self.url("/ic-web/reserve/resvInfo", "http"), params=params)
+
+            if response.status_code == 200:
+                result = response.json()
+                if result.get("code") == 0 or result.get("CODE") == "0":
+                    # 从响应中获取appAccNo
+                    if result.get("data"):
+                        first_reservation = result["data"][0]
+                        if "appAccNo" in first_reservation:
+                            self.app_acc_no = first_reservation["appAccNo"]
+                            self.debug_print("成功获取appAccNo: %s", self.app_acc_no)
+                            return self.app_acc_no
+                        self.debug_print("在预约记录中未找到appAccNo字段")
+                    else:
+                        self.debug_print("无预约记录，无法获取appAccNo")
+                else:
+                    self.debug_print("获取预约列表失败: %s", result.get('message', result.get('MESSAGE', '')))
+            else:
+                self.debug_print("请求失败，状态码: %s", response.status_code)
+
+        except Exception as e:
+            self.debug_print("获取appAccNo过程出错: %s", e)
+            self.debug_print("异常详情:", exc_info=True)
+
+        self.debug_print("无法获取appAccNo，请联系开发者")
+        return None
+
+    async def get_rooms_info(self):
+        """获取所有房间信息"""
+        try:
+            request_url = self.url("/ic-web/seatMenu")
+            self.debug_print("发送GET请求: %s", request_url)
+            self.debug_print("请求头: %s", RedactedHeaders(self.headers))
+
+            # 通过共享连接池发送请求
+            response = await self.request("get", request_url)
+
+            # 解析JSON响应
+            data = response.json()
+
+            if self.debug:
+                self.debug_print("响应状态码: %s", response.status_code)
+                self.debug_print("响应数据: %s", Payload(data, limit=500))
+
+            if data["code"] == 0:
+                rooms_info = {}
+
+                def extract_rooms(node):
+                    """递归提取房间信息"""
+                    # 如果是大学城校区，处理其子节点
+                    if node.get("name") == "大学城校区":
+                        for building in node.get("children", []):  # 遍历楼层
+                            for room in building.get("children", []):  # 遍历房间
+                                if "children" not in room:  # 确保是最终的房间节点
+                                    room_name = room["name"]
+                                    # 处理特殊房间号 - 走廊区域
+                                    if ("走廊" in room_name and "区" in room_name) or "（C区）" in room_name or "(C区)" in room_name:
+                                        # 处理各种格式的C区房间
+                                        if "（C区）" in room_name or "(C区)" in room_name:
+                                            # 提取楼层号
+                                            floor = room_name[0]
+                                            room_number = f"{floor}C"
+                                        # 处理类似"2楼北面（C区）"的情况
+                                        elif "（" in room_name and "）" in room_name:
+                                            floor = room_name[0]
+                                            area = room_name[room_name.find("（") + 1]
+                                            room_number = f"{floor}{area}"
+                                        else:
+                                            floor = room_name[0]
+                                            area = room_name[room_name.find("(") + 1]
+                                            room_number = f"{floor}{area}"
+                                    else:
+                                        room_number = room_name.split("自修室")[0].split("书库")[0].split("区")[0].strip()
+
+                                    rooms_info[room_number] = {
+                                        "id": room["id"],
+                                        "name": room["name"],
+                                        "total_seats": room["totalCount"]
+                                    }
+                    # 如果有子节点，继续递归
+                    elif "children" in node:
+                        for child in node["children"]:
+                            extract_rooms(child)
+
+                # 处理所有校区
+                for campus in data["data"]:
+                    extract_rooms(campus)
+
+                if not rooms_info:
+                    print("\033[33m[WARNING] 未找到大学城校区的房间信息\033[0m")
+                    return None
+
+                self.rooms_info = rooms_info
+                self.debug_print("解析出 %s 个房间信息", len(rooms_info))
+                return rooms_info
+            else:
+                print(f"获取房间信息失败: {data['message']}")
+                return None
+
+        except Exception as e:
+            print(f"获取房间信息时发生错误: {str(e)}")
+            if self.debug:
+                self.debug_print("异常详情:", exc_info=True)
+            return None
+
+    async def get_seats_info(self, date_str, room_id, build_matrix=False):
+        """获取指定日期和房间的座位列表信息
+
+        Args:
+            build_matrix: 为True时同时构建座位占用矩阵，保存在self.occupancy[(date_str, room_id)]
+
+        Returns:
+            Room（{座位号: Seat}），失败时返回None
+        """
+        try:
+            # 构建请求URL
+            url = self.url("/ic-web/reserve")
+
+            # 构建请求参数
+            params = {
+                "roomIds": room_id,
+                "resvDates": f"{self.year}{date_str}",
+                "sysKind": "8"
+            }
+
+            self.debug_print("发送GET请求: %s", url)
+            self.debug_print("请求参数: %s", params)
+
+            # 发送GET请求
+            response = await self.request("get", url, params=params)
+
+            # 与上一次返回的内容完全相同时直接复用上一次解析好的Room
+            digest = payload_digest(response.content)
+            seats_info = self.store.cached(date_str, room_id, digest)
+            if seats_info is not None:
+                self.debug_print("座位信息与上一次相同，复用 %s 个座位的解析结果", len(seats_info))
+                self.store.update(date_str, room_id, seats_info, digest)
+                if build_matrix:
+                    self.occupancy[(date_str, room_id)] = OccupancyMatrix.from_seats_info(seats_info)
+                return seats_info
+
+            # 解析JSON响应
+            with METRICS.timed("seat_json"):
+                data = response.json()
+
+            if self.debug:
+                self.debug_print("响应状态码: %s", response.status_code)
+                self.debug_print("响应数据大小: %s 字节", len(response.content))
+                seats_count = len(data["data"]) if data["code"] == 0 and "data" in data else 0
+                self.debug_print("座位数量: %s", seats_count)
+                if seats_count > 0:
+                    self.debug_print("座位示例: %s", Payload(data['data'][0], indent=2))
+
+            if data["code"] == 0:
+                # 只解析一次：时间转为分钟数，坐标转为浮点数
+                with METRICS.timed("seat_parse"):
+                    seats_info = Room.from_api(room_id, date_str, data["data"])
+                diff = self.store.update(date_str, room_id, seats_info, digest)
+
+                self.debug_print("成功获取 %s 个座位信息", len(seats_info))
+                if not diff.initial:
+                    self.debug_print("与上一次相比 %s 个座位有变化", len(diff))
+                if build_matrix:
+                    self.occupancy[(date_str, room_id)] = OccupancyMatrix.from_seats_info(seats_info)
+                return seats_info
+            else:
+                print(f"获取座位信息失败: {data['message']}")
+                self.debug_print("错误响应: %s", Payload(data, indent=2))
+                return None
+
+        except Exception as e:
+            print(f"获取座位信息时发生错误: {str(e)}")
+            if self.debug:
+                self.debug_print("异常详情:", exc_info=True)
+            return None
+
+    def get_occupancy(self, date_str, room_id):
+        """最近一次以build_matrix=True查询得到的座位占用矩阵，没有则返回None"""
+        return self.occupancy.get((date_str, room_id))
+
+    async def get_seats_info_many(self, queries, concurrency=None):
+        """并发查询多个房间/日期的座位信息
+
+        Args:
+            queries: (date_str, room_id) 元组列表
+            concurrency: 最大并发数（可选，默认受连接池大小限制）
+
+        Returns:
+            与queries顺序一致的座位信息列表，失败的查询为None
+        """
+        return await gather_bounded([self.get_seats_info(date_str, room_id) for date_str, room_id in queries],
+                                    concurrency)
+
+    async def snapshot(self, dates, room_ids=None, concurrency=8):
+        """并发获取多个日期、所有房间（或指定房间）的座位信息，合并为一个全馆快照
+
+        Args:
+            dates: 日期列表 (MMDD)，也可以是单个日期
+            room_ids: 只获取这些房间（可选，房间ID或房间编号，默认为get_rooms_info返回的所有房间）
+            concurrency: 同时进行的请求数
+
+        Returns:
+            LibrarySnapshot，获取房间信息失败时返回None
+        """
+        if isinstance(dates, str):
+            dates = [dates]
+        rooms_info = self.rooms_info or await self.get_rooms_info()
+        if not rooms_info:
+            return None
+        if room_ids is None:
+            room_numbers = list(rooms_info)
+        else:
+            wanted = {str(room_id) for room_id in room_ids}
+            room_numbers = [number for number, info in rooms_info.items()
+                            if number in wanted or str(info["id"]) in wanted]
+
+        snapshot = LibrarySnapshot(rooms_info)
+        start = time.perf_counter()
+
+        async def fetch(date_str, room_number):
+            started = time.perf_counter()
+            room = await self.get_seats_info(date_str, rooms_info[room_number]["id"])
+            snapshot.add(date_str, room_number, room, (time.perf_counter() - started) * 1000)
+
+        await gather_bounded([fetch(date_str, room_number) for date_str in dates for room_number in room_numbers],
+                             concurrency)
+        snapshot.elapsed = time.perf_counter() - start
+        self.debug_print("全馆快照: %s 天 × %s 个房间, 耗时 %.0f ms", len(dates), len(room_numbers),
+                         snapshot.elapsed * 1000)
+        return snapshot
+
+    @staticmethod
+    def split_time_periods(start_time, end_time, max_minutes=240, min_minutes=60):
+        """将长时间段拆分为多个时间段，确保每段不少于min_minutes分钟且不超过max_minutes分钟
+
+        Args:
+            start_time: 开始时间 (HH:MM)
+            end_time: 结束时间 (HH:MM)
+            max_minutes: 每段最大分钟数，默认240分钟
+            min_minutes: 每段最小分钟数，默认60分钟
+
+        Returns:
+            时间段列表，每个元素为(开始时间, 结束时间)的元组
+        """
+        # 转换时间字符串为datetime对象
+        start_dt = datetime.strptime(start_time, "%H:%M")
+        end_dt = datetime.strptime(end_time, "%H:%M")
+
+        # 计算分钟差
+        if end_dt < start_dt:  # 处理跨天的情况
+            end_dt = end_dt + timedelta(days=1)
+
+        time_diff = (end_dt - start_dt).total_seconds() / 60
+
+        # 检查总时间是否满足最小时间要求
+        if time_diff < min_minutes:
+            print(f"\n\033[33m[WARNING] 预约时间段小于{min_minutes}分钟，图书馆要求预约时间至少为{min_minutes}分钟\033[0m")
+            # 尝试延长到最小时间
+            if end_dt + timedelta(minutes=(min_minutes - time_diff)) <= datetime.strptime("21:45", "%H:%M"):
+                end_dt = start_dt + timedelta(minutes=min_minutes)
+                end_time = end_dt.strftime("%H:%M")
+                print(f"\n已自动调整结束时间为: {end_time}")
+            else:
+                print("\n无法自动调整时间段到符合要求，请重新选择")
+                return []
+
+        # 如果时间段不超过max_minutes，直接返回
+        if time_diff <= max_minutes:
+            return [(start_time, end_time)]
+
+        # 否则，将时间段拆分为多个不超过max_minutes的时间段
+        time_periods = []
+        current_start = start_dt
+
+        # 计算完整的时间段数量
+        num_full_periods = int(time_diff // max_minutes)
+        remaining_minutes = time_diff % max_minutes
+
+        # 如果剩余时间小于最小时间要求，调整最后一个完整时间段
+        if 0 < remaining_minutes < min_minutes:
+            # 减少完整时间段的数量
+            if num_full_periods > 0:
+                # 分配剩余分钟到最后一个完整段
+                adjusted_last_period = max_minutes + remaining_minutes
+                # 确保不超过最大时间限制
+                if adjusted_last_period <= max_minutes:
+                    num_full_periods -= 1
+                    remaining_minutes = adjusted_last_period
+            else:
+                # 如果没有完整时间段，直接返回整段
+                return [(start_time, end_time)]
+
+        # 添加完整时间段
+        for _ in range(num_full_periods):
+            current_end = current_start + timedelta(minutes=max_minutes)
+            time_periods.append((
+                current_start.strftime("%H:%M"),
+                current_end.strftime("%H:%M")
+            ))
+            current_start = current_end
+
+        # 添加最后一个不完整时间段（如果有）
+        if remaining_minutes >= min_minutes:
+            time_periods.append((
+                current_start.strftime("%H:%M"),
+                end_dt.strftime("%H:%M")
+            ))
+        elif remaining_minutes > 0 and time_periods:
+            # 如果剩余时间太短但大于0，将其并入前一段
+            last_start, _ = time_periods.pop()
+            time_periods.append((
+                last_start,
+                end_dt.strftime("%H:%M")
+            ))
+
+        # 最终检查所有时间段，确保没有超过max_minutes的段
+        validated_periods = []
+        for start_str, end_str in time_periods:
+            start_period = datetime.strptime(start_str, "%H:%M")
+            end_period = datetime.strptime(end_str, "%H:%M")
+
+            # 处理跨天情况
+            if end_period < start_period:
+                end_period = end_period + timedelta(days=1)
+
+            period_minutes = (end_period - start_period).total_seconds() / 60
+
+            # 如果发现超过最大时间的段，进行再次拆分
+            if period_minutes > max_minutes:
+                # 计算需要切分的次数
+                num_splits = int(period_minutes // max_minutes)
+                split_start = start_period
+
+                for _ in range(num_splits):
+                    split_end = split_start + timedelta(minutes=max_minutes)
+                    validated_periods.append((
+                        split_start.strftime("%H:%M"),
+                        split_end.strftime("%H:%M")
+                    ))
+                    split_start = split_end
+
+                # 处理最后一段
+                remaining = (end_period - split_start).total_seconds() / 60
+                if remaining >= min_minutes:
+                    validated_periods.append((
+                        split_start.strftime("%H:%M"),
+                        end_period.strftime("%H:%M")
+                    ))
+                elif remaining > 0 and validated_periods:
+                    # 合并到前一段
+                    last_start, _ = validated_periods.pop()
+                    validated_periods.append((
+                        last_start,
+                        end_period.strftime("%H:%M")
+                    ))
+            else:
+                validated_periods.append((start_str, end_str))
+
+        # 最后确认每个时间段的时长
+        final_periods = []
+        for start_str, end_str in validated_periods:
+            start_period = datetime.strptime(start_str, "%H:%M")
+            end_period = datetime.strptime(end_str, "%H:%M")
+
+            # 处理跨天情况
+            if end_period < start_period:
+                end_period = end_period + timedelta(days=1)
+
+            period_minutes = (end_period - start_period).total_seconds() / 60
+
+            # 确保不超过最大允许时间
+            if period_minutes > max_minutes:
+                end_period = start_period + timedelta(minutes=max_minutes)
+                end_str = end_period.strftime("%H:%M")
+
+            final_periods.append((start_str, end_str))
+
+        return final_periods
+
+    def _build_reservation_data(self, seat_sn, begin_time, end_time, date_str, app_acc_no):
+        """构建预约请求数据
+
+        Returns:
+            (data, None) 或 (None, 错误结果字典)
+        """
+        # 检查app_acc_no是否有效
+        if not app_acc_no:
+            return None, {"code": -1, "message": "无法获取用户ID (appAccNo)"}
+
+        # 确保self.year存在
+        if not hasattr(self, 'year') or self.year is None:
+            # 如果date_str是MMDD格式 (例如0513)
+            if len(date_str) == 4:
+                self.year = str(datetime.now().year)
+            # 如果date_str是YYYYMMDD格式 (例如20250513)
+            elif len(date_str) == 8:
+                self.year = date_str[:4]
+                date_str = date_str[4:]  # 截取后面的MMDD部分
+            # 如果是其他格式则使用当前年份
+            else:
+                self.year = str(datetime.now().year)
+
+        # 构建正确的日期字符串格式
+        try:
+            # 解析日期字符串
+            if len(date_str) == 4:  # MMDD
+                month = date_str[:2]
+                day = date_str[2:]
+                formatted_date = f"{self.year}-{month}-{day}"
+            elif len(date_str) == 8:  # YYYYMMDD
+                year = date_str[:4]
+                month = date_str[4:6]
+                day = date_str[6:]
+                formatted_date = f"{year}-{month}-{day}"
+            elif '-' in date_str:  # YYYY-MM-DD
+                formatted_date = date_str
+            else:
+                return None, {"code": -1, "message": f"无效的日期格式: {date_str}"}
+        except Exception as e:
+            return None, {"code": -1, "message": f"日期格式处理错误: {str(e)}"}
+
+        data = {
+            "sysKind": 8,
+            "memberKind": 1,
+            "appAccNo": app_acc_no,
+            "resvMember": [app_acc_no],  # 使用appAccNo值
+            "resvBeginTime": f"{formatted_date} {begin_time}:00",
+            "resvEndTime": f"{formatted_date} {end_time}:00",
+            "testName": "",
+            "captcha": "",
+            "resvProperty": 0,
+            "resvDev": [seat_sn],
+            "memo": ""
+        }
+        return data, None
+
+    async def _resolve_app_acc_no(self, app_acc_no):
+        """使用传入的app_acc_no，未传入时确保已获取当前用户的appAccNo（userInfo失败时从预约列表获取）"""
+        if app_acc_no is None:
+            if self.app_acc_no is None:
+                await self.get_app_acc_no()
+            app_acc_no = self.app_acc_no
+        return app_acc_no
+
+    async def make_reservation(self, seat_sn, begin_time, end_time, date_str, app_acc_no=None):
+        """提交座位预约请求"""
+        # 清理可能存在的非法Unicode字符
+        begin_time = strip_surrogates(begin_time)
+        end_time = strip_surrogates(end_time)
+
+        app_acc_no = await self._resolve_app_acc_no(app_acc_no)
+        data, error = self._build_reservation_data(seat_sn, begin_time, end_time, date_str, app_acc_no)
+        if error:
+            return error
+
+        # 构建请求URL
+        url = self.url("/ic-web/reserve", "http")
+
+        if self.debug:
+            self.debug_print("发送预约请求: %s", url)
+            self.debug_print("预约数据: %s", Payload(data))
+
+        result, _ = await self._submit_reservation(url, seat_sn, begin_time, end_time, json=data)
+        return result
+
+    async def _submit_reservation(self, url, seat_sn, begin_time, end_time, **kwargs):
+        """发送预约POST请求并统一响应格式
+
+        Returns:
+            (结果字典, HTTPResponse)，请求异常时响应为None
+        """
+        try:
+            # 发送POST请求
+            response = await self.request("post", url, **kwargs)
+
+            # 解析JSON响应
+            result = response.json()
+
+            if self.debug:
+                self.debug_print("预约响应状态码: %s", response.status_code)
+                self.debug_print("预约响应内容: %s", Payload(result, indent=2))
+
+            # 转换响应格式为统一的格式
+            if "code" in result:
+                result["CODE"] = result["code"]
+                result["MESSAGE"] = result.get("message", "")
+
+            if result.get("CODE", result.get("code")) == 0:
+                print(f"\033[32m预约成功! 座位: {seat_sn}, 时间: {begin_time}-{end_time}\033[0m")
+            else:
+                print(f"\033[31m预约失败: {result.get('MESSAGE', result.get('message', '未知错误'))}\033[0m")
+
+            return result, response
+
+        except Exception as e:
+            print(f"\033[31m[ERROR] 预约请求发生错误: {str(e)}\033[0m")
+            if self.debug:
+                self.debug_print("预约异常详情:", exc_info=True)
+            return {"CODE": -1, "MESSAGE": f"预约请求异常: {str(e)}"}, None
+
+    async def prepare_reservation(self, seat_sn, begin_time, end_time, date_str, app_acc_no=None):
+        """预先构建并序列化预约请求，开火时只需写出字节
+
+        Returns:
+            PreparedReservation，数据无效时返回None
+        """
+        begin_time = strip_surrogates(begin_time)
+        end_time = strip_surrogates(end_time)
+        app_acc_no = await self._resolve_app_acc_no(app_acc_no)
+        data, error = self._build_reservation_data(seat_sn, begin_time, end_time, date_str, app_acc_no)
+        if error:
+            print(f"\033[31m[ERROR] 预约请求预构建失败: {error['message']}\033[0m")
+            return None
+
+        headers = dict(self.headers)
+        headers["Content-Type"] = "application/json"
+        return PreparedReservation(
+            seat_sn=seat_sn,
+            begin_time=begin_time,
+            end_time=end_time,
+            url=self.url("/ic-web/reserve", "http"),
+            body=json.dumps(data, separators=(",", ":")).encode("utf-8"),
+            headers=headers,
+        )
+
+    async def fire_prepared(self, prepared):
+        """发送预构建的预约请求，返回与make_reservation相同格式的结果
+
+        请求头写出的时刻（time.perf_counter）记录在prepared.sent_at中，用于统计开火延迟
+        """
+        result, response = await self._submit_reservation(prepared.url, prepared.seat_sn, prepared.begin_time,
+                                                          prepared.end_time, headers=prepared.headers,
+                                                          data=prepared.body)
+        prepared.sent_at = response.sent_at if response is not None else None
+        return result
+
+    async def warm_up(self, connections=2):
+        """预热连接池：解析DNS并建立connections条keep-alive连接
+
+        通过并发请求userInfo接口建立连接，请求结束后连接留在池中供预约请求复用
+
+        Returns:
+            成功完成的预热请求数
+        """
+        url = self.url("/ic-web/auth/userInfo", "http")
+
+        async def touch():
+            try:
+                await self.http.request("get", url, endpoint="WARMUP", headers=self.headers)
+                return True
+            except Exception as e:
+                self.debug_print("预热连接失败: %s", e)
+                return False
+
+        results = await asyncio.gather(*(touch() for _ in range(connections)))
+        return sum(results)
+
+    async def probe_server_date(self):
+        """发送一次轻量请求，返回服务器的Date响应头，用于估计时钟偏差"""
+        response = await self.http.request("get", self.url("/ic-web/auth/userInfo", "http"),
+                                           endpoint="CLOCK_PROBE", headers=self.headers)
+        return response.headers.get("Date")
+
+    async def sync_server_clock(self, count=8):
+        """通过多次探测估计本机与服务器的时钟偏差和RTT
+
+        Returns:
+            scheduler.ClockSync
+        """
+        clock_sync = await estimate_clock_offset_async(self.probe_server_date, count)
+        self.debug_print("服务器时钟同步结果: %s", clock_sync)
+        return clock_sync
+
+    async def prearm(self, seat_sn, time_periods, date_str, connections=None):
+        """开火前的预备阶段：预热连接并预构建所有时间段的预约请求
+
+        Args:
+            seat_sn: 座位devId
+            time_periods: (开始时间, 结束时间) 元组列表
+            date_str: 预约日期
+            connections: 预热连接数，默认与时间段数量相同
+
+        Returns:
+            与time_periods顺序一致的PreparedReservation列表（构建失败的为None）
+        """
+        warmed = await self.warm_up(connections or len(time_periods))
+        self.debug_print("已预热 %s 条连接", warmed)
+        return [await self.prepare_reservation(seat_sn, start, end, date_str) for start, end in time_periods]
+
+    async def submit_periods(self, seat_sn, time_periods, date_str, prepared=None, concurrent=True,
+                             retry_policy=None):
+        """提交一个预约计划的所有时间段，每段按自己的重试策略独立重试
+
+        Args:
+            seat_sn: 座位devId
+            time_periods: (开始时间, 结束时间) 元组列表
+            date_str: 预约日期
+            prepared: 与time_periods对应的PreparedReservation列表（可选），有则直接写出预构建的请求
+            concurrent: True时所有时间段并发提交，False时按顺序逐段提交
+            retry_policy: RetryPolicy，或与time_periods等长的RetryPolicy列表（可选）
+
+        Returns:
+            与time_periods顺序一致的结果字典列表，包含start、end、success、code、message、
+            attempts、latency_ms（从开始提交到拿到最终结果的毫秒数）和原始result
+        """
+        if retry_policy is None or isinstance(retry_policy, RetryPolicy):
+            policies = [retry_policy or RetryPolicy()] * len(time_periods)
+        else:
+            policies = list(retry_policy)
+
+        async def submit(index):
+            period_start, period_end = time_periods[index]
+            policy = policies[index]
+            prepared_request = prepared[index] if prepared else None
+            start = time.perf_counter()
+            attempts = 0
+            while True:
+                attempts += 1
+                if prepared_request is not None:
+                    result = await self.fire_prepared(prepared_request)
+                else:
+                    result = await self.make_reservation(seat_sn, period_start, period_end, date_str)
+                if result_code(result) == 0 or attempts >= policy.attempts or not policy.should_retry(result):
+                    break
+                if policy.delay:
+                    await asyncio.sleep(policy.delay)
+            return {
+                "start": period_start,
+                "end": period_end,
+                "success": result_code(result) == 0,
+                "code": result_code(result),
+                "message": result.get("message", result.get("MESSAGE", "")) if result else "",
+                "attempts": attempts,
+                "latency_ms": (time.perf_counter() - start) * 1000,
+                "result": result,
+            }
+
+        if concurrent:
+            return await asyncio.gather(*(submit(i) for i in range(len(time_periods))))
+        return [await submit(i) for i in range(len(time_periods))]
+
+    async def prearm_candidates(self, candidates, time_periods, date_str, parallelism=2):
+        """为候选座位列表预热连接并预构建预约请求
+
+        Args:
+            candidates: 按优先级排列的Seat列表
+            parallelism: 同时尝试的候选座位数，决定预热的连接数
+
+        Returns:
+            与candidates顺序一致的列表，每项为该座位各时间段的PreparedReservation列表
+        """
+        warmed = await self.warm_up(max(1, min(parallelism, len(candidates))) * len(time_periods))
+        self.debug_print("已预热 %s 条连接", warmed)
+        return await self.prepare_candidates(candidates, time_periods, date_str)
+
+    async def prepare_candidates(self, candidates, time_periods, date_str):
+        """为候选座位列表预构建所有时间段的预约请求（不预热连接）
+
+        Returns:
+            与candidates顺序一致的列表，每项为该座位各时间段的PreparedReservation列表
+        """
+        return [[await self.prepare_reservation(seat.dev_id, start, end, date_str) for start, end in time_periods]
+                for seat in candidates]
+
+    @staticmethod
+    def _reservation_uuid(result):
+        """从预约响应中取出预约uuid（响应不含uuid时返回None）"""
+        data = result.get("data") if isinstance(result, dict) else None
+        if isinstance(data, dict):
+            return data.get("uuid")
+        return None
+
+    async def find_reservation_uuids(self, seat_sn, date_str, time_periods):
+        """在预约列表中查找指定座位、日期和时间段的预约uuid
+
+        Returns:
+            {(开始时间, 结束时间): uuid}，只包含找到的时间段
+        """
+        date = f"{self.year}-{date_str[:2]}-{date_str[2:]}"
+        reservations = await self.get_reservations(date, date) or []
+        wanted = set(time_periods)
+        found = {}
+        for resv in reservations:
+            devices = resv.get("resvDevInfoList") or []
+            if not any(str(dev.get("devId", dev.get("devSn"))) == str(seat_sn) for dev in devices):
+                continue
+            begin = datetime.fromtimestamp(resv["resvBeginTime"] / 1000).strftime("%H:%M")
+            end = datetime.fromtimestamp(resv["resvEndTime"] / 1000).strftime("%H:%M")
+            if (begin, end) in wanted:
+                found[(begin, end)] = resv["uuid"]
+        return found
+
+    async def cancel_periods(self, seat_sn, date_str, period_results):
+        """取消submit_periods结果中预约成功的时间段
+
+        Returns:
+            [(开始时间, 结束时间, 是否取消成功)] 列表
+        """
+        succeeded = [item for item in period_results if item["success"]]
+        uuids = {(item["start"], item["end"]): self._reservation_uuid(item["result"]) for item in succeeded}
+        missing = [period for period, uuid in uuids.items() if not uuid]
+        if missing:
+            uuids.update(await self.find_reservation_uuids(seat_sn, date_str, missing))
+
+        async def cancel(period):
+            uuid = uuids.get(period)
+            return (*period, bool(uuid) and await self.delete_reservation(uuid))
+
+        return await asyncio.gather(*(cancel((item["start"], item["end"])) for item in succeeded))
+
+    async def race_candidates(self, candidates, time_periods, date_str, prepared=None, parallelism=2,
+                              retry_policy=None):
+        """按优先级并发尝试多个候选座位，所有时间段都落在同一个座位上
+
+        同一账号在同一时间段只能预约一个座位，多个座位同时提交整个计划时各时间段会互相冲突，
+        被拆到不同的座位上。因此同时尝试多个座位时逐段竞争：当前时间段同时向最多parallelism个座位提交，
+        出现成功后不再发起新的尝试，已在途的照常完成，保留其中排名最靠前的座位，其余成功的通过
+        delete_reservation自动取消；之后剩余的时间段只向该座位提交。当前时间段所有座位都失败时竞争下一个时间段。
+        只尝试一个座位时（parallelism为1或只有一个候选）按优先级逐个座位提交整个计划
+
+        Args:
+            candidates: 按优先级排列的Seat列表（跨房间时带有room_name）
+            time_periods: (开始时间, 结束时间) 元组列表
+            date_str: 预约日期
+            prepared: prearm_candidates的返回值（可选）
+            parallelism: 同时尝试的候选座位数
+            retry_policy: 每个时间段的RetryPolicy，或与time_periods等长的RetryPolicy列表（可选）
+
+        Returns:
+            dict: success（所有时间段都预约成功）、partial（座位只抢到部分时间段）、rank（抢到时间段的座位的排名，
+            从1开始）、seat、time_to_success_ms（仅success时）、periods（该座位的submit_periods结果，
+            与time_periods顺序一致）、attempts（每个候选座位的尝试情况）、cancelled
+        """
+        start = time.perf_counter()
+        if retry_policy is None or isinstance(retry_policy, RetryPolicy):
+            policies = [retry_policy or RetryPolicy()] * len(time_periods)
+        else:
+            policies = list(retry_policy)
+        attempts = [{"rank": rank, "seat": seat, "status": "skipped", "periods": None, "finished_ms": None}
+                    for rank, seat in enumerate(candidates, 1)]
+
+        async def submit(index, indexes):
+            # 向第index个候选座位提交indexes中的时间段，结果按时间段顺序合并到该座位的记录中
+            record = attempts[index]
+            results = await self.submit_periods(
+                candidates[index].dev_id, [time_periods[i] for i in indexes], date_str,
+                prepared=[prepared[index][i] for i in indexes] if prepared else None,
+                retry_policy=[policies[i] for i in indexes])
+            record["periods"] = sorted((record["periods"] or []) + results,
+                                       key=lambda item: time_periods.index((item["start"], item["end"])))
+            record["finished_ms"] = (time.perf_counter() - start) * 1000
+            record["status"] = "failed"
+            return any(item["success"] for item in results)
+
+        # 每轮竞争的时间段数：只尝试一个座位时一次提交整个计划
+        batch = len(time_periods) if min(parallelism, len(candidates)) <= 1 else 1
+        holder = None
+        surplus = []
+        for first in range(0, len(time_periods), batch):
+            indexes = list(range(first, min(first + batch, len(time_periods))))
+            semaphore = asyncio.Semaphore(max(1, parallelism))
+            won = asyncio.Event()
+
+            async def attempt(index):
+                async with semaphore:
+                    if won.is_set():
+                        return False
+                    if await submit(index, indexes):
+                        won.set()
+                        return True
+                    return False
+
+            outcomes = await asyncio.gather(*(attempt(i) for i in range(len(candidates))))
+            winners = [index for index, ok in enumerate(outcomes) if ok]
+            if winners:
+                holder, surplus = winners[0], winners[1:]
+                rest = list(range(indexes[-1] + 1, len(time_periods)))
+                if rest:
+                    await submit(holder, rest)
+                break
+
+        cancelled = []
+        if surplus:
+            outcomes = await asyncio.gather(*(self.cancel_periods(candidates[index].dev_id, date_str,
+                                                                  attempts[index]["periods"]) for index in surplus))
+            for index, outcome in zip(surplus, outcomes):
+                attempts[index]["status"] = "cancelled"
+                cancelled.extend((index + 1, *item) for item in outcome)
+
+        record = attempts[holder] if holder is not None else None
+        success = record is not None and len(record["periods"]) == len(time_periods) \
+            and all(item["success"] for item in record["periods"])
+        if record is not None:
+            record["status"] = "won" if success else "partial"
+        return {
+            "success": success,
+            "partial": record is not None and not success,
+            "rank": record["rank"] if record else None,
+            "seat": record["seat"] if record else None,
+            "time_to_success_ms": record["finished_ms"] if success else None,
+            "periods": record["periods"] if record else [],
+            "attempts": attempts,
+            "cancelled": cancelled,
+        }
+
+    async def make_reservations_many(self, reservations, concurrency=None):
+        """并发提交多个预约请求
+
+        Args:
+            reservations: (seat_sn, begin_time, end_time, date_str) 元组列表
+            concurrency: 最大并发数（可选）
+
+        Returns:
+            与reservations顺序一致的预约结果列表
+        """
+        return await gather_bounded([self.make_reservation(*reservation) for reservation in reservations],
+                                    concurrency)
+
+    async def submit_seat_plan(self, reservations, date_str, retry_policy=None):
+        """提交跨多个座位的预约方案（如换座方案），各座位并发提交，同一座位的时间段也并发提交
+
+        Args:
+            reservations: (Seat, 开始时间, 结束时间) 列表
+
+        Returns:
+            与reservations顺序一致的submit_periods结果字典列表，每项另含seat
+        """
+        by_seat = {}
+        for index, (seat, start, end) in enumerate(reservations):
+            by_seat.setdefault(seat.dev_id, (seat, []))[1].append((index, start, end))
+        outcomes = await asyncio.gather(*(
+            self.submit_periods(seat.dev_id, [(start, end) for _, start, end in items], date_str,
+                                retry_policy=retry_policy)
+            for seat, items in by_seat.values()))
+        results = [None] * len(reservations)
+        for (seat, items), period_results in zip(by_seat.values(), outcomes):
+            for (index, _, _), item in zip(items, period_results):
+                results[index] = dict(item, seat=seat)
+        return results
+
+    async def get_reservations(self, begin_date=None, end_date=None):
+        """获取当前用户的预约列表
+
+        Args:
+            begin_date: 查询开始日期 YYYY-MM-DD（可选，默认昨天）
+            end_date: 查询结束日期 YYYY-MM-DD（可选，默认7天后）
+        """
+        try:
+            # 计算查询日期范围（前一天到后七天）
+            today = datetime.now()
+            begin_date = begin_date or (today - timedelta(days=1)).strftime("%Y-%m-%d")
+            end_date = end_date or (today + timedelta(days=7)).strftime("%Y-%m-%d")
+
+            # 构建请求URL和参数
+            url = self.url("/ic-web/reserve/resvInfo")
+            params = {
+                "beginDate": begin_date,
+                "endDate": end_date,
+                "needStatus": "6",
+                "page": "1",
+                "pageNum": "50",
+                "orderKey": "gmt_create",
+                "orderModel": "desc"
+            }
+
+            self.debug_print("发送GET请求: %s", url)
+            self.debug_print("请求参数: %s", params)
+
+            # 发送GET请求
+            response = await self.request("get", url, params=params)
+
+            # 解析JSON响应
+            data = response.json()
+
+            if self.debug:
+                self.debug_print("响应状态码: %s", response.status_code)
+                self.debug_print("响应数据大小: %s 字节", len(response.content))
+                if data["code"] == 0:
+                    reservations_count = len(data["data"]) if "data" in data else 0
+                    self.debug_print("预约记录数: %s", reservations_count)
+                    if reservations_count > 0:
+                        self.debug_print("预约记录示例: %s", Payload(data['data'][0], indent=2))
+
+                        # 输出所有不同的状态码，帮助发现新的状态类型
+                        if "data" in data and len(data["data"]) > 0:
+                            status_codes = set(item["resvStatus"] for item in data["data"])
+                            self.debug_print("发现的状态码: %s", status_codes)
+                            for code in status_codes:
+                                desc = self.get_reservation_status_description(code)
+                                self.debug_print("状态码 %s: %s", code, desc)
+                else:
+                    self.debug_print("错误响应: %s", Payload(data, indent=2))
+
+            if data["code"] == 0:
+                reservations = data["data"]
+                return reservations
+            else:
+                print(f"\033[31m获取预约列表失败: {data.get('message', '未知错误')}\033[0m")
+                return None
+
+        except Exception as e:
+            print(f"\033[31m[ERROR] 获取预约列表时发生错误: {str(e)}\033[0m")
+            if self.debug:
+                self.debug_print("异常详情:", exc_info=True)
+            return None
+
+    def get_reservation_status_description(self, status_code):
+        """
+        根据状态码返回友好的预约状态描述
+
+        Args:
+            status_code: 预约状态码
+
+        Returns:
+            status_description: 状态描述字符串
+        """
+        status_map = {
+            1027: "已预约（等待签到）",
+            1093: "已签到（使用中）",
+            1029: "已超时（未签到被系统取消）",
+            3141: "暂时离开",
+            1031: "已终止（管理员终止）",
+            1033: "已删除（被管理员删除）"
+        }
+
+        return status_map.get(status_code, f"未知状态({status_code})")
+
+    async def sign_reservation(self, devSn):
+        """发送请求签到预约"""
+        try:
+            lurl = self.url("/ic-web/phoneSeatReserve/login")
+
+            # 发送POST请求
+            login_data = {
+                "devSn": devSn,
+                "type": "1",
+                "bind": 0,
+                "loginType": 2
+            }
+
+            response_login = await self.request("post", lurl, json=login_data, timeout=60)
+
+            response_login_data = response_login.json()
+
+            if self.debug:
+                self.debug_print("响应状态码: %s", response_login.status_code)
+                self.debug_print("响应数据: %s", Payload(response_login_data, indent=2))
+
+            resvId = response_login_data.get('data').get('reserveInfo').get('resvId')
+            # 构造请求数据
+            data = {"resvId": resvId}
+
+            url = self.url("/ic-web/phoneSeatReserve/sign")
+            self.debug_print("发送POST请求: %s", url)
+            self.debug_print("请求数据: %s", data)
+
+            # 发送POST请求
+            response = await self.request("post", url, json=data)
+
+            # 解析JSON响应
+            result = response.json()
+
+            if self.debug:
+                self.debug_print("响应状态码: %s", response.status_code)
+                self.debug_print("响应数据: %s", Payload(result, indent=2))
+
+            if result["code"] == 0:
+                return True
+            else:
+                print(f"\033[31m[ERROR] 签到失败: {result.get('message', '未知错误')}\033[0m")
+                return False
+
+        except Exception as e:
+            print(f"\033[31m[ERROR] 签到请求发生错误: {str(e)}\033[0m")
+            if self.debug:
+                self.debug_print("异常详情:", exc_info=True)
+            return False
+
+    async def delete_reservation(self, uuid):
+        """发送请求删除预约"""
+        try:
+            # 构建请求URL
+            url = self.url("/ic-web/reserve/delete")
+
+            # 构造请求数据
+            data = {"uuid": uuid}
+
+            self.debug_print("发送POST请求: %s", url)
+            self.debug_print("请求数据: %s", Payload(data))
+
+            # 发送POST请求
+            response = await self.request("post", url, json=data)
+
+            # 解析JSON响应
+            result = response.json()
+
+            if self.debug:
+                self.debug_print("响应状态码: %s", response.status_code)
+                self.debug_print("响应数据: %s", Payload(result, indent=2))
+
+            if result["code"] == 0:
+                return True
+            else:
+                print(f"\033[31m删除预约失败: {result.get('message', '未知错误')}\033[0m")
+                return False
+
+        except Exception as e:
+            print(f"\033[31m[ERROR] 删除预约请求发生错误: {str(e)}\033[0m")
+            if self.debug:
+                self.debug_print("异常详情:", exc_info=True)
+            return False
+
+    def get_connection_stats(self):
+        """获取各接口的连接复用统计"""
+        return self.http.stats.snapshot()
+
+    async def close(self):
+        """关闭本实例持有的连接池"""
+        if self._owns_client:
+            await self.http.close()
@@ -0,0 +1,119 @@
+"""
+座位竞争度模型测试
+生成若干周的占用历史：一部分座位是“热门座位”，每天放出后几分钟内就被抢走；一部分是普通座位，
+当天晚些时候才被预约；其余座位很少有人预约。历史写入临时HistoryStore后建立ContentionModel，
+测量建表耗时和给候选座位排序的耗时，并校验排序把冷门座位排在热门座位之前
+
+用法: python benchmarks/bench_contention.py [--rooms 10] [--seats 60] [--days 42]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contention import ContentionModel  # noqa: E402
+from feed import RoomDiff, diff_rooms  # noqa: E402
+from history import HistoryStore  # noqa: E402
+from models import Room  # noqa: E402
+
+TODAY = datetime(2026, 5, 31, 12, 0)
+
+
+def seat_kind(seat):
+    return "hot" if seat % 5 == 0 else "warm" if seat % 5 == 1 else "cold"
+
+
+def build_history(history, rooms, seats, days, rng):
+    rooms_info = {}
+    for index in range(rooms):
+        number = f"{2 + index // 10}{index % 10:02d}"
+        rooms_info[number] = {"id": 1000 + index, "name": f"{number}自修室"}
+    history.record_rooms(rooms_info)
+    for day in range(days, 0, -1):
+        date = TODAY - timedelta(days=day)
+        release = (date.replace(hour=6, minute=15) - timedelta(days=1)).timestamp()
+        for number, info in rooms_info.items():
+            at_release, later = {}, {}
+            for seat in range(seats):
+                name = f"{number}-{seat:03d}"
+                kind = seat_kind(seat)
+                base = {"devId": info["id"] * 1000 + seat, "devName": name, "coordinate": "0,0"}
+                reserved = [{"start": "08:30", "end": "12:30"}]
+                if kind == "hot" and rng.random() < 0.9:
+                    at_release[name] = dict(base, reserved_times=reserved)
+                    later[name] = at_release[name]
+                    continue
+                at_release[name] = dict(base, reserved_times=[])
+                probability = 0.5 if kind == "warm" else 0.05
+                later[name] = dict(base, reserved_times=reserved if rng.random() < probability else [])
+            first = Room.from_dicts(info["id"], date.strftime("%m%d"), at_release)
+            second = Room.from_dicts(info["id"], date.strftime("%m%d"), later)
+            # 放出后2分钟第一次查询，3小时后第二次查询
+            history.publish(RoomDiff(date.strftime("%m%d"), info["id"], diff_rooms(None, first), initial=True,
+                                     at=release + 120, seats=seats))
+            history.publish(RoomDiff(date.strftime("%m%d"), info["id"], diff_rooms(first, second),
+                                     at=release + 3 * 3600, seats=seats))
+    history.flush()
+    return rooms_info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="座位竞争度模型测试")
+    parser.add_argument("--rooms", type=int, default=10, help="房间数")
+    parser.add_argument("--seats", type=int, default=60, help="每个房间的座位数")
+    parser.add_argument("--days", type=int, default=42, help="历史天数")
+    args = parser.parse_args()
+
+    rng = random.Random(20240601)
+    history = HistoryStore(os.path.join(tempfile.mkdtemp(), "history.db"))
+    rooms_info = build_history(history, args.rooms, args.seats, args.days, rng)
+
+    started = time.perf_counter()
+    model = ContentionModel.from_history(history, days=args.days + 1, now=TODAY.timestamp())
+    build = time.perf_counter() - started
+    history.close()
+    print(f"{args.days} 天 × {args.rooms} 个房间 × {args.seats} 个座位，建立查找表 {build * 1000:.0f} ms，"
+          f"表大小 {(model.demand.nbytes + model.contention.nbytes) / 1024:.0f} KB")
+
+    room_id = rooms_info[next(iter(rooms_info))]["id"]
+    room = Room.from_dicts(room_id, "0601", {f"s{seat}": {"devId": room_id * 1000 + seat, "devName": f"s{seat}"}
+                                             for seat in range(args.seats)})
+    candidates = list(room.values())[:10]
+    date_str = (TODAY + timedelta(days=1)).strftime("%m%d")
+    model.rank(candidates, date_str, "08:30", "12:30")
+    rounds = 2000
+    started = time.perf_counter()
+    for _ in range(rounds):
+        ranked = model.rank(candidates, date_str, "08:30", "12:30", keep_first=False)
+    elapsed = (time.perf_counter() - started) / rounds
+    print(f"给 {len(candidates)} 个候选座位排序: {elapsed * 1e6:.1f} us")
+    order = {"cold": 0, "warm": 1, "hot": 2}
+    for seat in ranked:
+        risk = model.risk(seat.dev_id, date_str, "08:30", "12:30")
+        print(f"  {seat.name:<4} {seat_kind(seat.dev_id % 1000):<4} 风险 {risk:.2f}")
+
+    failures = 0
+    kinds = [order[seat_kind(seat.dev_id % 1000)] for seat in ranked]
+    if kinds != sorted(kinds):
+        print("\033[31m校验失败: 排序没有把冷门座位排在热门座位之前\033[0m")
+        failures += 1
+
+    # 还没有任何查询记录的历史：模型标记为empty，排序保持原顺序
+    empty_history = HistoryStore(os.path.join(tempfile.mkdtemp(), "history.db"))
+    empty = ContentionModel.from_history(empty_history, now=TODAY.timestamp())
+    empty_history.close()
+    if model.empty or not empty.empty or empty.rank(candidates, date_str, "08:30", "12:30") != candidates:
+        print("\033[31m校验失败: 没有查询记录时模型没有标记为empty或改变了候选顺序\033[0m")
+        failures += 1
+    if failures:
+        sys.exit(1)
+    print("校验通过: 冷门座位 < 普通座位 < 热门座位，没有历史数据时保持原顺序")
+
+
+if __name__ == "__main__":
+    main()
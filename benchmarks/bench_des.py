@@ -0,0 +1,68 @@
+"""
+str_enc 正确性与性能测试
+先用encryption.GOLDEN_VECTORS（python -m encryption --selftest）以及随机输入校验整数实现与参考实现逐字节一致，
+再比较两者加密 学号+密码+lt 长字符串的耗时
+
+用法: python benchmarks/bench_des.py [--length 80] [--rounds 50]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encryption import GOLDEN_VECTORS, selftest, str_enc, str_enc_reference  # noqa: E402
+
+KEY_SETS = [("1", "2", "3"), ("k", "z", ""), ("abcde", "", "x"), ("", "2", "3"), ("longerkey12", "q", "zz9")]
+
+
+def check_golden():
+    failures = selftest()
+    for name, data, actual, expected in failures:
+        print(f"\033[31m[FAIL] {name}({data!r}): {actual} != {expected}\033[0m")
+    return len(failures)
+
+
+def check_random(count=300, seed=20240601):
+    rng = random.Random(seed)
+    alphabet = "abcdefXYZ0123456789!@#-_中文密码\U0001F600"
+    failures = 0
+    for _ in range(count):
+        data = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        keys = rng.choice(KEY_SETS)
+        if str_enc(data, *keys) != str_enc_reference(data, *keys):
+            failures += 1
+            print(f"\033[31m[FAIL] {data!r} {keys}\033[0m")
+    return failures
+
+
+def timed(func, data, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(data, "1", "2", "3")
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="str_enc 正确性与性能测试")
+    parser.add_argument("--length", type=int, default=80, help="明文长度（学号+密码+lt）")
+    parser.add_argument("--rounds", type=int, default=50, help="每种实现的加密次数")
+    args = parser.parse_args()
+
+    failures = check_golden() + check_random()
+    if failures:
+        print(f"\033[31m校验失败 {failures} 项\033[0m")
+        sys.exit(1)
+    print(f"校验通过: {len(GOLDEN_VECTORS)} 组固定向量 + 300 组随机输入")
+
+    data = ("3200000001" + "Passw0rd!" + "LT-4410-" + "abcdefghijklmnopqrstuvwxyz" * 4)[:args.length]
+    reference = timed(str_enc_reference, data, max(1, args.rounds // 10))
+    fast = timed(str_enc, data, args.rounds)
+    print(f"明文长度 {len(data)}: 参考实现 {reference * 1000:.2f} ms, 整数实现 {fast * 1000:.3f} ms, "
+          f"加速 {reference / fast:.1f} 倍")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+本地模拟服务器端到端测试
+在后台线程启动fake_server，用项目自己的代码走完整个流程并测量耗时：
+- getCookieWithDirectLogin完成CAS登录（lt/execution + str_enc）拿到cookie
+- AsyncLibraryBooking获取用户信息、房间、全馆快照、预约、查询预约、签到、删除
+- 抢座风暴：放座时刻有clients个模拟客户端同时抢座，本客户端提前预热并按候选顺序抢座
+最后校验服务器上没有任何重叠的预约
+
+用法: python benchmarks/bench_fake_server.py [--rooms 4] [--seats 80] [--latency 10] [--clients 500]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_booking import AsyncLibraryBooking  # noqa: E402
+from cookie import getCookieWithDirectLogin  # noqa: E402
+from fake_server import FakeLibrary, FakeServer, Latency, ReleaseStorm  # noqa: E402
+
+USERNAME, PASSWORD = "20230001", "password"
+
+
+def check(failures, condition, message):
+    if not condition:
+        print(f"\033[31m校验失败: {message}\033[0m")
+        failures.append(message)
+
+
+async def exercise(server, cookie, failures, clients):
+    """用AsyncLibraryBooking走一遍所有接口，然后参加一次抢座风暴"""
+    core = AsyncLibraryBooking(pool_size=20, base_url=server.base_url, scheme="http")
+    core.debug = False
+    core.set_cookie(cookie)
+    timings = {}
+    try:
+        started = time.perf_counter()
+        check(failures, await core.get_person_appAccNo() == server.library.acc_nos[USERNAME], "appAccNo不正确")
+        rooms_info = await core.get_rooms_info()
+        timings["用户信息+房间"] = time.perf_counter() - started
+        check(failures, rooms_info and len(rooms_info) == len(server.library.rooms), "房间数不正确")
+
+        today = datetime.now()
+        date_str = today.strftime("%m%d")
+        started = time.perf_counter()
+        snapshot = await core.snapshot([date_str, (today + timedelta(days=1)).strftime("%m%d")])
+        timings["全馆快照(2天)"] = time.perf_counter() - started
+        seat_count = sum(len(room) for room in snapshot.rooms.values())
+        check(failures, seat_count == 2 * len(server.library.seats), f"快照座位数 {seat_count} 不正确")
+
+        number = next(iter(rooms_info))
+        room = await core.get_seats_info(date_str, rooms_info[number]["id"])
+        seat = next(iter(room.values()))
+        started = time.perf_counter()
+        periods = await core.submit_periods(seat.dev_id, [("08:30", "12:30"), ("12:30", "16:30")], date_str)
+        timings["预约2个时间段"] = time.perf_counter() - started
+        check(failures, all(item["success"] for item in periods), "预约失败")
+        again = await core.make_reservation(seat.dev_id, "09:00", "10:00", date_str)
+        check(failures, again.get("code") != 0, "同一座位重复预约没有被拒绝")
+        room = await core.get_seats_info(date_str, rooms_info[number]["id"])
+        check(failures, len(room[seat.name].intervals) == 2, "座位信息中没有新预约")
+
+        started = time.perf_counter()
+        reservations = await core.get_reservations()
+        signed = await core.sign_reservation(seat.dev_id)
+        cancelled = await core.cancel_periods(seat.dev_id, date_str, periods)
+        timings["查询+签到+取消"] = time.perf_counter() - started
+        check(failures, reservations and len(reservations) == 2, "预约列表数量不正确")
+        check(failures, signed, "签到失败")
+        check(failures, sorted(item[2] for item in cancelled) == [False, True],
+              "签到后的预约不能取消，另一段应当取消成功")
+
+        # 多个时间段同时向多个候选座位竞争：首选座位的第二段已被别人预约，各时间段不能被拆到不同座位上
+        candidates = list(room.values())[1:4]
+        plan = [("17:00", "19:00"), ("19:00", "21:00")]
+        full_date = today.strftime("%Y-%m-%d")
+        server.call(lambda: server.library.reserve(1, candidates[0].dev_id, full_date, 19 * 60, 21 * 60, "other"))
+        started = time.perf_counter()
+        race = await core.race_candidates(candidates, plan, date_str, parallelism=3)
+        timings["多时间段竞争"] = time.perf_counter() - started
+        acc_no = server.library.acc_nos[USERNAME]
+        held = server.call(lambda: sorted((resv.dev_id, resv.start) for resv in server.library.reservations.values()
+                                          if resv.acc_no == acc_no and resv.date == full_date and resv.active
+                                          and resv.start >= 17 * 60))
+        booked = sum(item["success"] for item in race["periods"])
+        check(failures, held and len({dev_id for dev_id, _ in held}) == 1 and held[0][0] == race["seat"].dev_id,
+              f"时间段被拆到了不同座位上: {held}")
+        check(failures, race["success"] == (booked == len(plan)) and race["partial"] == (0 < booked < len(plan)),
+              f"success/partial与预约到的时间段不一致: {race['success']}, {race['partial']}, {booked}")
+        await core.cancel_periods(race["seat"].dev_id, date_str, race["periods"])
+
+        # 抢座风暴：2秒后放座
+        release_at = server.library.now() + 2
+        storm_date = (today + timedelta(days=1)).strftime("%m%d")
+        storm = ReleaseStorm(clients, (today + timedelta(days=1)).strftime("%Y-%m-%d"), "08:30", "12:30",
+                             arrival=Latency(30, 0.8), seed=1)
+
+        def arm():
+            server.library.release_at = release_at
+            return server.schedule_storm(storm, release_at)
+
+        server.call(arm)
+        # 座位按风暴的热门程度排序时，本客户端的首选往往也是别人的首选，这里按房间顺序取前10个
+        candidates = list((await core.get_seats_info(storm_date, rooms_info[number]["id"])).values())[:10]
+        prepared = await core.prearm_candidates(candidates, [("08:30", "12:30")], storm_date, parallelism=2)
+        await asyncio.sleep(max(release_at - server.library.now(), 0))
+        started = time.perf_counter()
+        result = await core.race_candidates(candidates, [("08:30", "12:30")], storm_date, prepared, parallelism=2)
+        timings["风暴中抢座"] = time.perf_counter() - started
+        await asyncio.sleep(1.5)
+    finally:
+        await core.close()
+    return timings, storm, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟服务器端到端测试")
+    parser.add_argument("--rooms", type=int, default=4, help="房间数")
+    parser.add_argument("--seats", type=int, default=80, help="每个房间的座位数")
+    parser.add_argument("--latency", type=float, default=10, help="接口延迟中位数（毫秒）")
+    parser.add_argument("--clients", type=int, default=500, help="抢座风暴的模拟客户端数")
+    args = parser.parse_args()
+
+    library = FakeLibrary(args.rooms, args.seats, {USERNAME: PASSWORD})
+    server = FakeServer(library, Latency(args.latency, 0.3))
+    base_url = server.start_in_thread()
+    print(f"模拟服务器 http://{base_url}，{args.rooms} 个房间 × {args.seats} 个座位，接口延迟约 {args.latency:.0f} ms")
+    failures = []
+    try:
+        started = time.perf_counter()
+        cookie = getCookieWithDirectLogin(USERNAME, PASSWORD, delay=None, base_url=base_url, scheme="http")
+        login_time = time.perf_counter() - started
+        check(failures, cookie and "ic-cookie=" in cookie, "CAS登录没有拿到cookie")
+        wrong = getCookieWithDirectLogin(USERNAME, "wrong", delay=None, base_url=base_url, scheme="http")
+        check(failures, not wrong, "错误密码也登录成功了")
+        if cookie:
+            timings, storm, result = asyncio.run(exercise(server, cookie, failures, args.clients))
+            print(f"{'直接登录(CAS)':<14} {login_time * 1000:8.1f} ms")
+            for name, seconds in timings.items():
+                print(f"{name:<14} {seconds * 1000:8.1f} ms")
+            stats = server.call(library.stats)
+            print(f"抢座风暴: {storm.clients} 个模拟客户端，{storm.attempts} 次提交，{storm.won} 个抢到座位，"
+                  f"{storm.gave_up} 个全部失败")
+            outcome = f"第 {result['rank']} 个候选座位 {result['seat'].name}" if result["success"] else "没有抢到"
+            print(f"本客户端: {outcome}，被拒绝原因 {stats['rejected']}")
+            check(failures, stats["conflicts"] == 0, f"服务器上有 {stats['conflicts']} 处重叠预约")
+            check(failures, storm.won + storm.gave_up == storm.clients, "有模拟客户端没有完成")
+    finally:
+        server.stop_thread()
+
+    if failures:
+        sys.exit(1)
+    print("校验通过: 登录、查询、预约、签到、取消和抢座流程与模拟服务器一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+座位变化比较性能测试
+在随机生成的全馆快照上，每一轮随机让少量座位增加或取消预约，比较：
+- 逐座位展开全部预约时段再比较（O(座位数 × 时段数)）
+- diff_rooms（每个座位只比较一次时段元组，只有变化的座位才计算增删）
+- 原始内容未变、直接复用上一次Room时的比较
+并校验把变化应用到上一次的状态后与这一次完全一致，订阅队列和JSON Lines文件收到的变化数一致
+
+用法: python benchmarks/bench_feed.py [--rooms 30] [--seats 100] [--changes 5] [--rounds 50]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_search import synthetic_snapshot  # noqa: E402
+from feed import SnapshotStore, diff_rooms, read_feed  # noqa: E402
+from models import Interval, Room, Seat  # noqa: E402
+
+
+def mutate(room, rng, count):
+    """随机让count个座位增加或取消一个预约，返回新的Room（所有Seat都是新对象，与重新解析接口数据一致）"""
+    changed = set(rng.sample(list(room), count))
+    seats = []
+    for name, seat in room.items():
+        intervals = list(seat.intervals)
+        if name in changed:
+            if intervals and rng.random() < 0.5:
+                intervals.pop(rng.randrange(len(intervals)))
+            else:
+                start = rng.randrange(22 * 60, 23 * 60, 5)
+                intervals.append(Interval(start, start + 30))
+        seats.append(Seat(seat.dev_id, name, seat.x, seat.y, tuple(sorted(intervals, key=lambda item: item.start)),
+                          room.room_id))
+    return Room(room.room_id, room.date, {seat.name: seat for seat in seats})
+
+
+def naive_diff(previous, room):
+    """展开两次的全部预约时段逐座位比较"""
+    changes = []
+    for name in set(previous) | set(room):
+        before = {(item["start"], item["end"]) for item in previous[name].to_dict()["reserved_times"]} \
+            if name in previous else set()
+        after = {(item["start"], item["end"]) for item in room[name].to_dict()["reserved_times"]} \
+            if name in room else set()
+        if before != after:
+            changes.append(name)
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="座位变化比较性能测试")
+    parser.add_argument("--rooms", type=int, default=30, help="房间数")
+    parser.add_argument("--seats", type=int, default=100, help="每个房间的座位数")
+    parser.add_argument("--changes", type=int, default=5, help="每轮每个房间变化的座位数")
+    parser.add_argument("--rounds", type=int, default=50, help="轮数")
+    args = parser.parse_args()
+
+    rng = random.Random(20240601)
+    snapshot = synthetic_snapshot(args.rooms, args.seats)
+    rooms = {key[1]: room for key, room in snapshot.rooms.items()}
+    store = SnapshotStore()
+    subscription = store.subscribe()
+    path = os.path.join(tempfile.mkdtemp(), "feed.jsonl")
+    writer = store.subscribe_jsonl(path)
+    for number, room in rooms.items():
+        store.update("0601", number, room)
+    subscription.drain()
+
+    failures = 0
+    naive_time = diff_time = same_time = 0.0
+    published = 0
+    for _ in range(args.rounds):
+        for number, room in rooms.items():
+            current = mutate(room, rng, args.changes)
+            started = time.perf_counter()
+            expected = naive_diff(room, current)
+            naive_time += time.perf_counter() - started
+            started = time.perf_counter()
+            changes = diff_rooms(room, current)
+            diff_time += time.perf_counter() - started
+            started = time.perf_counter()
+            failures += bool(diff_rooms(current, current))
+            same_time += time.perf_counter() - started
+
+            failures += sorted(expected) != sorted(change.name for change in changes)
+            for change in changes:
+                rebuilt = (set(change.previous.intervals) - set(change.removed)) | set(change.added)
+                failures += rebuilt != set(change.seat.intervals)
+            diff = store.update("0601", number, current)
+            published += bool(diff)
+            failures += len(diff) != len(changes)
+            rooms[number] = current
+
+    received = len(subscription.drain())
+    writer.close()
+    lines = sum(1 for item in read_feed(path) if not item["initial"])
+    failures += received != published or lines != published
+
+    comparisons = args.rooms * args.rounds
+    print(f"{args.rooms} 个房间 × {args.seats} 个座位，每轮每个房间 {args.changes} 个座位变化，共 {args.rounds} 轮")
+    print(f"展开全部时段比较 {naive_time / comparisons * 1e6:.0f} us/房间, diff_rooms {diff_time / comparisons * 1e6:.0f} us/房间"
+          f"（加速 {naive_time / diff_time:.1f} 倍），内容未变 {same_time / comparisons * 1e6:.2f} us/房间")
+    print(f"订阅队列收到 {received} 个变化，JSON Lines文件 {lines} 行")
+    if failures:
+        print(f"\033[31m校验失败 {failures} 项\033[0m")
+        sys.exit(1)
+    print("校验通过: 变化与逐座位比较一致，应用变化后与新状态一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+组队座位搜索性能测试
+在随机生成的大房间上，校验网格索引的最近邻与暴力计算一致，并测量找出k个相邻空闲座位的耗时
+
+用法: python benchmarks/bench_group.py [--seats 600] [--k 4]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_search import synthetic_snapshot  # noqa: E402
+from group import SeatGrid, find_seat_groups, format_groups  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="组队座位搜索性能测试")
+    parser.add_argument("--seats", type=int, default=600, help="房间座位数")
+    parser.add_argument("--k", type=int, default=4, help="组队人数")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(20240601)
+    xs, ys = rng.uniform(0, 1000, args.seats), rng.uniform(0, 800, args.seats)
+    grid = SeatGrid(xs, ys)
+    failures = 0
+    started = time.perf_counter()
+    for index in range(args.seats):
+        found = grid.nearest(index, args.k - 1)
+        distances = np.hypot(xs - xs[index], ys - ys[index])
+        distances[index] = np.inf
+        failures += not np.allclose(np.sort(distances)[:args.k - 1], np.sort(distances[found]))
+    print(f"{args.seats} 个座位的最近邻查询（含暴力校验） {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    snapshot = synthetic_snapshot(1, args.seats)
+    room_number = snapshot.room_numbers("0601")[0]
+    room, matrix = snapshot.rooms[("0601", room_number)], snapshot.matrix("0601", room_number)
+    started = time.perf_counter()
+    groups = find_seat_groups(room, matrix, "09:00", "12:00", args.k)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(format_groups(groups))
+    print(f"{args.seats} 个座位的房间中找出 {args.k} 个相邻空闲座位: {elapsed:.1f} ms")
+    for group in groups:
+        failures += len(group["seats"]) != args.k or not all(seat.is_free("09:00", "12:00") for seat in group["seats"])
+
+    if failures:
+        print(f"\033[31m校验失败 {failures} 项\033[0m")
+        sys.exit(1)
+    print("校验通过: 最近邻与暴力计算一致，每组座位在该时段都空闲")
+
+
+if __name__ == "__main__":
+    main()
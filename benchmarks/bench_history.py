@@ -0,0 +1,106 @@
+"""
+历史占用记录性能测试
+生成若干天的全馆座位变化（每天每个房间先有一次完整查询，之后几次查询各有少量座位增加或取消预约），
+写入临时的HistoryStore，测量：
+- 查询路径上publish的耗时（只是放入队列）与后台批量写入的总耗时
+- 按索引查询“某房间最近N天每天某时刻的占用”的耗时，并与把该房间全部记录读入Python后计算的结果比较
+
+用法: python benchmarks/bench_history.py [--rooms 30] [--seats 100] [--days 30]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_feed import mutate  # noqa: E402
+from bench_search import synthetic_snapshot  # noqa: E402
+from feed import RoomDiff, diff_rooms  # noqa: E402
+from history import HistoryStore  # noqa: E402
+from models import to_minutes  # noqa: E402
+
+FIRST_DAY = datetime(2026, 3, 1)
+
+
+def naive_occupancy(rows, minute):
+    """按日期统计在minute时刻仍有效的预约座位数"""
+    busy = {}
+    for _, dev_id, date, start, end, _, removed_at in rows:
+        cutoff = (datetime.strptime(date, "%Y-%m-%d") + timedelta(minutes=minute)).timestamp()
+        if start <= minute < end and (removed_at is None or removed_at > cutoff):
+            busy.setdefault(date, set()).add(dev_id)
+    return {date: len(seats) for date, seats in busy.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="历史占用记录性能测试")
+    parser.add_argument("--rooms", type=int, default=30, help="房间数")
+    parser.add_argument("--seats", type=int, default=100, help="每个房间的座位数")
+    parser.add_argument("--days", type=int, default=30, help="天数")
+    parser.add_argument("--polls", type=int, default=4, help="每天每个房间的查询次数")
+    args = parser.parse_args()
+
+    rng = random.Random(20240601)
+    path = os.path.join(tempfile.mkdtemp(), "history.db")
+    history = HistoryStore(path)
+    snapshot = synthetic_snapshot(args.rooms, args.seats)
+    history.record_rooms(snapshot.rooms_info)
+
+    publish_time = 0.0
+    published = 0
+    started = time.perf_counter()
+    for day in range(args.days):
+        date = FIRST_DAY + timedelta(days=day)
+        date_str = date.strftime("%m%d")
+        for (_, number), base in snapshot.rooms.items():
+            room_id = snapshot.rooms_info[number]["id"]
+            previous, room = None, base
+            for poll in range(args.polls):
+                at = (date - timedelta(hours=2) + timedelta(hours=poll * 4)).timestamp()
+                diff = RoomDiff(date_str, room_id, diff_rooms(previous, room), initial=previous is None, at=at,
+                                seats=len(room))
+                begin = time.perf_counter()
+                history.publish(diff)
+                publish_time += time.perf_counter() - begin
+                published += 1
+                previous, room = room, mutate(room, rng, 5)
+    history.flush()
+    write_time = time.perf_counter() - started
+    stats = history.stats()
+    print(f"{args.days} 天 × {args.rooms} 个房间 × {args.seats} 个座位，{published} 次查询的变化")
+    print(f"publish {publish_time / published * 1e6:.1f} us/次，后台写入共 {write_time:.1f} s，"
+          f"预约记录 {stats['reservations']} 条，数据库 {stats['size_bytes'] / 1024 / 1024:.1f} MB")
+
+    failures = 0
+    number = next(iter(snapshot.rooms_info))
+    until = (FIRST_DAY + timedelta(days=args.days - 1)).strftime("%Y-%m-%d")
+    indexed_time = naive_time = 0.0
+    for at in ("07:00", "09:00", "14:30", "20:00"):
+        begin = time.perf_counter()
+        rows = history.occupancy_at(number, at, days=args.days, until=until)
+        indexed_time += time.perf_counter() - begin
+        begin = time.perf_counter()
+        expected = naive_occupancy(history.reservations(number), to_minutes(at))
+        naive_time += time.perf_counter() - begin
+        failures += len(rows) != args.days
+        failures += any(row["busy"] != expected.get(row["date"], 0) for row in rows)
+    print(f"房间 {number} 最近 {args.days} 天某时刻的占用 x4: 索引查询 {indexed_time * 1000:.1f} ms，"
+          f"读出全部记录计算 {naive_time * 1000:.1f} ms")
+    sample = history.occupancy_at(number, "09:00", days=args.days, until=until)[:3]
+    for row in sample:
+        print(f"  {row['date']} 09:00 占用 {row['busy']}/{row['seats']}")
+    history.close()
+
+    if failures or history.errors:
+        print(f"\033[31m校验失败 {failures + history.errors} 项\033[0m")
+        sys.exit(1)
+    print("校验通过: 索引查询与逐条计算结果一致")
+
+
+if __name__ == "__main__":
+    main()
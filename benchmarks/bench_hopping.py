@@ -0,0 +1,97 @@
+"""
+换座规划性能测试
+生成一个拥挤的全馆快照（每个座位全天都有若干预约，没有座位能覆盖整天），
+规划 08:30-21:45 的换座方案，校验每个预约都落在对应座位的空闲时间内且满足60/240分钟规则，
+并与“每次都换到能坐得最久的座位”的贪心方案比较换座次数
+
+用法: python benchmarks/bench_hopping.py [--rooms 30] [--seats 100]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hopping import format_plan, plan_seat_hops  # noqa: E402
+from models import Room, to_hhmm, to_minutes  # noqa: E402
+from search import SeatSearch  # noqa: E402
+from snapshot import LibrarySnapshot  # noqa: E402
+
+OPENING = to_minutes("08:30")
+CLOSING = to_minutes("21:45")
+
+
+def crowded_snapshot(rooms, seats, date_str="0601", seed=20240601):
+    rng = random.Random(seed)
+    rooms_info = {}
+    snapshot = LibrarySnapshot(rooms_info)
+    for index in range(rooms):
+        number = f"{2 + index // 10}{index % 10:02d}"
+        rooms_info[number] = {"id": 1000 + index, "name": f"{number}自修室", "total_seats": seats}
+        seats_info = {}
+        for seat in range(seats):
+            name = f"{number}-{seat + 1:03d}"
+            reserved_times = []
+            cursor = OPENING + rng.randrange(0, 300, 5)
+            while cursor < CLOSING:
+                end = min(CLOSING, cursor + rng.randrange(30, 121, 5))
+                reserved_times.append({"start": to_hhmm(cursor), "end": to_hhmm(end)})
+                cursor = end + rng.randrange(60, 300, 5)
+            seats_info[name] = {"devId": 100000 * index + seat, "devName": name,
+                                "coordinate": f"{seat % 10 * 50},{seat // 10 * 50}", "reserved_times": reserved_times}
+        snapshot.add(date_str, number, Room.from_dicts(1000 + index, date_str, seats_info), 0.0)
+    return snapshot
+
+
+def greedy_switches(snapshot, date_str, start, end):
+    """每次换到从当前时刻起空闲最久的座位，返回换座次数（不考虑60分钟下限）"""
+    seats = [seat for number in snapshot.room_numbers(date_str) for seat in snapshot.rooms[(date_str, number)].values()]
+    cursor, stints = start, 0
+    while cursor < end:
+        reach = max((interval.end for seat in seats for interval in seat.free_intervals(OPENING, CLOSING)
+                     if interval.start <= cursor < interval.end), default=cursor)
+        if reach <= cursor:
+            return None
+        cursor, stints = reach, stints + 1
+    return stints - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="换座规划性能测试")
+    parser.add_argument("--rooms", type=int, default=30, help="房间数")
+    parser.add_argument("--seats", type=int, default=100, help="每个房间的座位数")
+    args = parser.parse_args()
+
+    snapshot = crowded_snapshot(args.rooms, args.seats)
+    search = SeatSearch(snapshot)
+    started = time.perf_counter()
+    plan = plan_seat_hops(snapshot, "0601", "08:30", "21:45", search=search)
+    cold = (time.perf_counter() - started) * 1000
+    warm = min(plan_seat_hops(snapshot, "0601", "08:30", "21:45", search=search)["elapsed_ms"] for _ in range(20))
+    print(format_plan(plan))
+    print(f"{args.rooms} 个房间 × {args.seats} 个座位: 首次规划（含建立索引） {cold:.1f} ms，之后每次 {warm:.2f} ms")
+
+    failures = 0
+    if not plan["success"]:
+        failures += 1
+    covered = OPENING
+    for seat, begin, finish in plan["reservations"]:
+        if to_minutes(begin) != covered or not seat.is_free(begin, finish) or \
+                not 60 <= to_minutes(finish) - to_minutes(begin) <= 240:
+            failures += 1
+            print(f"\033[31m[FAIL] {seat.name} {begin}-{finish}\033[0m")
+        covered = to_minutes(finish)
+    failures += covered != CLOSING
+    print(f"贪心方案换座 {greedy_switches(snapshot, '0601', OPENING, CLOSING)} 次（不考虑60分钟下限），"
+          f"规划方案换座 {plan['switches']} 次")
+
+    if failures:
+        print(f"\033[31m校验失败 {failures} 项\033[0m")
+        sys.exit(1)
+    print("校验通过: 预约首尾相接覆盖整个时段，每段都在座位空闲时间内且满足60/240分钟规则")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+调试日志的开销测试
+- 开启调试时，调用方记录一次座位响应的耗时：原来的 print(json.dumps(...)) 与日志队列（只入队，由后台线程采样、序列化并输出）
+- 对本地fake_server开启调试后登录、查询座位和预约，检查输出中没有cookie，座位数据被采样截断，调试信息按顺序完整输出
+
+用法: python benchmarks/bench_logging.py [--count 200] [--seats 400]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logs  # noqa: E402
+from async_booking import AsyncLibraryBooking  # noqa: E402
+from cookie import getCookieWithDirectLogin  # noqa: E402
+from fake_server import FakeLibrary, FakeServer, Latency  # noqa: E402
+
+USERNAME, PASSWORD = "20230001", "password"
+
+
+def check(failures, condition, message):
+    if not condition:
+        print(f"\033[31m校验失败: {message}\033[0m")
+        failures.append(message)
+
+
+def seat_payload(seats):
+    """与seatMenu响应结构相同的座位数据"""
+    return {"code": 0, "message": "查询成功", "data": [
+        {"devId": 100000000 + index, "devName": f"2F-{index:03d}", "roomId": 100455820, "roomName": "二楼东",
+         "resvInfo": [{"startTime": 1700000000000 + minute * 60000, "endTime": 1700003600000 + minute * 60000,
+                       "state": 1} for minute in range(0, 600, 120)]}
+        for index in range(seats)]}
+
+
+def measure_caller(count, data, sink):
+    """返回 (原来的打印方式, 日志队列) 调用方每次的耗时（毫秒）"""
+    started = time.perf_counter()
+    for _ in range(count):
+        print(f"\033[36m[DEBUG] 响应数据: {json.dumps(data, indent=2, ensure_ascii=False)}\033[0m", file=sink)
+    printed = (time.perf_counter() - started) / count * 1000
+
+    logs.flush_logs()
+    logs.setup_logging(stream=sink)
+    logger = logs.get_logger("bench")
+    started = time.perf_counter()
+    for _ in range(count):
+        logger.debug("响应数据: %s", logs.Payload(data, indent=2))
+    queued = (time.perf_counter() - started) / count * 1000
+    logs.flush_logs()
+    return printed, queued
+
+
+async def session(base_url, cookie):
+    async with AsyncLibraryBooking(pool_size=2, base_url=base_url, scheme="http") as core:
+        core.debug = True
+        core.set_cookie(cookie)
+        await core.get_person_appAccNo()
+        rooms_info = await core.get_rooms_info()
+        date_str = (datetime.now() + timedelta(days=1)).strftime("%m%d")
+        seats = await core.get_seats_info(date_str, next(iter(rooms_info.values()))["id"])
+        seat = next(iter(seats.values()))
+        result = await core.make_reservation(seat.dev_id, "08:30", "12:30", date_str)
+        return len(seats), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="调试日志的开销测试")
+    parser.add_argument("--count", type=int, default=200, help="每种方式记录的次数")
+    parser.add_argument("--seats", type=int, default=400, help="座位响应中的座位数")
+    args = parser.parse_args()
+    failures = []
+
+    data = seat_payload(args.seats)
+    size = len(json.dumps(data, ensure_ascii=False))
+    with open(os.devnull, "w", encoding="utf-8") as sink:
+        printed, queued = measure_caller(args.count, data, sink)
+    print(f"座位响应 {size / 1024:.0f} KB，调用方每次记录: 原来的打印 {printed:.3f} ms，日志队列 {queued:.3f} ms")
+
+    text = str(logs.Payload(data))
+    check(failures, len(text) < logs.PAYLOAD_LIMIT + 50 and f"共 {args.seats} 项" in text, "座位数据没有被采样")
+    text = str(logs.Payload("x" * 10000, items=None))
+    check(failures, text.endswith("（共 10002 字符，已截断）"), f"长文本没有被截断: {text[-30:]}")
+    headers = str(logs.RedactedHeaders({"Cookie": "ic-cookie=secret", "User-Agent": "bench"}))
+    check(failures, "secret" not in headers and "bench" in headers, f"请求头没有脱敏: {headers}")
+
+    library = FakeLibrary(1, args.seats, {USERNAME: PASSWORD})
+    server = FakeServer(library, Latency(1, 0.1))
+    base_url = server.start_in_thread()
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            cookie = getCookieWithDirectLogin(USERNAME, PASSWORD, delay=None, base_url=base_url, scheme="http")
+        check(failures, bool(cookie), "CAS登录没有拿到cookie")
+        logs.setup_logging(stream=output)
+        seats, result = asyncio.run(session(base_url, cookie))
+        logs.flush_logs()
+    finally:
+        server.stop_thread()
+
+    text = output.getvalue()
+    check(failures, result.get("code") == 0, f"预约失败: {result}")
+    for part in cookie.split(";"):
+        check(failures, part.split("=", 1)[-1].strip() not in text, "调试输出中含有cookie")
+    for message in ("请求头", "座位数量", "预约数据", "预约响应内容"):
+        check(failures, message in text, f"调试输出中没有 {message}")
+    positions = [text.find(message) for message in ("请求头", "座位数量", "预约数据")]
+    check(failures, positions == sorted(positions), "调试信息的顺序不正确")
+    print(f"开启调试的会话（{seats} 个座位）共输出 {len(text) / 1024:.1f} KB 调试信息")
+
+    if failures:
+        sys.exit(1)
+    print("校验通过: 调试输出已采样截断，cookie已脱敏，记录不再阻塞调用方")
+
+
+if __name__ == "__main__":
+    main()
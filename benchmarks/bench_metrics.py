@@ -0,0 +1,139 @@
+"""
+耗时统计的开销与导出测试
+- 单次记录（查找code + 直方图）的开销，与本地开火一次预约请求的耗时比较
+- 对本地fake_server登录并查询、预约后，检查登录各步骤、座位解析和各接口（按状态码和code）都有记录
+- 启动守护进程，检查 /metrics 的Prometheus文本格式和控制端口的metrics命令
+
+用法: python benchmarks/bench_metrics.py [--count 200000]
+"""
+import argparse
+import asyncio
+import os
+import re
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp  # noqa: E402
+from async_booking import AsyncLibraryBooking  # noqa: E402
+from cookie import getCookieWithDirectLogin  # noqa: E402
+from daemon import BookingDaemon  # noqa: E402
+from fake_server import FakeLibrary, FakeServer, Latency  # noqa: E402
+from metrics import METRICS, Metrics, result_code_of  # noqa: E402
+from models import to_hhmm, to_minutes  # noqa: E402
+
+USERNAME, PASSWORD = "20230001", "password"
+# Prometheus文本格式的一行：注释，或 指标名{标签} 数值
+PROMETHEUS_LINE = re.compile(r'^(# (HELP|TYPE) .+|[a-z_]+(\{([a-z_]+="[^"]*",?)+\})? [0-9.e+-]+)$')
+
+
+def check(failures, condition, message):
+    if not condition:
+        print(f"\033[31m校验失败: {message}\033[0m")
+        failures.append(message)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_overhead(count):
+    """每次记录的耗时（微秒）"""
+    metrics = Metrics()
+    content = '{"code":0,"message":"新增成功","data":{"uuid":"abc"}}'.encode("utf-8")
+    started = time.perf_counter()
+    for index in range(count):
+        metrics.observe_request("POST /ic-web/reserve", 200, result_code_of(content), 0.001 * (index % 50))
+    return (time.perf_counter() - started) / count * 1e6
+
+
+async def exercise(base_url, cookie):
+    """查询座位并连续提交预约，返回预约请求的平均耗时（秒）"""
+    async with AsyncLibraryBooking(pool_size=4, base_url=base_url, scheme="http") as core:
+        core.debug = False
+        core.set_cookie(cookie)
+        await core.get_person_appAccNo()
+        rooms_info = await core.get_rooms_info()
+        date_str = (datetime.now() + timedelta(days=1)).strftime("%m%d")
+        room = await core.get_seats_info(date_str, next(iter(rooms_info.values()))["id"])
+        seats = list(room.values())
+        # 前10个座位各预约一个半小时，之后10次与自己的预约时间冲突
+        started = time.perf_counter()
+        for index, seat in enumerate(seats[:20]):
+            start = to_minutes("08:30") + 30 * (index % 10)
+            await core.make_reservation(seat.dev_id, to_hhmm(start), to_hhmm(start + 30), date_str)
+        return (time.perf_counter() - started) / 20
+
+
+async def check_daemon(failures, workdir):
+    control_port, metrics_port = free_port(), free_port()
+    daemon = BookingDaemon(os.path.join(workdir, "jobs.json"), os.path.join(workdir, "accounts.json"),
+                           port=control_port, metrics_port=metrics_port)
+    task = asyncio.ensure_future(daemon.serve())
+    await asyncio.sleep(0.2)
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{metrics_port}/metrics") as response:
+                text = await response.text()
+                check(failures, response.status == 200, f"/metrics 返回 {response.status}")
+                check(failures, "version=0.0.4" in response.headers.get("Content-Type", ""), "Content-Type不正确")
+            async with session.get(f"http://127.0.0.1:{metrics_port}/metrics.json") as response:
+                check(failures, "requests" in await response.json(), "/metrics.json 内容不正确")
+        bad = [line for line in text.splitlines() if not PROMETHEUS_LINE.match(line)]
+        check(failures, not bad, f"Prometheus格式不正确: {bad[:3]}")
+        check(failures, 'libbooking_request_duration_seconds_bucket{endpoint="POST /ic-web/reserve",status="200",'
+                        'code="0",le="+Inf"}' in text, "/metrics 中没有预约接口的直方图")
+        reply = await daemon.handle_command({"cmd": "metrics"})
+        check(failures, reply["ok"] and reply["metrics"]["stages"], "控制端口的metrics命令没有返回阶段耗时")
+        return len(text.splitlines())
+    finally:
+        await daemon.handle_command({"cmd": "stop"})
+        await task
+
+
+def main():
+    parser = argparse.ArgumentParser(description="耗时统计的开销与导出测试")
+    parser.add_argument("--count", type=int, default=200000, help="测量开销时的记录次数")
+    args = parser.parse_args()
+    failures = []
+
+    overhead_us = measure_overhead(args.count)
+    print(f"单次记录（查找code + 直方图）: {overhead_us:.2f} 微秒")
+
+    library = FakeLibrary(1, 40, {USERNAME: PASSWORD})
+    server = FakeServer(library, Latency(1, 0.1))
+    base_url = server.start_in_thread()
+    workdir = tempfile.mkdtemp(prefix="bench_metrics_")
+    try:
+        METRICS.reset()
+        cookie = getCookieWithDirectLogin(USERNAME, PASSWORD, delay=None, base_url=base_url, scheme="http")
+        check(failures, bool(cookie), "CAS登录没有拿到cookie")
+        reserve_seconds = asyncio.run(exercise(base_url, cookie))
+        snapshot = METRICS.snapshot()
+        stages = {item["stage"] for item in snapshot["stages"]}
+        expected = {f"login_step{step}" for step in (1, 2, 3, 4, 5, 6, 7, 8, 10)} | {"seat_json", "seat_parse"}
+        check(failures, expected <= stages, f"缺少阶段: {sorted(expected - stages)}")
+        series = {(item["endpoint"], item["status"], item["code"]): item["count"] for item in snapshot["requests"]}
+        check(failures, series.get(("POST /ic-web/reserve", "200", "0")) == 10
+              and series.get(("POST /ic-web/reserve", "200", "1")) == 10, f"预约请求没有按code区分: {series}")
+        check(failures, ("GET /ic-web/seatMenu", "200", "0") in series, "没有按状态码和code记录seatMenu")
+        lines = asyncio.run(check_daemon(failures, workdir))
+    finally:
+        server.stop_thread()
+
+    print(METRICS.format_report())
+    print(f"本地预约请求平均 {reserve_seconds * 1000:.2f} ms，记录开销占 {overhead_us / (reserve_seconds * 1e6) * 100:.3f}%")
+    print(f"/metrics 共 {lines} 行")
+    if failures:
+        sys.exit(1)
+    print("校验通过: 各接口和各阶段耗时都有记录，Prometheus和JSON导出格式正确")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+座位数据模型内存与速度测试
+生成一周内所有房间的/ic-web/reserve响应，分别构建原来的嵌套字典结构和__slots__的Room/Seat/Interval，
+用tracemalloc比较两者占用的内存，并比较解析耗时和“某时段空闲座位”查询耗时
+
+用法: python benchmarks/bench_models.py [--rooms 30] [--seats 120] [--days 7]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Room, Seat, to_minutes  # noqa: E402
+
+OPENING = to_minutes("08:30")
+CLOSING = to_minutes("21:45")
+
+
+def synthetic_response(room_index, seats, day, rng):
+    """一个房间一天的座位列表，格式与接口返回的data相同"""
+    base = datetime(2024, 6, 1 + day).timestamp() * 1000
+    data = []
+    for index in range(seats):
+        resv_info = []
+        cursor = OPENING
+        for _ in range(rng.randint(0, 5)):
+            start = cursor + rng.randrange(0, 120, 5)
+            end = start + rng.randrange(60, 241, 5)
+            if end > CLOSING:
+                break
+            resv_info.append({"startTime": int(base + start * 60000), "endTime": int(base + end * 60000), "resvStatus": 1093})
+            cursor = end
+        data.append({
+            "devId": 100000000 + room_index * 1000 + index,
+            "devName": f"{room_index + 200}-{index + 1:03d}",
+            "coordinate": f"{rng.uniform(0, 1000):.1f},{rng.uniform(0, 800):.1f}",
+            "resvInfo": resv_info,
+        })
+    return data
+
+
+def legacy_seats_info(data):
+    """原来get_seats_info构建的嵌套字典结构"""
+    seats_info = {}
+    for seat in data:
+        seat_info = {
+            "devId": seat["devId"],
+            "devName": seat["devName"],
+            "coordinate": seat.get("coordinate", ""),
+            "reserved_times": []
+        }
+        for resv in seat.get("resvInfo", []):
+            start_time = datetime.fromtimestamp(resv["startTime"] / 1000)
+            end_time = datetime.fromtimestamp(resv["endTime"] / 1000)
+            seat_info["reserved_times"].append({
+                "start": start_time.strftime("%H:%M"),
+                "end": end_time.strftime("%H:%M")
+            })
+        seats_info[seat["devName"]] = seat_info
+    return seats_info
+
+
+def measure(build, responses):
+    """构建所有快照，返回 (快照, 占用字节数, 耗时秒)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    snapshots = [build(key, data) for key, data in responses]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return snapshots, size, elapsed
+
+
+def legacy_free(seats_info, start, end):
+    return [name for name, seat_info in seats_info.items()
+            if all(end <= resv["start"] or start >= resv["end"] for resv in seat_info["reserved_times"])]
+
+
+def slotted_free(room, start, end):
+    return [name for name, seat in room.seats.items() if seat.is_free(start, end)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="座位数据模型内存与速度测试")
+    parser.add_argument("--rooms", type=int, default=30, help="房间数")
+    parser.add_argument("--seats", type=int, default=120, help="每个房间的座位数")
+    parser.add_argument("--days", type=int, default=7, help="天数")
+    args = parser.parse_args()
+
+    rng = random.Random(20240601)
+    responses = [((room_index, f"06{day + 1:02d}"), synthetic_response(room_index, args.seats, day, rng))
+                 for day in range(args.days) for room_index in range(args.rooms)]
+    total = args.rooms * args.seats * args.days
+
+    legacy, legacy_bytes, legacy_time = measure(lambda key, data: legacy_seats_info(data), responses)
+    slotted, slotted_bytes, slotted_time = measure(lambda key, data: Room.from_api(key[0], key[1], data), responses)
+    print(f"{args.rooms} 个房间 × {args.seats} 个座位 × {args.days} 天 = {total} 个座位快照")
+    print(f"内存: 嵌套字典 {legacy_bytes / 1024 / 1024:.1f} MiB ({legacy_bytes / total:.0f} B/座位), "
+          f"Seat/Interval {slotted_bytes / 1024 / 1024:.1f} MiB ({slotted_bytes / total:.0f} B/座位), "
+          f"节省 {1 - slotted_bytes / legacy_bytes:.0%}")
+    print(f"解析: 嵌套字典 {legacy_time * 1000:.0f} ms, Seat/Interval {slotted_time * 1000:.0f} ms")
+
+    failures = 0
+    for seats_info, room in zip(legacy, slotted):
+        for name, seat_info in room.to_dict().items():
+            # 坐标字符串还原时按浮点数格式化，比较解析后的数值
+            expected = dict(seats_info[name], coordinate=Seat.parse_coordinate(seats_info[name]["coordinate"]))
+            failures += expected != dict(seat_info, coordinate=Seat.parse_coordinate(seat_info["coordinate"]))
+    for start, end in (("09:00", "12:00"), ("14:00", "17:30"), ("08:30", "21:45")):
+        started = time.perf_counter()
+        expected = [legacy_free(seats_info, start, end) for seats_info in legacy]
+        legacy_query = time.perf_counter() - started
+        started = time.perf_counter()
+        start_minutes, end_minutes = to_minutes(start), to_minutes(end)
+        actual = [slotted_free(room, start_minutes, end_minutes) for room in slotted]
+        slotted_query = time.perf_counter() - started
+        failures += expected != actual
+        print(f"{start}-{end} 全馆一周空闲座位: 字符串比较 {legacy_query * 1000:.1f} ms, 整数比较 {slotted_query * 1000:.1f} ms")
+
+    if failures:
+        print(f"\033[31m校验失败 {failures} 项\033[0m")
+        sys.exit(1)
+    print("校验通过: to_dict还原结果与原结构一致，查询结果一致")
+
+
+if __name__ == "__main__":
+    main()
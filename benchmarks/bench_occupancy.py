@@ -0,0 +1,134 @@
+"""
+座位占用矩阵性能测试
+在随机生成的2000座图书馆上，比较逐座位循环（check_seat_available的做法）与占用矩阵向量化查询的耗时，
+并校验两者结果一致。预约时间落在5分钟边界上，此时矩阵查询与逐座位比较结果完全相同
+
+用法: python benchmarks/bench_occupancy.py [--seats 2000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Room, to_hhmm, to_minutes  # noqa: E402
+from occupancy import OccupancyMatrix  # noqa: E402
+
+OPENING = to_minutes("08:30")
+CLOSING = to_minutes("21:45")
+
+
+def synthetic_seats_info(seats, seed=20240601):
+    """生成与get_seats_info返回格式相同的座位字典，每个座位0~5段互不重叠的预约"""
+    rng = random.Random(seed)
+    seats_info = {}
+    for index in range(seats):
+        name = f"{200 + index // 100}-{index % 100 + 1:03d}"
+        reserved_times = []
+        cursor = OPENING
+        for _ in range(rng.randint(0, 5)):
+            start = cursor + rng.randrange(0, 120, 5)
+            end = start + rng.randrange(60, 241, 5)
+            if end > CLOSING:
+                break
+            reserved_times.append({"start": to_hhmm(start), "end": to_hhmm(end)})
+            cursor = end
+        seats_info[name] = {"devId": 100000000 + index, "devName": name, "coordinate": "", "reserved_times": reserved_times}
+    return seats_info
+
+
+def check_seat_available(seat_info, target_start, target_end):
+    """原来LibraryBooking.check_seat_available的逐段字符串比较"""
+    for resv in seat_info["reserved_times"]:
+        if not (target_end <= resv["start"] or target_start >= resv["end"]):
+            return False
+    return True
+
+
+def loop_free_seats(seats_info, start, end):
+    return [name for name, seat_info in seats_info.items() if check_seat_available(seat_info, start, end)]
+
+
+def loop_longest_free_run(seats_info):
+    """逐座位计算最长连续空闲分钟数"""
+    lengths = {}
+    for name, seat_info in seats_info.items():
+        longest, cursor = 0, OPENING
+        for resv in sorted(seat_info["reserved_times"], key=lambda r: r["start"]):
+            longest = max(longest, to_minutes(resv["start"]) - cursor)
+            cursor = max(cursor, to_minutes(resv["end"]))
+        lengths[name] = max(longest, CLOSING - cursor)
+    return lengths
+
+
+def loop_free_count_per_slot(seats_info, slot_minutes=5):
+    counts = []
+    for slot_start in range(OPENING, CLOSING, slot_minutes):
+        start, end = to_hhmm(slot_start), to_hhmm(slot_start + slot_minutes)
+        counts.append(sum(check_seat_available(seat_info, start, end) for seat_info in seats_info.values()))
+    return counts
+
+
+def timed(func, *args, rounds=1):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func(*args)
+    return result, (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="座位占用矩阵性能测试")
+    parser.add_argument("--seats", type=int, default=2000, help="座位数")
+    parser.add_argument("--queries", type=int, default=200, help="“某时段空闲座位”查询次数")
+    args = parser.parse_args()
+
+    seats_info = synthetic_seats_info(args.seats)
+    rng = random.Random(7)
+    queries = []
+    for _ in range(args.queries):
+        start = rng.randrange(OPENING, CLOSING - 60, 5)
+        queries.append((to_hhmm(start), to_hhmm(min(CLOSING, start + rng.randrange(60, 481, 5)))))
+
+    room = Room.from_dicts(1, "0601", seats_info)
+    matrix, build = timed(OccupancyMatrix.from_seats_info, room, rounds=5)
+    print(f"{args.seats} 个座位 × {matrix.slots} 个时间槽，构建矩阵 {build * 1000:.2f} ms")
+
+    failures = 0
+    loop_time = vector_time = 0.0
+    for start, end in queries:
+        expected, elapsed = timed(loop_free_seats, seats_info, start, end)
+        loop_time += elapsed
+        actual, elapsed = timed(matrix.free_seats, start, end)
+        vector_time += elapsed
+        failures += expected != actual
+    print(f"时段空闲座位 x{len(queries)}: 逐座位循环 {loop_time * 1000:.1f} ms, 矩阵 {vector_time * 1000:.1f} ms, "
+          f"加速 {loop_time / vector_time:.1f} 倍")
+
+    # 不在开馆时间内或为空的时段没有可预约的座位
+    for start, end in (("07:00", "08:00"), ("22:00", "23:00"), ("10:00", "10:00")):
+        if matrix.free_seats(start, end) or matrix.is_free(matrix.seat_names[0], start, end):
+            failures += 1
+            print(f"\033[31m[FAIL] {start}-{end} 不在开馆时间内，却有空闲座位\033[0m")
+
+    expected, loop_elapsed = timed(loop_longest_free_run, seats_info)
+    (lengths, _), vector_elapsed = timed(matrix.longest_free_run, rounds=5)
+    failures += sum(expected[name] != lengths[row] * matrix.slot_minutes for row, name in enumerate(matrix.seat_names))
+    print(f"最长连续空闲: 逐座位循环 {loop_elapsed * 1000:.2f} ms, 矩阵 {vector_elapsed * 1000:.2f} ms, "
+          f"加速 {loop_elapsed / vector_elapsed:.1f} 倍")
+
+    expected, loop_elapsed = timed(loop_free_count_per_slot, seats_info)
+    actual, vector_elapsed = timed(matrix.free_count_per_slot, rounds=5)
+    failures += expected != actual.tolist()
+    print(f"每槽空闲座位数: 逐座位循环 {loop_elapsed * 1000:.1f} ms, 矩阵 {vector_elapsed * 1000:.3f} ms, "
+          f"加速 {loop_elapsed / vector_elapsed:.0f} 倍")
+
+    if failures:
+        print(f"\033[31m校验失败 {failures} 项\033[0m")
+        sys.exit(1)
+    print("校验通过: 矩阵查询结果与逐座位循环一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+预备阶段开火延迟测试
+在本地启动一个替身服务器，比较冷启动预约与预热+预构建后开火时，从T0到服务器收到请求首字节的延迟
+
+用法: python benchmarks/bench_prearm.py [--rounds 20] [--periods 3]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_booking import AsyncLibraryBooking  # noqa: E402
+
+RESPONSE_BODY = b'{"code":0,"message":"","data":null}'
+
+
+class StandInServer:
+    """最小化的HTTP/1.1 keep-alive替身服务器，记录每个请求首字节到达的时刻"""
+    def __init__(self):
+        self.first_byte_times = []
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                first = await reader.read(1)
+                if not first:
+                    break
+                self.first_byte_times.append(time.perf_counter())
+                head = first + await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: %d\r\n\r\n%s" % (len(RESPONSE_BODY), RESPONSE_BODY))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+def new_client(port):
+    core = AsyncLibraryBooking(pool_size=10)
+    core.debug = False
+    core.base_url = f"127.0.0.1:{port}"
+    core.app_acc_no = 100000
+    return core
+
+
+async def cold_round(server, periods):
+    """预约时间到达后才构建请求并建立连接"""
+    core = new_client(server.port)
+    server.first_byte_times.clear()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(core.make_reservation(1001, s, e, "0101") for s, e in periods))
+    delays = [t - t0 for t in server.first_byte_times]
+    await core.close()
+    return delays
+
+
+async def prearmed_round(server, periods):
+    """预热连接并预构建请求，预约时间到达时只写出字节"""
+    core = new_client(server.port)
+    prepared = await core.prearm(1001, periods, "0101")
+    server.first_byte_times.clear()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(core.fire_prepared(p) for p in prepared))
+    delays = [t - t0 for t in server.first_byte_times]
+    client_delays = [p.sent_at - t0 for p in prepared]
+    await core.close()
+    return delays, client_delays
+
+
+def summarize(name, delays):
+    delays_ms = sorted(d * 1000 for d in delays)
+    p95 = delays_ms[int(len(delays_ms) * 0.95) - 1] if len(delays_ms) >= 20 else delays_ms[-1]
+    print(f"{name}: 中位数 {statistics.median(delays_ms):.3f} ms, P95 {p95:.3f} ms, 最大 {delays_ms[-1]:.3f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="比较冷启动与预备阶段后的开火延迟")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--periods", type=int, default=3)
+    args = parser.parse_args()
+
+    periods = [(f"{8 + 4 * i:02d}:30", f"{12 + 4 * i:02d}:30") for i in range(args.periods)]
+    server = StandInServer()
+    await server.start()
+
+    import builtins
+    original_print = builtins.print
+    builtins.print = lambda *a, **k: None  # 屏蔽预约成功提示，避免终端输出影响计时
+    try:
+        cold, warm, warm_client = [], [], []
+        for _ in range(args.rounds):
+            cold += await cold_round(server, periods)
+            server_delays, client_delays = await prearmed_round(server, periods)
+            warm += server_delays
+            warm_client += client_delays
+    finally:
+        builtins.print = original_print
+        await server.stop()
+
+    print(f"{args.rounds} 轮，每轮 {args.periods} 个时间段，T0到服务器收到首字节：")
+    summarize("冷启动(make_reservation)", cold)
+    summarize("预备阶段(prearm+fire_prepared)", warm)
+    summarize("预备阶段客户端写出请求头", warm_client)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""
+录制与回放基准测试
+1. 对本地fake_server录制一次完整会话：CAS登录后查询房间、查询座位、绘制座位布局图、预约、查询预约、生成二维码
+2. 校验录制文件中没有cookie、密码和学号
+3. 按录制时的延迟回放一次，再以零延迟回放repeat次，统计各阶段耗时的中位数（即解析和绘图本身的耗时）
+也可以用 --cassette 直接回放一份已有的录制（例如对真实系统录制的会话），用于发现解析和绘图耗时的退化
+
+用法: python benchmarks/bench_replay.py [--repeat 5] [--latency 20] [--cassette session.jsonl.gz] [--save 路径]
+"""
+import argparse
+import contextlib
+import gzip
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timedelta
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+# 没有中文字体时matplotlib对每个字都会警告一次
+warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cookie import getCookieWithDirectLogin  # noqa: E402
+from fake_server import FakeLibrary, FakeServer, Latency  # noqa: E402
+from library_booking import LibraryBooking  # noqa: E402
+
+USERNAME, PASSWORD = "20230001", "password"
+
+
+def check(failures, condition, message):
+    if not condition:
+        print(f"\033[31m校验失败: {message}\033[0m")
+        failures.append(message)
+
+
+def session(booking, date_str):
+    """按交互菜单的顺序走一遍，返回 ({阶段: 秒}, 结果)"""
+    timings = {}
+    results = {}
+
+    def stage(name, func, *args):
+        started = time.perf_counter()
+        value = func(*args)
+        timings[name] = time.perf_counter() - started
+        return value
+
+    # 会话中的打印不计入终端，只测量代码本身
+    with contextlib.redirect_stdout(io.StringIO()):
+        rooms_info = stage("房间列表", booking.get_rooms_info)
+        room_id = next(iter(rooms_info.values()))["id"]
+        seats_info = stage("座位查询与解析", booking.get_seats_info, date_str, room_id)
+        stage("座位布局图", booking.visualize_seats, seats_info, room_id, "08:30", "12:30")
+        seat = next(iter(seats_info.values()))
+        results["reservation"] = stage("预约", booking.make_reservation, seat.dev_id, "08:30", "12:30", date_str)
+        results["reservations"] = stage("预约查询", booking.get_reservations)
+        stage("二维码", booking.generate_checkin_qrcode, seat.dev_id, seat.name)
+    results["seats"] = len(seats_info)
+    return timings, results
+
+
+def record(path, latency, failures):
+    library = FakeLibrary(2, 120, {USERNAME: PASSWORD})
+    server = FakeServer(library, Latency(latency, 0.3))
+    base_url = server.start_in_thread()
+    booking = None
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            cookie = getCookieWithDirectLogin(USERNAME, PASSWORD, delay=None, base_url=base_url, scheme="http")
+            booking = LibraryBooking(base_url=base_url, scheme="http")
+            booking.debug = False
+            booking.set_cookie(cookie)
+            booking.get_app_acc_no()
+        check(failures, bool(cookie), "CAS登录没有拿到cookie")
+        booking.start_recording()
+        date_str = (datetime.now() + timedelta(days=1)).strftime("%m%d")
+        timings, results = session(booking, date_str)
+        cassette = booking.stop_recording(path)
+        check(failures, results["reservation"].get("code") == 0, f"预约失败: {results['reservation']}")
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            raw = f.read()
+        for secret in (cookie.split("=", 1)[-1], PASSWORD, USERNAME, str(booking.app_acc_no)):
+            check(failures, secret not in raw, f"录制文件中含有敏感内容 {secret[:6]}...")
+        return cassette, timings, results, date_str
+    finally:
+        if booking is not None:
+            booking.close()
+        server.stop_thread()
+
+
+def replay(path, date_str, scale):
+    with contextlib.redirect_stdout(io.StringIO()):
+        booking = LibraryBooking.from_cassette(path, scale)
+    booking.debug = False
+    booking.app_acc_no = 1
+    try:
+        timings, results = session(booking, date_str)
+        return timings, results, booking.core.http
+    finally:
+        booking.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="录制与回放基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="零延迟回放次数")
+    parser.add_argument("--latency", type=float, default=20, help="录制时模拟服务器的接口延迟中位数（毫秒）")
+    parser.add_argument("--cassette", help="回放已有的录制文件，不再录制")
+    parser.add_argument("--date", help="回放已有录制时使用的日期MMDD，默认明天")
+    parser.add_argument("--save", help="录制文件的保存路径，默认保存在临时目录")
+    args = parser.parse_args()
+    failures = []
+
+    workdir = tempfile.mkdtemp(prefix="bench_replay_")
+    path = os.path.abspath(args.cassette or args.save or os.path.join(workdir, "session.jsonl.gz"))
+    # 布局图和二维码都写在临时目录中
+    os.chdir(workdir)
+
+    columns = []
+    if args.cassette:
+        date_str = args.date or (datetime.now() + timedelta(days=1)).strftime("%m%d")
+    else:
+        cassette, timings, results, date_str = record(path, args.latency, failures)
+        print(f"录制 {len(cassette)} 个请求，文件 {os.path.getsize(path) / 1024:.1f} KB: {path}")
+        columns.append(("录制", timings))
+
+    timings, results, client = replay(path, date_str, 1.0)
+    check(failures, not client.misses, f"回放时没有记录的请求: {client.misses}")
+    check(failures, results["reservation"].get("code") == 0, "回放的预约结果不正确")
+    columns.append(("按原延迟回放", timings))
+
+    runs = [replay(path, date_str, 0.0)[0] for _ in range(args.repeat)]
+    columns.append(("零延迟回放P50", {name: statistics.median(run[name] for run in runs) for name in runs[0]}))
+
+    print(f"{'阶段':<12}" + "".join(f"{title:>14}" for title, _ in columns))
+    for name in columns[-1][1]:
+        print(f"{name:<12}" + "".join(f"{values[name] * 1000:12.1f}ms" for _, values in columns))
+    print(f"{'合计':<12}" + "".join(f"{sum(values.values()) * 1000:12.1f}ms" for _, values in columns))
+
+    if failures:
+        sys.exit(1)
+    print("校验通过: 录制文件已脱敏，回放结果与录制一致")
+
+
+if __name__ == "__main__":
+    main()
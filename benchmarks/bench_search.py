@@ -0,0 +1,105 @@
+"""
+跨房间最佳座位搜索性能测试
+在随机生成的全馆快照上，比较SeatSearch（占用矩阵 + 空闲段索引）与逐座位遍历预约记录的搜索耗时，
+并校验两者选出的前k个座位的连续空闲时长一致
+
+用法: python benchmarks/bench_search.py [--rooms 30] [--seats 100] [--k 10]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_occupancy import CLOSING, OPENING, synthetic_seats_info  # noqa: E402
+from models import Room, to_hhmm  # noqa: E402
+from search import SeatSearch  # noqa: E402
+from snapshot import LibrarySnapshot  # noqa: E402
+
+
+def synthetic_snapshot(rooms, seats, date_str="0601"):
+    rng = random.Random(20240601)
+    rooms_info = {}
+    snapshot = LibrarySnapshot(rooms_info)
+    for index in range(rooms):
+        number = f"{2 + index // 10}{index % 10:02d}"
+        rooms_info[number] = {"id": 1000 + index, "name": f"{number}自修室", "total_seats": seats}
+        seats_info = {}
+        for seat, seat_info in enumerate(synthetic_seats_info(seats, seed=index).values(), 1):
+            name = f"{number}-{seat:03d}"
+            seats_info[name] = dict(seat_info, devName=name,
+                                    coordinate=f"{rng.uniform(0, 1000):.0f},{rng.uniform(0, 800):.0f}")
+        snapshot.add(date_str, number, Room.from_dicts(1000 + index, date_str, seats_info), 0.0)
+    return snapshot
+
+
+def naive_search(snapshot, date_str, start, end, k):
+    """逐座位遍历预约记录，找出覆盖 [start, end) 的连续空闲最长的k个座位"""
+    ranked = []
+    for room_number in snapshot.room_numbers(date_str):
+        for seat in snapshot.rooms[(date_str, room_number)].values():
+            if not seat.is_free(start, end):
+                continue
+            for interval in seat.free_intervals(OPENING, CLOSING):
+                if interval.start <= start and interval.end >= end:
+                    ranked.append((interval.minutes, seat.name))
+                    break
+    ranked.sort(key=lambda item: -item[0])
+    return ranked[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="跨房间最佳座位搜索性能测试")
+    parser.add_argument("--rooms", type=int, default=30, help="房间数")
+    parser.add_argument("--seats", type=int, default=100, help="每个房间的座位数")
+    parser.add_argument("--k", type=int, default=10, help="返回前k个座位")
+    args = parser.parse_args()
+
+    snapshot = synthetic_snapshot(args.rooms, args.seats)
+    search = SeatSearch(snapshot, weights={"gaps": 0.0})
+    rng = random.Random(7)
+    windows = []
+    for _ in range(50):
+        start = rng.randrange(OPENING, CLOSING - 60, 5)
+        windows.append((start, min(CLOSING, start + rng.randrange(60, 241, 5))))
+
+    started = time.perf_counter()
+    search.search("0601", to_hhmm(windows[0][0]), to_hhmm(windows[0][1]), k=args.k)
+    cold = time.perf_counter() - started
+
+    failures = 0
+    naive_time = indexed_time = 0.0
+    for start, end in windows:
+        started = time.perf_counter()
+        expected = naive_search(snapshot, "0601", start, end, args.k)
+        naive_time += time.perf_counter() - started
+        started = time.perf_counter()
+        actual = search.search("0601", to_hhmm(start), to_hhmm(end), k=args.k)
+        indexed_time += time.perf_counter() - started
+        failures += [minutes for minutes, _ in expected] != [item["block_minutes"] for item in actual]
+
+    # 同一房间同一天再次加入（如重新获取）应替换原来的记录，索引大小不变
+    room_count, indexed = len(snapshot.room_numbers("0601")), len(snapshot._seat_index)
+    first = snapshot.room_numbers("0601")[0]
+    snapshot.add("0601", first, snapshot.rooms[("0601", first)], 0.0)
+    snapshot.add("0601", first, None, 0.0)
+    snapshot.add("0601", first, snapshot.rooms[("0601", first)], 0.0)
+    if (len(snapshot.room_numbers("0601")), len(snapshot._seat_index)) != (room_count, indexed) or snapshot.failed:
+        print(f"\033[31m重复加入房间后索引改变: {len(snapshot.room_numbers('0601'))} 个房间, "
+              f"{len(snapshot._seat_index)} 个座位, 失败 {snapshot.failed}\033[0m")
+        failures += 1
+
+    print(f"{args.rooms} 个房间 × {args.seats} 个座位，首次搜索（含建立索引） {cold * 1000:.1f} ms")
+    print(f"前{args.k}个座位 x{len(windows)}: 逐座位遍历 {naive_time * 1000:.1f} ms, 索引搜索 {indexed_time * 1000:.1f} ms, "
+          f"加速 {naive_time / indexed_time:.1f} 倍")
+    if failures:
+        print(f"\033[31m校验失败 {failures} 项\033[0m")
+        sys.exit(1)
+    print("校验通过: 前k个座位的连续空闲时长一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+抢座风暴模拟器的自检与吞吐量测试
+- 同一个seed重复模拟结果完全相同，不同策略面对同一批竞争者
+- 放座前到达的请求全部被"未开放"拒绝，放座后没有任何重叠的预约
+- 没有竞争者时单座策略必定抢到首选座位的全部时间段，时钟没有偏差时固定开火不会被"未开放"拒绝
+- 测量单核每分钟能模拟的放座次数
+
+用法: python benchmarks/bench_simulator.py [--releases 100]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator import (RELEASE_T0, EventQueue, SampledLatency, SimClient, StormScenario,  # noqa: E402
+                       default_strategies, run, simulate_release)
+from fake_server import FakeLibrary, Latency  # noqa: E402
+from async_booking import RetryPolicy  # noqa: E402
+
+
+def check(failures, condition, message):
+    if not condition:
+        print(f"\033[31m校验失败: {message}\033[0m")
+        failures.append(message)
+
+
+def check_server_rules(failures):
+    """20个客户端抢同一个座位，一半在放座前开火"""
+    events = EventQueue(start=RELEASE_T0 - 10)
+    library = FakeLibrary(1, 4, clock=events, release_at=RELEASE_T0)
+    seats = list(library.seats)
+    latency = SampledLatency(Latency(20, 0.5), 0)
+    clients = []
+    for index in range(20):
+        client = SimClient(events, library, 1000 + index, seats[:2], [(510, 750), (750, 990)],
+                           retry=RetryPolicy(3, 0.05), latency=latency)
+        client.fire(RELEASE_T0 + (index - 10) * 0.01)
+        clients.append(client)
+    events.run()
+    stats = library.stats()
+    check(failures, stats["conflicts"] == 0, f"有 {stats['conflicts']} 处重叠预约")
+    check(failures, all(created >= RELEASE_T0 for created, *_ in library.grants), "放座前有预约成功")
+    check(failures, sum(client.won is not None for client in clients) <= 2, "两个座位被超过两个客户端抢到")
+    check(failures, stats["rejected"].get("预约未开放，请在开放时间后预约", 0) > 0, "没有模拟到提前开火")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抢座风暴模拟器自检")
+    parser.add_argument("--releases", type=int, default=100, help="吞吐量测试的放座次数")
+    args = parser.parse_args()
+    failures = []
+
+    check_server_rules(failures)
+
+    scenario = StormScenario()
+    strategies = default_strategies()
+    check(failures, simulate_release(scenario, strategies[5], 42) == simulate_release(scenario, strategies[5], 42),
+          "同一个seed两次模拟结果不同")
+
+    quiet = StormScenario(competitors=0, clock_skew=0.0)
+    for strategy in strategies:
+        if not strategy.fallbacks:
+            result = simulate_release(quiet, strategy, 7)
+            check(failures, result["success"] and result["rank"] == 1, f"{strategy.name} 在没有竞争者时没有抢到座位")
+            check(failures, strategy.corrected or result["early"] == 0, f"{strategy.name} 时钟没有偏差时提前开火")
+
+    started = time.perf_counter()
+    totals = run(scenario, strategies, args.releases)
+    elapsed = time.perf_counter() - started
+    check(failures, all(total["releases"] == args.releases for total in totals), "模拟次数不正确")
+    print(f"{args.releases} 次放座 × {len(strategies)} 种策略，耗时 {elapsed:.2f} 秒，"
+          f"单核每分钟 {args.releases * len(strategies) / elapsed * 60:.0f} 次单策略模拟")
+
+    if failures:
+        sys.exit(1)
+    print("校验通过: 模拟结果可复现，服务器规则与先到先得一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+捡漏监控模拟
+在虚拟时钟上模拟一个下午：目标时段 14:00-18:00 的座位全部被预约，之后陆续有人取消或未签到被释放
+（大部分集中在14:00后的半小时内），释放出来的座位若干秒后会被其他人抢走。
+比较固定间隔轮询与自适应轮询在相同请求预算下的查询次数、抢到的座位数和发现延迟，
+并校验同一轮中每个房间只查询一次
+
+用法: python benchmarks/bench_watcher.py [--rooms 10] [--seats 80] [--budget 30]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Room  # noqa: E402
+from scheduler import VirtualClock  # noqa: E402
+from watcher import SeatWatch, SeatWatcher  # noqa: E402
+
+DATE = "0601"
+START = datetime(2026, 6, 1, 13, 0).timestamp()
+END = datetime(2026, 6, 1, 17, 0).timestamp()
+RTT = 0.08
+
+
+class SimulatedLibrary:
+    """按虚拟时间演化的座位状态，提供watcher需要的get_seats_info和race_candidates"""
+    def __init__(self, rooms, seats, clock, seed=20240601, grab_mean=90.0):
+        rng = random.Random(seed)
+        self.clock = clock
+        self.rooms = {1000 + index: [f"{index + 2}{seat:02d}-{seat:03d}" for seat in range(1, seats + 1)]
+                      for index in range(rooms)}
+        self.busy = {name: True for names in self.rooms.values() for name in names}
+        self.events = []
+        for names in self.rooms.values():
+            for name in rng.sample(names, 3):
+                if rng.random() < 0.7:
+                    at = datetime(2026, 6, 1, 14, 0).timestamp() + rng.uniform(0, 35 * 60)
+                else:
+                    at = START + rng.uniform(0, END - START)
+                self.events.append((at, "release", name))
+                self.events.append((at + rng.expovariate(1 / grab_mean), "grab", name))
+        self.events.sort()
+        self.released_at = {}
+        self.caught = []
+        self.fetches = []
+        self.cycle = lambda: 0
+
+    def _apply(self):
+        now = self.clock.time()
+        while self.events and self.events[0][0] <= now:
+            at, kind, name = self.events.pop(0)
+            if kind == "release":
+                self.busy[name] = False
+                self.released_at[name] = at
+            elif name not in (seat for seat, _ in self.caught):
+                self.busy[name] = True
+
+    async def get_seats_info(self, date_str, room_id):
+        self.fetches.append((self.cycle(), room_id))
+        await self.clock.async_sleep(RTT)
+        self._apply()
+        seats_info = {}
+        for index, name in enumerate(self.rooms[room_id]):
+            reserved = [{"start": "14:00", "end": "18:00"}] if self.busy[name] else []
+            seats_info[name] = {"devId": index, "devName": name, "coordinate": f"{index % 10 * 50},{index // 10 * 50}",
+                                "reserved_times": reserved}
+        return Room.from_dicts(room_id, date_str, seats_info)
+
+    async def race_candidates(self, candidates, time_periods, date_str, parallelism=2, **kwargs):
+        await self.clock.async_sleep(RTT)
+        self._apply()
+        for seat in candidates:
+            if not self.busy[seat.name]:
+                self.busy[seat.name] = True
+                self.caught.append((seat.name, self.clock.time() - self.released_at[seat.name]))
+                periods = [{"start": start, "end": end, "success": True} for start, end in time_periods]
+                return {"success": True, "partial": False, "seat": seat, "periods": periods}
+        return {"success": False, "partial": False, "seat": None, "periods": []}
+
+
+async def simulate(args, **options):
+    clock = VirtualClock(start=START)
+    library = SimulatedLibrary(args.rooms, args.seats, clock)
+    rooms_info = {str(room_id): {"id": room_id, "name": f"{room_id}自修室"} for room_id in library.rooms}
+    watcher = SeatWatcher(library, rooms_info, budget=args.budget, concurrency=1, clock=clock,
+                          log=lambda message: None, **options)
+    library.cycle = lambda: watcher.cycles
+    for room_number in rooms_info:
+        for account in range(2):
+            watcher.add(SeatWatch(library, DATE, room_number, "14:00", "18:00", name=f"{room_number}#{account}"))
+
+    async def deadline():
+        while clock.time() < END:
+            await asyncio.sleep(0)
+        watcher.stop()
+
+    stopper = asyncio.ensure_future(deadline())
+    stats = await watcher.run()
+    stopper.cancel()
+    delays = [delay for _, delay in library.caught]
+    duplicates = len(library.fetches) - len(set(library.fetches))
+    return stats, delays, duplicates, sum(kind == "release" for _, kind, _ in library.events) + len(library.released_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="捡漏监控模拟")
+    parser.add_argument("--rooms", type=int, default=10, help="房间数")
+    parser.add_argument("--seats", type=int, default=80, help="每个房间的座位数")
+    parser.add_argument("--budget", type=int, default=30, help="每分钟查询预算")
+    args = parser.parse_args()
+
+    fixed_interval = args.rooms * 60 / args.budget
+    strategies = [
+        (f"固定间隔 {fixed_interval:.0f}s", {"min_interval": fixed_interval, "max_interval": fixed_interval}),
+        ("自适应", {"min_interval": 3.0, "max_interval": 60.0}),
+    ]
+    failures = 0
+    print(f"{args.rooms} 个房间 × {args.seats} 个座位，每个房间2个捡漏任务，每分钟查询预算 {args.budget} 次")
+    for label, options in strategies:
+        stats, delays, duplicates, releases = asyncio.run(simulate(args, **options))
+        caught = len(delays)
+        text = f"平均延迟 {statistics.mean(delays):.1f}s, 最大 {max(delays):.1f}s" if delays else "没有抢到座位"
+        print(f"  {label}: 查询 {stats['requests']} 次, 释放 {releases} 个座位, 抢到 {caught} 个, {text}")
+        failures += duplicates
+        failures += stats["requests"] > args.budget * (END - START) / 60 + args.budget
+    if failures:
+        print(f"\033[31m校验失败 {failures} 项\033[0m")
+        sys.exit(1)
+    print("校验通过: 同一轮中每个房间只查询一次，查询次数不超过预算")
+
+
+if __name__ == "__main__":
+    main()
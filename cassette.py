@@ -0,0 +1,279 @@
+"""
+HTTP录制与回放
+RecordingHTTPClient包在AsyncPooledHTTPClient外面，把seatMenu、reserve、resvInfo、sysInfo（及其平面图）的请求和响应
+按顺序记录到Cassette；ReplayHTTPClient按记录的（或缩放后的）延迟把这些响应原样返回，不访问网络。
+用同一份录制可以反复回放一整次会话（查询座位、可视化、预约），比较解析和绘图耗时的变化
+
+录制文件是gzip压缩的JSON Lines，第一行是文件信息，之后每行一个请求。请求头不保存，响应头只保存Content-Type和Date，
+请求参数和响应JSON中的账号、姓名、密码、token等字段写入前替换掉
+
+用法:
+    python cassette.py show session.jsonl.gz
+"""
+import argparse
+import asyncio
+import base64
+import gzip
+import json
+import time
+import urllib.parse
+from datetime import datetime
+from multidict import CIMultiDict
+from http_client import AsyncPooledHTTPClient, ConnectionStats, HTTPResponse
+
+CASSETTE_VERSION = 1
+# 默认录制的接口路径，以及sysInfo返回的平面图所在的路径前缀
+RECORDED_PATHS = ("/ic-web/seatMenu", "/ic-web/reserve", "/ic-web/reserve/resvInfo", "/ic-web/sysInfo")
+RECORDED_PREFIXES = ("/ic-web/upload/",)
+# 写入前替换的字段（不区分大小写），请求参数中的这些字段在回放匹配时也被忽略
+REDACTED_FIELDS = frozenset({
+    "cookie", "password", "pwd", "token", "lgtoken", "ticket", "str_enc", "accno", "appaccno", "logonname",
+    "truename", "username", "resvmember", "pid", "cardno", "phone", "handphone", "email",
+})
+# 保存的响应头
+KEPT_HEADERS = ("Content-Type", "Date")
+# 回放时没有记录的请求返回的响应体
+MISSING_RESPONSE = '{"code":404,"message":"回放记录中没有该请求"}'.encode("utf-8")
+
+
+def redact(value):
+    """递归替换字典中的敏感字段：字符串换成"***"，数字换成0"""
+    if isinstance(value, dict):
+        return {key: _mask(item) if key.lower() in REDACTED_FIELDS else redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def _mask(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return 0
+    if isinstance(value, list):
+        return [_mask(item) for item in value]
+    if isinstance(value, dict):
+        return redact(value)
+    return "***"
+
+
+def _parse_body(data):
+    """把请求体（JSON字符串或字节）解析成对象，无法解析时原样返回字符串"""
+    if data is None:
+        return None
+    if isinstance(data, (bytes, bytearray)):
+        data = bytes(data).decode("utf-8", errors="replace")
+    if isinstance(data, str):
+        try:
+            return json.loads(data)
+        except ValueError:
+            return data
+    return data
+
+
+def request_signature(method, url, params=None, json_body=None, data=None):
+    """请求的(方法, 路径, 查询参数, 请求体)，URL中的查询参数并入params，敏感字段已替换"""
+    parts = urllib.parse.urlsplit(url)
+    query = dict(urllib.parse.parse_qsl(parts.query, keep_blank_values=True))
+    query.update({key: str(value) for key, value in (params or {}).items()})
+    body = json_body if json_body is not None else _parse_body(data)
+    return method.upper(), parts.path or "/", redact(query), redact(body)
+
+
+def _match_key(method, path, query, body):
+    return json.dumps([method, path, query, body], sort_keys=True, ensure_ascii=False)
+
+
+class Cassette:
+    """按顺序保存的请求/响应记录
+
+    Args:
+        base_url: 录制时的预约系统主机名，仅作记录
+    """
+    def __init__(self, base_url=None):
+        self.base_url = base_url
+        self.created = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def record(self, method, url, response, params=None, json_body=None, data=None):
+        """记录一次请求和已读完的响应（HTTPResponse）"""
+        method, path, query, body = request_signature(method, url, params, json_body, data)
+        entry = {"m": method, "p": path, "q": query, "b": body, "s": response.status_code,
+                 "h": {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+                 "t": round(response.elapsed * 1000, 2)}
+        try:
+            # JSON响应替换敏感字段后紧凑地保存为文本，回放时的字节与之相同
+            payload = redact(json.loads(response.content))
+            entry["c"] = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        except ValueError:
+            entry["c64"] = base64.b64encode(response.content).decode("ascii")
+        self.entries.append(entry)
+        return entry
+
+    def save(self, path):
+        """写入gzip压缩的JSON Lines文件"""
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"cassette": CASSETTE_VERSION, "base_url": self.base_url, "created": self.created,
+                                "entries": len(self.entries)}, ensure_ascii=False) + "\n")
+            for entry in self.entries:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("cassette") != CASSETTE_VERSION:
+                raise ValueError(f"不支持的录制文件版本: {header.get('cassette')}")
+            cassette = cls(header.get("base_url"))
+            cassette.created = header.get("created")
+            cassette.entries = [json.loads(line) for line in f if line.strip()]
+        return cassette
+
+    def summary(self):
+        """{接口: {"count": 请求数, "bytes": 响应字节数, "latency_ms": 平均延迟}}"""
+        result = {}
+        for entry in self.entries:
+            item = result.setdefault(f"{entry['m']} {entry['p']}", {"count": 0, "bytes": 0, "latency_ms": 0.0})
+            item["count"] += 1
+            item["bytes"] += len(_content(entry))
+            item["latency_ms"] += entry["t"]
+        for item in result.values():
+            item["latency_ms"] = round(item["latency_ms"] / item["count"], 2)
+        return result
+
+
+def _content(entry):
+    if "c" in entry:
+        return entry["c"].encode("utf-8")
+    return base64.b64decode(entry["c64"])
+
+
+class RecordingHTTPClient:
+    """录制模式：请求照常经过client发送，路径在paths中（或以prefixes开头）的请求和响应记录到cassette
+
+    提供与AsyncPooledHTTPClient相同的request/get/post/close接口和stats，可以直接替换AsyncLibraryBooking.http
+
+    Args:
+        cassette: 录制到的Cassette
+        client: 实际发送请求的AsyncPooledHTTPClient（可选，默认新建）
+        paths: 录制的接口路径，为None时录制所有请求
+        prefixes: 额外录制的路径前缀
+    """
+    def __init__(self, cassette, client=None, paths=RECORDED_PATHS, prefixes=RECORDED_PREFIXES):
+        self.cassette = cassette
+        self.client = client or AsyncPooledHTTPClient()
+        self.paths = None if paths is None else frozenset(paths)
+        self.prefixes = tuple(prefixes or ())
+
+    @property
+    def stats(self):
+        return self.client.stats
+
+    def records(self, url):
+        """该URL的请求是否需要录制"""
+        if self.paths is None:
+            return True
+        path = urllib.parse.urlsplit(url).path
+        return path in self.paths or path.startswith(self.prefixes)
+
+    async def request(self, method, url, endpoint=None, headers=None, params=None, json=None, data=None,
+                      timeout=None, verify=False):
+        response = await self.client.request(method, url, endpoint=endpoint, headers=headers, params=params,
+                                             json=json, data=data, timeout=timeout, verify=verify)
+        if self.records(url):
+            self.cassette.record(method, url, response, params, json, data)
+        return response
+
+    async def get(self, url, **kwargs):
+        return await self.request("get", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("post", url, **kwargs)
+
+    async def close(self):
+        await self.client.close()
+
+
+class ReplayHTTPClient:
+    """回放模式：按请求匹配cassette中的记录并返回，不访问网络
+
+    先按方法、路径、查询参数和请求体精确匹配，找不到时按方法和路径匹配（日期等参数与录制时不同的情况）；
+    同一请求有多条记录时按录制顺序依次返回，用完后重复最后一条。没有任何记录的请求返回404，记录在misses中
+
+    Args:
+        cassette: Cassette
+        scale: 延迟缩放系数，1为按录制时的延迟返回，0为立即返回
+    """
+    def __init__(self, cassette, scale=1.0):
+        self.cassette = cassette
+        self.scale = scale
+        self.stats = ConnectionStats()
+        self.served = 0
+        self.misses = []
+        self._exact = {}
+        self._by_path = {}
+        for entry in cassette.entries:
+            self._exact.setdefault(_match_key(entry["m"], entry["p"], entry["q"], entry["b"]), []).append(entry)
+            self._by_path.setdefault((entry["m"], entry["p"]), []).append(entry)
+        self._cursors = {}
+
+    def _next(self, key, entries):
+        index = self._cursors.get(key, 0)
+        self._cursors[key] = index + 1
+        return entries[min(index, len(entries) - 1)]
+
+    def find(self, method, url, params=None, json_body=None, data=None):
+        """找到与请求对应的记录，没有时返回None"""
+        method, path, query, body = request_signature(method, url, params, json_body, data)
+        key = _match_key(method, path, query, body)
+        if key in self._exact:
+            return self._next(key, self._exact[key])
+        if (method, path) in self._by_path:
+            return self._next((method, path), self._by_path[(method, path)])
+        return None
+
+    async def request(self, method, url, endpoint=None, headers=None, params=None, json=None, data=None,
+                      timeout=None, verify=False):
+        endpoint = endpoint or AsyncPooledHTTPClient.endpoint_name(method, url)
+        start = time.perf_counter()
+        entry = self.find(method, url, params, json, data)
+        if entry is None:
+            self.misses.append(endpoint)
+            return HTTPResponse(404, CIMultiDict({"Content-Type": "application/json"}), MISSING_RESPONSE, url, 0.0,
+                                start)
+        if self.scale > 0:
+            await asyncio.sleep(entry["t"] / 1000 * self.scale)
+        self.served += 1
+        self.stats.record(endpoint, True)
+        return HTTPResponse(entry["s"], CIMultiDict(entry["h"]), _content(entry), url, time.perf_counter() - start,
+                            start)
+
+    async def get(self, url, **kwargs):
+        return await self.request("get", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("post", url, **kwargs)
+
+    async def close(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看HTTP录制文件")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    show = subparsers.add_parser("show", help="按接口汇总录制的请求")
+    show.add_argument("path", help="录制文件路径")
+    args = parser.parse_args()
+
+    cassette = Cassette.load(args.path)
+    print(f"录制于 {cassette.created}，主机 {cassette.base_url}，共 {len(cassette)} 个请求")
+    for endpoint, item in sorted(cassette.summary().items()):
+        print(f"{endpoint:<32} {item['count']:>4} 次  {item['bytes'] / 1024:8.1f} KB  平均 {item['latency_ms']:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+座位竞争度估计
+根据占用历史（history.HistoryStore）估计每个座位在每个星期几、每个时段：
+- demand: 最终被预约的概率
+- contention: 放出后很快（fast_minutes分钟内，以当天第一次查询为起点）就被抢走的概率
+两者都按日期做指数衰减加权（半衰期half_life天），最近的数据权重更高。
+
+结果预先计算为 座位 × 星期 × 时段 的查找表，并对时段做前缀和，
+开火前给候选座位排序时每个座位只需几次数组访问
+"""
+import time
+from datetime import datetime
+import numpy as np
+from history import full_date
+from models import CLOSING_MINUTES, OPENING_MINUTES, as_minutes
+
+# 竞争度相同时，被预约概率对风险的贡献权重
+DEMAND_WEIGHT = 0.25
+
+
+def _weekday(date_str, at=None):
+    """MMDD或YYYY-MM-DD对应的星期几（0为星期一）"""
+    if len(date_str) == 4:
+        date_str = full_date(date_str, time.time() if at is None else at)
+    return datetime.strptime(date_str, "%Y-%m-%d").weekday()
+
+
+class ContentionModel:
+    """座位 × 星期 × 时段 的竞争度查找表
+
+    Args:
+        dev_ids: 座位devId列表，与表的第一维对应
+        demand, contention: 形状为 (座位数, 7, 时段数) 的数组，没有数据处为NaN
+        opening: 第一个时段的开始时间（分钟数）
+        slot_minutes: 时段长度（分钟）
+    """
+    def __init__(self, dev_ids, demand, contention, opening=OPENING_MINUTES, slot_minutes=60):
+        self.dev_ids = list(dev_ids)
+        self._rows = {dev_id: row for row, dev_id in enumerate(self.dev_ids)}
+        self.demand = demand
+        self.contention = contention
+        self.opening = opening
+        self.slot_minutes = slot_minutes
+        risk = contention + DEMAND_WEIGHT * demand
+        known = ~np.isnan(risk)
+        # 前缀和：任意连续时段的风险之和与有数据的时段数都只需两次访问
+        self._risk_prefix = np.concatenate([np.zeros(risk.shape[:2] + (1,)),
+                                            np.cumsum(np.where(known, risk, 0.0), axis=2)], axis=2)
+        self._known_prefix = np.concatenate([np.zeros(risk.shape[:2] + (1,), dtype=np.int32),
+                                             np.cumsum(known, axis=2, dtype=np.int32)], axis=2)
+
+    @property
+    def slots(self):
+        return self.demand.shape[2]
+
+    @property
+    def empty(self):
+        """没有任何座位有数据（如历史中还没有查询记录），此时rank只会返回原顺序"""
+        return not self._known_prefix[..., -1].any()
+
+    @classmethod
+    def from_history(cls, history, days=60, half_life=14.0, fast_minutes=10, slot_minutes=60, now=None):
+        """从HistoryStore最近days天的记录建立模型，没有查询记录时返回的模型empty为True"""
+        now = time.time() if now is None else now
+        until = datetime.fromtimestamp(now).strftime("%Y-%m-%d")
+        seats = history.query("SELECT room_id, dev_id FROM seats")
+        polls = history.query("SELECT room_id, date, MIN(observed_at) FROM polls WHERE date BETWEEN ? AND ? "
+                              "GROUP BY room_id, date", history.date_range(days, until))
+        # 没有观测就没有分母，不必再读预约记录
+        reservations = history.reservations(days=days, until=until) if polls else []
+        return cls.from_rows(seats, polls, reservations, half_life, fast_minutes, slot_minutes, now)
+
+    @classmethod
+    def from_rows(cls, seats, polls, reservations, half_life=14.0, fast_minutes=10, slot_minutes=60, now=None):
+        """由历史记录的原始行建立模型
+
+        Args:
+            seats: (room_id, dev_id) 列表
+            polls: (room_id, date, 当天第一次查询时间) 列表，每个房间有查询记录的日期都算一次观测
+            reservations: HistoryStore.reservations返回的行
+        """
+        now = time.time() if now is None else now
+        today = datetime.fromtimestamp(now).date()
+        slots = -(-(CLOSING_MINUTES - OPENING_MINUTES) // slot_minutes)
+        dev_ids = [dev_id for _, dev_id in seats]
+        rows = {dev_id: row for row, dev_id in enumerate(dev_ids)}
+        seat_rooms = np.array([room_id for room_id, _ in seats])
+
+        # 每个房间每个星期几被观测到的加权天数
+        first_seen = {}
+        observed = {}
+        for room_id, date, observed_at in polls:
+            day = datetime.strptime(date, "%Y-%m-%d")
+            weight = 0.5 ** (max((today - day.date()).days, 0) / half_life)
+            first_seen[(room_id, date)] = (observed_at, day, weight)
+            observed[(room_id, day.weekday())] = observed.get((room_id, day.weekday()), 0.0) + weight
+
+        # 同一座位同一天的多个预约先合并为时段掩码，避免重复计数
+        taken, fast = {}, {}
+        for room_id, dev_id, date, start, end, seen_at, removed_at in reservations:
+            row = rows.get(dev_id)
+            poll = first_seen.get((room_id, date))
+            if row is None or poll is None:
+                continue
+            first_observed, day, _ = poll
+            # 预约开始前就被取消的不算占用
+            if removed_at is not None and removed_at <= day.timestamp() + start * 60:
+                continue
+            first = max((start - OPENING_MINUTES) // slot_minutes, 0)
+            last = min(-(-(end - OPENING_MINUTES) // slot_minutes), slots)
+            if first >= last:
+                continue
+            mask = taken.setdefault((row, date), np.zeros(slots, dtype=bool))
+            mask[first:last] = True
+            if seen_at - first_observed <= fast_minutes * 60:
+                fast_mask = fast.setdefault((row, date), np.zeros(slots, dtype=bool))
+                fast_mask[first:last] = True
+
+        demand = np.zeros((len(dev_ids), 7, slots))
+        contention = np.zeros((len(dev_ids), 7, slots))
+        for counts, masks in ((demand, taken), (contention, fast)):
+            for (row, date), mask in masks.items():
+                _, day, weight = first_seen[(seat_rooms[row], date)]
+                counts[row, day.weekday()] += weight * mask
+
+        denominators = np.array([[observed.get((room_id, weekday), 0.0) for weekday in range(7)]
+                                 for room_id in seat_rooms]).reshape(len(dev_ids), 7, 1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            demand = np.where(denominators > 0, demand / denominators, np.nan)
+            contention = np.where(denominators > 0, contention / denominators, np.nan)
+        return cls(dev_ids, demand.astype(np.float32), contention.astype(np.float32), OPENING_MINUTES, slot_minutes)
+
+    def _slot_range(self, start, end):
+        first = max((as_minutes(start) - self.opening) // self.slot_minutes, 0)
+        last = min(-(-(as_minutes(end) - self.opening) // self.slot_minutes), self.slots)
+        return first, max(last, first)
+
+    def risk(self, dev_id, date_str, start, end):
+        """某个座位在该日期 [start, end) 的平均风险（竞争度 + DEMAND_WEIGHT × 被预约概率），没有数据时返回None"""
+        row = self._rows.get(dev_id)
+        if row is None:
+            return None
+        weekday = _weekday(date_str)
+        first, last = self._slot_range(start, end)
+        known = self._known_prefix[row, weekday, last] - self._known_prefix[row, weekday, first]
+        if not known:
+            return None
+        return float(self._risk_prefix[row, weekday, last] - self._risk_prefix[row, weekday, first]) / known
+
+    def rank(self, seats, date_str, start, end, keep_first=True, bucket=0.05):
+        """按风险从低到高给候选座位排序
+
+        风险按bucket分档，同一档内保持原来的顺序（用户的偏好）；没有历史数据的座位排在有数据的之后
+
+        Args:
+            seats: Seat列表
+            keep_first: 第一个座位（用户首选）保持在第一位
+
+        Returns:
+            排序后的新列表
+        """
+        fixed, rest = (list(seats[:1]), list(seats[1:])) if keep_first else ([], list(seats))
+        weekday = _weekday(date_str)
+        first, last = self._slot_range(start, end)
+
+        def key(item):
+            position, seat = item
+            row = self._rows.get(seat.dev_id)
+            if row is None:
+                return (1, 0, position)
+            known = self._known_prefix[row, weekday, last] - self._known_prefix[row, weekday, first]
+            if not known:
+                return (1, 0, position)
+            risk = (self._risk_prefix[row, weekday, last] - self._risk_prefix[row, weekday, first]) / known
+            return (0, int(risk / bucket), position)
+
+        return fixed + [seat for _, seat in sorted(enumerate(rest), key=key)]
+
+    def save(self, path):
+        """保存查找表，之后可以用load直接加载而不必重新读历史"""
+        np.savez_compressed(path, dev_ids=np.asarray(self.dev_ids), demand=self.demand, contention=self.contention,
+                            opening=self.opening, slot_minutes=self.slot_minutes)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["dev_ids"].tolist(), data["demand"], data["contention"], int(data["opening"]),
+                   int(data["slot_minutes"]))
@@ -5,13 +5,34 @@ import random
 import time
 import urllib.parse
 from encryption import str_enc
+from http_client import site_url
+from metrics import METRICS
 from datetime import datetime, timedelta
 import os
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 
-def getCookieWithDirectLogin(username, password):
-    """直接HTTP登录方式获取cookie，无需打开浏览器"""
+def _login_pause(delay, timer=None):
+    """登录步骤之间的随机停顿，delay为(最短, 最长)秒数，为None时不停顿；停顿前结束timer中正在计时的步骤"""
+    if timer is not None:
+        timer.end()
+    if delay:
+        time.sleep(random.uniform(*delay))
+
+def getCookieWithDirectLogin(username, password, delay=(1, 2), base_url=None, scheme=None):
+    """直接HTTP登录方式获取cookie，无需打开浏览器
+    
+    Args:
+        username: 用户名
+        password: 密码
+        delay: 各登录步骤之间随机停顿的(最短, 最长)秒数，防止触发服务器风控；为None时不停顿
+        base_url, scheme: 预约系统地址，见http_client.site_url（CAS地址由预约系统的跳转决定）
+
+    各步骤的耗时（不含步骤之间的停顿）记录在metrics.METRICS的login_step1……login_step10阶段中
+    """
+    timer = METRICS.timer("login")
     try:
         # 禁用SSL警告
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -36,7 +57,7 @@ def getCookieWithDirectLogin(username, password):
             "Accept": "application/json, text/plain, */*",
             "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
             "Connection": "keep-alive",
-            "Referer": "http://libbooking.gzhu.edu.cn/",
+            "Referer": site_url("/", base_url, scheme),
             "Sec-Fetch-Dest": "empty",
             "Sec-Fetch-Mode": "cors",
             "Sec-Fetch-Site": "same-origin"
@@ -46,12 +67,13 @@ def getCookieWithDirectLogin(username, password):
         print("开始尝试直接登录...")
         
         # 步骤1: 访问图书馆主页获取初始Cookie
-        library_url = "http://libbooking.gzhu.edu.cn"
+        timer.begin("step1")
+        library_url = site_url("", base_url, scheme)
         response = session.get(library_url, verify=False)
         print(f"图书馆主页响应状态码: {response.status_code}")
         
         # 添加一个小延迟，防止服务器风控了
-        time.sleep(random.uniform(1, 2))
+        _login_pause(delay, timer)
         
         # 最大重试次数
         max_retries = 3
@@ -60,13 +82,14 @@ def getCookieWithDirectLogin(username, password):
         while retry_count < max_retries:
             try:
                 # 步骤2: 调用auth/address接口获取重定向URL
+                timer.begin("step2")
                 print(f"步骤2: 调用auth/address接口获取重定向URL (尝试 {retry_count+1}/{max_retries})...")
-                auth_address_url = "http://libbooking.gzhu.edu.cn/ic-web/auth/address"
+                auth_address_url = site_url("/ic-web/auth/address", base_url, scheme)
                 
                 # 添加必要的查询参数
                 params = {
-                    "finalAddress": "https://libbooking.gzhu.edu.cn/scancode.html#/transferPage?sta=1&sysid=1EW&lab=12&dev=100586871&msn=c9115f6e-f384-4641-a66b-e0982031239c",
-                    "errPageUrl": "https://libbooking.gzhu.edu.cn/scancode.html#/error",
+                    "finalAddress": site_url("/scancode.html#/transferPage?sta=1&sysid=1EW&lab=12&dev=100586871&msn=c9115f6e-f384-4641-a66b-e0982031239c", base_url, scheme, "https"),
+                    "errPageUrl": site_url("/scancode.html#/error", base_url, scheme, "https"),
                     "manager": "false",
                     "consoleType": "16"
                 }
@@ -87,6 +110,7 @@ def getCookieWithDirectLogin(username, password):
                     if retry_count < max_retries:
                         delay = random.uniform(3, 5)  # 增加随机延迟
                         print(f"等待 {delay:.1f} 秒后重试...")
+                        timer.end()
                         time.sleep(delay)
                     else:
                         print("❌ 无法从auth/address接口获取重定向URL")
@@ -97,6 +121,7 @@ def getCookieWithDirectLogin(username, password):
                 if retry_count < max_retries:
                     delay = random.uniform(3, 5)
                     print(f"等待 {delay:.1f} 秒后重试...")
+                    timer.end()
                     time.sleep(delay)
                 else:
                     print("❌ 调用auth/address接口失败")
@@ -108,9 +133,10 @@ def getCookieWithDirectLogin(username, password):
             return None
             
         # 添加一个小延迟
-        time.sleep(random.uniform(1, 2))
+        _login_pause(delay, timer)
         
         # 步骤3: 访问重定向URL触发CAS跳转
+        timer.begin("step3")
         print("步骤3: 访问重定向URL触发CAS跳转...")
         response = session.get(redirect_url, verify=False, allow_redirects=False)
         print(f"重定向响应状态码: {response.status_code}")
@@ -131,12 +157,13 @@ def getCookieWithDirectLogin(username, password):
             print(f"原始service参数: {original_service}")
         else:
             print("⚠️ 未在CAS URL中找到service参数")
-            original_service = "http://libbooking.gzhu.edu.cn/authcenter/doAuth"
+            original_service = site_url("/authcenter/doAuth", base_url, scheme)
         
         # 添加一个小延迟
-        time.sleep(random.uniform(1, 2))
+        _login_pause(delay, timer)
         
         # 步骤4: 获取CAS登录页面
+        timer.begin("step4")
         print("步骤4: 获取CAS登录页面...")
         response = session.get(cas_url, verify=False)
         print(f"CAS页面响应状态码: {response.status_code}")
@@ -157,9 +184,10 @@ def getCookieWithDirectLogin(username, password):
         print(f"获取到execution参数: {execution}")
         
         # 添加一个小延迟
-        time.sleep(random.uniform(1, 2))
+        _login_pause(delay, timer)
         
         # 步骤5: 准备登录数据
+        timer.begin("step5")
         print("步骤5: 准备登录数据...")
         # 构造加密内容
         combined = username + password + lt
@@ -179,6 +207,7 @@ def getCookieWithDirectLogin(username, password):
         }
         
         # 步骤6: 提交登录表单
+        timer.begin("step6")
         print("步骤6: 提交登录表单...")
         login_response = session.post(cas_url, data=login_data, verify=False, allow_redirects=False)
         print(f"登录响应状态码: {login_response.status_code}")
@@ -202,7 +231,7 @@ def getCookieWithDirectLogin(username, password):
                         correct_url += "?ticket=" + ticket
                 else:
                     # 如果original_service不是完整URL，构建一个
-                    correct_url = f"http://libbooking.gzhu.edu.cn{original_service}"
+                    correct_url = site_url(original_service, base_url, scheme)
                     if "?" in correct_url:
                         correct_url += "&ticket=" + ticket
                     else:
@@ -211,20 +240,22 @@ def getCookieWithDirectLogin(username, password):
                 print(f"构建的验证URL: {correct_url}")
                 
                 # 添加一个小延迟
-                time.sleep(random.uniform(1, 2))
+                _login_pause(delay, timer)
                 
                 # 步骤7: 访问正确的带ticket的URL
+                timer.begin("step7")
                 print("步骤7: 访问票据验证URL...")
                 ticket_response = session.get(correct_url, verify=False, allow_redirects=True)
                 print(f"票据验证响应状态码: {ticket_response.status_code}")
                 print(f"票据验证后URL: {ticket_response.url}")
                 
                 # 添加一个小延迟
-                time.sleep(random.uniform(1, 2))
+                _login_pause(delay, timer)
                 
                 # 步骤8: 访问首页确认登录成功
+                timer.begin("step8")
                 print("步骤8: 访问首页确认登录成功...")
-                final_url = "https://libbooking.gzhu.edu.cn/#/ic/home"
+                final_url = site_url("/#/ic/home", base_url, scheme, "https")
                 final_response = session.get(final_url, verify=False)
                 print(f"首页响应状态码: {final_response.status_code}")
                 
@@ -241,6 +272,7 @@ def getCookieWithDirectLogin(username, password):
                     
                     # 尝试访问预约信息API验证cookie有效性
                     print("步骤10: 验证cookie有效性...")
+                    timer.begin("step10")
                     try:
                         # 计算查询日期范围（前一天到后一天）
                         today = datetime.now()
@@ -259,7 +291,7 @@ def getCookieWithDirectLogin(username, password):
                         }
                         
                         # 使用相同的URL和参数方式
-                        check_url = "http://libbooking.gzhu.edu.cn/ic-web/reserve/resvInfo"
+                        check_url = site_url("/ic-web/reserve/resvInfo", base_url, scheme)
                         check_response = session.get(check_url, params=params, verify=False)
                         
                         if check_response.status_code == 200:
@@ -297,6 +329,8 @@ def getCookieWithDirectLogin(username, password):
         import traceback
         traceback.print_exc()
         return None
+    finally:
+        timer.end()
 
 def getCookieWithCASLogin(login_url, username, password):
     """
@@ -396,6 +430,171 @@ def getCookieWithCASLogin(login_url, username, password):
 
     return cookie_str
 
+def fetch_app_acc_no(cookie, base_url=None, scheme=None):
+    """用cookie请求userInfo接口获取appAccNo，失败返回None"""
+    try:
+        response = requests.get(
+            site_url("/ic-web/auth/userInfo", base_url, scheme),
+            headers={"Cookie": cookie, "Accept": "application/json, text/plain, */*"},
+            verify=False,
+            timeout=10,
+        )
+        data = response.json()
+        if data.get("code") in (0, "0") and isinstance(data.get("data"), dict):
+            return data["data"].get("accNo")
+    except Exception as e:
+        print(f"获取appAccNo失败: {str(e)}")
+    return None
+
+class CookieStore:
+    """按账号分别保存cookie和appAccNo，切换账号时无需重新登录"""
+    def __init__(self, store_file="cookies.json", cookie_lifetime=timedelta(hours=1)):
+        """初始化CookieStore，指定存储文件路径和cookie有效期"""
+        self.store_file = store_file
+        self.cookie_lifetime = cookie_lifetime
+        self._lock = threading.Lock()
+        self.entries = self.load()
+    
+    def load(self):
+        """从文件加载所有账号的cookie"""
+        if not os.path.exists(self.store_file):
+            return {}
+        try:
+            with open(self.store_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"加载cookie存储失败: {str(e)}")
+            return {}
+    
+    def _save(self):
+        try:
+            with open(self.store_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            return True
+        except Exception as e:
+            print(f"保存cookie存储失败: {str(e)}")
+            return False
+    
+    def save(self, username, cookie, app_acc_no=None):
+        """保存账号的cookie和appAccNo（可被多个登录线程同时调用）"""
+        with self._lock:
+            self.entries[username] = {
+                "cookie": cookie,
+                "app_acc_no": app_acc_no,
+                "timestamp": datetime.now().timestamp(),
+            }
+            return self._save()
+    
+    def get(self, username):
+        """获取账号保存的cookie数据，不存在返回None"""
+        with self._lock:
+            entry = self.entries.get(username)
+            return dict(entry) if entry else None
+    
+    def is_expired(self, entry):
+        """检查cookie数据是否已超过有效期"""
+        if not entry or "timestamp" not in entry:
+            return True
+        return datetime.now() - datetime.fromtimestamp(entry["timestamp"]) > self.cookie_lifetime
+    
+    def get_valid(self, username):
+        """获取账号未过期的cookie数据，没有或已过期返回None"""
+        entry = self.get(username)
+        return None if self.is_expired(entry) else entry
+    
+    def remove(self, username):
+        with self._lock:
+            if self.entries.pop(username, None) is not None:
+                return self._save()
+            return True
+
+class LoginPool:
+    """并发登录多个账号，结果写入CookieStore
+    
+    每个账号的登录由多次往返和防风控停顿组成，耗时主要在等待上，
+    因此用线程池同时登录多个账号，总耗时接近最慢的单个账号
+    
+    Args:
+        account_manager: AccountManager，提供账号密码
+        store: CookieStore（可选，默认新建）
+        parallelism: 同时登录的账号数上限
+        delay: 单个账号各登录步骤间的停顿，见getCookieWithDirectLogin
+        base_url, scheme: 预约系统地址，见getCookieWithDirectLogin
+    """
+    def __init__(self, account_manager, store=None, parallelism=4, delay=(1, 2), base_url=None, scheme=None):
+        self.account_manager = account_manager
+        self.store = store or CookieStore()
+        self.parallelism = parallelism
+        self.delay = delay
+        self.base_url = base_url
+        self.scheme = scheme
+    
+    def login_one(self, username, force=False):
+        """登录单个账号，cookie未过期且force为False时直接使用已保存的cookie
+        
+        Returns:
+            dict: username、success、cached（是否使用已保存的cookie）、seconds、cookie、app_acc_no、error
+        """
+        start = time.perf_counter()
+        result = {"username": username, "success": False, "cached": False, "seconds": 0.0,
+                  "cookie": None, "app_acc_no": None, "error": None}
+        entry = None if force else self.store.get_valid(username)
+        if entry:
+            result.update(success=True, cached=True, cookie=entry["cookie"], app_acc_no=entry.get("app_acc_no"))
+            return result
+        
+        account = self.account_manager.get_account(username)
+        if not account:
+            result["error"] = "账号不存在"
+            return result
+        try:
+            cookie = getCookieWithDirectLogin(username, account["password"], delay=self.delay,
+                                              base_url=self.base_url, scheme=self.scheme)
+            if cookie:
+                app_acc_no = fetch_app_acc_no(cookie, self.base_url, self.scheme)
+                self.store.save(username, cookie, app_acc_no)
+                result.update(success=True, cookie=cookie, app_acc_no=app_acc_no)
+            else:
+                result["error"] = "登录失败"
+        except Exception as e:
+            result["error"] = str(e)
+        result["seconds"] = time.perf_counter() - start
+        return result
+    
+    def login_all(self, usernames=None, force=False):
+        """并发登录多个账号
+        
+        Args:
+            usernames: 要登录的账号列表（可选，默认AccountManager中的所有账号）
+            force: 是否忽略已保存的cookie强制重新登录
+            
+        Returns:
+            (与usernames顺序一致的结果列表, 总耗时秒数)
+        """
+        if usernames is None:
+            usernames = [account["username"] for account in self.account_manager.list_accounts()]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.parallelism, len(usernames) or 1))) as executor:
+            results = list(executor.map(lambda username: self.login_one(username, force), usernames))
+        return results, time.perf_counter() - start
+    
+    @staticmethod
+    def format_report(results, wall_seconds):
+        """生成登录报告：每个账号的结果，以及并发总耗时与逐个登录耗时之和的对比"""
+        lines = []
+        for result in results:
+            if result["cached"]:
+                status = "使用已保存的cookie"
+            elif result["success"]:
+                status = f"登录成功 {result['seconds']:.1f} 秒"
+            else:
+                status = f"失败: {result['error']}"
+            lines.append(f"{result['username']}: {status}")
+        sequential = sum(result["seconds"] for result in results)
+        speedup = sequential / wall_seconds if wall_seconds > 0 else 0
+        lines.append(f"并发登录总耗时 {wall_seconds:.1f} 秒，逐个登录预计 {sequential:.1f} 秒，加速 {speedup:.1f} 倍")
+        return "\n".join(lines)
+
 if __name__ == "__main__":
     # 使用示例
     login_url = "http://libbooking.gzhu.edu.cn"
@@ -0,0 +1,703 @@
+"""
+无人值守预约守护进程
+从任务文件加载多个定时预约任务（账号、日期、房间、候选座位、时间段、开火时间），
+所有任务运行在同一个asyncio事件循环上，共享连接池、登录状态和服务器时钟同步结果；
+通过本地控制端口添加、查看和取消任务
+
+用法：
+    python daemon.py run --jobs jobs.json
+    python daemon.py add --account 学号 --date 0520 --room 2 --seats 203-013,3:305-001 --time 08:30-22:00 --fire-at 06:15
+    python daemon.py list
+    python daemon.py cancel 任务ID
+    python daemon.py run --jobs jobs.json --rules rules.json      # 同时按周期规则自动排程
+    python daemon.py plan --rules rules.json --jobs jobs.json     # 一次性展开周期规则写入任务文件
+    python daemon.py run --jobs jobs.json --metrics-port 9108     # 在 http://127.0.0.1:9108/metrics 提供Prometheus指标
+    python daemon.py metrics                                      # 查看各接口和各阶段的耗时
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from async_booking import AsyncLibraryBooking
+from contention import ContentionModel
+from cookie import AccountManager, CookieStore, getCookieWithCASLogin, getCookieWithDirectLogin
+from history import HistoryStore
+from http_client import AsyncPooledHTTPClient
+from jobs import (BookingJob, CANCELLED, DONE, FAILED, FINISHED_STATES, MISSED, PENDING, RUNNING,
+                  parse_fire_at)
+from logs import get_logger
+from metrics import METRICS
+from planner import WeeklyPlanner, load_rules
+from scheduler import FireScheduler
+from search import SeatSearch, room_floor
+from snapshot import LibrarySnapshot
+
+DEFAULT_CONTROL_PORT = 8765
+CONTENTION_REFRESH = 6 * 3600  # 座位竞争度模型的重建间隔（秒）
+SEAT_INFO_TTL = 30  # 合并座位信息请求的有效期（秒），之后的任务重新查询
+
+logger = get_logger("daemon")
+
+
+def log(message, job_id=None):
+    """带时间戳的日志输出，经后台线程写到终端，不阻塞事件循环"""
+    prefix = f"[{job_id}] " if job_id else ""
+    logger.info("%s %s%s", datetime.now().strftime('%H:%M:%S.%f')[:-3], prefix, message)
+
+
+class AccountSession:
+    """一个账号的登录状态，所有账号共用守护进程的连接池
+
+    同一账号的多个任务共用一个会话，登录由锁保护，同时到期的任务只会触发一次登录；
+    登录结果写入CookieStore，守护进程重启或交互脚本登录过的账号可以直接复用
+    """
+    def __init__(self, username, password, client, debug=False, store=None, base_url=None, scheme=None):
+        self.username = username
+        self.password = password
+        self.store = store
+        self.core = AsyncLibraryBooking(client=client, base_url=base_url, scheme=scheme)
+        self.core.debug = debug
+        self.logged_in_at = None  # 最近一次登录成功的时间戳
+        self._lock = asyncio.Lock()
+
+    def _login(self):
+        # 登录流程基于requests，在线程池中执行以免阻塞事件循环
+        cookie = getCookieWithDirectLogin(self.username, self.password, base_url=self.core.base_url,
+                                          scheme=self.core.scheme)
+        if not cookie:
+            cookie = getCookieWithCASLogin(self.core.url("", "http"), self.username, self.password)
+        return cookie
+
+    async def ensure_cookie(self, max_age):
+        """确保cookie在max_age秒内刷新过，否则重新登录
+
+        Returns:
+            是否持有有效cookie
+        """
+        async with self._lock:
+            if self.logged_in_at is not None and time.time() - self.logged_in_at < max_age:
+                return True
+            entry = self.store.get(self.username) if self.store else None
+            if entry and time.time() - entry["timestamp"] < max_age:
+                self.core.set_cookie(entry["cookie"])
+                self.core.app_acc_no = entry.get("app_acc_no") or await self.core.get_person_appAccNo()
+                if self.core.app_acc_no:
+                    self.logged_in_at = entry["timestamp"]
+                    return True
+            cookie = await asyncio.get_running_loop().run_in_executor(None, self._login)
+            if not cookie:
+                return False
+            self.core.set_cookie(cookie)
+            self.core.app_acc_no = None
+            await self.core.get_person_appAccNo()
+            self.logged_in_at = time.time()
+            if self.store:
+                self.store.save(self.username, cookie, self.core.app_acc_no)
+            return True
+
+
+class BookingDaemon:
+    """在一个事件循环中运行所有预约任务
+
+    Args:
+        jobs_file: 任务文件路径，任务状态变化时写回该文件
+        accounts_file: 账号文件路径
+        pool_size: 共享连接池大小
+        port: 本地控制端口（只监听127.0.0.1）
+        refresh_lead: 提前多少秒刷新登录状态并解析座位
+        prearm_seconds: 提前多少秒预热连接
+        debug: 是否输出调试信息
+        rules_file: 周期规则文件（可选），守护进程运行期间定期按规则增量排程
+        horizon_days: 周期规则的规划窗口天数，开火时间早于这么多天前的已结束任务会被清理
+        history_file: 座位占用历史数据库（可选），所有账号查询到的座位变化都写入其中
+        base_url, scheme: 预约系统地址，见AsyncLibraryBooking（可指向本地fake_server）
+        metrics_port: Prometheus指标的HTTP端口（只监听127.0.0.1），为None时不开启
+    """
+    def __init__(self, jobs_file="jobs.json", accounts_file="accounts.json", pool_size=200,
+                 port=DEFAULT_CONTROL_PORT, refresh_lead=600, prearm_seconds=5, debug=False,
+                 rules_file=None, horizon_days=7, history_file=None, base_url=None, scheme=None,
+                 metrics_port=None):
+        self.jobs_file = jobs_file
+        self.rules_file = rules_file
+        self.planner = WeeklyPlanner(horizon_days)
+        self.account_manager = AccountManager(accounts_file)
+        self.cookie_store = CookieStore()
+        self.client = AsyncPooledHTTPClient(pool_size=pool_size)
+        self.port = port
+        self.metrics_port = metrics_port
+        self.base_url = base_url
+        self.scheme = scheme
+        self.refresh_lead = refresh_lead
+        self.prearm_seconds = prearm_seconds
+        self.debug = debug
+        self.fire_scheduler = FireScheduler()
+        self.history = HistoryStore(history_file) if history_file else None
+        self._contention = None  # ContentionModel
+        self._contention_built_at = 0.0
+        self.jobs = {}  # job_id -> BookingJob
+        self.sessions = {}  # username -> AccountSession
+        self.rooms_info = None
+        self._tasks = {}  # job_id -> asyncio.Task
+        self._seat_requests = {}  # (date, room_id) -> (asyncio.Task, 发起时刻)，同时解析的任务只请求一次
+        self._clock_sync = None
+        self._clock_synced_at = 0.0
+        self._clock_lock = None
+        self._stopped = None
+        self._rules = []
+        self._rules_mtime = None
+        self._plan_task = None
+
+    # ---------- 任务文件 ----------
+
+    def load_jobs(self):
+        """从任务文件加载任务，文件内容为任务字典列表"""
+        if not os.path.exists(self.jobs_file):
+            return []
+        try:
+            with open(self.jobs_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            log(f"\033[31m加载任务文件失败: {str(e)}\033[0m")
+            return []
+        jobs = []
+        for item in data.get("jobs", []) if isinstance(data, dict) else data:
+            try:
+                jobs.append(BookingJob.from_dict(item))
+            except (KeyError, ValueError, TypeError) as e:
+                log(f"\033[33m[WARNING] 忽略无效任务 {item}: {str(e)}\033[0m")
+        return jobs
+
+    def save_jobs(self):
+        """把所有任务及其状态写回任务文件"""
+        try:
+            with open(self.jobs_file, "w", encoding="utf-8") as f:
+                json.dump([job.to_dict() for job in self.jobs.values()], f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            log(f"\033[31m保存任务文件失败: {str(e)}\033[0m")
+
+    # ---------- 任务管理 ----------
+
+    def add_job(self, job):
+        """登记任务并为未完成的任务创建协程"""
+        self.jobs[job.job_id] = job
+        if job.status not in FINISHED_STATES:
+            job.status = PENDING
+            self._tasks[job.job_id] = asyncio.ensure_future(self._run_job(job))
+        return job
+
+    def cancel_job(self, job_id):
+        """取消任务，返回是否找到了未完成的任务"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return False
+        task = self._tasks.pop(job_id, None)
+        if task is not None:
+            task.cancel()
+        job.status = CANCELLED
+        self.save_jobs()
+        log("任务已取消", job_id)
+        return True
+
+    def list_jobs(self):
+        return [job.to_dict() for job in sorted(self.jobs.values(), key=lambda job: job.fire_at)]
+
+    # ---------- 周期规则 ----------
+
+    def apply_plan(self, added, removed, schedule=True):
+        """应用规划器给出的增量：移除未执行的旧任务，登记新任务（已结束的同ID任务不会被覆盖）
+
+        Args:
+            schedule: 是否立即为新任务创建协程，一次性规划时为False
+        """
+        for job_id in removed:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status not in FINISHED_STATES:
+                task = self._tasks.pop(job_id, None)
+                if task is not None:
+                    task.cancel()
+                del self.jobs[job_id]
+        for job in added:
+            old = self.jobs.get(job.job_id)
+            if old is not None:
+                if old.status in FINISHED_STATES:
+                    continue
+                task = self._tasks.pop(job.job_id, None)
+                if task is not None:
+                    task.cancel()
+            if schedule:
+                self.add_job(job)
+            else:
+                self.jobs[job.job_id] = job
+        if added or removed:
+            self.save_jobs()
+            log(f"周期规则已更新: 新增/替换 {len(added)} 个任务, 移除 {len(removed)} 个任务")
+
+    def reload_rules(self, force=False, schedule=True):
+        """重新读取规则文件并增量排程；文件未修改时只补充新进入规划窗口的日期
+
+        Returns:
+            (added, removed)
+        """
+        if not self.rules_file or not os.path.exists(self.rules_file):
+            return [], []
+        mtime = os.path.getmtime(self.rules_file)
+        rules = load_rules(self.rules_file) if force or mtime != self._rules_mtime else self._rules
+        self._rules, self._rules_mtime = rules, mtime
+        added, removed = self.planner.update(rules)
+        self.apply_plan(added, removed, schedule)
+        return added, removed
+
+    def prune_jobs(self, now=None):
+        """清理开火时间在规划窗口（horizon_days天）之前的已结束任务，任务文件和规划器中都不再保留
+
+        Returns:
+            清理的任务ID列表
+        """
+        before = (now or datetime.now()) - timedelta(days=self.planner.horizon_days)
+        stale = [job_id for job_id, job in self.jobs.items() if job.expired(before)]
+        for job_id in stale:
+            del self.jobs[job_id]
+            self._tasks.pop(job_id, None)
+        self.planner.prune(before)
+        if stale:
+            self.save_jobs()
+            log(f"已清理 {len(stale)} 个 {self.planner.horizon_days} 天前结束的任务")
+        return stale
+
+    async def _plan_loop(self, interval=60):
+        while True:
+            try:
+                self.reload_rules()
+            except Exception as e:
+                log(f"\033[31m处理周期规则失败: {str(e)}\033[0m")
+            self.prune_jobs()
+            await asyncio.sleep(interval)
+
+    # ---------- 共享资源 ----------
+
+    def get_session(self, username):
+        """获取账号会话，不存在时按accounts.json中的密码创建"""
+        session = self.sessions.get(username)
+        if session is None:
+            account = self.account_manager.get_account(username)
+            if not account:
+                return None
+            session = AccountSession(username, account["password"], self.client, self.debug, self.cookie_store,
+                                     self.base_url, self.scheme)
+            if self.history:
+                self.history.attach(session.core.store)
+            self.sessions[username] = session
+        return session
+
+    async def get_rooms_info(self, session):
+        """房间信息对所有账号相同，只请求一次"""
+        if not self.rooms_info:
+            self.rooms_info = await session.core.get_rooms_info()
+            if self.rooms_info and self.history:
+                self.history.record_rooms(self.rooms_info)
+        session.core.rooms_info = self.rooms_info or {}
+        return self.rooms_info
+
+    async def get_seats_info(self, session, date_str, room_id):
+        """获取座位信息，SEAT_INFO_TTL秒内同一日期和房间的请求合并为一次，过期的结果随即丢弃"""
+        now = time.monotonic()
+        for stale in [key for key, (task, created) in self._seat_requests.items()
+                      if task.done() and now - created > SEAT_INFO_TTL]:
+            del self._seat_requests[stale]
+        key = (date_str, room_id)
+        task, _ = self._seat_requests.get(key, (None, None))
+        if task is None or (task.done() and task.result() is None):
+            task = asyncio.ensure_future(session.core.get_seats_info(date_str, room_id))
+            self._seat_requests[key] = (task, now)
+        return await asyncio.shield(task)
+
+    async def get_clock_sync(self, session, max_age=60):
+        """所有任务访问同一服务器，时钟偏差在max_age秒内复用"""
+        async with self._clock_lock:
+            if self._clock_sync is None or time.time() - self._clock_synced_at > max_age:
+                self._clock_sync = await session.core.sync_server_clock()
+                self._clock_synced_at = time.time()
+                log(f"服务器时钟同步: {self._clock_sync}")
+            return self._clock_sync
+
+    async def resolve_candidates(self, session, job):
+        """把任务的座位号列表解析为race_candidates使用的Seat列表"""
+        rooms_info = await self.get_rooms_info(session)
+        if not rooms_info or job.room not in rooms_info:
+            return []
+
+        wanted = []
+        for item in job.seats:
+            room_number, _, name = item.rpartition(":")
+            room_number = room_number or job.room
+            if room_number not in rooms_info:
+                log(f"\033[33m[WARNING] 未找到房间 {room_number}，已忽略 {item}\033[0m", job.job_id)
+                continue
+            wanted.append((room_number, name))
+
+        room_numbers = list(dict.fromkeys(room_number for room_number, _ in wanted))
+        seats_by_room = await asyncio.gather(*(self.get_seats_info(session, job.date, rooms_info[room_number]["id"])
+                                               for room_number in room_numbers))
+        seats_by_room = dict(zip(room_numbers, seats_by_room))
+
+        candidates = []
+        for room_number, name in wanted:
+            seat = (seats_by_room.get(room_number) or {}).get(name)
+            if seat is None:
+                log(f"\033[33m[WARNING] 房间 {rooms_info[room_number]['name']} 中未找到座位 {name}\033[0m", job.job_id)
+                continue
+            candidates.append(seat.with_room(rooms_info[room_number]["name"]))
+        if job.auto_fill:
+            candidates.extend(await self.search_candidates(session, job, candidates))
+        model = await self.get_contention_model()
+        if model is not None and len(candidates) > 2:
+            ranked = model.rank(candidates, job.date, job.start, job.end)
+            if ranked != candidates:
+                log(f"按历史竞争度调整备选顺序: {', '.join(seat.name for seat in ranked[1:])}", job.job_id)
+            candidates = ranked
+        return candidates
+
+    async def get_contention_model(self):
+        """由占用历史建立的座位竞争度模型，每隔CONTENTION_REFRESH秒重建一次；未记录历史或历史中还没有数据时返回None"""
+        if self.history is None:
+            return None
+        if self._contention is None or time.time() - self._contention_built_at > CONTENTION_REFRESH:
+            # 读历史和建表在线程池中进行，不阻塞其他任务
+            self._contention = await asyncio.get_running_loop().run_in_executor(
+                None, ContentionModel.from_history, self.history)
+            self._contention_built_at = time.time()
+            if self._contention.empty:
+                log("占用历史中还没有查询记录，暂不按竞争度调整备选顺序")
+        return None if self._contention.empty else self._contention
+
+    async def search_candidates(self, session, job, candidates):
+        """在任务房间及同楼层的房间中搜索job.auto_fill个补充候选座位，离已指定的座位越近越好"""
+        rooms_info = self.rooms_info
+        floor = room_floor(job.room)
+        room_numbers = [number for number in rooms_info if number == job.room or room_floor(number) == floor]
+        snapshot = LibrarySnapshot(rooms_info)
+        rooms = await asyncio.gather(*(self.get_seats_info(session, job.date, rooms_info[number]["id"])
+                                       for number in room_numbers))
+        for number, room in zip(room_numbers, rooms):
+            snapshot.add(job.date, number, room, 0.0)
+        results = SeatSearch(snapshot).search(job.date, job.start, job.end, k=job.auto_fill,
+                                              preferred_rooms=[job.room], preferred_floors=[floor],
+                                              favourites=[seat.name for seat in candidates],
+                                              exclude={seat.name for seat in candidates})
+        if results:
+            log(f"自动补充候选座位: {', '.join(item['seat'].name for item in results)}", job.job_id)
+        return [item["seat"] for item in results]
+
+    # ---------- 任务执行 ----------
+
+    @staticmethod
+    async def sleep_until(timestamp):
+        """睡眠到墙上时间timestamp，分段睡眠以跟上系统时间的调整"""
+        while True:
+            remaining = timestamp - time.time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, 30))
+
+    def _finish(self, job, status, message, result=None):
+        job.status = status
+        job.message = message
+        job.result = result
+        self._tasks.pop(job.job_id, None)
+        self.save_jobs()
+        color = "\033[32m" if status == DONE else "\033[31m"
+        log(f"{color}{message}\033[0m", job.job_id)
+
+    async def _run_job(self, job):
+        fire_ts = job.fire_at.timestamp()
+        if time.time() > fire_ts + 60:
+            self._finish(job, MISSED, "开火时间已过")
+            return
+        try:
+            log(f"已排程: {job.account} {job.date} {job.start}-{job.end} 座位 {','.join(job.seats)}, "
+                f"开火时间 {job.fire_at.strftime('%Y-%m-%d %H:%M:%S')}", job.job_id)
+
+            # 开火前refresh_lead秒：刷新登录状态并解析座位
+            await self.sleep_until(fire_ts - self.refresh_lead)
+            job.status = RUNNING
+            session = self.get_session(job.account)
+            if session is None:
+                self._finish(job, FAILED, f"accounts.json中没有账号 {job.account}")
+                return
+            if not await session.ensure_cookie(self.refresh_lead):
+                self._finish(job, FAILED, "登录失败")
+                return
+            candidates = await self.resolve_candidates(session, job)
+            if not candidates:
+                self._finish(job, FAILED, "没有可用的候选座位")
+                return
+            time_periods = job.periods or session.core.split_time_periods(job.start, job.end)
+            if not time_periods:
+                self._finish(job, FAILED, "预约时间段无效")
+                return
+            # 账号和座位都已确定，提前构建好所有预约请求体
+            cookie = session.core.cookie
+            prepared = await session.core.prepare_candidates(candidates, time_periods, job.date)
+
+            # 开火前prearm_seconds秒：预热连接、同步服务器时钟
+            await self.sleep_until(fire_ts - self.prearm_seconds)
+            await session.core.warm_up(max(1, min(job.parallelism, len(candidates))) * len(time_periods))
+            if session.core.cookie != cookie:
+                # 期间其他任务刷新了该账号的登录状态，请求头中的cookie需要更新
+                prepared = await session.core.prepare_candidates(candidates, time_periods, job.date)
+            clock_sync = await self.get_clock_sync(session)
+
+            race = await self.fire_scheduler.fire_at_async(
+                fire_ts,
+                lambda: session.core.race_candidates(candidates, time_periods, job.date, prepared=prepared,
+                                                     parallelism=job.parallelism),
+                sync=clock_sync,
+            )
+            summary = {
+                "success": race["success"],
+                "partial": race["partial"],
+                "rank": race["rank"],
+                "seat": race["seat"].name if race["seat"] else None,
+                "room": race["seat"].room_name if race["seat"] else None,
+                "time_to_success_ms": race["time_to_success_ms"],
+                "periods": [[item["start"], item["end"], item["success"]] for item in race["periods"]],
+                "cancelled": [list(item) for item in race["cancelled"]],
+            }
+            if race["success"]:
+                self._finish(job, DONE, f"预约成功: {summary['room']} {summary['seat']} (排名#{race['rank']}, "
+                                        f"{race['time_to_success_ms']:.1f} ms)", summary)
+            elif race["partial"]:
+                booked = sum(item["success"] for item in race["periods"])
+                self._finish(job, FAILED, f"部分成功: {summary['room']} {summary['seat']} 只预约到 "
+                                          f"{booked}/{len(time_periods)} 个时间段", summary)
+            else:
+                self._finish(job, FAILED, "所有候选座位均预约失败", summary)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._finish(job, FAILED, f"任务异常: {str(e)}")
+
+    # ---------- 控制端口 ----------
+
+    async def handle_command(self, command):
+        """处理一条控制命令，返回响应字典"""
+        cmd = command.get("cmd")
+        if cmd == "list":
+            return {"ok": True, "jobs": self.list_jobs()}
+        if cmd == "add":
+            try:
+                job = BookingJob.from_dict(command["job"])
+            except (KeyError, ValueError, TypeError) as e:
+                return {"ok": False, "error": f"无效任务: {str(e)}"}
+            if job.job_id in self.jobs:
+                return {"ok": False, "error": f"任务ID {job.job_id} 已存在"}
+            self.add_job(job)
+            self.save_jobs()
+            return {"ok": True, "job": job.to_dict()}
+        if cmd == "cancel":
+            if self.cancel_job(command.get("id")):
+                return {"ok": True}
+            return {"ok": False, "error": "任务不存在或已结束"}
+        if cmd == "reload":
+            added, removed = self.reload_rules(force=True)
+            return {"ok": True, "added": [job.job_id for job in added], "removed": removed}
+        if cmd == "metrics":
+            return {"ok": True, "metrics": METRICS.snapshot(), "report": METRICS.format_report()}
+        if cmd == "stop":
+            self._stopped.set()
+            return {"ok": True}
+        return {"ok": False, "error": f"未知命令: {cmd}"}
+
+    async def _handle_connection(self, reader, writer):
+        # 每行一条JSON命令，每条命令回复一行JSON
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.handle_command(json.loads(line))
+                except ValueError:
+                    response = {"ok": False, "error": "命令不是有效的JSON"}
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _handle_metrics(self, reader, writer):
+        # 只实现Prometheus抓取需要的最简HTTP：GET /metrics 返回文本格式，GET /metrics.json 返回JSON
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else "/"
+            if path == "/metrics":
+                status, content_type, body = "200 OK", "text/plain; version=0.0.4; charset=utf-8", \
+                    METRICS.format_prometheus()
+            elif path == "/metrics.json":
+                status, content_type, body = "200 OK", "application/json; charset=utf-8", METRICS.to_json()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", "not found\n"
+            payload = body.encode("utf-8")
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+                         f"Connection: close\r\n\r\n".encode("latin-1") + payload)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """加载任务文件、启动控制端口并运行到收到stop命令"""
+        self._clock_lock = asyncio.Lock()
+        self._stopped = asyncio.Event()
+        for job in self.load_jobs():
+            self.add_job(job)
+        self.planner.seed(self.jobs.values())
+        self.save_jobs()
+        # 没有规则文件时也定期清理已结束的旧任务
+        self._plan_task = asyncio.ensure_future(self._plan_loop())
+
+        server = await asyncio.start_server(self._handle_connection, "127.0.0.1", self.port)
+        log(f"守护进程已启动，已加载 {len(self.jobs)} 个任务，控制端口 127.0.0.1:{self.port}")
+        metrics_server = None
+        if self.metrics_port is not None:
+            metrics_server = await asyncio.start_server(self._handle_metrics, "127.0.0.1", self.metrics_port)
+            log(f"Prometheus指标: http://127.0.0.1:{metrics_server.sockets[0].getsockname()[1]}/metrics")
+        try:
+            await self._stopped.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            if metrics_server is not None:
+                metrics_server.close()
+                await metrics_server.wait_closed()
+            if self._plan_task is not None:
+                self._plan_task.cancel()
+            for task in list(self._tasks.values()):
+                task.cancel()
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            await self.client.close()
+            if self.history:
+                self.history.close()
+            log("守护进程已停止")
+
+
+def send_command(command, port=DEFAULT_CONTROL_PORT, timeout=10):
+    """向运行中的守护进程发送一条控制命令并返回响应"""
+    with socket.create_connection(("127.0.0.1", port), timeout=timeout) as conn:
+        conn.sendall(json.dumps(command, ensure_ascii=False).encode("utf-8") + b"\n")
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data)
+
+
+def print_jobs(jobs):
+    if not jobs:
+        print("没有任务")
+        return
+    for job in jobs:
+        print(f"{job['id']}  {job['status']:<9} {job['fire_at']}  {job['account']}  {job['date']} "
+              f"{job['start']}-{job['end']}  房间{job['room']} 座位 {','.join(job['seats'])}  {job['message']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图书馆座位预约守护进程")
+    parser.add_argument("--port", type=int, default=DEFAULT_CONTROL_PORT, help="本地控制端口")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="启动守护进程")
+    run_parser.add_argument("--jobs", default="jobs.json", help="任务文件")
+    run_parser.add_argument("--accounts", default="accounts.json", help="账号文件")
+    run_parser.add_argument("--pool-size", type=int, default=200, help="共享连接池大小")
+    run_parser.add_argument("--debug", action="store_true", help="输出调试信息")
+    run_parser.add_argument("--rules", help="周期规则文件")
+    run_parser.add_argument("--horizon", type=int, default=7, help="周期规则规划天数，也是已结束任务的保留天数")
+    run_parser.add_argument("--history", default=None, help="座位占用历史数据库（如history.db），不设置则不记录")
+    run_parser.add_argument("--base-url", help="预约系统主机名（可带端口），如本地fake_server的127.0.0.1:8000")
+    run_parser.add_argument("--scheme", choices=("http", "https"), help="强制使用的协议")
+    run_parser.add_argument("--metrics-port", type=int, help="Prometheus指标的HTTP端口，不设置则不开启")
+
+    plan_parser = subparsers.add_parser("plan", help="一次性展开周期规则并写入任务文件")
+    plan_parser.add_argument("--rules", required=True, help="周期规则文件")
+    plan_parser.add_argument("--jobs", default="jobs.json", help="任务文件")
+    plan_parser.add_argument("--horizon", type=int, default=7, help="规划天数")
+
+    add_parser = subparsers.add_parser("add", help="添加任务")
+    add_parser.add_argument("--account", required=True, help="账号（学号）")
+    add_parser.add_argument("--date", required=True, help="预约日期 MMDD")
+    add_parser.add_argument("--room", required=True, help="房间编号")
+    add_parser.add_argument("--seats", required=True, help="按优先级用逗号分隔的座位号，其他房间写 房间编号:座位号")
+    add_parser.add_argument("--time", required=True, help="预约时间段 HH:MM-HH:MM")
+    add_parser.add_argument("--fire-at", required=True, help="开火时间 HH:MM[:SS] 或 'YYYY-MM-DD HH:MM:SS'")
+    add_parser.add_argument("--parallelism", type=int, default=2, help="同时尝试的候选座位数")
+    add_parser.add_argument("--auto-fill", type=int, default=0, help="从本房间和同楼层自动补充的备选座位数")
+
+    subparsers.add_parser("list", help="列出任务")
+    cancel_parser = subparsers.add_parser("cancel", help="取消任务")
+    cancel_parser.add_argument("id", help="任务ID")
+    subparsers.add_parser("reload", help="重新读取周期规则")
+    metrics_parser = subparsers.add_parser("metrics", help="查看各接口和各阶段的耗时")
+    metrics_parser.add_argument("--json", action="store_true", help="输出JSON")
+    subparsers.add_parser("stop", help="停止守护进程")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        daemon = BookingDaemon(args.jobs, args.accounts, args.pool_size, args.port, debug=args.debug,
+                               rules_file=args.rules, horizon_days=args.horizon, history_file=args.history,
+                               base_url=args.base_url, scheme=args.scheme, metrics_port=args.metrics_port)
+        try:
+            asyncio.run(daemon.serve())
+        except KeyboardInterrupt:
+            print("\n守护进程被用户中断")
+        return
+
+    if args.command == "plan":
+        daemon = BookingDaemon(args.jobs, rules_file=args.rules, horizon_days=args.horizon)
+        daemon.jobs = {job.job_id: job for job in daemon.load_jobs()}
+        daemon.planner.seed(daemon.jobs.values())
+        daemon.prune_jobs()
+        daemon.reload_rules(force=True, schedule=False)
+        print_jobs([job.to_dict() for job in daemon.planner.jobs()])
+        return
+
+    if args.command == "add":
+        start, end = [part.strip() for part in args.time.split("-")]
+        # 开火时间在客户端解析为绝对时间，避免守护进程重启后漂移到第二天
+        command = {"cmd": "add", "job": {
+            "account": args.account, "date": args.date, "room": args.room, "seats": args.seats,
+            "start": start, "end": end, "parallelism": args.parallelism, "auto_fill": args.auto_fill,
+            "fire_at": parse_fire_at(args.fire_at).strftime("%Y-%m-%d %H:%M:%S"),
+        }}
+    elif args.command == "cancel":
+        command = {"cmd": "cancel", "id": args.id}
+    else:
+        command = {"cmd": args.command}
+
+    try:
+        response = send_command(command, args.port)
+    except OSError as e:
+        print(f"\033[31m[ERROR] 无法连接守护进程: {str(e)}\033[0m")
+        return
+
+    if not response.get("ok"):
+        print(f"\033[31m[ERROR] {response.get('error')}\033[0m")
+    elif args.command == "list":
+        print_jobs(response["jobs"])
+    elif args.command == "add":
+        print(f"已添加任务 {response['job']['id']}，开火时间 {response['job']['fire_at']}")
+    elif args.command == "metrics":
+        print(json.dumps(response["metrics"], ensure_ascii=False, indent=2) if args.json else response["report"])
+    else:
+        print("完成")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,16 @@
 """
 CAS登录DES加密算法
 用于加密账号密码提交请求
+
+str_enc使用64位整数实现：置换和S盒都预先展开成查表（SP表），密钥编排按密钥缓存；
+下方按位列表实现的函数保留为参考实现（str_enc_reference），整数实现的置换表也由它们推导得到
+
+自检（两种实现都与固定向量比对，不一致时以非零状态退出）:
+    python -m encryption --selftest
 """
+import argparse
+import sys
+from functools import lru_cache
 
 def generate_keys(key_byte):
     key = [0] * 56
@@ -238,9 +247,9 @@ def get_key_bytes(key):
     
     return key_bytes
 
-def str_enc(data, first_key, second_key, third_key):
+def str_enc_reference(data, first_key, second_key, third_key):
     """
-    实现JavaScript版本的strEnc加密函数
+    实现JavaScript版本的strEnc加密函数（按位列表的参考实现）
     
     Args:
         data: 要加密的数据
@@ -355,4 +364,204 @@ def str_enc(data, first_key, second_key, third_key):
                 
                 enc_data += bt64_to_hex(enc_byte)
     
-    return enc_data 
\ No newline at end of file
+    return enc_data 
+
+
+# ---------- 64位整数实现 ----------
+
+def _bits_to_int(bits):
+    """位列表（第0位为最高位）转整数"""
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bit
+    return value
+
+def _unit(size, index):
+    bits = [0] * size
+    bits[index] = 1
+    return bits
+
+def _selection(func, in_size):
+    """推导按位选择函数func的选择表：输出第i位 = 输入第table[i]位"""
+    out_size = len(func([0] * in_size))
+    table = [None] * out_size
+    for index in range(in_size):
+        for position, bit in enumerate(func(_unit(in_size, index))):
+            if bit:
+                table[position] = index
+    return table
+
+def _byte_tables(table, in_size=64):
+    """把选择表展开为按输入字节查表：输出 = OR(tables[k][第k个输入字节])"""
+    out_size = len(table)
+    masks = [0] * in_size  # 输入第index位为1时对输出的贡献
+    for position, index in enumerate(table):
+        if index is not None:
+            masks[index] |= 1 << (out_size - 1 - position)
+    tables = []
+    for k in range(in_size // 8):
+        entries = [0] * 256
+        for value in range(1, 256):
+            low = value & -value
+            entries[value] = entries[value ^ low] | masks[k * 8 + 8 - low.bit_length()]
+        tables.append(entries)
+    return tables
+
+def _permute(value, tables):
+    out = 0
+    for k, entries in enumerate(tables):
+        out |= entries[(value >> (56 - 8 * k)) & 0xFF]
+    return out
+
+_IP_TABLES = _byte_tables(_selection(init_permute, 64))
+_FP_TABLES = _byte_tables(_selection(finally_permute, 64))
+
+def _build_sp_tables():
+    """SP表：sp[m][六位输入] = 第m个S盒的输出经P置换后的32位值"""
+    p_table = _selection(p_permute, 32)
+    tables = []
+    for m in range(8):
+        entries = []
+        for value in range(64):
+            # P置换是按位线性的，可以把各S盒的4位输出分别置换后再按位或起来
+            expand_byte = [0] * 48
+            for n in range(6):
+                expand_byte[m * 6 + n] = (value >> (5 - n)) & 1
+            nibble = s_box_permute(expand_byte)[m * 4:m * 4 + 4]
+            s_box_byte = [0] * 32
+            s_box_byte[m * 4:m * 4 + 4] = nibble
+            entries.append(_bits_to_int([s_box_byte[index] for index in p_table]))
+        tables.append(entries)
+    return tables
+
+_SP_TABLES = _build_sp_tables()
+
+def _key_selections():
+    """推导16轮子密钥的选择表：第i轮子密钥第m位 = 密钥第tables[i][m]位"""
+    tables = [[None] * 48 for _ in range(16)]
+    for index in range(64):
+        for i, subkey in enumerate(generate_keys(_unit(64, index))):
+            for position, bit in enumerate(subkey):
+                if bit:
+                    tables[i][position] = index
+    return tables
+
+_KEY_SELECTIONS = _key_selections()
+
+def _key_block(text):
+    """把最多4个字符转为64位整数，每个字符占16位，不足4个字符时补0（与str_to_bt一致）"""
+    value = 0
+    for i in range(4):
+        value = (value << 16) | (ord(text[i]) & 0xFFFF if i < len(text) else 0)
+    return value
+
+def _round_keys(block):
+    """计算一个64位密钥块的16轮子密钥，每轮为8个6位分组"""
+    key_bits = [(block >> (63 - i)) & 1 for i in range(64)]
+    schedule = []
+    for selection in _KEY_SELECTIONS:
+        subkey = _bits_to_int([key_bits[index] for index in selection])
+        schedule.append(tuple((subkey >> (42 - 6 * m)) & 0x3F for m in range(8)))
+    return tuple(schedule)
+
+@lru_cache(maxsize=64)
+def key_schedules(key):
+    """按get_key_bytes的方式把密钥切成4字符一块，返回每块的子密钥编排（按密钥缓存）"""
+    return tuple(_round_keys(_key_block(key[i:i + 4])) for i in range(0, len(key), 4))
+
+def enc_block(block, schedule):
+    """用一个密钥块的子密钥加密一个64位整数分组，与enc的结果一致"""
+    sp0, sp1, sp2, sp3, sp4, sp5, sp6, sp7 = _SP_TABLES
+    value = _permute(block, _IP_TABLES)
+    left = value >> 32
+    right = value & 0xFFFFFFFF
+    for k0, k1, k2, k3, k4, k5, k6, k7 in schedule:
+        # 扩展置换：第m组取右半部分第4m-1到4m+4位（首尾循环）
+        extended = ((right & 1) << 33) | (right << 1) | (right >> 31)
+        left, right = right, left ^ (
+            sp0[((extended >> 28) & 0x3F) ^ k0] | sp1[((extended >> 24) & 0x3F) ^ k1] |
+            sp2[((extended >> 20) & 0x3F) ^ k2] | sp3[((extended >> 16) & 0x3F) ^ k3] |
+            sp4[((extended >> 12) & 0x3F) ^ k4] | sp5[((extended >> 8) & 0x3F) ^ k5] |
+            sp6[((extended >> 4) & 0x3F) ^ k6] | sp7[(extended & 0x3F) ^ k7]
+        )
+    return _permute((right << 32) | left, _FP_TABLES)
+
+def str_enc(data, first_key, second_key, third_key):
+    """
+    实现JavaScript版本的strEnc加密函数，输出与str_enc_reference逐字节相同
+    
+    Args:
+        data: 要加密的数据
+        first_key: 第一个密钥
+        second_key: 第二个密钥
+        third_key: 第三个密钥
+        
+    Returns:
+        加密后的十六进制字符串
+    """
+    # 与原实现相同：只有前面的密钥都存在时，后面的密钥才参与加密
+    schedules = ()
+    if first_key:
+        schedules += key_schedules(first_key)
+        if second_key:
+            schedules += key_schedules(second_key)
+            if third_key:
+                schedules += key_schedules(third_key)
+    
+    parts = []
+    for i in range(0, len(data), 4):
+        block = _key_block(data[i:i + 4])
+        for schedule in schedules:
+            block = enc_block(block, schedule)
+        parts.append("%016X" % block)
+    return "".join(parts)
+
+
+# 固定的 (明文, 密钥1, 密钥2, 密钥3, 密文)，由原按位列表实现生成
+GOLDEN_VECTORS = [
+    ("", "1", "2", "3", ""),
+    ("a", "1", "2", "3", "A62B4F77D5F8C6C7"),
+    ("abc", "1", "2", "3", "39644174795FB4D0"),
+    ("abcd", "1", "2", "3", "A9CF2704230383D1"),
+    ("3200000001", "1", "2", "3", "F7C89C8BB565EC4C315CB4B8654EACF21BDC705FD7525DC8"),
+    ("3200000001Passw0rd!LT-4410-abcdef", "1", "2", "3",
+     "F7C89C8BB565EC4C315CB4B8654EACF2BE8BD033BC699334AEDCC497394FAC6DC4DBB6D2B426B42883B098F06CFD39508CB5DDC34EB6A5"
+     "25AA151DD7E059E2307B6E85C2591EA0AC"),
+    ("3200000001密码测试LT-1-cas", "1", "2", "3",
+     "F7C89C8BB565EC4C315CB4B8654EACF2603AED402749E3B9E09D5EC9E89A4BA2F84CB4AE9243F30F9A216BCFE6054686"),
+    ("x" * 16, "1", "2", "3", "0544DACD17157627" * 4),
+]
+
+
+def selftest():
+    """用GOLDEN_VECTORS校验str_enc和str_enc_reference
+
+    Returns:
+        不一致的 (函数名, 明文, 实际密文, 期望密文) 列表，全部一致时为空
+    """
+    failures = []
+    for data, first_key, second_key, third_key, expected in GOLDEN_VECTORS:
+        for func in (str_enc, str_enc_reference):
+            actual = func(data, first_key, second_key, third_key)
+            if actual != expected:
+                failures.append((func.__name__, data, actual, expected))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CAS登录DES加密")
+    parser.add_argument("--selftest", action="store_true", help="用固定向量校验加密实现")
+    args = parser.parse_args()
+    if not args.selftest:
+        parser.print_help()
+        return
+    failures = selftest()
+    for name, data, actual, expected in failures:
+        print(f"\033[31m[FAIL] {name}({data!r}): {actual} != {expected}\033[0m")
+    if failures:
+        sys.exit(1)
+    print(f"校验通过: {len(GOLDEN_VECTORS)} 组固定向量")
+
+
+if __name__ == "__main__":
+    main()
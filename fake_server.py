@@ -0,0 +1,731 @@
+"""
+本地模拟服务器
+在本机模拟图书馆预约系统（ic-web）和统一身份认证（CAS），用于离线测试和性能测试：
+- ic-web: seatMenu、reserve（查询座位/提交预约）、reserve/resvInfo、reserve/delete、
+  phoneSeatReserve/login和sign、sysInfo（房间平面图）、auth/address、auth/userInfo
+- CAS: 带lt和execution的登录页，按str_enc重新计算并校验提交的rsa，登录成功后经ticket跳转回预约系统写入cookie
+
+每个接口都可以加上随机延迟（对数正态分布）；"抢座风暴"模式下，放座时刻到达后大量模拟客户端同时抢座，
+与真实客户端按请求到达服务器的先后顺序竞争（先到先得）。所有状态都在事件循环线程中同步修改，
+处理一个请求的过程中没有await，请求被处理的先后就是延迟结束的先后
+
+用法:
+    python fake_server.py --port 8000 --rooms 4 --seats 80 --latency 20 --sigma 0.3
+    python fake_server.py --port 8000 --release-in 60 --storm 500   # 60秒后放座，500个模拟客户端抢座
+    python daemon.py run --base-url 127.0.0.1:8000 --scheme http    # 守护进程连接本地服务器
+
+    LibraryBooking(base_url="127.0.0.1:8000", scheme="http")        # 交互脚本/测试代码连接本地服务器
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import random
+import secrets
+import urllib.parse
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from aiohttp import web
+from async_booking import EventLoopThread
+from encryption import str_enc
+from models import CLOSING_MINUTES, OPENING_MINUTES, to_minutes
+from scheduler import SystemClock
+
+# 默认账号 学号 -> 密码
+DEFAULT_ACCOUNTS = {"20230001": "password"}
+# 登录cookie名
+SESSION_COOKIE = "ic-cookie"
+# 单次预约的最长时间（分钟）
+MAX_RESERVATION_MINUTES = 240
+# 仍然占用座位的预约状态：已预约、已签到、暂时离开
+ACTIVE_STATUSES = (1027, 1093, 3141)
+# 模拟客户端的appAccNo从这里开始编号，不会与真实账号冲突
+STORM_ACC_BASE = 900000
+
+
+def _ms(date, minutes):
+    """YYYY-MM-DD与当天分钟数对应的本地毫秒时间戳"""
+    return int((datetime.strptime(date, "%Y-%m-%d") + timedelta(minutes=minutes)).timestamp() * 1000)
+
+
+def _ok(data=None, message="操作成功"):
+    return web.json_response({"code": 0, "message": message, "data": data})
+
+
+def _error(message, code=1):
+    return web.json_response({"code": code, "message": message, "data": None})
+
+
+class Latency:
+    """服务器处理延迟（毫秒），服从对数正态分布
+
+    Args:
+        median: 中位数（毫秒），为0时没有延迟
+        sigma: 对数标准差，为0时是固定延迟，越大长尾越明显
+    """
+    __slots__ = ("median", "sigma", "rng")
+
+    def __init__(self, median=0.0, sigma=0.0, rng=None):
+        self.median = median
+        self.sigma = sigma
+        self.rng = rng or random.Random()
+
+    def sample(self):
+        """抽取一次延迟（秒）"""
+        if self.median <= 0:
+            return 0.0
+        if self.sigma <= 0:
+            return self.median / 1000
+        return self.median * math.exp(self.rng.gauss(0.0, self.sigma)) / 1000
+
+
+class FakeReservation:
+    """模拟服务器上的一条预约"""
+    __slots__ = ("uuid", "resv_id", "acc_no", "dev_id", "date", "start", "end", "status", "created", "source")
+
+    def __init__(self, resv_id, acc_no, dev_id, date, start, end, created, source):
+        self.uuid = secrets.token_hex(16)
+        self.resv_id = resv_id
+        self.acc_no = acc_no
+        self.dev_id = dev_id
+        self.date = date
+        self.start = start
+        self.end = end
+        self.status = 1027
+        self.created = created
+        self.source = source
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def overlaps(self, start, end):
+        return self.active and self.start < end and start < self.end
+
+    def to_api(self, seat):
+        """resvInfo接口中的一条预约"""
+        begin = _ms(self.date, self.start)
+        return {
+            "uuid": self.uuid,
+            "resvId": self.resv_id,
+            "appAccNo": self.acc_no,
+            "resvBeginTime": begin,
+            "resvEndTime": _ms(self.date, self.end),
+            "latestCheckInTime": begin + 30 * 60 * 1000,
+            "resvStatus": self.status,
+            "gmtCreate": int(self.created * 1000),
+            "resvDevInfoList": [{"devId": seat["devId"], "devSn": seat["devSn"], "devName": seat["devName"],
+                                 "roomId": seat["roomId"], "roomName": seat["roomName"]}],
+        }
+
+
+class FakeLibrary:
+    """模拟服务器的全部状态：房间、座位、账号、登录会话和预约
+
+    Args:
+        rooms: 房间数，每层10个房间，从2楼开始编号（201、202……）
+        seats: 每个房间的座位数
+        accounts: {学号: 密码}，默认DEFAULT_ACCOUNTS
+        clock_offset: 服务器时钟比本机快的秒数，影响Date响应头和放座时刻的判断
+        release_at: 放座时刻（服务器时钟的epoch秒），之前提交的预约一律拒绝；为None时随时可以预约
+        seed: 随机种子
+        clock: 时钟（可选，默认真实时钟；simulator传入VirtualClock在虚拟时间中运行）
+    """
+    def __init__(self, rooms=4, seats=80, accounts=None, clock_offset=0.0, release_at=None, seed=0, clock=None):
+        self.rng = random.Random(seed)
+        self.clock = clock or SystemClock()
+        self.clock_offset = clock_offset
+        self.release_at = release_at
+        self.accounts = dict(accounts or DEFAULT_ACCOUNTS)
+        self.acc_nos = {username: 100001 + index for index, username in enumerate(self.accounts)}
+        self.rooms = {}  # room_id -> 房间信息
+        self.seats = {}  # devId -> 座位信息
+        for index in range(rooms):
+            floor, number = 2 + index // 10, f"{2 + index // 10}{index % 10 + 1:02d}"
+            room_id = 100650 + index
+            room = {"id": room_id, "number": number, "floor": floor, "name": f"{number}自修室", "seats": []}
+            for seat in range(1, seats + 1):
+                dev_id = room_id * 1000 + seat
+                self.seats[dev_id] = {"devId": dev_id, "devSn": dev_id, "devName": f"{number}-{seat:03d}",
+                                      "roomId": room_id, "roomName": room["name"],
+                                      "coordinate": f"{(seat - 1) % 10 * 60 + 30},{(seat - 1) // 10 * 60 + 30}"}
+                room["seats"].append(dev_id)
+            self.rooms[room_id] = room
+        self.sessions = {}  # cookie -> 学号
+        self.login_tickets = {}  # lt -> execution
+        self.service_tickets = {}  # ST -> 学号
+        self.reservations = {}  # uuid -> FakeReservation
+        self._by_seat = {}  # (devId, 日期) -> [FakeReservation]
+        self._by_acc = {}  # appAccNo -> [FakeReservation]
+        self._next_resv_id = 1
+        self.requests = {}  # 接口名 -> 请求数
+        self.granted = {}  # 来源 -> 成功预约数
+        self.rejected = {}  # 拒绝原因 -> 次数
+        self.grants = []  # (服务器时间, 来源, appAccNo, devId)
+
+    def now(self):
+        """服务器时钟"""
+        return self.clock.time() + self.clock_offset
+
+    # ---------- 登录 ----------
+
+    def issue_login_ticket(self):
+        """CAS登录页的lt和execution，lt只能使用一次"""
+        lt = f"LT-{len(self.login_tickets) + 1}-{secrets.token_hex(12)}-cas"
+        execution = f"e{self.rng.randint(1, 9)}s1"
+        self.login_tickets[lt] = execution
+        return lt, execution
+
+    def verify_login(self, form):
+        """校验CAS登录表单，成功时返回学号
+
+        rsa是 str_enc(学号 + 密码 + lt, "1", "2", "3")，ul/pl是学号和密码的长度；
+        服务器不保存明文以外的信息，只能对长度相符的账号重新计算一次比较
+        """
+        lt = form.get("lt", "")
+        execution = self.login_tickets.pop(lt, None)
+        if execution is None or execution != form.get("execution"):
+            return None
+        try:
+            username_length, password_length = int(form.get("ul", -1)), int(form.get("pl", -1))
+        except ValueError:
+            return None
+        for username, password in self.accounts.items():
+            if len(username) == username_length and len(password) == password_length and \
+                    str_enc(username + password + lt, "1", "2", "3") == form.get("rsa"):
+                return username
+        return None
+
+    def issue_service_ticket(self, username):
+        ticket = f"ST-{secrets.token_hex(16)}"
+        self.service_tickets[ticket] = username
+        return ticket
+
+    def issue_cookie(self, username):
+        """直接为账号建立登录会话（跳过CAS），返回cookie字符串，供测试代码使用"""
+        token = secrets.token_hex(16)
+        self.sessions[token] = username
+        return f"{SESSION_COOKIE}={token}"
+
+    def session_user(self, request):
+        """请求cookie对应的学号，未登录时返回None"""
+        return self.sessions.get(request.cookies.get(SESSION_COOKIE, ""))
+
+    # ---------- 预约 ----------
+
+    def reserve(self, acc_no, dev_id, date, start, end, source="client"):
+        """预约座位
+
+        Returns:
+            (code, message, FakeReservation或None)
+        """
+        if self.release_at is not None and self.now() < self.release_at:
+            return self._reject("预约未开放，请在开放时间后预约")
+        if dev_id not in self.seats:
+            return self._reject("设备不存在")
+        if start >= end or start < OPENING_MINUTES or end > CLOSING_MINUTES:
+            return self._reject("预约时间不在开放时间内")
+        if end - start > MAX_RESERVATION_MINUTES:
+            return self._reject(f"单次预约时长不能超过{MAX_RESERVATION_MINUTES}分钟")
+        if any(resv.overlaps(start, end) for resv in self._by_seat.get((dev_id, date), ())):
+            return self._reject("该座位在该时间段已经预约")
+        if any(resv.date == date and resv.overlaps(start, end) for resv in self._by_acc.get(acc_no, ())):
+            return self._reject("您在该时间段已经预约了座位")
+        resv = FakeReservation(self._next_resv_id, acc_no, dev_id, date, start, end, self.now(), source)
+        self._next_resv_id += 1
+        self.reservations[resv.uuid] = resv
+        self._by_seat.setdefault((dev_id, date), []).append(resv)
+        self._by_acc.setdefault(acc_no, []).append(resv)
+        self.granted[source] = self.granted.get(source, 0) + 1
+        self.grants.append((resv.created, source, acc_no, dev_id))
+        return 0, "新增成功", resv
+
+    def _reject(self, message):
+        self.rejected[message] = self.rejected.get(message, 0) + 1
+        return 1, message, None
+
+    def delete(self, acc_no, uuid):
+        """删除自己尚未签到的预约，返回是否成功"""
+        resv = self.reservations.get(uuid)
+        if resv is None or resv.acc_no != acc_no or resv.status != 1027:
+            return False
+        del self.reservations[uuid]
+        self._by_seat[(resv.dev_id, resv.date)].remove(resv)
+        self._by_acc[acc_no].remove(resv)
+        return True
+
+    def seat_reservations(self, dev_id, date):
+        return [resv for resv in self._by_seat.get((dev_id, date), ()) if resv.active]
+
+    def user_reservations(self, acc_no):
+        return list(self._by_acc.get(acc_no, ()))
+
+    def check_consistency(self):
+        """检查没有任何座位或账号的有效预约相互重叠，返回发现的冲突数"""
+        conflicts = 0
+        for index in (self._by_seat, self._by_acc):
+            for key, items in index.items():
+                active = sorted((resv for resv in items if resv.active), key=lambda resv: (resv.date, resv.start))
+                conflicts += sum(a.date == b.date and b.start < a.end for a, b in zip(active, active[1:]))
+        return conflicts
+
+    def stats(self):
+        return {"requests": dict(self.requests), "granted": dict(self.granted), "rejected": dict(self.rejected),
+                "reservations": len(self.reservations), "sessions": len(self.sessions),
+                "conflicts": self.check_consistency()}
+
+
+class ReleaseStorm:
+    """抢座风暴：放座时刻到达后，clients个模拟客户端各自经过一段网络延迟后提交预约
+
+    目标座位按热门程度（Zipf分布，指数为skew）抽取，热门座位固定由seed决定；
+    预约失败的客户端再经过一个往返后尝试下一个备选座位，最多尝试1 + fallbacks个座位
+
+    Args:
+        clients: 模拟客户端数
+        date: 预约日期 YYYY-MM-DD，默认服务器时钟的明天
+        start, end: 预约时间段 HH:MM
+        room_ids: 参与抢座的房间ID列表，默认所有房间
+        arrival: 客户端从放座时刻到请求到达服务器的延迟（Latency）
+        skew: 座位热门程度的Zipf指数
+        fallbacks: 每个客户端的备选座位数
+    """
+    def __init__(self, clients=200, date=None, start="08:30", end="12:30", room_ids=None, arrival=None, skew=1.1,
+                 fallbacks=2, seed=0):
+        self.clients = clients
+        self.date = date
+        self.start = to_minutes(start)
+        self.end = to_minutes(end)
+        self.room_ids = room_ids
+        self.arrival = arrival or Latency(40, 0.8)
+        self.skew = skew
+        self.fallbacks = fallbacks
+        self.rng = random.Random(seed)
+        self.attempts = 0
+        self.won = 0
+        self.gave_up = 0
+        self._order = None
+
+    def popularity(self, library):
+        """参与抢座的座位按热门程度从高到低排列（由seed决定，同一个ReleaseStorm多次调用结果相同）"""
+        if self._order is None:
+            room_ids = self.room_ids or list(library.rooms)
+            self._order = [dev_id for room_id in room_ids for dev_id in library.rooms[room_id]["seats"]]
+            self.rng.shuffle(self._order)
+        return self._order
+
+    def choose(self, library):
+        """为每个模拟客户端抽取按优先级排列的候选座位"""
+        order = self.popularity(library)
+        weights = [1.0 / (rank + 1) ** self.skew for rank in range(len(order))]
+        cumulative = []
+        total = 0.0
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+        plans = []
+        for _ in range(self.clients):
+            picks = list(dict.fromkeys(self.rng.choices(order, cum_weights=cumulative, k=2 * (self.fallbacks + 1))))
+            plans.append(picks[:self.fallbacks + 1])
+        return plans
+
+    def stats(self):
+        return {"clients": self.clients, "attempts": self.attempts, "won": self.won, "gave_up": self.gave_up}
+
+
+class FakeServer:
+    """基于aiohttp.web的模拟服务器
+
+    Args:
+        library: FakeLibrary（可选，默认新建）
+        latency: 所有接口的默认延迟（Latency）
+        endpoint_latency: {接口名: Latency}，单独设置某些接口的延迟，接口名见routes
+        host, port: 监听地址，port为0时由系统分配
+    """
+    def __init__(self, library=None, latency=None, endpoint_latency=None, host="127.0.0.1", port=0):
+        self.library = library or FakeLibrary()
+        self.latency = latency or Latency()
+        self.endpoint_latency = dict(endpoint_latency or {})
+        self.host = host
+        self.port = port
+        self.storms = []
+        self.app = web.Application(middlewares=[self._middleware])
+        self.app.on_response_prepare.append(self._set_date)
+        self.app.add_routes(self.routes())
+        self._runner = None
+        self._loop = None
+        self._thread = None
+
+    def routes(self):
+        return [
+            web.get("/", self.home, name="home"),
+            web.get("/scancode.html", self.home, name="scancode"),
+            web.get("/ic-web/auth/address", self.auth_address, name="address"),
+            web.get("/authcenter/toLoginPage", self.to_login_page, name="toLoginPage"),
+            web.get("/authcenter/doAuth", self.do_auth, name="doAuth"),
+            web.get("/cas/login", self.cas_form, name="cas"),
+            web.post("/cas/login", self.cas_login, name="cas_login"),
+            web.get("/ic-web/auth/userInfo", self.user_info, name="userInfo"),
+            web.get("/ic-web/seatMenu", self.seat_menu, name="seatMenu"),
+            web.get("/ic-web/reserve", self.seats, name="reserve"),
+            web.post("/ic-web/reserve", self.reserve, name="reserve_post"),
+            web.get("/ic-web/reserve/resvInfo", self.resv_info, name="resvInfo"),
+            web.post("/ic-web/reserve/delete", self.delete, name="delete"),
+            web.post("/ic-web/phoneSeatReserve/login", self.seat_login, name="seat_login"),
+            web.post("/ic-web/phoneSeatReserve/sign", self.sign, name="sign"),
+            web.get("/ic-web/sysInfo", self.sys_info, name="sysInfo"),
+            web.get("/ic-web/upload/layout/{room_id}.png", self.layout_image, name="layout"),
+            web.get("/_fake/stats", self.fake_stats, name="fake_stats"),
+            web.post("/_fake/storm", self.fake_storm, name="fake_storm"),
+        ]
+
+    @property
+    def base_url(self):
+        """主机名:端口，传给LibraryBooking/AsyncLibraryBooking的base_url（scheme为"http"）"""
+        return f"{self.host}:{self.port}"
+
+    # ---------- 启动与停止 ----------
+
+    async def start(self):
+        """在当前事件循环中启动，返回base_url"""
+        self._loop = asyncio.get_running_loop()
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self):
+        """在后台线程的事件循环中启动，返回base_url（同步的LibraryBooking和requests登录流程可以直接使用）"""
+        self._thread = EventLoopThread()
+        return self._thread.run(self.start())
+
+    def stop_thread(self):
+        if self._thread is not None:
+            self._thread.run(self.stop())
+            self._thread.stop()
+            self._thread = None
+
+    def call(self, callback, *args):
+        """在服务器的事件循环中调用callback（测试代码从其他线程修改状态时使用）"""
+        if self._thread is not None:
+            future = asyncio.run_coroutine_threadsafe(self._call(callback, *args), self._loop)
+            return future.result()
+        return callback(*args)
+
+    @staticmethod
+    async def _call(callback, *args):
+        return callback(*args)
+
+    # ---------- 中间件 ----------
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        name = request.match_info.route.name or "unknown"
+        requests = self.library.requests
+        requests[name] = requests.get(name, 0) + 1
+        delay = self.endpoint_latency.get(name, self.latency).sample()
+        if delay:
+            await asyncio.sleep(delay)
+        return await handler(request)
+
+    async def _set_date(self, request, response):
+        if self.library.clock_offset:
+            response.headers["Date"] = formatdate(self.library.now(), usegmt=True)
+
+    def _origin(self, request):
+        return f"{request.scheme}://{request.host}"
+
+    def _user(self, request):
+        """(学号, appAccNo)，未登录时为(None, None)"""
+        username = self.library.session_user(request)
+        return username, self.library.acc_nos.get(username)
+
+    # ---------- 登录流程 ----------
+
+    async def home(self, request):
+        response = web.Response(text="<html><body><div id=\"app\"></div></body></html>", content_type="text/html")
+        if "JSESSIONID" not in request.cookies:
+            response.set_cookie("JSESSIONID", secrets.token_hex(16).upper(), path="/")
+        return response
+
+    async def auth_address(self, request):
+        final_address = request.query.get("finalAddress", "")
+        return _ok(f"{self._origin(request)}/authcenter/toLoginPage?redirectUrl="
+                   f"{urllib.parse.quote(final_address, safe='')}")
+
+    async def to_login_page(self, request):
+        service = urllib.parse.quote(f"{self._origin(request)}/authcenter/doAuth", safe="")
+        raise web.HTTPFound(f"{self._origin(request)}/cas/login?service={service}")
+
+    def _login_form(self, request, error=""):
+        lt, execution = self.library.issue_login_ticket()
+        action = f"/cas/login?{request.query_string}"
+        return web.Response(content_type="text/html", text=(
+            f"<html><body><form id=\"loginForm\" method=\"post\" action=\"{action}\">"
+            f"<span id=\"errormsg\">{error}</span>"
+            "<input id=\"un\" type=\"text\"/><input id=\"pd\" type=\"password\"/>"
+            "<input type=\"hidden\" id=\"rsa\" name=\"rsa\"/><input type=\"hidden\" id=\"ul\" name=\"ul\"/>"
+            "<input type=\"hidden\" id=\"pl\" name=\"pl\"/>"
+            f"<input type=\"hidden\" id=\"lt\" name=\"lt\" value=\"{lt}\"/>"
+            f"<input type=\"hidden\" name=\"execution\" value=\"{execution}\"/>"
+            "<input type=\"hidden\" name=\"_eventId\" value=\"submit\"/>"
+            "</form></body></html>"))
+
+    async def cas_form(self, request):
+        return self._login_form(request)
+
+    async def cas_login(self, request):
+        form = await request.post()
+        username = self.library.verify_login(form)
+        if username is None:
+            return self._login_form(request, "账号或密码错误")
+        service = request.query.get("service", f"{self._origin(request)}/authcenter/doAuth")
+        separator = "&" if "?" in service else "?"
+        raise web.HTTPFound(f"{service}{separator}ticket={self.library.issue_service_ticket(username)}")
+
+    async def do_auth(self, request):
+        username = self.library.service_tickets.pop(request.query.get("ticket", ""), None)
+        if username is None:
+            return _error("票据无效", 300)
+        token = self.library.issue_cookie(username).split("=", 1)[1]
+        response = web.HTTPFound("/")
+        response.set_cookie(SESSION_COOKIE, token, path="/")
+        raise response
+
+    async def user_info(self, request):
+        username, acc_no = self._user(request)
+        if username is None:
+            return _error("用户未登录", 300)
+        return _ok({"accNo": acc_no, "logonName": username, "trueName": f"用户{username[-4:]}", "pid": username})
+
+    # ---------- 房间与座位 ----------
+
+    async def seat_menu(self, request):
+        if self._user(request)[0] is None:
+            return _error("用户未登录", 300)
+        floors = {}
+        for room in self.library.rooms.values():
+            floors.setdefault(room["floor"], []).append({
+                "id": room["id"], "name": room["name"], "totalCount": len(room["seats"]),
+                "freeCount": len(room["seats"])})
+        buildings = [{"id": floor, "name": f"{floor}楼", "children": rooms} for floor, rooms in sorted(floors.items())]
+        return _ok([{"id": 1, "name": "大学城校区", "children": buildings}])
+
+    async def seats(self, request):
+        if self._user(request)[0] is None:
+            return _error("用户未登录", 300)
+        try:
+            room = self.library.rooms[int(request.query.get("roomIds", ""))]
+            date = datetime.strptime(request.query.get("resvDates", ""), "%Y%m%d").strftime("%Y-%m-%d")
+        except (KeyError, ValueError):
+            return _error("参数错误")
+        data = []
+        for dev_id in room["seats"]:
+            seat = self.library.seats[dev_id]
+            data.append(dict(seat, resvInfo=[{"startTime": _ms(date, resv.start), "endTime": _ms(date, resv.end),
+                                              "resvStatus": resv.status}
+                                             for resv in self.library.seat_reservations(dev_id, date)]))
+        return _ok(data)
+
+    async def sys_info(self, request):
+        if request.query.get("sysValue", "").isdigit() and int(request.query["sysValue"]) in self.library.rooms:
+            return _ok({"sysType": 2, "content": f"upload/layout/{request.query['sysValue']}.png"})
+        return _ok(None)
+
+    async def layout_image(self, request):
+        from PIL import Image, ImageDraw
+
+        room = self.library.rooms.get(int(request.match_info["room_id"]))
+        if room is None:
+            raise web.HTTPNotFound()
+        image = Image.new("RGB", (620, (len(room["seats"]) + 9) // 10 * 60 + 20), "white")
+        draw = ImageDraw.Draw(image)
+        for dev_id in room["seats"]:
+            x, y = map(int, self.library.seats[dev_id]["coordinate"].split(","))
+            draw.rectangle((x - 20, y - 20, x + 20, y + 20), outline="gray")
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return web.Response(body=buffer.getvalue(), content_type="image/png")
+
+    # ---------- 预约 ----------
+
+    async def reserve(self, request):
+        username, acc_no = self._user(request)
+        if username is None:
+            return _error("用户未登录", 300)
+        try:
+            data = await request.json()
+            begin, end = data["resvBeginTime"], data["resvEndTime"]
+            dev_id = int(data["resvDev"][0])
+            member = int(data["appAccNo"])
+        except (ValueError, KeyError, IndexError, TypeError):
+            return _error("参数错误")
+        if member != acc_no:
+            return _error("预约人与登录用户不一致")
+        if begin[:10] != end[:10]:
+            return _error("预约不能跨天")
+        code, message, resv = self.library.reserve(acc_no, dev_id, begin[:10], to_minutes(begin[11:16]),
+                                                   to_minutes(end[11:16]))
+        if code:
+            return _error(message, code)
+        return _ok({"uuid": resv.uuid, "resvId": resv.resv_id, "resvDevInfoList": [{"devId": dev_id}]}, message)
+
+    async def resv_info(self, request):
+        username, acc_no = self._user(request)
+        if username is None:
+            return _error("用户未登录", 300)
+        begin = request.query.get("beginDate", "0000-00-00")
+        end = request.query.get("endDate", "9999-99-99")
+        items = sorted((resv for resv in self.library.user_reservations(acc_no) if begin <= resv.date <= end),
+                       key=lambda resv: resv.created, reverse=True)
+        page_size = int(request.query.get("pageNum", 50))
+        return _ok([resv.to_api(self.library.seats[resv.dev_id]) for resv in items[:page_size]])
+
+    async def delete(self, request):
+        username, acc_no = self._user(request)
+        if username is None:
+            return _error("用户未登录", 300)
+        data = await request.json()
+        if not self.library.delete(acc_no, data.get("uuid")):
+            return _error("预约不存在或已签到")
+        return _ok()
+
+    async def seat_login(self, request):
+        username, acc_no = self._user(request)
+        if username is None:
+            return _error("用户未登录", 300)
+        data = await request.json()
+        today = datetime.fromtimestamp(self.library.now()).strftime("%Y-%m-%d")
+        for resv in self.library.user_reservations(acc_no):
+            if str(resv.dev_id) == str(data.get("devSn")) and resv.date == today and resv.status == 1027:
+                return _ok({"reserveInfo": {"resvId": resv.resv_id, "uuid": resv.uuid}})
+        return _error("当前座位没有您的预约")
+
+    async def sign(self, request):
+        username, acc_no = self._user(request)
+        if username is None:
+            return _error("用户未登录", 300)
+        data = await request.json()
+        for resv in self.library.user_reservations(acc_no):
+            if resv.resv_id == data.get("resvId") and resv.status == 1027:
+                resv.status = 1093
+                return _ok(message="签到成功")
+        return _error("签到失败，预约不存在或已签到")
+
+    # ---------- 抢座风暴 ----------
+
+    def schedule_storm(self, storm, at=None):
+        """安排一次抢座风暴，必须在服务器的事件循环中调用（其他线程请用call）
+
+        Args:
+            storm: ReleaseStorm
+            at: 放座时刻（服务器时钟的epoch秒），默认为library.release_at，都没有时立即开始
+        """
+        library = self.library
+        if storm.date is None:
+            storm.date = (datetime.fromtimestamp(library.now()) + timedelta(days=1)).strftime("%Y-%m-%d")
+        at = at if at is not None else library.release_at if library.release_at is not None else library.now()
+        loop = asyncio.get_running_loop()
+        for index, plan in enumerate(storm.choose(library)):
+            loop.call_later(max(at - library.now(), 0.0) + storm.arrival.sample(), self._storm_attempt, storm,
+                            STORM_ACC_BASE + index, plan, 0)
+        self.storms.append(storm)
+        return storm
+
+    def _storm_attempt(self, storm, acc_no, plan, attempt):
+        storm.attempts += 1
+        code, _, _ = self.library.reserve(acc_no, plan[attempt], storm.date, storm.start, storm.end, "storm")
+        if code == 0:
+            storm.won += 1
+        elif attempt + 1 < len(plan):
+            # 客户端收到失败响应后再发下一个请求，间隔一个往返
+            asyncio.get_running_loop().call_later(2 * storm.arrival.sample(), self._storm_attempt, storm, acc_no,
+                                                  plan, attempt + 1)
+        else:
+            storm.gave_up += 1
+
+    async def fake_stats(self, request):
+        return web.json_response(dict(self.library.stats(), storms=[storm.stats() for storm in self.storms]))
+
+    async def fake_storm(self, request):
+        """POST {"clients", "date", "start", "end", "in"（几秒后放座）, "median", "sigma"}"""
+        options = await request.json() if request.can_read_body else {}
+        at = self.library.now() + float(options.get("in", 0))
+        storm = ReleaseStorm(options.get("clients", 200), options.get("date"), options.get("start", "08:30"),
+                             options.get("end", "12:30"),
+                             arrival=Latency(options.get("median", 40), options.get("sigma", 0.8)))
+        self.library.release_at = at
+        self.schedule_storm(storm, at)
+        return web.json_response({"release_at": at, "date": storm.date})
+
+
+def parse_accounts(values, accounts_file=None):
+    """--account 学号:密码 参数与账号文件合并为 {学号: 密码}"""
+    accounts = {}
+    if accounts_file:
+        with open(accounts_file, encoding="utf-8") as file:
+            accounts.update({username: info["password"] for username, info in json.load(file).items()})
+    for value in values or ():
+        username, _, password = value.partition(":")
+        accounts[username] = password
+    return accounts or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟的图书馆预约系统与CAS登录服务器")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口")
+    parser.add_argument("--rooms", type=int, default=4, help="房间数")
+    parser.add_argument("--seats", type=int, default=80, help="每个房间的座位数")
+    parser.add_argument("--account", action="append", help="账号 学号:密码，可重复；默认 20230001:password")
+    parser.add_argument("--accounts", help="从accounts.json加载账号")
+    parser.add_argument("--latency", type=float, default=0, help="接口延迟中位数（毫秒）")
+    parser.add_argument("--sigma", type=float, default=0.3, help="接口延迟的对数标准差")
+    parser.add_argument("--reserve-latency", type=float, help="预约提交接口的延迟中位数（毫秒），默认同--latency")
+    parser.add_argument("--clock-offset", type=float, default=0, help="服务器时钟比本机快的秒数")
+    parser.add_argument("--release-in", type=float, help="几秒后放座，之前的预约请求一律拒绝")
+    parser.add_argument("--storm", type=int, default=0, help="放座时刻参与抢座的模拟客户端数")
+    parser.add_argument("--storm-time", default="08:30-12:30", help="模拟客户端预约的时间段")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    library = FakeLibrary(args.rooms, args.seats, parse_accounts(args.account, args.accounts), args.clock_offset,
+                          seed=args.seed)
+    if args.release_in is not None:
+        library.release_at = library.now() + args.release_in
+    rng = random.Random(args.seed)
+    endpoint_latency = {}
+    if args.reserve_latency is not None:
+        endpoint_latency["reserve_post"] = Latency(args.reserve_latency, args.sigma, rng)
+    server = FakeServer(library, Latency(args.latency, args.sigma, rng), endpoint_latency, args.host, args.port)
+
+    async def serve():
+        base_url = await server.start()
+        print(f"\033[32m模拟服务器已启动: http://{base_url}\033[0m")
+        print(f"{len(library.rooms)} 个房间 × {args.seats} 个座位，账号: {', '.join(library.accounts)}")
+        if args.storm:
+            start, end = args.storm_time.split("-")
+            server.schedule_storm(ReleaseStorm(args.storm, None, start, end, seed=args.seed))
+            print(f"{args.storm} 个模拟客户端将在放座时刻抢座")
+        try:
+            while True:
+                await asyncio.sleep(3600)
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print(f"\n{json.dumps(library.stats(), ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
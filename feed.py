@@ -0,0 +1,278 @@
+"""
+座位变化推送
+SnapshotStore按 (日期, 房间) 保存最近一次的座位状态，每次查询后与上一次比较，
+得到精简的变化（哪些座位被预约、被释放，增加或删除了哪些预约时段），推送给订阅者：
+进程内的队列/迭代器（Subscription），以及本地JSON Lines文件（JsonLinesWriter）
+
+比较的代价与变化量成正比：
+- 接口返回的原始内容与上一次完全相同时，直接复用上一次解析好的Room，不再解析也不再比较
+- 否则每个座位只比较一次预约时段元组，只有真正变化的座位才计算增加/删除了哪些时段
+"""
+import hashlib
+import json
+import queue
+import threading
+import time
+
+# 订阅关闭时放入队列的结束标记
+_CLOSED = object()
+
+
+def payload_digest(content):
+    """接口原始响应内容的摘要，用来判断两次查询结果是否完全相同"""
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+
+class SeatChange:
+    """一个座位的变化
+
+    Attributes:
+        kind: "reserved"（增加了预约）、"freed"（预约被取消或释放）、"changed"（两者都有）、
+            "added"（新出现的座位）或 "removed"（消失的座位）
+        seat: 变化后的Seat（removed时为变化前的Seat）
+        previous: 变化前的Seat（added时为None）
+        added, removed: 增加/删除的Interval元组
+    """
+    __slots__ = ("kind", "seat", "previous", "added", "removed")
+
+    def __init__(self, kind, seat, previous, added=(), removed=()):
+        self.kind = kind
+        self.seat = seat
+        self.previous = previous
+        self.added = added
+        self.removed = removed
+
+    @property
+    def name(self):
+        return self.seat.name
+
+    def to_dict(self):
+        return {"kind": self.kind, "seat": self.seat.name, "dev_id": self.seat.dev_id,
+                "added": [interval.to_dict() for interval in self.added],
+                "removed": [interval.to_dict() for interval in self.removed]}
+
+    def __repr__(self):
+        return f"SeatChange({self.kind!r}, {self.seat.name!r}, +{len(self.added)}, -{len(self.removed)})"
+
+
+def diff_seat(previous, seat):
+    """比较同一个座位的两次状态，没有变化时返回None"""
+    if previous.intervals == seat.intervals:
+        return None
+    before, after = set(previous.intervals), set(seat.intervals)
+    added = tuple(sorted(after - before, key=lambda interval: interval.start))
+    removed = tuple(sorted(before - after, key=lambda interval: interval.start))
+    if not added and not removed:
+        # 只是顺序或重复记录不同
+        return None
+    kind = "changed" if added and removed else "reserved" if added else "freed"
+    return SeatChange(kind, seat, previous, added, removed)
+
+
+def diff_rooms(previous, room):
+    """比较同一个房间的两次状态
+
+    Args:
+        previous: 上一次的Room，为None时房间内所有座位都记为added
+        room: 这一次的Room
+
+    Returns:
+        SeatChange列表，同一个Room对象（内容未变）直接返回空列表
+    """
+    if previous is room:
+        return []
+    if previous is None:
+        return [SeatChange("added", seat, None, added=seat.intervals) for seat in room.values()]
+    changes = []
+    for name, seat in room.items():
+        before = previous.get(name)
+        if before is None:
+            changes.append(SeatChange("added", seat, None, added=seat.intervals))
+        elif before is not seat:
+            change = diff_seat(before, seat)
+            if change is not None:
+                changes.append(change)
+    if len(previous) + sum(change.kind == "added" for change in changes) != len(room):
+        changes.extend(SeatChange("removed", seat, seat, removed=seat.intervals)
+                       for name, seat in previous.items() if name not in room)
+    return changes
+
+
+class RoomDiff:
+    """一个房间两次查询之间的变化
+
+    Attributes:
+        date, room_id: 日期和房间ID
+        at: 这一次查询的时间（epoch秒）
+        initial: 是否为该房间的第一次查询（此时所有座位都记为added）
+        changes: SeatChange列表
+        seats: 这一次查询时房间的座位数
+    """
+    __slots__ = ("date", "room_id", "at", "initial", "changes", "seats")
+
+    def __init__(self, date_str, room_id, changes, initial=False, at=None, seats=None):
+        self.date = date_str
+        self.room_id = room_id
+        self.at = time.time() if at is None else at
+        self.initial = initial
+        self.changes = changes
+        self.seats = seats
+
+    def freed(self):
+        """被取消或释放了预约的座位"""
+        return [change for change in self.changes if change.kind in ("freed", "changed")]
+
+    def reserved(self):
+        """新增了预约的座位"""
+        return [change for change in self.changes if change.kind in ("reserved", "changed")]
+
+    def to_dict(self):
+        return {"date": self.date, "room_id": self.room_id, "at": round(self.at, 3), "initial": self.initial,
+                "seats": self.seats, "changes": [change.to_dict() for change in self.changes]}
+
+    def __bool__(self):
+        return bool(self.changes)
+
+    def __len__(self):
+        return len(self.changes)
+
+    def __repr__(self):
+        return f"RoomDiff({self.date}, {self.room_id}, {len(self.changes)} changes)"
+
+
+class Subscription:
+    """进程内订阅，基于线程安全队列，可以在其他线程中get或直接迭代
+
+    Args:
+        maxsize: 队列容量（0为不限），队列满时丢弃新的变化并计入dropped
+        include_empty: 是否也推送没有变化的查询结果
+    """
+    def __init__(self, store, maxsize=0, include_empty=False):
+        self.store = store
+        self.queue = queue.Queue(maxsize)
+        self.include_empty = include_empty
+        self.dropped = 0
+
+    def publish(self, diff):
+        if not diff and not self.include_empty:
+            return
+        try:
+            self.queue.put_nowait(diff)
+        except queue.Full:
+            self.dropped += 1
+
+    def get(self, timeout=None):
+        """取出下一个RoomDiff，超时或订阅已关闭时返回None"""
+        try:
+            item = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return None if item is _CLOSED else item
+
+    def drain(self):
+        """取出队列中当前所有的RoomDiff，不等待"""
+        items = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is _CLOSED:
+                return items
+            items.append(item)
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is _CLOSED:
+                return
+            yield item
+
+    def close(self):
+        self.store.unsubscribe(self)
+        self.queue.put(_CLOSED)
+
+
+class JsonLinesWriter:
+    """把每个有变化的RoomDiff写成JSON Lines文件中的一行，其他进程可以用tail -f或read_feed读取"""
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def publish(self, diff):
+        if not diff:
+            return
+        line = json.dumps(diff.to_dict(), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        self.store.unsubscribe(self)
+        with self._lock:
+            self._file.close()
+
+
+def read_feed(path):
+    """逐行读取JsonLinesWriter写出的文件，返回字典迭代器"""
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class SnapshotStore:
+    """按 (日期, 房间ID) 保存最近一次的座位状态，并向订阅者推送变化"""
+    def __init__(self):
+        self._rooms = {}  # (日期, 房间ID) -> (原始响应摘要, Room)
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def get(self, date_str, room_id):
+        """最近一次的Room，没有时返回None"""
+        entry = self._rooms.get((date_str, room_id))
+        return entry[1] if entry else None
+
+    def cached(self, date_str, room_id, digest):
+        """原始响应与上一次完全相同时返回上一次的Room，否则返回None"""
+        entry = self._rooms.get((date_str, room_id))
+        return entry[1] if entry and digest is not None and entry[0] == digest else None
+
+    def update(self, date_str, room_id, room, digest=None):
+        """保存这一次的Room，计算与上一次的变化并推送给订阅者
+
+        Returns:
+            RoomDiff
+        """
+        entry = self._rooms.get((date_str, room_id))
+        previous = entry[1] if entry else None
+        diff = RoomDiff(date_str, room_id, diff_rooms(previous, room), initial=previous is None, seats=len(room))
+        self._rooms[(date_str, room_id)] = (digest, room)
+        self.publish(diff)
+        return diff
+
+    def publish(self, diff):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.publish(diff)
+
+    def subscribe(self, maxsize=0, include_empty=False):
+        """新建一个进程内订阅"""
+        return self._add(Subscription(self, maxsize, include_empty))
+
+    def subscribe_jsonl(self, path):
+        """把之后的变化追加写入JSON Lines文件"""
+        return self._add(JsonLinesWriter(self, path))
+
+    def _add(self, subscriber):
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
@@ -0,0 +1,130 @@
+"""
+组队预约
+在一个房间中找出k个在同一时段都空闲、位置相邻的座位，再用每个成员自己的账号各预约一个座位，所有成员并发提交。
+座位坐标放入网格空间索引，每个座位只需查询周围几格就能找到最近的k-1个空闲座位，几百个座位的房间也能即时给出结果
+"""
+import asyncio
+import math
+import numpy as np
+from async_booking import AsyncLibraryBooking
+
+
+class SeatGrid:
+    """座位坐标的网格空间索引
+
+    Args:
+        xs, ys: 坐标数组
+        cell: 网格边长（可选，默认按平均每格约2个座位估计）
+    """
+    def __init__(self, xs, ys, cell=None):
+        self.xs = np.asarray(xs, dtype=float)
+        self.ys = np.asarray(ys, dtype=float)
+        if cell is None:
+            width = float(np.ptp(self.xs)) if len(self.xs) else 1.0
+            height = float(np.ptp(self.ys)) if len(self.ys) else 1.0
+            cell = math.sqrt(max(width * height, 1.0) * 2 / max(len(self.xs), 1)) or 1.0
+        self.cell = cell
+        self.cells = {}
+        gx, gy = (self.xs // cell).astype(int), (self.ys // cell).astype(int)
+        for index, key in enumerate(zip(gx.tolist(), gy.tolist())):
+            self.cells.setdefault(key, []).append(index)
+        # 网格跨度，最近邻查询最多扩大到这么多圈
+        self.span = int(max(np.ptp(gx), np.ptp(gy))) if len(gx) else 0
+
+    def nearest(self, index, count):
+        """离第index个点最近的count个其他点（按距离升序）"""
+        cx, cy = int(self.xs[index] // self.cell), int(self.ys[index] // self.cell)
+        found = []
+        radius = 0
+        while radius <= self.span:
+            for gx in range(cx - radius, cx + radius + 1):
+                for gy in range(cy - radius, cy + radius + 1):
+                    # 只访问第radius圈的格子
+                    if max(abs(gx - cx), abs(gy - cy)) != radius:
+                        continue
+                    found.extend(other for other in self.cells.get((gx, gy), ()) if other != index)
+            if len(found) >= count:
+                distances = np.hypot(self.xs[found] - self.xs[index], self.ys[found] - self.ys[index])
+                order = np.argsort(distances, kind="stable")[:count]
+                # 第radius圈以外的点至少相距radius个格子，比当前第count近的点更近时才需要继续扩大
+                if distances[order[-1]] <= radius * self.cell:
+                    return [found[position] for position in order]
+            radius += 1
+        distances = np.hypot(self.xs[found] - self.xs[index], self.ys[found] - self.ys[index])
+        return [found[position] for position in np.argsort(distances, kind="stable")[:count]]
+
+
+def find_seat_groups(room, matrix, start, end, k, limit=5, cell=None):
+    """在一个房间中找出k个在 [start, end) 内都空闲且彼此靠近的座位
+
+    Args:
+        room: Room
+        matrix: 该房间的OccupancyMatrix
+        limit: 返回的候选组数
+
+    Returns:
+        [{"seats": Seat列表, "diameter": 组内最远两座位的距离, "spread": 到组中心的平均距离}]，按diameter升序
+    """
+    free_rows = np.flatnonzero(matrix.free_mask(start, end))
+    seats = [room[matrix.seat_names[row]] for row in free_rows]
+    seats = [seat for seat in seats if seat.x is not None]
+    if k <= 0 or len(seats) < k:
+        return []
+    if k == 1:
+        return [{"seats": [seat], "diameter": 0.0, "spread": 0.0} for seat in seats[:limit]]
+
+    grid = SeatGrid([seat.x for seat in seats], [seat.y for seat in seats], cell)
+    groups = {}
+    for index in range(len(seats)):
+        members = tuple(sorted([index] + grid.nearest(index, k - 1)))
+        if members in groups:
+            continue
+        xs, ys = grid.xs[list(members)], grid.ys[list(members)]
+        diameter = float(np.hypot(xs[:, None] - xs[None, :], ys[:, None] - ys[None, :]).max())
+        spread = float(np.hypot(xs - xs.mean(), ys - ys.mean()).mean())
+        groups[members] = (diameter, spread)
+
+    ranked = sorted(groups.items(), key=lambda item: item[1])
+    results = []
+    used = set()
+    for members, (diameter, spread) in ranked:
+        # 候选组之间不共用座位，给出几个真正不同的选择
+        if used.intersection(members):
+            continue
+        used.update(members)
+        results.append({"seats": sorted((seats[index] for index in members), key=lambda seat: seat.name),
+                        "diameter": round(diameter, 1), "spread": round(spread, 1)})
+        if len(results) >= limit:
+            break
+    return results
+
+
+async def book_group(client, members, seats, time_periods, date_str, debug=False, base_url=None, scheme=None):
+    """每个成员用自己的账号预约一个座位，所有成员并发提交
+
+    Args:
+        client: 共享的AsyncPooledHTTPClient
+        members: LoginPool.login_one返回的登录结果列表（含username、cookie、app_acc_no）
+        seats: 与members一一对应的Seat列表
+        time_periods: (开始时间, 结束时间) 列表
+        base_url, scheme: 预约系统地址，见AsyncLibraryBooking
+
+    Returns:
+        与members顺序一致的列表，每项为 {"username", "seat", "success", "periods"}
+    """
+    async def book(member, seat):
+        core = AsyncLibraryBooking(client=client, base_url=base_url, scheme=scheme)
+        core.debug = debug
+        core.set_cookie(member["cookie"])
+        core.app_acc_no = member.get("app_acc_no") or await core.get_person_appAccNo()
+        periods = await core.submit_periods(seat.dev_id, time_periods, date_str)
+        return {"username": member["username"], "seat": seat,
+                "success": all(item["success"] for item in periods), "periods": periods}
+
+    return await asyncio.gather(*(book(member, seat) for member, seat in zip(members, seats)))
+
+
+def format_groups(groups):
+    """候选座位组的文本列表"""
+    return "\n".join(f"  {number}. {', '.join(seat.name for seat in group['seats'])}"
+                     f"（最远相距 {group['diameter']:.0f}）" for number, group in enumerate(groups, 1))
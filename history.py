@@ -0,0 +1,349 @@
+"""
+历史占用记录
+把每次查询得到的座位变化（feed.RoomDiff）追加写入本地SQLite数据库，之后可以按房间、座位、日期和时间做范围查询，
+例如“203房间最近30天每天07:00的占用情况”
+
+- 每条预约时段一行：出现时记录seen_at，被取消或释放时记录removed_at，同一时段不会重复写入
+- 写入在后台线程中批量提交，查询座位的路径上只是把变化放入队列
+- 数据库使用WAL模式并开启mmap，查询几个月的数据时由操作系统按需换页，不需要全部读入内存
+
+用法：
+    python history.py occupancy --room 203 --time 07:00 --days 30
+    python history.py seat --room 203 --seat 203-013 --days 7
+    python history.py stats
+"""
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from logs import get_logger
+from models import as_minutes, to_hhmm
+
+logger = get_logger("history")
+
+DEFAULT_HISTORY_FILE = "history.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    room_id INTEGER PRIMARY KEY,
+    room_number TEXT NOT NULL,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS seats (
+    room_id INTEGER NOT NULL,
+    dev_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (room_id, dev_id)
+);
+CREATE TABLE IF NOT EXISTS polls (
+    room_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    seats INTEGER,
+    changes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    room_id INTEGER NOT NULL,
+    dev_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    seen_at REAL NOT NULL,
+    removed_at REAL
+);
+CREATE INDEX IF NOT EXISTS polls_room_date ON polls (room_id, date);
+CREATE INDEX IF NOT EXISTS reservations_room_date ON reservations (room_id, date, start, end);
+CREATE INDEX IF NOT EXISTS reservations_seat_date ON reservations (dev_id, date);
+CREATE UNIQUE INDEX IF NOT EXISTS reservations_open ON reservations (dev_id, date, start, end)
+    WHERE removed_at IS NULL;
+"""
+
+# 队列中的控制标记
+_STOP = object()
+
+
+def full_date(date_str, at):
+    """MMDD补全为YYYY-MM-DD，年份取查询时间所在年份（12月查询1月的日期时算作下一年）"""
+    observed = datetime.fromtimestamp(at)
+    year = observed.year + (observed.month == 12 and date_str.startswith("01"))
+    return f"{year}-{date_str[:2]}-{date_str[2:]}"
+
+
+class HistoryStore:
+    """座位占用历史的SQLite存储
+
+    作为SnapshotStore的订阅者接收RoomDiff（attach），也可以直接调用publish
+
+    Args:
+        path: 数据库文件路径
+        batch_size: 每次提交最多写入的变化数
+        flush_interval: 收到第一个变化后最多等待多少秒再提交
+        mmap_size: SQLite内存映射的最大字节数
+    """
+    def __init__(self, path=DEFAULT_HISTORY_FILE, batch_size=200, flush_interval=1.0, mmap_size=256 * 1024 * 1024):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.mmap_size = mmap_size
+        self.written = 0  # 已写入的RoomDiff数
+        self.errors = 0
+        self._stores = []
+        self._queue = queue.Queue()
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        connection.close()
+        self._reader = self._connect(check_same_thread=False)
+        self._reader_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def _connect(self, check_same_thread=True):
+        connection = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        return connection
+
+    # ---------- 写入 ----------
+
+    def attach(self, store):
+        """订阅SnapshotStore，之后每次查询座位的变化都会写入历史"""
+        store._add(self)
+        self._stores.append(store)
+        return self
+
+    def publish(self, diff):
+        """放入写入队列，立即返回"""
+        self._queue.put(("diff", diff))
+
+    def record_rooms(self, rooms_info):
+        """记录房间编号与房间ID的对应关系，之后可以按房间编号查询"""
+        rows = [(info["id"], number, info.get("name")) for number, info in rooms_info.items()]
+        self._queue.put(("rooms", rows))
+
+    def flush(self, timeout=None):
+        """等待队列中已有的变化全部写入
+
+        Returns:
+            是否在timeout秒内写完
+        """
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self):
+        """取消订阅，写完队列中剩余的变化后关闭数据库"""
+        for store in self._stores:
+            store.unsubscribe(self)
+        self._stores = []
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        with self._reader_lock:
+            self._reader.close()
+
+    def _write_loop(self):
+        connection = self._connect()
+        stopped = False
+        while not stopped:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _STOP and batch[-1][0] != "flush":
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            events = []
+            try:
+                with connection:
+                    for item in batch:
+                        if item is _STOP:
+                            stopped = True
+                        elif item[0] == "flush":
+                            events.append(item[1])
+                        elif item[0] == "rooms":
+                            connection.executemany("INSERT OR REPLACE INTO rooms VALUES (?, ?, ?)", item[1])
+                        else:
+                            self._write_diff(connection, item[1])
+                            self.written += 1
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.error("写入历史记录失败: %s", e)
+            for event in events:
+                event.set()
+        connection.close()
+
+    @staticmethod
+    def _write_diff(connection, diff):
+        date = full_date(diff.date, diff.at)
+        connection.execute("INSERT INTO polls VALUES (?, ?, ?, ?, ?)",
+                           (diff.room_id, date, diff.at, diff.seats, 0 if diff.initial else len(diff.changes)))
+        added, removed, seats = [], [], []
+        for change in diff.changes:
+            seat = change.seat
+            if change.kind == "added":
+                seats.append((diff.room_id, seat.dev_id, seat.name))
+            added.extend((diff.room_id, seat.dev_id, date, interval.start, interval.end, diff.at)
+                         for interval in change.added)
+            removed.extend((diff.at, seat.dev_id, date, interval.start, interval.end) for interval in change.removed)
+        if seats:
+            connection.executemany("INSERT OR REPLACE INTO seats VALUES (?, ?, ?)", seats)
+        if diff.initial:
+            # 第一次查询时，数据库中仍未结束、但这次已经不存在的预约视为在离线期间被取消
+            current = {(dev_id, start, end) for _, dev_id, _, start, end, _ in added}
+            stale = [(diff.at, dev_id, date, start, end) for dev_id, start, end in connection.execute(
+                "SELECT dev_id, start, end FROM reservations WHERE room_id = ? AND date = ? AND removed_at IS NULL",
+                (diff.room_id, date)) if (dev_id, start, end) not in current]
+            removed.extend(stale)
+        connection.executemany("UPDATE reservations SET removed_at = ? WHERE dev_id = ? AND date = ? AND start = ? "
+                               "AND end = ? AND removed_at IS NULL", removed)
+        connection.executemany("INSERT OR IGNORE INTO reservations VALUES (?, ?, ?, ?, ?, ?, NULL)", added)
+
+    # ---------- 查询 ----------
+
+    def query(self, sql, params=()):
+        """在只读连接上执行一条查询，返回行列表"""
+        with self._reader_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def room_id(self, room):
+        """房间编号或房间ID转为房间ID，未知时返回None"""
+        rows = self.query("SELECT room_id FROM rooms WHERE room_number = ?", (str(room),))
+        if rows:
+            return rows[0][0]
+        try:
+            return int(room)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def date_range(days, until=None):
+        """最近days天（截至until，默认今天）的起止日期 (YYYY-MM-DD, YYYY-MM-DD)"""
+        until = until or datetime.now().strftime("%Y-%m-%d")
+        first = (datetime.strptime(until, "%Y-%m-%d") - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        return first, until
+
+    def occupancy_at(self, room, at, days=30, until=None):
+        """某个房间在某个时刻的占用情况，按日期列出
+
+        在该时刻之前被取消或释放的预约不计入，之后才被取消的仍算占用
+
+        Args:
+            room: 房间编号或房间ID
+            at: 时刻 (HH:MM 或分钟数)
+            days: 查询最近多少天
+            until: 最后一天 YYYY-MM-DD（可选，默认今天）
+
+        Returns:
+            [{"date", "busy", "seats", "ratio"}]，只包含有查询记录的日期
+        """
+        room_id = self.room_id(room)
+        minute = as_minutes(at)
+        first, last = self.date_range(days, until)
+        rows = self.query(
+            """
+            SELECT p.date, p.seats, (
+                SELECT COUNT(DISTINCT r.dev_id) FROM reservations r
+                WHERE r.room_id = p.room_id AND r.date = p.date AND r.start <= ? AND r.end > ?
+                  AND (r.removed_at IS NULL
+                       OR r.removed_at > CAST(strftime('%s', r.date, '+' || ? || ' minutes', 'utc') AS REAL))
+            )
+            FROM (SELECT room_id, date, MAX(seats) AS seats FROM polls
+                  WHERE room_id = ? AND date BETWEEN ? AND ? GROUP BY date) p
+            ORDER BY p.date
+            """, (minute, minute, minute, room_id, first, last))
+        return [{"date": date, "busy": busy, "seats": seats, "ratio": busy / seats if seats else None}
+                for date, seats, busy in rows]
+
+    def seat_history(self, room, seat_name, days=30, until=None):
+        """某个座位最近几天的所有预约时段（含已取消的）
+
+        Returns:
+            [{"date", "start", "end", "seen_at", "removed_at"}]
+        """
+        room_id = self.room_id(room)
+        first, last = self.date_range(days, until)
+        rows = self.query(
+            """
+            SELECT r.date, r.start, r.end, r.seen_at, r.removed_at FROM reservations r
+            JOIN seats s ON s.room_id = r.room_id AND s.dev_id = r.dev_id
+            WHERE r.room_id = ? AND s.name = ? AND r.date BETWEEN ? AND ?
+            ORDER BY r.date, r.start
+            """, (room_id, seat_name, first, last))
+        return [{"date": date, "start": to_hhmm(start), "end": to_hhmm(end), "seen_at": seen_at,
+                 "removed_at": removed_at} for date, start, end, seen_at, removed_at in rows]
+
+    def reservations(self, room=None, days=None, until=None):
+        """所有预约时段记录，供统计分析使用
+
+        Returns:
+            (room_id, dev_id, date, start, end, seen_at, removed_at) 元组列表
+        """
+        sql = "SELECT room_id, dev_id, date, start, end, seen_at, removed_at FROM reservations WHERE 1 = 1"
+        params = []
+        if room is not None:
+            sql += " AND room_id = ?"
+            params.append(self.room_id(room))
+        if days is not None:
+            sql += " AND date BETWEEN ? AND ?"
+            params.extend(self.date_range(days, until))
+        return self.query(sql, params)
+
+    def stats(self):
+        """记录条数和数据库文件大小"""
+        counts = {table: self.query(f"SELECT COUNT(*) FROM {table}")[0][0]
+                  for table in ("rooms", "seats", "polls", "reservations")}
+        counts["size_bytes"] = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="座位占用历史查询")
+    parser.add_argument("--db", default=DEFAULT_HISTORY_FILE, help="历史数据库文件")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    occupancy_parser = subparsers.add_parser("occupancy", help="某个房间每天某个时刻的占用情况")
+    occupancy_parser.add_argument("--room", required=True, help="房间编号或房间ID")
+    occupancy_parser.add_argument("--time", required=True, help="时刻 HH:MM")
+    occupancy_parser.add_argument("--days", type=int, default=30, help="最近多少天")
+
+    seat_parser = subparsers.add_parser("seat", help="某个座位的预约记录")
+    seat_parser.add_argument("--room", required=True, help="房间编号或房间ID")
+    seat_parser.add_argument("--seat", required=True, help="座位号")
+    seat_parser.add_argument("--days", type=int, default=7, help="最近多少天")
+
+    subparsers.add_parser("stats", help="记录条数")
+    args = parser.parse_args()
+
+    history = HistoryStore(args.db)
+    try:
+        if args.command == "occupancy":
+            rows = history.occupancy_at(args.room, args.time, args.days)
+            if not rows:
+                print("没有记录")
+            for row in rows:
+                ratio = f"{row['ratio']:.0%}" if row["ratio"] is not None else "-"
+                print(f"{row['date']}  {args.time}  占用 {row['busy']}/{row['seats']}  {ratio}")
+        elif args.command == "seat":
+            rows = history.seat_history(args.room, args.seat, args.days)
+            if not rows:
+                print("没有记录")
+            for row in rows:
+                status = "已取消 " + datetime.fromtimestamp(row["removed_at"]).strftime("%m-%d %H:%M") \
+                    if row["removed_at"] else ""
+                print(f"{row['date']}  {row['start']}-{row['end']}  {status}")
+        else:
+            for key, value in history.stats().items():
+                print(f"{key}: {value}")
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+换座规划
+没有任何一个座位能空闲覆盖整个所需时段时，用最少的换座次数拼出覆盖整个时段的预约方案：
+在一个座位上连续坐的一段（以下称“一段”）至少min_minutes分钟，超过max_minutes时再拆成多个预约，
+与split_time_periods的60/240分钟规则一致；换座时优先选择离上一个座位近的座位
+
+规划在占用矩阵的时间槽上做逆向动态规划：
+    f[t] = 从槽t起覆盖到结束所需的最少段数
+    f[t] = 1 + min(f[e])，e取 [t + 最短段槽数, reach[t]]，reach[t]为所有座位从槽t起空闲能到达的最远槽
+每个槽只做一次数组运算，全馆快照上也只需几毫秒
+"""
+import time
+import numpy as np
+from models import to_hhmm
+from search import SeatSearch
+
+
+def split_stint(start, end, max_minutes=240, min_minutes=60, slot_minutes=5):
+    """把一个座位上连续的 [start, end)（分钟数）平均拆成若干个不超过max_minutes的预约，边界落在时间槽上
+
+    Returns:
+        [(开始分钟, 结束分钟)]，总时长小于min_minutes时返回空列表
+    """
+    total = end - start
+    if total < min_minutes:
+        return []
+    count = -(-total // max_minutes)
+    slots = total // slot_minutes
+    bounds = [start + (slots * index // count) * slot_minutes for index in range(count)] + [end]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def plan_seat_hops(snapshot, date_str, start, end, rooms=None, max_minutes=240, min_minutes=60, search=None):
+    """规划覆盖 [start, end) 的换座方案
+
+    Args:
+        snapshot: LibrarySnapshot
+        rooms: 只使用这些房间的座位（可选，默认快照中的全部房间）
+        search: 复用已建立索引的SeatSearch（可选）
+
+    Returns:
+        dict: success、switches（换座次数）、stints（每段的座位和起止时间）、
+        reservations（可直接提交的 (Seat, 开始时间, 结束时间) 列表）、elapsed_ms
+    """
+    started = time.perf_counter()
+    search = search or SeatSearch(snapshot)
+    indexes = [(room_number, search.index(date_str, room_number))
+               for room_number in rooms or snapshot.room_numbers(date_str)]
+    indexes = [(room_number, index) for room_number, index in indexes if index is not None]
+    result = {"success": False, "switches": None, "stints": [], "reservations": [], "elapsed_ms": 0.0}
+    if not indexes:
+        return result
+
+    matrix = indexes[0][1].matrix
+    slot_minutes = matrix.slot_minutes
+    first, last = matrix.slot_range(start, end)
+    count = last - first
+    min_slots = -(-min_minutes // slot_minutes)
+    if count < min_slots:
+        result["elapsed_ms"] = (time.perf_counter() - started) * 1000
+        return result
+
+    # 所有房间的座位合并为一张表：reach[i, t] 为座位i从槽first+t起空闲能到达的最远槽（相对first，不超过count）
+    reach = np.concatenate([np.minimum(index.run_end[:, first:last], last) - first for _, index in indexes])
+    owners = np.concatenate([np.full(len(index.room), number) for number, (_, index) in enumerate(indexes)])
+    rows = np.concatenate([np.arange(len(index.room)) for _, index in indexes])
+    xs = np.concatenate([index.xs for _, index in indexes])
+    ys = np.concatenate([index.ys for _, index in indexes])
+    furthest = reach.max(axis=0)
+
+    inf = np.iinfo(np.int32).max
+    fewest = np.full(count + 1, inf, dtype=np.int64)
+    fewest[count] = 0
+    for t in range(count - 1, -1, -1):
+        low, high = t + min_slots, furthest[t]
+        if low <= high:
+            best = fewest[low:high + 1].min()
+            if best < inf:
+                fewest[t] = best + 1
+    if fewest[0] >= inf:
+        result["elapsed_ms"] = (time.perf_counter() - started) * 1000
+        return result
+
+    stints = []
+    t, previous = 0, None
+    while t < count:
+        remaining = fewest[t]
+        targets = np.flatnonzero(fewest[t + min_slots:] == remaining - 1) + t + min_slots
+        feasible = np.flatnonzero(reach[:, t] >= targets[0])
+        if previous is None:
+            # 第一段选能坐得最久的座位
+            choice = feasible[np.argmax(reach[feasible, t])]
+        else:
+            # 换座时优先同一房间、离上一个座位近、能坐得久的座位
+            other_room = owners[feasible] != owners[previous]
+            distance = np.hypot(xs[feasible] - xs[previous], ys[feasible] - ys[previous])
+            distance = np.where(other_room | np.isnan(distance), np.inf, distance)
+            order = np.lexsort((-reach[feasible, t], distance, other_room))
+            choice = feasible[order[0]]
+        stop = targets[targets <= reach[choice, t]].max()
+        stints.append((choice, t, stop))
+        t, previous = stop, choice
+
+    for choice, stint_start, stint_end in stints:
+        room_number, index = indexes[owners[choice]]
+        name = index.matrix.seat_names[rows[choice]]
+        seat = index.room[name].with_room(snapshot.room_name(room_number))
+        begin = matrix.opening + (first + stint_start) * slot_minutes
+        finish = matrix.opening + (first + stint_end) * slot_minutes
+        result["stints"].append({"seat": seat, "start": matrix.slot_start(first + stint_start),
+                                 "end": matrix.slot_start(first + stint_end)})
+        for period_start, period_end in split_stint(begin, finish, max_minutes, min_minutes, slot_minutes):
+            result["reservations"].append((seat, to_hhmm(period_start), to_hhmm(period_end)))
+    result["success"] = True
+    result["switches"] = len(stints) - 1
+    result["elapsed_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def format_plan(plan):
+    """换座方案的文本说明"""
+    if not plan["success"]:
+        return "没有能覆盖该时段的换座方案"
+    lines = [f"换座 {plan['switches']} 次，共 {len(plan['reservations'])} 个预约（规划耗时 {plan['elapsed_ms']:.1f} ms）："]
+    for number, stint in enumerate(plan["stints"], 1):
+        seat = stint["seat"]
+        periods = ", ".join(f"{begin}-{finish}" for item, begin, finish in plan["reservations"] if item.name == seat.name
+                            and stint["start"] <= begin < stint["end"])
+        lines.append(f"  {number}. {seat.name} ({seat.room_name}) {stint['start']}-{stint['end']}  预约: {periods}")
+    return "\n".join(lines)
@@ -0,0 +1,166 @@
+"""
+连接池HTTP客户端
+基于aiohttp的异步客户端，为LibraryBooking的所有接口提供共享的keep-alive连接池，按接口统计连接复用情况，
+并按接口、状态码和code记录延迟直方图（metrics.Metrics）
+"""
+import json
+import threading
+import time
+import urllib.parse
+import aiohttp
+from metrics import METRICS, result_code_of
+
+# 图书馆预约系统的默认主机名
+DEFAULT_BASE_URL = "libbooking.gzhu.edu.cn"
+
+
+def site_url(path, base_url=None, scheme=None, default_scheme="http"):
+    """拼接预约系统的URL
+
+    Args:
+        path: 以/开头的路径，可以为空
+        base_url: 主机名（可带端口），默认DEFAULT_BASE_URL
+        scheme: 强制使用的协议，为None时使用default_scheme（各接口原来使用的协议）
+    """
+    return f"{scheme or default_scheme}://{base_url or DEFAULT_BASE_URL}{path}"
+
+
+class ConnectionStats:
+    """按接口记录连接复用命中(hits)与未命中(misses)次数"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def record(self, endpoint, reused):
+        with self._lock:
+            counter = self._counters.setdefault(endpoint, {"hits": 0, "misses": 0})
+            counter["hits" if reused else "misses"] += 1
+
+    def snapshot(self):
+        """返回各接口计数的副本"""
+        with self._lock:
+            return {endpoint: dict(counter) for endpoint, counter in self._counters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+    def format_report(self):
+        """生成可打印的复用统计报告"""
+        lines = []
+        for endpoint, counter in sorted(self.snapshot().items()):
+            total = counter["hits"] + counter["misses"]
+            rate = counter["hits"] / total * 100 if total else 0
+            lines.append(f"{endpoint}: 复用 {counter['hits']} 次, 新建 {counter['misses']} 次, 复用率 {rate:.0f}%")
+        return "\n".join(lines) if lines else "暂无请求记录"
+
+
+class HTTPResponse:
+    """已读取完毕的响应，提供与requests.Response相同的常用属性"""
+    def __init__(self, status_code, headers, content, url, elapsed=0.0, sent_at=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+        self.elapsed = elapsed  # 从发出请求到读完响应的秒数
+        self.sent_at = sent_at  # 请求头写出到连接上的时刻（time.perf_counter）
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncPooledHTTPClient:
+    """共享连接池的异步HTTP客户端，同一主机的请求复用keep-alive连接
+
+    一个实例可以被多个账号的AsyncLibraryBooking共享，cookie通过请求头传递，不使用会话cookie
+
+    Args:
+        pool_size: 连接池总连接数上限
+        limit_per_host: 每个主机的连接数上限，0表示不单独限制
+        keepalive_timeout: 空闲连接保持的秒数
+        dns_ttl: DNS解析结果缓存秒数
+        metrics: 记录请求延迟的Metrics，默认为进程内的metrics.METRICS
+    """
+    def __init__(self, pool_size=100, limit_per_host=0, keepalive_timeout=60, dns_ttl=300, metrics=None):
+        self.pool_size = pool_size
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+        self.stats = ConnectionStats()
+        self.metrics = metrics or METRICS
+        self._session = None
+
+    def _get_session(self):
+        # aiohttp的会话必须在运行中的事件循环里创建，因此延迟到第一次请求时创建
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_created)
+            trace_config.on_request_headers_sent.append(self._on_headers_sent)
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_ttl,
+                ssl=False,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                trace_configs=[trace_config],
+                cookie_jar=aiohttp.DummyCookieJar(),
+            )
+        return self._session
+
+    @staticmethod
+    async def _on_connection_created(session, trace_config_ctx, params):
+        trace_config_ctx.trace_request_ctx["new_connection"] = True
+
+    @staticmethod
+    async def _on_headers_sent(session, trace_config_ctx, params):
+        trace_config_ctx.trace_request_ctx["sent_at"] = time.perf_counter()
+
+    @staticmethod
+    def endpoint_name(method, url):
+        """由请求方法和URL路径生成接口名，例如 GET /ic-web/reserve"""
+        return f"{method.upper()} {urllib.parse.urlsplit(url).path or '/'}"
+
+    async def request(self, method, url, endpoint=None, headers=None, params=None, json=None,
+                      data=None, timeout=None, verify=False):
+        """发送请求、读完响应体，记录本次请求是否复用了连接以及耗时
+
+        Returns:
+            HTTPResponse: 响应对象
+        """
+        endpoint = endpoint or self.endpoint_name(method, url)
+        trace_ctx = {"new_connection": False, "sent_at": None}
+        options = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        start = time.perf_counter()
+        try:
+            async with self._get_session().request(
+                method.upper(), url,
+                headers=headers, params=params, json=json, data=data,
+                ssl=bool(verify), trace_request_ctx=trace_ctx, **options
+            ) as response:
+                content = await response.read()
+        except Exception:
+            self.metrics.observe_request(endpoint, "error", "", time.perf_counter() - start)
+            raise
+        elapsed = time.perf_counter() - start
+        self.stats.record(endpoint, not trace_ctx["new_connection"])
+        self.metrics.observe_request(endpoint, response.status, result_code_of(content), elapsed)
+        return HTTPResponse(response.status, response.headers, content, str(response.url), elapsed,
+                            trace_ctx["sent_at"])
+
+    async def get(self, url, **kwargs):
+        return await self.request("get", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("post", url, **kwargs)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
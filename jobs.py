@@ -0,0 +1,128 @@
+"""
+预约任务
+守护进程执行的定时预约任务及其JSON序列化
+"""
+import uuid
+from datetime import datetime, timedelta
+
+# 任务状态
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+MISSED = "missed"
+FINISHED_STATES = (DONE, FAILED, CANCELLED, MISSED)
+
+
+def parse_fire_at(value, now=None):
+    """解析开火时间
+
+    Args:
+        value: "YYYY-MM-DD HH:MM[:SS]" 形式的绝对时间，或 "HH:MM[:SS]" 形式（取下一次出现的该时刻）
+
+    Returns:
+        datetime
+    """
+    now = now or datetime.now()
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    parts = [int(part) for part in value.split(":")]
+    target = now.replace(hour=parts[0], minute=parts[1], second=parts[2] if len(parts) > 2 else 0, microsecond=0)
+    if target < now:
+        target += timedelta(days=1)
+    return target
+
+
+class BookingJob:
+    """一个定时预约任务
+
+    Args:
+        account: 账号（学号），密码从accounts.json读取
+        date: 预约日期 MMDD
+        room: 房间编号（get_rooms_info返回的键）
+        seats: 按优先级排列的座位号列表，其他房间的座位写成 房间编号:座位号
+        start, end: 预约时间段 HH:MM
+        fire_at: 开火时间，见parse_fire_at
+        parallelism: 同时尝试的候选座位数
+        periods: 预先拆分好的 [开始时间, 结束时间] 列表（可选，默认执行时按split_time_periods拆分）
+        rule_id, rule_version: 由周期规则展开的任务记录来源规则及其指纹，见planner.py
+        auto_fill: 在指定座位之后，再从本房间和同楼层搜索补充多少个备选座位（默认0不补充）
+    """
+    __slots__ = ("job_id", "account", "date", "room", "seats", "start", "end", "fire_at", "parallelism",
+                 "periods", "rule_id", "rule_version", "auto_fill", "status", "message", "result")
+
+    def __init__(self, account, date, room, seats, start, end, fire_at, parallelism=2, job_id=None,
+                 periods=None, rule_id=None, rule_version=None, auto_fill=0, status=PENDING, message="",
+                 result=None):
+        self.job_id = job_id or uuid.uuid4().hex[:8]
+        self.account = str(account)
+        self.date = str(date)
+        self.room = str(room)
+        self.seats = [str(seat) for seat in seats]
+        self.start = start
+        self.end = end
+        self.fire_at = fire_at if isinstance(fire_at, datetime) else parse_fire_at(fire_at)
+        self.parallelism = int(parallelism)
+        self.periods = [tuple(period) for period in periods] if periods else None
+        self.rule_id = rule_id
+        self.rule_version = rule_version
+        self.auto_fill = int(auto_fill)
+        self.status = status
+        self.message = message
+        self.result = result
+
+    @classmethod
+    def from_dict(cls, data):
+        seats = data["seats"]
+        if isinstance(seats, str):
+            seats = [seat.strip() for seat in seats.replace("，", ",").split(",") if seat.strip()]
+        return cls(
+            account=data["account"],
+            date=data["date"],
+            room=data["room"],
+            seats=seats,
+            start=data["start"],
+            end=data["end"],
+            fire_at=data["fire_at"],
+            parallelism=data.get("parallelism", 2),
+            job_id=data.get("id"),
+            periods=data.get("periods"),
+            rule_id=data.get("rule_id"),
+            rule_version=data.get("rule_version"),
+            auto_fill=data.get("auto_fill", 0),
+            status=data.get("status", PENDING),
+            message=data.get("message", ""),
+            result=data.get("result"),
+        )
+
+    def to_dict(self):
+        data = {
+            "id": self.job_id,
+            "account": self.account,
+            "date": self.date,
+            "room": self.room,
+            "seats": self.seats,
+            "start": self.start,
+            "end": self.end,
+            "fire_at": self.fire_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "parallelism": self.parallelism,
+            "status": self.status,
+            "message": self.message,
+            "result": self.result,
+        }
+        if self.periods:
+            data["periods"] = [list(period) for period in self.periods]
+        if self.rule_id:
+            data["rule_id"] = self.rule_id
+            data["rule_version"] = self.rule_version
+        if self.auto_fill:
+            data["auto_fill"] = self.auto_fill
+        return data
+
+    def expired(self, before):
+        """任务已结束且开火时间早于before，可以从任务文件中清理"""
+        return self.status in FINISHED_STATES and self.fire_at < before
@@ -1,5 +1,5 @@
+import argparse
 import json
-import http.client
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import numpy as np
@@ -16,9 +16,26 @@ from cookie import (
     getCookieWithCASLogin,
     CookieManager, 
     getCookieWithDirectLogin,
-    AccountManager
+    AccountManager,
+    CookieStore,
+    LoginPool
 )
-import random
+from async_booking import AsyncLibraryBooking, EventLoopThread
+from cassette import RECORDED_PATHS, Cassette, RecordingHTTPClient, ReplayHTTPClient
+from logs import Payload, get_logger
+from metrics import METRICS
+from scheduler import ClockSync, FireScheduler
+from occupancy import OccupancyMatrix
+from models import to_hhmm, to_minutes
+from group import book_group, find_seat_groups, format_groups
+from hopping import format_plan, plan_seat_hops
+from search import SeatSearch, format_results, room_floor
+from snapshot import LibrarySnapshot
+from watcher import SeatWatch, SeatWatcher
+from history import HistoryStore
+from contention import ContentionModel
+
+logger = get_logger("booking")
 
 def get_lt_value(url):
     """从CAS登录页面获取lt参数值"""
@@ -33,41 +50,86 @@ def get_lt_value(url):
         print(f"获取lt值时发生错误: {e}")
         return None
 
+def _core_attribute(name, doc):
+    """生成读写异步核心同名属性的property，保证同步封装与异步核心共享同一份状态"""
+    return property(
+        lambda self: getattr(self.core, name),
+        lambda self, value: setattr(self.core, name, value),
+        doc=doc,
+    )
+
 class LibraryBooking:
-    def __init__(self):
-        self.base_url = "libbooking.gzhu.edu.cn"
-        # 随机UA列表
-        self.user_agents = [
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
-            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) Gecko/20100101 Firefox/124.0",
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:123.0) Gecko/20100101 Firefox/123.0",
-        ]
-        # 在初始化时就设置随机UA
-        random_ua = self.get_random_ua()
-        self.headers = {
-            "User-Agent": random_ua,
-            "Accept": "application/json, text/plain, */*",
-            "Sec-Fetch-Site": "same-origin",
-            "Accept-Language": "zh-CN,zh-Hans;q=0.9",
-            "Sec-Fetch-Mode": "cors",
-            "Content-Type": "application/json;charset=utf-8",
-            "Sec-Fetch-Dest": "empty"
-        }
-        self.cookie = None
-        self.year = str(datetime.now().year)  # 获取当前年份
-        self.rooms_info = {}  # 存储房间信息的字典
+    """同步预约接口，网络操作都委托给后台事件循环中的AsyncLibraryBooking"""
+    base_url = _core_attribute("base_url", "图书馆预约系统主机名")
+    scheme = _core_attribute("scheme", "强制使用的协议，为None时各接口沿用原来的协议")
+    user_agents = _core_attribute("user_agents", "随机UA列表")
+    headers = _core_attribute("headers", "请求头")
+    cookie = _core_attribute("cookie", "当前cookie")
+    year = _core_attribute("year", "预约年份")
+    rooms_info = _core_attribute("rooms_info", "房间信息字典")
+    debug = _core_attribute("debug", "调试模式开关")
+    app_acc_no = _core_attribute("app_acc_no", "用户的appAccNo值，用于预约")
+    store = _core_attribute("store", "座位状态存储，可订阅座位变化")
+
+    def __init__(self, pool_size=10, base_url=None, scheme=None, client=None, history=None):
+        # 所有接口共享异步核心的keep-alive连接池，避免每次请求重新进行TCP+TLS握手
+        # base_url/scheme指向本地fake_server时可以离线测试，client可传入cassette.ReplayHTTPClient回放录制的会话
+        # history为历史数据库路径时，每次查询到的座位变化都写入该文件（默认不记录）
+        self.core = AsyncLibraryBooking(client=client, pool_size=pool_size, base_url=base_url, scheme=scheme)
+        self._loop = EventLoopThread()
         self.cookie_manager = CookieManager()
+        self.cookie_store = CookieStore()  # 按账号保存的cookie和appAccNo，切换账号时优先使用
         self.username = None  # 存储当前用户名
         self.password = None  # 存储当前密码
-        self.debug = True  # 调试模式开关
-        self.app_acc_no = None  # 存储用户的appAccNo值，用于预约
-        self.debug_print(f"已设置随机User-Agent: {random_ua}")
+        self.fire_scheduler = FireScheduler()  # 定时开火调度器，记录每次开火的抖动
+        self.clock_sync = ClockSync()  # 最近一次估计的服务器时钟偏差
+        self.history = HistoryStore(history).attach(self.store) if history else None
+        self.debug_print("已设置随机User-Agent: %s", self.headers['User-Agent'])
+
+    @classmethod
+    def from_cassette(cls, path, scale=1.0):
+        """回放录制文件的LibraryBooking，不访问网络
+
+        Args:
+            path: start_recording/stop_recording保存的录制文件
+            scale: 延迟缩放系数，1为按录制时的延迟返回，0为立即返回
+        """
+        cassette = Cassette.load(path)
+        return cls(base_url=cassette.base_url, client=ReplayHTTPClient(cassette, scale))
+
+    def _run(self, coro):
+        """在后台事件循环中执行异步核心的协程并返回结果"""
+        return self._loop.run(coro)
+
+    def start_recording(self, paths=RECORDED_PATHS):
+        """开始录制seatMenu、reserve、resvInfo、sysInfo等接口的请求和响应，返回录制到的Cassette
+
+        Args:
+            paths: 录制的接口路径，为None时录制所有请求
+        """
+        if isinstance(self.core.http, RecordingHTTPClient):
+            return self.core.http.cassette
+        self.core.http = RecordingHTTPClient(Cassette(self.base_url), self.core.http, paths)
+        return self.core.http.cassette
+
+    def stop_recording(self, path=None):
+        """停止录制，path不为空时保存到文件
+
+        Returns:
+            Cassette，没有在录制时返回None
+        """
+        recorder = self.core.http
+        if not isinstance(recorder, RecordingHTTPClient):
+            return None
+        self.core.http = recorder.client
+        if path:
+            recorder.cassette.save(path)
+            print(f"已录制 {len(recorder.cassette)} 个请求，保存到 {path}")
+        return recorder.cassette
     
     def get_random_ua(self):
         """获取随机User-Agent"""
-        return random.choice(self.user_agents)
+        return self.core.get_random_ua()
         
     def set_debug_mode(self, enabled=True):
         """设置调试模式开关"""
@@ -78,16 +140,165 @@ class LibraryBooking:
             print("\033[36m[DEBUG] 调试模式已关闭\033[0m")
         return self.debug
 
-    def debug_print(self, message):
-        """调试信息打印函数"""
+    def debug_print(self, message, *args, exc_info=False):
+        """调试信息，经libbooking.booking日志输出；args在真正输出时才格式化进message，exc_info为True时附上当前异常的堆栈"""
         if self.debug:
-            print(f"\033[36m[DEBUG] {message}\033[0m")
+            logger.debug(message, *args, exc_info=exc_info)
+
+    def auto_fallback_seats(self, date_str, room_number, seat_info, start_time, end_time, count=3):
+        """在全馆快照上搜索备选座位：同房间、同楼层优先，离首选座位越近越好
+
+        Returns:
+            按优先级排列的Seat列表（带有房间名称）
+        """
+        snapshot = self.snapshot(date_str)
+        if snapshot is None:
+            return []
+        results = SeatSearch(snapshot).search(date_str, start_time, end_time, k=count, preferred_rooms=[room_number],
+                                              preferred_floors=[room_floor(room_number)],
+                                              favourites=[seat_info.name], exclude={seat_info.name})
+        if results:
+            print("\n自动选择的备选座位：")
+            print(format_results(results))
+        return [item["seat"] for item in results]
+
+    def submit_seat_plan(self, reservations, date_str, retry_policy=None):
+        """提交跨多个座位的预约方案，见AsyncLibraryBooking.submit_seat_plan"""
+        return self._run(self.core.submit_seat_plan(reservations, date_str, retry_policy))
+
+    def offer_seat_hops(self, date_str, start_time, end_time, seat_search, submit=True):
+        """没有座位能覆盖整个时段时，规划换座方案：先在当前房间内规划，不行再在全馆规划
+
+        Args:
+            seat_search: 当前房间的SeatSearch
+            submit: 是否询问立即提交（定时预约模式下只显示方案）
+        """
+        choice = input("\n是否规划换座方案（用最少的换座次数覆盖整个时段）？(y/n): ").strip().lower()
+        if choice != "y":
+            return
+        plan = plan_seat_hops(seat_search.snapshot, date_str, start_time, end_time, search=seat_search)
+        if not plan["success"]:
+            print("\n当前房间内无法覆盖该时段，正在获取全馆座位信息...")
+            snapshot = self.snapshot(date_str)
+            if snapshot is not None:
+                plan = plan_seat_hops(snapshot, date_str, start_time, end_time)
+        print("\n" + format_plan(plan))
+        if not plan["success"] or not submit:
+            return
+        if input("\n是否立即提交以上预约？(y/n): ").strip().lower() == "y":
+            results = self.submit_seat_plan(plan["reservations"], date_str)
+            for stint in plan["stints"]:
+                seat = stint["seat"]
+                print(f"\n座位 {seat.name} ({seat.room_name}):", end="")
+                self.report_period_results([item for item in results if item["seat"].name == seat.name
+                                            and stint["start"] <= item["start"] < stint["end"]])
+
+    def book_group(self, account_manager, usernames, seats, start_time, end_time, date_str):
+        """组队预约：每个成员用自己的账号预约一个座位，登录与提交均并发进行
+
+        Args:
+            usernames: 成员账号列表，与seats一一对应
+
+        Returns:
+            book_group的结果列表，登录失败的成员success为False且periods为空
+        """
+        time_periods = self.split_time_periods(start_time, end_time)
+        if not time_periods:
+            return []
+        login_pool = LoginPool(account_manager, self.cookie_store, base_url=self.base_url, scheme=self.scheme)
+        logins, wall_seconds = login_pool.login_all(usernames)
+        print(login_pool.format_report(logins, wall_seconds))
+        members = [login for login in logins if login["success"]]
+        member_seats = [seat for login, seat in zip(logins, seats) if login["success"]]
+        results = self._run(book_group(self.core.http, members, member_seats, time_periods, date_str, self.debug,
+                                       base_url=self.base_url, scheme=self.scheme))
+        results = {result["username"]: result for result in results}
+        return [results.get(login["username"], {"username": login["username"], "seat": seat, "success": False,
+                                                "periods": []})
+                for login, seat in zip(logins, seats)]
+
+    def rank_candidates(self, candidates, date_str, start_time, end_time):
+        """按占用历史估计的竞争度给备选座位排序（首选座位不动），没有历史数据时保持原顺序"""
+        if len(candidates) <= 2 or self.history is None:
+            return candidates
+        self.history.flush(timeout=5)
+        try:
+            model = ContentionModel.from_history(self.history)
+        except Exception as e:
+            self.debug_print("建立座位竞争度模型失败: %s", e)
+            return candidates
+        if model.empty:
+            self.debug_print("占用历史中还没有查询记录，保持备选顺序")
+            return candidates
+        ranked = model.rank(candidates, date_str, start_time, end_time)
+        if ranked != candidates:
+            print(f"根据历史竞争度调整备选顺序: {', '.join(seat.name for seat in ranked[1:])}")
+        return ranked
+
+    def watch_seats(self, date_str, room_numbers, start_time, end_time, seats=None, budget=60):
+        """捡漏监控：轮询指定房间，有座位在目标时段变为空闲时立即预约，直到预约成功或按Ctrl+C停止
+
+        Args:
+            room_numbers: 房间编号列表
+            seats: 只接受这些座位号（可选，按优先顺序）
+            budget: 每分钟最多查询次数
+
+        Returns:
+            SeatWatcher.stats()，房间不存在时返回None
+        """
+        rooms_info = self.rooms_info or self.get_rooms_info()
+        if not rooms_info:
+            return None
+        watcher = SeatWatcher(self.core, rooms_info, budget=budget)
+        if watcher.add(SeatWatch(self.core, date_str, room_numbers, start_time, end_time, seats=seats)) is None:
+            return None
+        future = self._loop.submit(watcher.run())
+        try:
+            return future.result()
+        except KeyboardInterrupt:
+            # 在事件循环线程中停止监控，等待当前一轮结束
+            self._loop.call_soon(watcher.stop)
+            print("\n正在停止监控...")
+            return future.result()
+
+    def use_stored_cookie(self, username):
+        """使用CookieStore中该账号未过期的cookie，并通过userInfo接口确认其仍然有效
+
+        Returns:
+            是否成功使用已保存的cookie
+        """
+        entry = self.cookie_store.get_valid(username)
+        if not entry:
+            return False
+        self.set_cookie(entry["cookie"])
+        self.app_acc_no = None
+        app_acc_no = self.get_person_appAccNo()
+        if not app_acc_no:
+            self.debug_print("账号 %s 保存的cookie已失效", username)
+            return False
+        if app_acc_no != entry.get("app_acc_no"):
+            self.cookie_store.save(username, entry["cookie"], app_acc_no)
+        self.username = username
+        print(f"已使用账号 {username} 保存的登录状态，无需重新登录")
+        return True
+
+    def set_cookie(self, cookie):
+        """设置cookie并更新请求头"""
+        self.core.set_cookie(cookie)
 
     def initialize_cookie(self, username=None, password=None, force_refresh=False):
         """初始化cookie，优先检查cookie有效性，无效时才重新登录"""
-        # 如果没有强制刷新，先尝试从cookie管理器加载cookie
+        # 如果没有强制刷新，先尝试使用该账号单独保存的cookie
+        if not force_refresh and username and self.use_stored_cookie(username):
+            self.password = password or self.password
+            return True
+
+        # 再尝试从cookie管理器加载cookie
         if not force_refresh:
             cookie_data = self.cookie_manager.load_cookie()
+            # cookie.json只保存最近登录的一个账号，属于其他账号时不能使用
+            if cookie_data and username and cookie_data.get("username") not in (None, username):
+                cookie_data = None
             if cookie_data:
                 # 设置初始cookie、用户名和密码
                 self.cookie = cookie_data.get("cookie")
@@ -96,7 +307,7 @@ class LibraryBooking:
                 
                 if self.cookie:
                     self.headers["Cookie"] = self.cookie
-                    self.debug_print(f"已从文件加载cookie")
+                    self.debug_print("已从文件加载cookie")
                     
                     # 检查当前cookie是否有效
                     self.debug_print("检查cookie有效性...")
@@ -118,8 +329,8 @@ class LibraryBooking:
                         }
                         
                         # 使用相同的URL和参数方式
-                        check_url = "http://libbooking.gzhu.edu.cn/ic-web/reserve/resvInfo"
-                        check_response = requests.get(check_url, headers=self.headers, params=params, verify=False)
+                        check_url = self.core.url("/ic-web/reserve/resvInfo", "http")
+                        check_response = self.request("get", check_url, params=params)
                         
                         # 解析响应
                         if check_response.status_code == 200:
@@ -132,7 +343,7 @@ class LibraryBooking:
                                     first_reservation = result["data"][0]
                                     if "appAccNo" in first_reservation:
                                         self.app_acc_no = first_reservation["appAccNo"]
-                                        self.debug_print(f"已获取appAccNo: {self.app_acc_no}")
+                                        self.debug_print("已获取appAccNo: %s", self.app_acc_no)
                                 
                                 return True
                             else:
@@ -160,11 +371,11 @@ class LibraryBooking:
         
         # 需要登录的情况
         if username and password:
-            self.debug_print(f"正在使用直接登录方式，用户名: {username}")
+            self.debug_print("正在使用直接登录方式，用户名: %s", username)
             
             # 尝试直接登录获取cookie
             try:
-                cookie = getCookieWithDirectLogin(username, password)
+                cookie = getCookieWithDirectLogin(username, password, base_url=self.base_url, scheme=self.scheme)
                 if cookie:
                     self.cookie = cookie
                     self.headers["Cookie"] = cookie
@@ -177,12 +388,13 @@ class LibraryBooking:
                     
                     # 保存cookie到文件
                     self.cookie_manager.save_cookie(cookie, username, password)
+                    self.cookie_store.save(username, cookie, self.app_acc_no)
                     self.debug_print("cookie已保存到文件")
                     return True
                 else:
                     print("直接登录失败，尝试备选登录方式...")
                     # 调用浏览器模拟登录 - 简化try-except结构
-                    login_url = "http://libbooking.gzhu.edu.cn"
+                    login_url = self.core.url("", "http")
                     cookie = getCookieWithCASLogin(login_url, username, password)
                     if cookie:
                         self.cookie = cookie
@@ -196,12 +408,13 @@ class LibraryBooking:
                         
                         # 保存cookie到文件
                         self.cookie_manager.save_cookie(cookie, username, password)
+                        self.cookie_store.save(username, cookie, self.app_acc_no)
                         self.debug_print("cookie已保存到文件")
                         return True
                     else:
                         self.debug_print("备选登录方式未能获取有效cookie")
             except Exception as e:
-                self.debug_print(f"获取cookie过程出错: {e}")
+                self.debug_print("获取cookie过程出错: %s", e)
                 import traceback
                 traceback.print_exc()
         
@@ -210,103 +423,11 @@ class LibraryBooking:
 
     def get_person_appAccNo(self):
         """从用户信息API获取appAccNo"""
-        try:
-            self.debug_print("尝试从userInfo API获取用户ID")
-            # 确保使用正确的URL
-            url = "http://libbooking.gzhu.edu.cn/ic-web/auth/userInfo"
-            
-            self.debug_print(f"请求用户信息URL: {url}")
-            
-            # 发送请求 - 使用requests库而不是session
-            response = requests.get(url, headers=self.headers, verify=False)
-            
-            self.debug_print(f"userInfo API响应状态码: {response.status_code}")
-            self.debug_print(f"userInfo API响应内容: {response.text}...")
-            
-            if response.status_code == 200:
-                data = response.json()
-                # 兼容大小写的code字段
-                code = data.get("code") or data.get("CODE")
-                if (code == 0 or code == "0") and "data" in data:
-                    app_acc_no = data["data"].get("accNo")
-                    if app_acc_no:
-                        self.app_acc_no = app_acc_no
-                        self.debug_print(f"成功获取用户ID: {app_acc_no}")
-                        return app_acc_no
-                    else:
-                        self.debug_print("用户信息中没有accNo字段")
-                else:
-                    # 兼容大小写的message字段
-                    message = data.get("message") or data.get("MESSAGE", "未知错误")
-                    self.debug_print(f"API返回错误: {message}")
-            else:
-                self.debug_print(f"获取用户信息失败，状态码: {response.status_code}")
-            
-            return None
-        except Exception as e:
-            self.debug_print(f"获取用户ID时发生异常: {str(e)}")
-            import traceback
-            self.debug_print(f"异常详情: {traceback.format_exc()}")
-            return None
+        return self._run(self.core.get_person_appAccNo())
 
     def get_app_acc_no(self):
         """获取用户的appAccNo，首先尝试userInfo接口，然后尝试从预约列表中获取"""
-        # 先尝试从userInfo接口获取
-        app_acc_no = self.get_person_appAccNo()
-        if app_acc_no:
-            self.debug_print(f"从userInfo接口获取到appAccNo: {app_acc_no}")
-            return app_acc_no
-            
-        # 如果失败，再尝试从预约列表获取
-        try:
-            self.debug_print("尝试从预约列表获取用户appAccNo...")
-            
-            # 计算查询日期范围
-            today = datetime.now()
-            begin_date = (today - timedelta(days=1)).strftime("%Y-%m-%d")
-            end_date = (today + timedelta(days=7)).strftime("%Y-%m-%d")
-            
-            # 构建请求参数
-            params = {
-                "beginDate": begin_date,
-                "endDate": end_date,
-                "needStatus": "6",
-                "page": "1",
-                "pageNum": "50",
-                "orderKey": "gmt_create",
-                "orderModel": "desc"
-            }
-            
-            # 发送请求获取预约列表
-            check_url = "http://libbooking.gzhu.edu.cn/ic-web/reserve/resvInfo"
-            response = requests.get(check_url, headers=self.headers, params=params, verify=False)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get("code") == 0 or result.get("CODE") == "0":
-                    # 从响应中获取appAccNo
-                    if "data" in result and len(result["data"]) > 0:
-                        first_reservation = result["data"][0]
-                        if "appAccNo" in first_reservation:
-                            self.app_acc_no = first_reservation["appAccNo"]
-                            self.debug_print(f"成功获取appAccNo: {self.app_acc_no}")
-                            return self.app_acc_no
-                        else:
-                            self.debug_print("在预约记录中未找到appAccNo字段")
-                    else:
-                        self.debug_print("无预约记录，无法获取appAccNo")
-                else:
-                    self.debug_print(f"获取预约列表失败: {result.get('message', result.get('MESSAGE', ''))}")
-            else:
-                self.debug_print(f"请求失败，状态码: {response.status_code}")
-        
-        except Exception as e:
-            self.debug_print(f"获取appAccNo过程出错: {str(e)}")
-            import traceback
-            self.debug_print(f"异常详情: {traceback.format_exc()}")
-        
-        self.debug_print("无法获取appAccNo，请联系开发者")
-        return None
+        return self._run(self.core.get_app_acc_no())
 
     def refresh_cookie_if_needed(self, target_time=None, force_refresh=False):
         """如果cookie即将过期或在预约前，刷新cookie
@@ -352,311 +473,59 @@ class LibraryBooking:
 
     def get_rooms_info(self):
         """获取所有房间信息"""
-        try:
-            request_url = "https://libbooking.gzhu.edu.cn/ic-web/seatMenu"
-            self.debug_print(f"发送GET请求: {request_url}")
-            self.debug_print(f"请求头: {json.dumps(self.headers, indent=2)}")
-            
-            # 使用requests库发送请求
-            response = requests.get(request_url, headers=self.headers, verify=False)
-            
-            # 解析JSON响应
-            data = response.json()
-            
-            if self.debug:
-                self.debug_print(f"响应状态码: {response.status_code}")
-                self.debug_print(f"响应数据: {json.dumps(data, indent=2, ensure_ascii=False)[:500]}...")
-            
-            if data["code"] == 0:
-                rooms_info = {}
-                
-                def extract_rooms(node):
-                    """递归提取房间信息"""
-                    # 如果是大学城校区，处理其子节点
-                    if node.get("name") == "大学城校区":
-                        for building in node.get("children", []):  # 遍历楼层
-                            for room in building.get("children", []):  # 遍历房间
-                                if "children" not in room:  # 确保是最终的房间节点
-                                    room_name = room["name"]
-                                    # 处理特殊房间号 - 走廊区域
-                                    if ("走廊" in room_name and "区" in room_name) or "（C区）" in room_name or "(C区)" in room_name:
-                                        # 处理各种格式的C区房间
-                                        if "（C区）" in room_name or "(C区)" in room_name:
-                                            # 提取楼层号
-                                            floor = room_name[0]
-                                            room_number = f"{floor}C"
-                                        # 处理类似"2楼北面（C区）"的情况
-                                        elif "（" in room_name and "）" in room_name:
-                                            floor = room_name[0]
-                                            area = room_name[room_name.find("（") + 1]
-                                            room_number = f"{floor}{area}"
-                                        else:
-                                            floor = room_name[0]
-                                            area = room_name[room_name.find("(") + 1]
-                                            room_number = f"{floor}{area}"
-                                    else:
-                                        room_number = room_name.split("自修室")[0].split("书库")[0].split("区")[0].strip()
-                                    
-                                    rooms_info[room_number] = {
-                                        "id": room["id"],
-                                        "name": room["name"],
-                                        "total_seats": room["totalCount"]
-                                    }
-                    # 如果有子节点，继续递归
-                    elif "children" in node:
-                        for child in node["children"]:
-                            extract_rooms(child)
-                
-                # 处理所有校区
-                for campus in data["data"]:
-                    extract_rooms(campus)
-                
-                if not rooms_info:
-                    print("\033[33m[WARNING] 未找到大学城校区的房间信息\033[0m")
-                    return None
-                
-                self.rooms_info = rooms_info
-                self.debug_print(f"解析出 {len(rooms_info)} 个房间信息")
-                return rooms_info
-            else:
-                print(f"获取房间信息失败: {data['message']}")
-                return None
-                
-        except Exception as e:
-            print(f"获取房间信息时发生错误: {str(e)}")
-            if self.debug:
-                import traceback
-                self.debug_print(f"异常详情: {traceback.format_exc()}")
-            return None
+        rooms_info = self._run(self.core.get_rooms_info())
+        if rooms_info and self.history:
+            self.history.record_rooms(rooms_info)
+        return rooms_info
 
-    def get_seats_info(self, date_str, room_id):
-        """获取指定日期和房间的座位列表信息"""
-        try:
-            # 构建请求URL
-            url = f"https://{self.base_url}/ic-web/reserve"
-            
-            # 构建请求参数
-            params = {
-                "roomIds": room_id,
-                "resvDates": f"{self.year}{date_str}",
-                "sysKind": "8"
-            }
-            
-            self.debug_print(f"发送GET请求: {url}")
-            self.debug_print(f"请求参数: {params}")
-            
-            # 发送GET请求
-            response = requests.get(url, headers=self.headers, params=params, verify=False)
-            
-            # 解析JSON响应
-            data = response.json()
-            
-            print(f"{data}")
-            if self.debug:
-                self.debug_print(f"响应状态码: {response.status_code}")
-                self.debug_print(f"响应数据大小: {len(response.content)} 字节")
-                seats_count = len(data["data"]) if data["code"] == 0 and "data" in data else 0
-                self.debug_print(f"座位数量: {seats_count}")
-                if seats_count > 0:
-                    self.debug_print(f"座位示例: {json.dumps(data['data'][0], indent=2, ensure_ascii=False)}")
-            
-            if data["code"] == 0:
-                seats_info = {}
-                for seat in data["data"]:
-                    seat_info = {
-                        "devId": seat["devId"],
-                        "devName": seat["devName"],
-                        "coordinate": seat.get("coordinate", ""),  # 添加坐标信息
-                        "reserved_times": []
-                    }
-                    
-                    # 提取已预约时间段
-                    for resv in seat.get("resvInfo", []):
-                        start_time = datetime.fromtimestamp(resv["startTime"]/1000)
-                        end_time = datetime.fromtimestamp(resv["endTime"]/1000)
-                        seat_info["reserved_times"].append({
-                            "start": start_time.strftime("%H:%M"),
-                            "end": end_time.strftime("%H:%M")
-                        })
-                    
-                    seats_info[seat["devName"]] = seat_info
-                
-                self.debug_print(f"成功获取 {len(seats_info)} 个座位信息")
-                return seats_info
-            else:
-                print(f"获取座位信息失败: {data['message']}")
-                self.debug_print(f"错误响应: {json.dumps(data, indent=2, ensure_ascii=False)}")
-                return None
-                
-        except Exception as e:
-            print(f"获取座位信息时发生错误: {str(e)}")
-            if self.debug:
-                import traceback
-                self.debug_print(f"异常详情: {traceback.format_exc()}")
-            return None
-        finally:
-            if 'conn' in locals():
-                conn.close()
+    def get_seats_info(self, date_str, room_id, build_matrix=False):
+        """获取指定日期和房间的座位列表信息，build_matrix为True时同时构建座位占用矩阵"""
+        return self._run(self.core.get_seats_info(date_str, room_id, build_matrix))
+
+    def get_occupancy(self, date_str, room_id):
+        """最近一次查询得到的座位占用矩阵，见AsyncLibraryBooking.get_occupancy"""
+        return self.core.get_occupancy(date_str, room_id)
+
+    def snapshot(self, dates, room_ids=None, concurrency=8):
+        """并发获取全馆座位快照，见AsyncLibraryBooking.snapshot"""
+        snapshot = self._run(self.core.snapshot(dates, room_ids, concurrency))
+        if snapshot is not None and self.history:
+            self.history.record_rooms(snapshot.rooms_info)
+        return snapshot
 
     def get_available_times(self, seat_info):
         """计算座位可用时间段"""
-        # 图书馆开放时间
-        opening_time = "08:30"
-        closing_time = "21:45"
-        
-        # 将已预约时间段按开始时间排序
-        reserved_times = sorted(seat_info["reserved_times"], key=lambda x: x["start"])
-        
-        # 计算可用时间段
-        available_times = []
-        current_time = opening_time
-        
-        for reserved in reserved_times:
-            if current_time < reserved["start"]:
-                available_times.append({
-                    "start": current_time,
-                    "end": reserved["start"]
-                })
-            current_time = reserved["end"]
-        
-        # 添加最后一个预约之后到闭馆的时间段
-        if current_time < closing_time:
-            available_times.append({
-                "start": current_time,
-                "end": closing_time
-            })
-        
-        return available_times
+        # 图书馆开放时间 08:30-21:45
+        return [{"start": to_hhmm(interval.start), "end": to_hhmm(interval.end)}
+                for interval in seat_info.free_intervals()]
 
     def make_reservation(self, seat_sn, begin_time, end_time, date_str, app_acc_no=None):
         """提交座位预约请求"""
-        # 清理可能存在的非法Unicode字符
-        begin_time = ''.join(char for char in begin_time if ord(char) < 0xD800 or ord(char) > 0xDFFF)
-        end_time = ''.join(char for char in end_time if ord(char) < 0xD800 or ord(char) > 0xDFFF)
-        
-        # 使用传入的app_acc_no或尝试获取
-        if app_acc_no is None:
-            # 确保已获取appAccNo
-            if self.app_acc_no is None:
-                self.get_app_acc_no()
-            app_acc_no = self.app_acc_no
-        
-        # 检查app_acc_no是否有效
-        if not app_acc_no:
-            return {"code": -1, "message": "无法获取用户ID (appAccNo)"}
-        
-        # 确保self.year存在
-        if not hasattr(self, 'year') or self.year is None:
-            # 如果date_str是MMDD格式 (例如0513)
-            if len(date_str) == 4:
-                self.year = str(datetime.now().year)
-            # 如果date_str是YYYYMMDD格式 (例如20250513)
-            elif len(date_str) == 8:
-                self.year = date_str[:4]
-                date_str = date_str[4:]  # 截取后面的MMDD部分
-            # 如果是其他格式则使用当前年份
-            else:
-                self.year = str(datetime.now().year)
-        
-        # 构建正确的日期字符串格式
-        try:
-            # 解析日期字符串
-            if len(date_str) == 4:  # MMDD
-                month = date_str[:2]
-                day = date_str[2:]
-                formatted_date = f"{self.year}-{month}-{day}"
-            elif len(date_str) == 8:  # YYYYMMDD
-                year = date_str[:4]
-                month = date_str[4:6]
-                day = date_str[6:]
-                formatted_date = f"{year}-{month}-{day}"
-            elif '-' in date_str:  # YYYY-MM-DD
-                formatted_date = date_str
-            else:
-                return {"code": -1, "message": f"无效的日期格式: {date_str}"}
-        except Exception as e:
-            return {"code": -1, "message": f"日期格式处理错误: {str(e)}"}
-        
-        data = {
-            "sysKind": 8,
-            "memberKind": 1,
-            "appAccNo": app_acc_no,
-            "resvMember": [app_acc_no],  # 使用appAccNo值
-            "resvBeginTime": f"{formatted_date} {begin_time}:00",
-            "resvEndTime": f"{formatted_date} {end_time}:00",
-            "testName": "",
-            "captcha": "",
-            "resvProperty": 0,
-            "resvDev": [seat_sn],
-            "memo": ""
-        }
-
-        try:
-            # 构建请求URL
-            url = f"http://{self.base_url}/ic-web/reserve"
-            
-            if self.debug:
-                self.debug_print(f"发送预约请求: {url}")
-                self.debug_print(f"预约数据: {json.dumps(data, ensure_ascii=False)}")
-            
-            # 发送POST请求
-            response = requests.post(url, headers=self.headers, json=data, verify=False)
-            
-            # 解析JSON响应
-            result = response.json()
-            
-            if self.debug:
-                self.debug_print(f"预约响应状态码: {response.status_code}")
-                self.debug_print(f"预约响应内容: {json.dumps(result, indent=2, ensure_ascii=False)}")
-            
-            # 转换响应格式为统一的格式
-            if "code" in result:
-                result["CODE"] = result["code"]
-                result["MESSAGE"] = result.get("message", "")
-            
-            if result.get("CODE", result.get("code")) == 0:
-                print(f"\033[32m预约成功! 座位: {seat_sn}, 时间: {begin_time}-{end_time}\033[0m")
-            else:
-                print(f"\033[31m预约失败: {result.get('MESSAGE', result.get('message', '未知错误'))}\033[0m")
-            
-            return result
-            
-        except Exception as e:
-            print(f"\033[31m[ERROR] 预约请求发生错误: {str(e)}\033[0m")
-            if self.debug:
-                import traceback
-                self.debug_print(f"预约异常详情: {traceback.format_exc()}")
-            return {"CODE": -1, "MESSAGE": f"预约请求异常: {str(e)}"}
+        return self._run(self.core.make_reservation(seat_sn, begin_time, end_time, date_str, app_acc_no))
 
     def get_room_layout(self, room_id):
         """获取房间平面图"""
         try:
-            # 创建HTTPS连接
-            conn = http.client.HTTPSConnection(self.base_url)
-            
             # 构建请求路径 - 确保URL编码
             path = f"/ic-web/sysInfo?sysType=2&sysValue={room_id}&sysKind=16"
             
-            self.debug_print(f"发送GET请求: https://{self.base_url}{path}")
-            self.debug_print(f"请求参数: sysType=2, sysValue={room_id}, sysKind=16")
+            self.debug_print("发送GET请求: %s", self.core.url(path))
+            self.debug_print("请求参数: sysType=2, sysValue=%s, sysKind=16", room_id)
             
             # 发送GET请求
-            conn.request("GET", path, headers=self.headers)
-            
-            # 获取响应
-            response = conn.getresponse()
-            response_data = response.read()
+            response = self.request("get", self.core.url(path))
+            response_data = response.content
             
             # 解析JSON响应
             data = json.loads(response_data.decode("utf-8"))
             
             if self.debug:
-                self.debug_print(f"响应状态码: {response.status}")
-                self.debug_print(f"响应数据大小: {len(response_data)} 字节")
+                self.debug_print("响应状态码: %s", response.status_code)
+                self.debug_print("响应数据大小: %s 字节", len(response_data))
                 if data["code"] == 0 and data["data"]:
-                    self.debug_print(f"房间平面图数据: {json.dumps(data['data'], indent=2, ensure_ascii=False)}")
+                    self.debug_print("房间平面图数据: %s", Payload(data['data'], indent=2))
                 else:
-                    self.debug_print(f"错误响应: {json.dumps(data, indent=2, ensure_ascii=False)}")
+                    self.debug_print("错误响应: %s", Payload(data, indent=2))
             
             if data["code"] == 0 and data["data"]:
                 # 提取图片信息
@@ -667,23 +536,21 @@ class LibraryBooking:
                         image_path = image_data["content"]
                         if image_path:
                             try:
-                                # 创建新的连接获取图片
-                                conn = http.client.HTTPSConnection(self.base_url)
+                                # 复用连接池中的连接获取图片
                                 image_request_path = f"/ic-web/{image_path}"
                                 
                                 # 确保路径编码正确
                                 # 转义非ASCII字符
                                 image_request_path = urllib.parse.quote(image_request_path, safe='/:-._?=&')
                                 
-                                self.debug_print(f"获取图片请求: https://{self.base_url}{image_request_path}")
+                                self.debug_print("获取图片请求: %s", self.core.url(image_request_path))
                                 
                                 # 发送GET请求获取图片
-                                conn.request("GET", image_request_path, headers=self.headers)
-                                image_response = conn.getresponse()
-                                image_bytes = image_response.read()
+                                image_response = self.request("get", self.core.url(image_request_path))
+                                image_bytes = image_response.content
                                 
-                                self.debug_print(f"图片响应状态码: {image_response.status}")
-                                self.debug_print(f"图片数据大小: {len(image_bytes)} 字节")
+                                self.debug_print("图片响应状态码: %s", image_response.status_code)
+                                self.debug_print("图片数据大小: %s 字节", len(image_bytes))
                                 
                                 # 创建PIL图片对象
                                 image = Image.open(io.BytesIO(image_bytes))
@@ -697,7 +564,7 @@ class LibraryBooking:
                                 return image
                             except Exception as e:
                                 print(f"\033[33m[WARNING] 处理图片请求时出错: {str(e)}\033[0m")
-                                self.debug_print(f"处理图片请求异常: {str(e)}")
+                                self.debug_print("处理图片请求异常: %s", e)
                                 # 返回一个空白背景作为备选
                                 return self.create_blank_layout()
                     else:
@@ -707,23 +574,18 @@ class LibraryBooking:
                 except Exception as e:
                     print(f"\033[33m[WARNING] 获取图片时出错: {str(e)}\033[0m")
                     if self.debug:
-                        import traceback
-                        self.debug_print(f"获取图片异常详情: {traceback.format_exc()}")
+                        self.debug_print("获取图片异常详情:", exc_info=True)
                     return self.create_blank_layout()
             else:
                 print("\033[33m[WARNING] 获取房间平面图信息失败\033[0m")
-                self.debug_print(f"获取平面图信息失败: {data.get('message', '未知错误')}")
+                self.debug_print("获取平面图信息失败: %s", data.get('message', '未知错误'))
                 return self.create_blank_layout()
                 
         except Exception as e:
             print(f"\033[33m[WARNING] 获取房间平面图时发生错误: {str(e)}\033[0m")
             if self.debug:
-                import traceback
-                self.debug_print(f"异常详情: {traceback.format_exc()}")
+                self.debug_print("异常详情:", exc_info=True)
             return self.create_blank_layout()
-        finally:
-            if 'conn' in locals():
-                conn.close()
                 
     def create_blank_layout(self, width=800, height=600):
         """创建一个空白的背景图用于当房间布局图无法获取时使用"""
@@ -745,8 +607,13 @@ class LibraryBooking:
         # 添加文字说明布局图无法加载
         return blank_image
 
-    def visualize_seats(self, seats_info, room_id, target_start=None, target_end=None):
-        """生成座位布局图"""
+    @METRICS.stage("visualize")
+    def visualize_seats(self, seats_info, room_id, target_start=None, target_end=None, occupancy=None):
+        """生成座位布局图
+
+        Args:
+            occupancy: 由seats_info构建的座位占用矩阵（可选，未传入时现场构建）
+        """
         # 获取房间平面图
         room_layout = self.get_room_layout(room_id)
         
@@ -772,14 +639,9 @@ class LibraryBooking:
         x_coords = []
         y_coords = []
         for seat_info in seats_info.values():
-            if "coordinate" in seat_info:
-                coords = seat_info["coordinate"].split(",")
-                if len(coords) >= 2:
-                    # 调整坐标系统
-                    x = float(coords[0])
-                    y = float(coords[1])
-                    x_coords.append(x)
-                    y_coords.append(y)
+            if seat_info.x is not None:
+                x_coords.append(seat_info.x)
+                y_coords.append(seat_info.y)
         
         if x_coords and y_coords:
             # 计算坐标范围，并添加一些边距
@@ -813,43 +675,39 @@ class LibraryBooking:
         # 当前时间
         current_time = datetime.now().strftime("%H:%M")
         
+        # 用占用矩阵一次性算出所有座位的状态，行顺序与seats_info一致
+        occupancy = occupancy or OccupancyMatrix.from_seats_info(seats_info)
+        if target_start and target_end:
+            available_mask = occupancy.free_mask(target_start, target_end)
+        else:
+            reserved_now_mask = occupancy.busy_at(current_time)
+        
         # 重置坐标列表用于绘制散点图
         x_coords = []
         y_coords = []
         
-        for seat_name, seat_info in seats_info.items():
-            if "coordinate" in seat_info:
-                coords = seat_info["coordinate"].split(",")
-                if len(coords) >= 2:
-                    # 调整坐标系统
-                    x = float(coords[0])
-                    y = float(coords[1])
-                    x_coords.append(x)
-                    y_coords.append(y)
-                    seat_numbers.append(seat_name)
-                    
-                    # 提取座位号的后缀部分
-                    if "-" in seat_name:
-                        simplified_seat_numbers.append(seat_name.split("-")[-1])
-                    else:
-                        simplified_seat_numbers.append(seat_name)
-                    
-                    # 根据座位状态设置颜色
-                    if target_start and target_end:
-                        # 模式二：根据指定时间段判断座位是否可用
-                        is_available = self.check_seat_available(seat_info, target_start, target_end)
-                        colors.append('green' if is_available else 'yellow')
+        for row, (seat_name, seat_info) in enumerate(seats_info.items()):
+            if seat_info.x is not None:
+                x_coords.append(seat_info.x)
+                y_coords.append(seat_info.y)
+                seat_numbers.append(seat_name)
+                
+                # 提取座位号的后缀部分
+                if "-" in seat_name:
+                    simplified_seat_numbers.append(seat_name.split("-")[-1])
+                else:
+                    simplified_seat_numbers.append(seat_name)
+                
+                # 根据座位状态设置颜色
+                if target_start and target_end:
+                    # 模式二：根据指定时间段判断座位是否可用
+                    colors.append('green' if available_mask[row] else 'yellow')
+                else:
+                    # 模式一：根据座位当前预约状态设置颜色
+                    if seat_info.intervals:
+                        colors.append('red' if reserved_now_mask[row] else 'orange')
                     else:
-                        # 模式一：根据座位当前预约状态设置颜色
-                        if seat_info["reserved_times"]:
-                            is_reserved = False
-                            for resv in seat_info["reserved_times"]:
-                                if resv["start"] <= current_time <= resv["end"]:
-                                    is_reserved = True
-                                    break
-                            colors.append('red' if is_reserved else 'orange')
-                        else:
-                            colors.append('green')
+                        colors.append('green')
         
         # 绘制散点图
         scatter = ax.scatter(x_coords, y_coords, c=colors, s=100, alpha=0.7, edgecolors='white')
@@ -902,165 +760,13 @@ class LibraryBooking:
 
     def check_seat_available(self, seat_info, target_start, target_end):
         """检查座位在指定时间段是否可用"""
-        # 座位没有预约记录，则完全可用
-        if not seat_info["reserved_times"]:
-            return True
-            
-        # 检查是否与已预约时间段冲突
-        for resv in seat_info["reserved_times"]:
-            # 检查时间是否重叠：两个时间段重叠的条件是开始时间小于对方的结束时间且结束时间大于对方的开始时间
-            if not (target_end <= resv["start"] or target_start >= resv["end"]):
-                return False
-                
-        return True
+        return seat_info.is_free(to_minutes(target_start), to_minutes(target_end))
 
     def split_time_periods(self, start_time, end_time, max_minutes=240, min_minutes=60):
-        """将长时间段拆分为多个时间段，确保每段不少于min_minutes分钟且不超过max_minutes分钟
-        
-        Args:
-            start_time: 开始时间 (HH:MM)
-            end_time: 结束时间 (HH:MM)
-            max_minutes: 每段最大分钟数，默认240分钟
-            min_minutes: 每段最小分钟数，默认60分钟
-            
-        Returns:
-            时间段列表，每个元素为(开始时间, 结束时间)的元组
-        """
-        # 转换时间字符串为datetime对象
-        start_dt = datetime.strptime(start_time, "%H:%M")
-        end_dt = datetime.strptime(end_time, "%H:%M")
-        
-        # 计算分钟差
-        if end_dt < start_dt:  # 处理跨天的情况
-            end_dt = end_dt + timedelta(days=1)
-        
-        time_diff = (end_dt - start_dt).total_seconds() / 60
-        
-        # 检查总时间是否满足最小时间要求
-        if time_diff < min_minutes:
-            print(f"\n\033[33m[WARNING] 预约时间段小于{min_minutes}分钟，图书馆要求预约时间至少为{min_minutes}分钟\033[0m")
-            # 尝试延长到最小时间
-            if end_dt + timedelta(minutes=(min_minutes - time_diff)) <= datetime.strptime("21:45", "%H:%M"):
-                end_dt = start_dt + timedelta(minutes=min_minutes)
-                end_time = end_dt.strftime("%H:%M")
-                print(f"\n已自动调整结束时间为: {end_time}")
-            else:
-                print(f"\n无法自动调整时间段到符合要求，请重新选择")
-                return []
-        
-        # 如果时间段不超过max_minutes，直接返回
-        if time_diff <= max_minutes:
-            return [(start_time, end_time)]
-        
-        # 否则，将时间段拆分为多个不超过max_minutes的时间段
-        time_periods = []
-        current_start = start_dt
-        
-        # 计算完整的时间段数量
-        num_full_periods = int(time_diff // max_minutes)
-        remaining_minutes = time_diff % max_minutes
-        
-        # 如果剩余时间小于最小时间要求，调整最后一个完整时间段
-        if 0 < remaining_minutes < min_minutes:
-            # 减少完整时间段的数量
-            if num_full_periods > 0:
-                # 分配剩余分钟到最后一个完整段
-                adjusted_last_period = max_minutes + remaining_minutes
-                # 确保不超过最大时间限制
-                if adjusted_last_period <= max_minutes:
-                    num_full_periods -= 1
-                    remaining_minutes = adjusted_last_period
-            else:
-                # 如果没有完整时间段，直接返回整段
-                return [(start_time, end_time)]
-        
-        # 添加完整时间段
-        for _ in range(num_full_periods):
-            current_end = current_start + timedelta(minutes=max_minutes)
-            time_periods.append((
-                current_start.strftime("%H:%M"),
-                current_end.strftime("%H:%M")
-            ))
-            current_start = current_end
-        
-        # 添加最后一个不完整时间段（如果有）
-        if remaining_minutes >= min_minutes:
-            time_periods.append((
-                current_start.strftime("%H:%M"),
-                end_dt.strftime("%H:%M")
-            ))
-        elif remaining_minutes > 0 and time_periods:
-            # 如果剩余时间太短但大于0，将其并入前一段
-            last_start, _ = time_periods.pop()
-            time_periods.append((
-                last_start,
-                end_dt.strftime("%H:%M")
-            ))
-        
-        # 最终检查所有时间段，确保没有超过max_minutes的段
-        validated_periods = []
-        for start_str, end_str in time_periods:
-            start_period = datetime.strptime(start_str, "%H:%M")
-            end_period = datetime.strptime(end_str, "%H:%M")
-            
-            # 处理跨天情况
-            if end_period < start_period:
-                end_period = end_period + timedelta(days=1)
-                
-            period_minutes = (end_period - start_period).total_seconds() / 60
-            
-            # 如果发现超过最大时间的段，进行再次拆分
-            if period_minutes > max_minutes:
-                # 计算需要切分的次数
-                num_splits = int(period_minutes // max_minutes)
-                split_start = start_period
-                
-                for _ in range(num_splits):
-                    split_end = split_start + timedelta(minutes=max_minutes)
-                    validated_periods.append((
-                        split_start.strftime("%H:%M"),
-                        split_end.strftime("%H:%M")
-                    ))
-                    split_start = split_end
-                
-                # 处理最后一段
-                remaining = (end_period - split_start).total_seconds() / 60
-                if remaining >= min_minutes:
-                    validated_periods.append((
-                        split_start.strftime("%H:%M"),
-                        end_period.strftime("%H:%M")
-                    ))
-                elif remaining > 0 and validated_periods:
-                    # 合并到前一段
-                    last_start, _ = validated_periods.pop()
-                    validated_periods.append((
-                        last_start,
-                        end_period.strftime("%H:%M")
-                    ))
-            else:
-                validated_periods.append((start_str, end_str))
-        
-        # 最后确认每个时间段的时长
-        final_periods = []
-        for start_str, end_str in validated_periods:
-            start_period = datetime.strptime(start_str, "%H:%M")
-            end_period = datetime.strptime(end_str, "%H:%M")
-            
-            # 处理跨天情况
-            if end_period < start_period:
-                end_period = end_period + timedelta(days=1)
-                
-            period_minutes = (end_period - start_period).total_seconds() / 60
-            
-            # 确保不超过最大允许时间
-            if period_minutes > max_minutes:
-                end_period = start_period + timedelta(minutes=max_minutes)
-                end_str = end_period.strftime("%H:%M")
-                
-            final_periods.append((start_str, end_str))
-        
-        return final_periods
+        """将长时间段拆分为多个时间段，见AsyncLibraryBooking.split_time_periods"""
+        return self.core.split_time_periods(start_time, end_time, max_minutes, min_minutes)
 
+    @METRICS.stage("qrcode")
     def generate_checkin_qrcode(self, seat_id, seat_number):
         """生成签到二维码"""
         try:
@@ -1103,86 +809,11 @@ class LibraryBooking:
 
     def get_reservations(self):
         """获取当前用户的预约列表"""
-        try:
-            # 计算查询日期范围（前一天到后一天）
-            today = datetime.now()
-            begin_date = (today - timedelta(days=1)).strftime("%Y-%m-%d")
-            end_date = (today + timedelta(days=7)).strftime("%Y-%m-%d")
-            
-            # 构建请求URL和参数
-            url = f"https://{self.base_url}/ic-web/reserve/resvInfo"
-            params = {
-                "beginDate": begin_date,
-                "endDate": end_date,
-                "needStatus": "6",
-                "page": "1",
-                "pageNum": "50",
-                "orderKey": "gmt_create",
-                "orderModel": "desc"
-            }
-            
-            self.debug_print(f"发送GET请求: {url}")
-            self.debug_print(f"请求参数: {params}")
-            
-            # 发送GET请求
-            response = requests.get(url, headers=self.headers, params=params, verify=False)
-            
-            # 解析JSON响应
-            data = response.json()
-            
-            if self.debug:
-                self.debug_print(f"响应状态码: {response.status_code}")
-                self.debug_print(f"响应数据大小: {len(response.content)} 字节")
-                if data["code"] == 0:
-                    reservations_count = len(data["data"]) if "data" in data else 0
-                    self.debug_print(f"预约记录数: {reservations_count}")
-                    if reservations_count > 0:
-                        self.debug_print(f"预约记录示例: {json.dumps(data['data'][0], indent=2, ensure_ascii=False)}")
-                        
-                        # 输出所有不同的状态码，帮助发现新的状态类型
-                        if "data" in data and len(data["data"]) > 0:
-                            status_codes = set(item["resvStatus"] for item in data["data"])
-                            self.debug_print(f"发现的状态码: {status_codes}")
-                            for code in status_codes:
-                                desc = self.get_reservation_status_description(code)
-                                self.debug_print(f"状态码 {code}: {desc}")
-                else:
-                    self.debug_print(f"错误响应: {json.dumps(data, indent=2, ensure_ascii=False)}")
-            
-            if data["code"] == 0:
-                reservations = data["data"]
-                return reservations
-            else:
-                print(f"\033[31m获取预约列表失败: {data.get('message', '未知错误')}\033[0m")
-                return None
-                
-        except Exception as e:
-            print(f"\033[31m[ERROR] 获取预约列表时发生错误: {str(e)}\033[0m")
-            if self.debug:
-                import traceback
-                self.debug_print(f"异常详情: {traceback.format_exc()}")
-            return None
+        return self._run(self.core.get_reservations())
 
     def get_reservation_status_description(self, status_code):
-        """
-        根据状态码返回友好的预约状态描述
-        
-        Args:
-            status_code: 预约状态码
-            
-        Returns:
-            status_description: 状态描述字符串
-        """
-        status_map = {
-            1027: "已预约（等待签到）",
-            1093: "已签到（使用中）",
-            1029: "已超时（未签到被系统取消）",
-            3141: "暂时离开",
-            1031: "已终止（管理员终止）",
-            1033: "已删除（被管理员删除）"
-        }
-        
-        return status_map.get(status_code, f"未知状态({status_code})")
+        """根据状态码返回友好的预约状态描述"""
+        return self.core.get_reservation_status_description(status_code)
         
     def display_reservations(self, reservations):
         """显示预约列表并允许用户选择查看签到二维码或删除预约"""
@@ -1338,98 +969,27 @@ class LibraryBooking:
 
     def sign_reservation(self, devSn):
         """发送请求签到预约"""
-        try:
-            lurl = f"https://{self.base_url}/ic-web/phoneSeatReserve/login"
-            
-            # 发送POST请求
-            login_data = {
-                "devSn": devSn,
-                "type": "1",
-                "bind": 0,
-                "loginType": 2
-            }
-            
-            response_login = requests.post(url=lurl, json=login_data, headers=self.headers, timeout=60)
-            
-            response_login_data = response_login.json()
-            
-            if self.debug:
-                self.debug_print(f"响应状态码: {response_login.status_code}")
-                self.debug_print(f"响应数据: {json.dumps(response_login_data, indent=2, ensure_ascii=False)}")
-            
-            resvId = response_login_data.get('data').get('reserveInfo').get('resvId')
-            # 构造请求数据
-            data = {"resvId": resvId}
-            
-            self.debug_print(f"发送POST请求: https://{self.base_url}/ic-web/phoneSeatReserve/sign")
-            self.debug_print(f"请求数据: {data}")
-            
-            # 发送POST请求
-            url = f"https://{self.base_url}/ic-web/phoneSeatReserve/sign"
-            response = requests.post(url, headers=self.headers, json=data, verify=False)
-            
-            # 解析JSON响应
-            result = response.json()
-            
-            if self.debug:
-                self.debug_print(f"响应状态码: {response.status_code}")
-                self.debug_print(f"响应数据: {json.dumps(result, indent=2, ensure_ascii=False)}")
-            
-            if result["code"] == 0:
-                return True
-            else:
-                print(f"\033[31m[ERROR] 签到失败: {result.get('message', '未知错误')}\033[0m")
-                return False
-                
-        except Exception as e:
-            print(f"\033[31m[ERROR] 签到请求发生错误: {str(e)}\033[0m")
-            if self.debug:
-                import traceback
-                self.debug_print(f"异常详情: {traceback.format_exc()}")
-            return False
-        finally:
-            if 'conn' in locals():
-                conn.close()
+        return self._run(self.core.sign_reservation(devSn))
     
     def delete_reservation(self, uuid):
         """发送请求删除预约"""
-        try:
-            # 构建请求URL
-            url = f"https://{self.base_url}/ic-web/reserve/delete"
-            
-            # 构造请求数据
-            data = {"uuid": uuid}
-            
-            self.debug_print(f"发送POST请求: {url}")
-            self.debug_print(f"请求数据: {json.dumps(data)}")
-            
-            # 发送POST请求
-            response = requests.post(url, headers=self.headers, json=data, verify=False)
-            
-            # 解析JSON响应
-            result = response.json()
-            
-            if self.debug:
-                self.debug_print(f"响应状态码: {response.status_code}")
-                self.debug_print(f"响应数据: {json.dumps(result, indent=2, ensure_ascii=False)}")
-            
-            if result["code"] == 0:
-                return True
-            else:
-                print(f"\033[31m删除预约失败: {result.get('message', '未知错误')}\033[0m")
-                return False
-                
-        except Exception as e:
-            print(f"\033[31m[ERROR] 删除预约请求发生错误: {str(e)}\033[0m")
-            if self.debug:
-                import traceback
-                self.debug_print(f"异常详情: {traceback.format_exc()}")
-            return False
+        return self._run(self.core.delete_reservation(uuid))
+
+    def auto_book_at_time(self, seat_info, date_str, start_time, end_time, target_time, room_number, seats_info, room_id,
+                          prearm_seconds=5, concurrent_periods=True, fallback_seats=None, parallelism=2):
+        """在指定时间自动预约座位
 
-    def auto_book_at_time(self, seat_info, date_str, start_time, end_time, target_time, room_number, seats_info, room_id):
-        """在指定时间自动预约座位"""
-        seat_number = seat_info["devName"]
-        seat_sn = seat_info["devId"]
+        Args:
+            prearm_seconds: 在预约时间前多少秒进入预备阶段（预热连接、预构建请求）
+            concurrent_periods: 拆分后的多个时间段是否并发提交，False时按顺序逐段提交
+            fallback_seats: 按优先级排列的备选座位字典列表（可选，可跨房间，见collect_fallback_seats），
+                首选座位被占时依次尝试
+            parallelism: 同时尝试的候选座位数
+        """
+        seat_number = seat_info.name
+        seat_sn = seat_info.dev_id
+        candidates = [seat_info.with_room(self.rooms_info[room_number]["name"])] + list(fallback_seats or [])
+        candidates = self.rank_candidates(candidates, date_str, start_time, end_time)
         
         # 清理可能存在的非法Unicode字符
         start_time = ''.join(char for char in start_time if ord(char) < 0xD800 or ord(char) > 0xDFFF)
@@ -1466,6 +1026,9 @@ class LibraryBooking:
         print(f"\n将在 {target_datetime.strftime('%Y-%m-%d %H:%M:%S')} 自动预约以下座位：")
         print(f"房间: {self.rooms_info[room_number]['name']}")
         print(f"座位号: {seat_number}")
+        if len(candidates) > 1:
+            fallback_str = ", ".join(f"{seat.name}({seat.room_name})" for seat in candidates[1:])
+            print(f"备选座位: {fallback_str}")
         print(f"日期: {self.year}-{date_str[:2]}-{date_str[2:]}")
         if is_split:
             periods_str = ", ".join([f"{s}-{e}" for s, e in time_periods])
@@ -1493,111 +1056,266 @@ class LibraryBooking:
         if not self.refresh_cookie_if_needed(force_refresh=True):
             print("\n\033[31m[ERROR] 自动刷新登录状态失败，预约可能会失败\033[0m")
             
-        # 继续等待到预约时间
-        while datetime.now() < target_datetime:
+        # 等待到预备阶段
+        prearm_time = target_datetime - timedelta(seconds=prearm_seconds)
+        while datetime.now() < prearm_time:
             # 每秒显示一次倒计时信息
             remaining = (target_datetime - datetime.now()).total_seconds()
             print(f"\r距离预约还有: {int(remaining//60)}分钟 {int(remaining%60)}秒", end="")
             time.sleep(1)
         
-        print(f"\n\n已到达预约时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print("正在发送预约请求...")
-        
-        # 发送预约请求
-        success_flag = False
-        if is_split:
-            all_success = True
-            success_periods = []
-            
-            for i, (period_start, period_end) in enumerate(time_periods, 1):
-                print(f"\n提交第 {i}/{len(time_periods)} 段预约 ({period_start}-{period_end})...")
-                result = self.make_reservation(seat_sn, period_start, period_end, date_str)
-                if result and result.get("code") == 0:
-                    success_periods.append((period_start, period_end))
-                else:
-                    all_success = False
-                    
-                    # 如果第一次失败，重试一次
-                    if result and "已经预约" not in str(result.get("message", "")):
-                        print("预约失败，正在重试...")
-                        time.sleep(1)  # 等待1秒后重试
-                        result = self.make_reservation(seat_sn, period_start, period_end, date_str)
-                        if result and result.get("code") == 0:
-                            success_periods.append((period_start, period_end))
-                            all_success = True
-            
-            if all_success:
-                print(f"\n\033[32m[SUCCESS] 所有时间段预约成功！\033[0m")
-                success_flag = True
-            elif success_periods:
-                print(f"\n\033[33m[部分成功] 以下时间段预约成功：\033[0m")
-                for i, (s, e) in enumerate(success_periods, 1):
-                    print(f"  {i}. {s}-{e}")
-                success_flag = True
-            
-            if success_periods:
-                print(f"\n预约详情：")
-                print(f"房间: {self.rooms_info[room_number]['name']}")
-                print(f"座位号: {seat_number}")
-                print(f"日期: {self.year}-{date_str[:2]}-{date_str[2:]}")
-                periods_str = ", ".join([f"{s}-{e}" for s, e in success_periods])
-                print(f"时间: {periods_str}")
-        else:
-            # 常规单次预约
-            result = self.make_reservation(seat_sn, start_time.strip(), end_time.strip(), date_str)
-            
-            # 如果失败，重试一次
-            if result and result.get("code") != 0 and "已经预约" not in str(result.get("message", "")):
-                print("预约失败，正在重试...")
-                time.sleep(1)  # 等待1秒后重试
-                result = self.make_reservation(seat_sn, start_time.strip(), end_time.strip(), date_str)
-            
-            if result and result.get("code") == 0:
-                print(f"\n\033[32m[SUCCESS] 预约成功！\033[0m")
-                print(f"\n预约详情：")
-                print(f"房间: {self.rooms_info[room_number]['name']}")
-                print(f"座位号: {seat_number}")
-                print(f"日期: {self.year}-{date_str[:2]}-{date_str[2:]}")
-                print(f"时间: {start_time.strip()} - {end_time.strip()}")
-                success_flag = True
-        
-        # 如果预约成功，生成签到二维码
-        if success_flag:
+        # 预备阶段：预热连接池并预先序列化所有时间段的预约请求，预约时间到达时只需写出字节
+        print("\n\n进入预备阶段，正在预热连接并预构建预约请求...")
+        prepared_by_seat = self._run(self.core.prearm_candidates(candidates, time_periods, date_str, parallelism))
+        
+        # 估计服务器时钟偏差，按服务器时间 T0 - RTT/2 发出请求
+        self.clock_sync = self.sync_server_clock()
+        print(f"服务器时钟偏差: {self.clock_sync.offset * 1000:+.1f} ms, RTT: {self.clock_sync.rtt * 1000:.1f} ms")
+        
+        # 继续等待到预约时间：先粗略睡眠，再在单调时钟上自旋，到点后立即提交所有时间段
+        server_t0 = target_datetime.timestamp()
+        fired = {}
+        
+        def fire():
+            fired["perf"] = time.perf_counter()
+            fired["lateness"] = time.time() + self.clock_sync.offset - server_t0
+            if len(candidates) == 1:
+                periods = self.submit_periods(seat_sn, time_periods, date_str, prepared=prepared_by_seat[0],
+                                              concurrent=concurrent_periods)
+                return self._single_seat_report(candidates[0], periods, fired["perf"])
+            return self.race_candidates(candidates, time_periods, date_str, prepared=prepared_by_seat,
+                                        parallelism=parallelism)
+        
+        race = self.fire_scheduler.fire_at(server_t0, fire, sync=self.clock_sync)
+        
+        print(f"\n\n已到达预约时间: {datetime.fromtimestamp(server_t0).strftime('%Y-%m-%d %H:%M:%S')}")
+        if len(candidates) > 1:
+            self.report_race(race)
+        success_periods = self.report_period_results(race["periods"])
+        
+        if success_periods:
+            seat_number = race["seat"].name
+            seat_sn = race["seat"].dev_id
+            print(f"\n预约详情：")
+            print(f"房间: {race['seat'].room_name or self.rooms_info[room_number]['name']}")
+            print(f"座位号: {seat_number}")
+            print(f"日期: {self.year}-{date_str[:2]}-{date_str[2:]}")
+            periods_str = ", ".join([f"{s}-{e}" for s, e in success_periods])
+            print(f"时间: {periods_str}")
+        
+        # 抢到时间段（包括只抢到部分时间段）时生成签到二维码
+        if success_periods:
             print("\n正在生成签到二维码...")
             self.generate_checkin_qrcode(seat_sn, seat_number)
-            
+        
+        if race["success"]:
             # 发出系统提示音通知用户
             print('\a')  # 系统提示音
+        elif race["partial"]:
+            missing = ", ".join(f"{item['start']}-{item['end']}" for item in race["periods"] if not item["success"])
+            print(f"\n\033[33m[部分成功] 以下时间段未预约到，需要手动补约: {missing}\033[0m")
+            print('\a\a')
         else:
             print("\n\033[31m[ERROR] 所有预约请求均失败\033[0m")
             print('\a\a\a')  # 多次提示音表示错误
+        
+        # 输出从预约时间到请求首字节写出的延迟和开火抖动
+        prepared_list = [prepared for prepared_seat in prepared_by_seat for prepared in prepared_seat]
+        self.print_fire_delays(prepared_list, fired["perf"], fired["lateness"])
+        print(self.fire_scheduler.format_jitter_report())
+        
+        # 调试模式下输出连接复用情况和各接口耗时，便于确认预约请求没有重新握手
+        if self.debug:
+            self.print_connection_stats()
+            self.print_metrics()
+
+    def prearm_reservations(self, seat_sn, time_periods, date_str, connections=None):
+        """预热连接池并预构建所有时间段的预约请求
+
+        Returns:
+            与time_periods顺序一致的PreparedReservation列表（构建失败的为None）
+        """
+        return self._run(self.core.prearm(seat_sn, time_periods, date_str, connections))
 
-    def request(self, method, url, **kwargs):
-        """请求包装器，确保每次请求都使用随机UA
+    def submit_periods(self, seat_sn, time_periods, date_str, prepared=None, concurrent=True, retry_policy=None):
+        """提交一个预约计划的所有时间段，参数与返回值见AsyncLibraryBooking.submit_periods"""
+        return self._run(self.core.submit_periods(seat_sn, time_periods, date_str, prepared, concurrent,
+                                                  retry_policy))
+
+    def report_period_results(self, period_results):
+        """打印每个时间段的提交结果（服务器返回码、耗时、尝试次数）及汇总
+
+        Returns:
+            预约成功的 (开始时间, 结束时间) 列表
+        """
+        print("\n各时间段提交结果：")
+        for i, item in enumerate(period_results, 1):
+            status = "\033[32m成功\033[0m" if item["success"] else f"\033[31m失败: {item['message']}\033[0m"
+            print(f"  {i}. {item['start']}-{item['end']} {status} "
+                  f"(code={item['code']}, {item['latency_ms']:.1f} ms, 尝试{item['attempts']}次)")
+        
+        success_periods = [(item["start"], item["end"]) for item in period_results if item["success"]]
+        if success_periods and len(success_periods) == len(period_results):
+            print(f"\n\033[32m[SUCCESS] 所有时间段预约成功！\033[0m")
+        elif success_periods:
+            print(f"\n\033[33m[部分成功] 以下时间段预约成功：\033[0m")
+            for i, (s, e) in enumerate(success_periods, 1):
+                print(f"  {i}. {s}-{e}")
+        return success_periods
+
+    def race_candidates(self, candidates, time_periods, date_str, prepared=None, parallelism=2, retry_policy=None):
+        """按优先级并发尝试多个候选座位，参数与返回值见AsyncLibraryBooking.race_candidates"""
+        return self._run(self.core.race_candidates(candidates, time_periods, date_str, prepared, parallelism,
+                                                   retry_policy))
+
+    @staticmethod
+    def _single_seat_report(seat, period_results, start_perf):
+        """把单个座位的提交结果整理成与race_candidates相同的格式"""
+        success = all(item["success"] for item in period_results)
+        held = any(item["success"] for item in period_results)
+        return {
+            "success": success,
+            "partial": held and not success,
+            "rank": 1 if held else None,
+            "seat": seat if held else None,
+            "time_to_success_ms": (time.perf_counter() - start_perf) * 1000 if success else None,
+            "periods": period_results,
+            "attempts": [],
+            "cancelled": [],
+        }
+
+    def report_race(self, race):
+        """打印候选座位的尝试情况：每个座位的结果、胜出排名、成功耗时以及自动取消的预约"""
+        status_names = {"won": "\033[32m胜出\033[0m", "cancelled": "\033[33m已取消\033[0m",
+                        "failed": "\033[31m失败\033[0m", "partial": "\033[33m部分成功\033[0m", "skipped": "未尝试"}
+        print("\n候选座位尝试结果：")
+        for attempt in race["attempts"]:
+            seat = attempt["seat"]
+            finished = f", {attempt['finished_ms']:.1f} ms" if attempt["finished_ms"] is not None else ""
+            print(f"  #{attempt['rank']} {seat.name}({seat.room_name or ''}) "
+                  f"{status_names.get(attempt['status'], attempt['status'])}{finished}")
+        
+        if race["success"]:
+            print(f"胜出排名: #{race['rank']}, 从开火到成功耗时: {race['time_to_success_ms']:.1f} ms")
+        elif race["partial"]:
+            print(f"\033[33m#{race['rank']} 只抢到部分时间段\033[0m")
+        for rank, start, end, ok in race["cancelled"]:
+            result = "成功" if ok else "\033[31m失败，请手动取消\033[0m"
+            print(f"  自动取消 #{rank} {start}-{end}: {result}")
+
+    def collect_fallback_seats(self, date_str, room_number, seats_info, text):
+        """解析备选座位输入，返回按优先级排列的Seat列表（带有房间名称）
+
+        Args:
+            text: 逗号分隔的座位号，本房间直接写座位号（如203-014），其他房间写 房间编号:座位号（如3:305-001）
+        """
+        fallback_seats = []
+        other_rooms = {}
+        for item in text.replace("，", ",").split(","):
+            item = item.strip()
+            if not item:
+                continue
+            number, _, name = item.rpartition(":")
+            number = number.strip() or room_number
+            if number not in self.rooms_info:
+                print(f"\033[33m[WARNING] 未找到房间 {number}，已忽略 {item}\033[0m")
+                continue
+            if number == room_number:
+                room_seats = seats_info
+            else:
+                if number not in other_rooms:
+                    other_rooms[number] = self.get_seats_info(date_str, self.rooms_info[number]["id"]) or {}
+                room_seats = other_rooms[number]
+            name = name.strip()
+            if name not in room_seats:
+                print(f"\033[33m[WARNING] 房间 {self.rooms_info[number]['name']} 中未找到座位 {name}，已忽略\033[0m")
+                continue
+            fallback_seats.append(room_seats[name].with_room(self.rooms_info[number]["name"]))
+        return fallback_seats
+
+    def sync_server_clock(self, count=8):
+        """估计本机与服务器的时钟偏差和RTT
+
+        Returns:
+            ClockSync
+        """
+        return self._run(self.core.sync_server_clock(count))
+
+    def fire_prepared(self, prepared):
+        """发送预构建的预约请求"""
+        return self._run(self.core.fire_prepared(prepared))
+
+    def print_fire_delays(self, prepared_list, fire_perf, fire_lateness=0.0):
+        """打印从预约时间T0到每个请求首字节写出的延迟（按服务器时间计算）
+
+        Args:
+            prepared_list: 已发送的PreparedReservation列表
+            fire_perf: 开火时刻的time.perf_counter()
+            fire_lateness: 开火时刻相对T0的延迟（秒），提前RTT/2开火时为负数
+        """
+        delays = [(p, fire_lateness + p.sent_at - fire_perf) for p in prepared_list if p and p.sent_at]
+        if not delays:
+            return
+        print("\nT0到请求首字节写出的延迟：")
+        for prepared, delay in delays:
+            print(f"  {prepared.begin_time}-{prepared.end_time}: {delay * 1000:.2f} ms")
+
+    def request(self, method, url, endpoint=None, **kwargs):
+        """请求包装器，确保每次请求都使用随机UA，并通过共享连接池发送
         
         Args:
             method: 请求方法，如'get', 'post'等
             url: 请求URL
+            endpoint: 统计连接复用时使用的接口名（可选，默认由请求方法和路径生成）
             **kwargs: 请求的其他参数
             
         Returns:
-            requests.Response: 请求响应对象
+            HTTPResponse: 响应对象，提供status_code、headers、content、text和json()
         """
-        # 确保headers使用最新的
-        if 'headers' not in kwargs:
-            kwargs['headers'] = self.headers
-            
-        # 禁用SSL警告
+        # 禁用SSL证书校验
         kwargs['verify'] = False
-        
-        # 发送请求
-        self.debug_print(f"发送 {method.upper()} 请求: {url}")
-        response = getattr(requests, method.lower())(url, **kwargs)
-        self.debug_print(f"响应状态码: {response.status_code}")
-        
-        return response
+        return self._run(self.core.request(method, url, endpoint=endpoint, **kwargs))
+
+    def get_connection_stats(self):
+        """获取各接口的连接复用统计
+
+        Returns:
+            dict: {接口名: {"hits": 复用次数, "misses": 新建连接次数}}
+        """
+        return self.core.get_connection_stats()
+
+    def print_connection_stats(self):
+        """打印各接口的连接复用统计"""
+        print("\n连接复用统计：")
+        print(self.core.http.stats.format_report())
+
+    def get_metrics(self):
+        """获取各接口的延迟直方图（按状态码和code区分）以及登录、解析、绘图等阶段的耗时，见metrics.Metrics.snapshot"""
+        return METRICS.snapshot()
+
+    def export_metrics(self, path):
+        """把耗时统计写入JSON文件"""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(METRICS.to_json(indent=2))
+        return path
+
+    def print_metrics(self):
+        """打印各接口和各阶段的耗时统计"""
+        print("\n耗时统计：")
+        print(METRICS.format_report())
+
+    def close(self):
+        """关闭连接池并停止后台事件循环，写完剩余的历史记录"""
+        self._run(self.core.close())
+        self._loop.stop()
+        if self.history:
+            self.history.close()
 
 def main():
+    parser = argparse.ArgumentParser(description="广州大学图书馆座位预约脚本")
+    parser.add_argument("--history", help="把查询到的座位变化写入该历史数据库（如history.db），用于备选座位排序，默认不记录")
+    args = parser.parse_args()
+
     # 初始化账号管理器
     account_manager = AccountManager()
     
@@ -1738,7 +1456,7 @@ def main():
         choice = ""
     
     # 初始化预约系统
-    booking = LibraryBooking()
+    booking = LibraryBooking(history=args.history)
     
     # 使用选择的账号初始化cookie
     print("\n正在检查登录状态...")
@@ -1759,8 +1477,10 @@ def main():
         print("2. 查询已有预约")
         print("3. 设置调试模式")
         print("4. 切换账号")
-        print("5. 退出程序")
-        operation = input("\n请输入操作编号 (1/2/3/4/5): ")
+        print("5. 全馆空闲座位查询")
+        print("6. 捡漏监控（有座位被取消或释放时自动预约）")
+        print("7. 退出程序")
+        operation = input("\n请输入操作编号 (1/2/3/4/5/6/7): ")
         
         if operation == "1":
             # 以下为新建预约流程
@@ -1830,22 +1550,25 @@ def main():
             
             # 获取座位信息
             print(f"\n正在获取 {rooms_info[room_number]['name']} 的座位信息...")
-            seats_info = booking.get_seats_info(date_str, room_id)
+            seats_info = booking.get_seats_info(date_str, room_id, build_matrix=True)
             if not seats_info:
                 print("\033[31m[ERROR] 获取座位信息失败\033[0m")
                 continue
+            occupancy = booking.get_occupancy(date_str, room_id)
+            seat_search = SeatSearch(LibrarySnapshot.from_room(rooms_info, date_str, room_number, seats_info))
             
             # 选择预约模式
             print("\n请选择预约模式：")
             print("1. 常规模式 - 先选择座位，再选择时间")
             print("2. 时间优先 - 先选择时间，再查找可用座位")
             print("3. 定时预约 - 在指定时间自动预约选择的座位")
-            mode = input("\n请输入模式编号 (1/2/3): ")
+            print("4. 组队预约 - 为多个账号预约相邻的座位")
+            mode = input("\n请输入模式编号 (1/2/3/4): ")
             
             if mode == "1":
                 # 显示座位布局图
                 print("\n正在生成座位布局图...")
-                booking.visualize_seats(seats_info, room_id)
+                booking.visualize_seats(seats_info, room_id, occupancy=occupancy)
                 
                 # 输入座位号
                 seat_number = input("\n请输入座位号（例如203-013）: ")
@@ -1904,17 +1627,16 @@ def main():
                     
                     # 显示座位布局图
                     print("\n正在生成座位布局图...")
-                    booking.visualize_seats(seats_info, room_id, start_time, end_time)
+                    booking.visualize_seats(seats_info, room_id, start_time, end_time, occupancy)
                     
-                    # 找出该时间段可用的座位
-                    available_seats = {}
-                    for seat_number, seat_info in seats_info.items():
-                        if booking.check_seat_available(seat_info, start_time, end_time):
-                            available_seats[seat_number] = seat_info
+                    # 找出该时间段可用的座位（占用矩阵上的一次向量化查询）
+                    available_seats = {seat_number: seats_info[seat_number]
+                                       for seat_number in occupancy.free_seats(start_time, end_time)}
                     
                     # 显示可用座位
                     if not available_seats:
                         print(f"\n\033[33m[WARNING] 在 {start_time}-{end_time} 时段内没有可用座位\033[0m")
+                        booking.offer_seat_hops(date_str, start_time, end_time, seat_search)
                         continue
                         
                     print(f"\n在 {start_time}-{end_time} 时段内可用的座位：")
@@ -1931,6 +1653,12 @@ def main():
                     # 显示可用座位列表
                     for seat_number in displayed_seats:
                         print(f"{seat_number}")
+                    
+                    # 按连续空闲时长、空档数给出推荐
+                    recommended = seat_search.search(date_str, start_time, end_time, k=5)
+                    if recommended:
+                        print("\n推荐座位（覆盖该时段的连续空闲最长、空档最少）：")
+                        print(format_results(recommended))
                         
                     # 选择座位
                     seat_number = input("\n请直接输入座位号（例如203-013）: ")
@@ -1957,7 +1685,7 @@ def main():
                 if auto_mode == "1":
                     # 显示座位布局图
                     print("\n正在生成座位布局图...")
-                    booking.visualize_seats(seats_info, room_id)
+                    booking.visualize_seats(seats_info, room_id, occupancy=occupancy)
                     
                     # 输入座位号
                     seat_number = input("\n请输入座位号（例如203-013）: ")
@@ -2002,17 +1730,16 @@ def main():
                         
                         # 显示座位布局图
                         print("\n正在生成座位布局图...")
-                        booking.visualize_seats(seats_info, room_id, start_time, end_time)
+                        booking.visualize_seats(seats_info, room_id, start_time, end_time, occupancy)
                         
-                        # 找出该时间段可用的座位
-                        available_seats = {}
-                        for seat_number, seat_info in seats_info.items():
-                            if booking.check_seat_available(seat_info, start_time, end_time):
-                                available_seats[seat_number] = seat_info
+                        # 找出该时间段可用的座位（占用矩阵上的一次向量化查询）
+                        available_seats = {seat_number: seats_info[seat_number]
+                                           for seat_number in occupancy.free_seats(start_time, end_time)}
                         
                         # 显示可用座位
                         if not available_seats:
                             print(f"\n\033[33m[WARNING] 在 {start_time}-{end_time} 时段内没有可用座位\033[0m")
+                            booking.offer_seat_hops(date_str, start_time, end_time, seat_search, submit=False)
                             continue
                             
                         print(f"\n在 {start_time}-{end_time} 时段内可用的座位：")
@@ -2029,6 +1756,12 @@ def main():
                         # 显示可用座位列表
                         for seat_number in displayed_seats:
                             print(f"{seat_number}")
+                        
+                        # 按连续空闲时长、空档数给出推荐
+                        recommended = seat_search.search(date_str, start_time, end_time, k=5)
+                        if recommended:
+                            print("\n推荐座位（覆盖该时段的连续空闲最长、空档最少）：")
+                            print(format_results(recommended))
                             
                         # 选择座位
                         seat_number = input("\n请直接输入座位号（例如203-013）: ")
@@ -2047,6 +1780,15 @@ def main():
                         print("\033[31m[ERROR] 无效的方式选择\033[0m")
                         continue
                 
+                # 输入备选座位，首选座位被占时按优先级依次尝试
+                fallback_text = input("\n请输入备选座位（按优先级用逗号分隔，其他房间写 房间编号:座位号，"
+                                      "输入A从全馆自动挑选，直接回车跳过）: ")
+                if fallback_text.strip().upper() == "A":
+                    print("\n正在获取全馆座位信息...")
+                    fallback_seats = booking.auto_fallback_seats(date_str, room_number, seat_info, start_time, end_time)
+                else:
+                    fallback_seats = booking.collect_fallback_seats(date_str, room_number, seats_info, fallback_text)
+                
                 # 输入定时预约的时间
                 print("\n请输入何时发送预约请求：")
                 print("注意：如果当前时间已过6:15，请确保预约的是下一天的座位")
@@ -2055,7 +1797,8 @@ def main():
                 # 创建一个线程来处理定时预约
                 thread = threading.Thread(
                     target=booking.auto_book_at_time,
-                    args=(seat_info, date_str, start_time, end_time, auto_time, room_number, seats_info, room_id)
+                    args=(seat_info, date_str, start_time, end_time, auto_time, room_number, seats_info, room_id),
+                    kwargs={"fallback_seats": fallback_seats}
                 )
                 # 设置为守护线程，这样如果主程序被中断，线程也会停止
                 thread.daemon = True
@@ -2071,30 +1814,61 @@ def main():
                 # 预约完成后继续显示主菜单
                 continue
                 
+            elif mode == "4":
+                # 组队预约：选择成员账号，找出相邻的空闲座位，每人用自己的账号并发预约
+                accounts = account_manager.list_accounts()
+                for i, account in enumerate(accounts, 1):
+                    print(f"{i}. {account['nickname']} ({account['username']})")
+                members_text = input("\n请输入参与的账号编号（用逗号分隔，例如1,2,3）: ")
+                try:
+                    indexes = [int(item) for item in members_text.replace("，", ",").split(",") if item.strip()]
+                    usernames = list(dict.fromkeys(accounts[index - 1]["username"] for index in indexes
+                                                   if 1 <= index <= len(accounts)))
+                except ValueError:
+                    print("\033[31m[ERROR] 请输入有效的账号编号\033[0m")
+                    continue
+                if not usernames:
+                    print("\033[31m[ERROR] 没有选择任何账号\033[0m")
+                    continue
+                
+                time_str = input("请输入预约时间段（格式：HH:MM-HH:MM，例如09:00-12:00）: ")
+                try:
+                    start_time, end_time = [part.strip() for part in time_str.split("-")]
+                    groups = find_seat_groups(seats_info, occupancy, start_time, end_time, len(usernames))
+                except ValueError:
+                    print("\033[31m[ERROR] 时间段格式错误\033[0m")
+                    continue
+                if not groups:
+                    print(f"\n\033[33m[WARNING] 在 {start_time}-{end_time} 时段内找不到 {len(usernames)} 个相邻的空闲座位\033[0m")
+                    continue
+                
+                print(f"\n在 {start_time}-{end_time} 时段内都空闲的相邻座位：")
+                print(format_groups(groups))
+                choice = input("\n请选择座位组编号（输入0返回）: ").strip()
+                if not choice.isdigit() or not 1 <= int(choice) <= len(groups):
+                    continue
+                group_seats = groups[int(choice) - 1]["seats"]
+                
+                print(f"\n正在为 {len(usernames)} 个账号并发登录并提交预约...")
+                results = booking.book_group(account_manager, usernames, group_seats, start_time, end_time, date_str)
+                print("\n组队预约结果：")
+                for result in results:
+                    status = "\033[32m成功\033[0m" if result["success"] else "\033[31m失败\033[0m"
+                    messages = "; ".join(f"{item['start']}-{item['end']} {item['message']}"
+                                         for item in result["periods"] if not item["success"])
+                    print(f"  {result['username']} -> {result['seat'].name} {status} {messages}")
+                continue
+                
             else:
                 print("\033[31m[ERROR] 无效的模式选择\033[0m")
                 continue
             
             # 提交预约请求
-            if mode == "1" and is_split:
+            if mode in ("1", "2") and is_split:
+                # 多个时间段互不依赖，并发提交
                 print("\n正在提交多段预约请求...")
-                all_success = True
-                success_periods = []
-                
-                for i, (period_start, period_end) in enumerate(time_periods, 1):
-                    print(f"\n提交第 {i}/{len(time_periods)} 段预约 ({period_start}-{period_end})...")
-                    result = booking.make_reservation(seat_info["devId"], period_start, period_end, date_str)
-                    if result and result.get("code") == 0:
-                        success_periods.append((period_start, period_end))
-                    else:
-                        all_success = False
-                
-                if all_success:
-                    print(f"\n\033[32m[SUCCESS] 所有时间段预约成功！\033[0m")
-                elif success_periods:
-                    print(f"\n\033[33m[部分成功] 以下时间段预约成功：\033[0m")
-                    for i, (s, e) in enumerate(success_periods, 1):
-                        print(f"  {i}. {s}-{e}")
+                period_results = booking.submit_periods(seat_info.dev_id, time_periods, date_str)
+                success_periods = booking.report_period_results(period_results)
                 
                 if success_periods:
                     print(f"\n预约详情：")
@@ -2106,41 +1880,10 @@ def main():
                     
                     # 生成签到二维码
                     print("\n正在生成签到二维码...")
-                    booking.generate_checkin_qrcode(seat_info["devId"], seat_number)
-            elif mode == "2" and is_split:
-                print("\n正在提交多段预约请求...")
-                all_success = True
-                success_periods = []
-                
-                for i, (period_start, period_end) in enumerate(time_periods, 1):
-                    print(f"\n提交第 {i}/{len(time_periods)} 段预约 ({period_start}-{period_end})...")
-                    result = booking.make_reservation(seat_info["devId"], period_start, period_end, date_str)
-                    if result and result.get("code") == 0:
-                        success_periods.append((period_start, period_end))
-                    else:
-                        all_success = False
-                
-                if all_success:
-                    print(f"\n\033[32m[SUCCESS] 所有时间段预约成功！\033[0m")
-                elif success_periods:
-                    print(f"\n\033[33m[部分成功] 以下时间段预约成功：\033[0m")
-                    for i, (s, e) in enumerate(success_periods, 1):
-                        print(f"  {i}. {s}-{e}")
-                
-                if success_periods:
-                    print(f"\n预约详情：")
-                    print(f"房间: {rooms_info[room_number]['name']}")
-                    print(f"座位号: {seat_number}")
-                    print(f"日期: {booking.year}-{date_str[:2]}-{date_str[2:]}")
-                    periods_str = ", ".join([f"{s}-{e}" for s, e in success_periods])
-                    print(f"时间: {periods_str}")
-                    
-                    # 生成签到二维码
-                    print("\n正在生成签到二维码...")
-                    booking.generate_checkin_qrcode(seat_info["devId"], seat_number)
+                    booking.generate_checkin_qrcode(seat_info.dev_id, seat_number)
             else:
                 print("\n正在提交预约请求...")
-                result = booking.make_reservation(seat_info["devId"], start_time.strip(), end_time.strip(), date_str)
+                result = booking.make_reservation(seat_info.dev_id, start_time.strip(), end_time.strip(), date_str)
                 
                 if result and result.get("code") == 0:
                     print(f"\n预约详情：")
@@ -2151,7 +1894,7 @@ def main():
                     
                     # 生成签到二维码
                     print("\n正在生成签到二维码...")
-                    booking.generate_checkin_qrcode(seat_info["devId"], seat_number)
+                    booking.generate_checkin_qrcode(seat_info.dev_id, seat_number)
                     
         elif operation == "2":
             # 查询预约模式
@@ -2190,7 +1933,17 @@ def main():
                 print("没有已保存的账号")
                 continue
                 
-            switch_choice = input("请输入账号编号 (输入0返回): ")
+            print("A. 并行登录所有账号（登录状态会按账号保存，之后切换无需重新登录）")
+            switch_choice = input("请输入账号编号 (输入0返回): ").strip()
+            
+            if switch_choice.upper() == "A":
+                print(f"\n正在并行登录 {account_count} 个账号...")
+                login_pool = LoginPool(account_manager, booking.cookie_store, base_url=booking.base_url,
+                                       scheme=booking.scheme)
+                results, wall_seconds = login_pool.login_all()
+                print("\n登录结果：")
+                print(login_pool.format_report(results, wall_seconds))
+                continue
             
             try:
                 index = int(switch_choice)
@@ -2210,9 +1963,9 @@ def main():
                     
                     print(f"\n已切换到账号：{selected_account['nickname']} ({selected_username})")
                     
-                    # 使用新账号初始化cookie
+                    # 使用新账号初始化cookie，该账号保存的登录状态仍有效时无需重新登录
                     print("\n正在检查登录状态...")
-                    if not booking.initialize_cookie(selected_username, selected_password, force_refresh=True):
+                    if not booking.initialize_cookie(selected_username, selected_password):
                         print("\033[31m[ERROR] 登录失败，程序退出\033[0m")
                         return
                     
@@ -2225,7 +1978,68 @@ def main():
                 print("\n请输入有效的数字")
                 
         elif operation == "5":
+            # 一次查询所有房间，找出某天某时段全馆的空闲座位
+            dates_text = input("\n请输入日期（格式：MMDD，多个日期用逗号分隔）: ")
+            dates = [item.strip() for item in dates_text.replace("，", ",").split(",") if item.strip()]
+            time_str = input("请输入时间段（格式：HH:MM-HH:MM，例如09:00-17:00）: ")
+            try:
+                start_time, end_time = [part.strip() for part in time_str.split("-")]
+            except ValueError:
+                print("\033[31m[ERROR] 时间段格式错误\033[0m")
+                continue
+            if not dates:
+                print("\033[31m[ERROR] 请输入日期\033[0m")
+                continue
+            
+            print(f"\n正在并发获取 {len(dates)} 天内所有房间的座位信息...")
+            snapshot = booking.snapshot(dates)
+            if snapshot is None:
+                print("\033[31m[ERROR] 获取房间信息失败\033[0m")
+                continue
+            print(snapshot.format_report())
+            
+            for date_str in dates:
+                try:
+                    free = snapshot.free_seats(date_str, start_time, end_time)
+                except ValueError:
+                    print("\033[31m[ERROR] 时间段格式错误\033[0m")
+                    break
+                print(f"\n{date_str} {start_time}-{end_time} 全馆空闲座位共 {len(free)} 个：")
+                for room_number, count in snapshot.free_count(date_str, start_time, end_time).items():
+                    if count:
+                        print(f"  {snapshot.room_name(room_number)}: {count} 个")
+                if free:
+                    print("例如: " + ", ".join(seat.name for seat in free[:20]))
+            
+        elif operation == "6":
+            # 轮询房间，有人取消预约或未签到被释放时立即预约
+            date_str = input("\n请输入预约日期（格式：MMDD，例如0321）: ").strip()
+            rooms_text = input("请输入要监控的房间号（多个用逗号分隔，例如203,305）: ")
+            room_numbers = [item.strip().upper() for item in rooms_text.replace("，", ",").split(",") if item.strip()]
+            time_str = input("请输入时间段（格式：HH:MM-HH:MM，例如14:00-18:00）: ")
+            try:
+                start_time, end_time = [part.strip() for part in time_str.split("-")]
+                to_minutes(start_time), to_minutes(end_time)
+            except ValueError:
+                print("\033[31m[ERROR] 时间段格式错误\033[0m")
+                continue
+            seats_text = input("只要这些座位（可选，按优先顺序用逗号分隔，直接回车表示任何座位）: ")
+            seats = [item.strip() for item in seats_text.replace("，", ",").split(",") if item.strip()]
+            
+            print("\n开始监控，按Ctrl+C停止...")
+            stats = booking.watch_seats(date_str, room_numbers, start_time, end_time, seats=seats)
+            if stats is None:
+                print("\033[31m[ERROR] 获取房间信息失败或房间号不存在\033[0m")
+                continue
+            watch = stats["watches"][0]
+            if watch["done"]:
+                print(f"\033[32m[SUCCESS] 已预约座位 {watch['seat']}\033[0m")
+            else:
+                print(f"监控已停止，共查询 {stats['requests']} 次，未抢到座位")
+            
+        elif operation == "7":
             # 退出程序
+            booking.close()
             print("\n感谢使用，再见！")
             break
             
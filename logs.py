@@ -0,0 +1,153 @@
+"""
+结构化日志
+基于标准库logging，替代原来直接print的调试输出：
+- 按级别过滤，未开启的级别只有一次比较的开销
+- 延迟格式化：logger.debug("响应数据: %s", Payload(data)) 只有在真正输出时才序列化data
+- payload按大小采样：列表只保留前几项，序列化后的文本超过上限时截断，几百KB的座位数据不会整段打印
+- 请求头中的Cookie等字段输出前替换掉
+- 终端输出经QueueHandler交给后台线程，发送请求和解析座位的协程不会被终端渲染阻塞
+
+用法:
+    from logs import Payload, RedactedHeaders, get_logger
+    logger = get_logger("booking")
+    logger.debug("请求头: %s", RedactedHeaders(headers))
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+LOGGER_NAME = "libbooking"
+# payload序列化后的最大字符数和列表保留的项数
+PAYLOAD_LIMIT = 2000
+PAYLOAD_ITEMS = 3
+SENSITIVE_HEADERS = frozenset({"cookie", "set-cookie", "authorization"})
+
+_COLORS = {logging.DEBUG: "\033[36m", logging.WARNING: "\033[33m", logging.ERROR: "\033[31m",
+           logging.CRITICAL: "\033[31m"}
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def _sample(value, items):
+    """列表只保留前items项（并注明总数），字典递归处理"""
+    if isinstance(value, list):
+        head = [_sample(item, items) for item in value[:items]]
+        if len(value) > items:
+            head.append(f"……共 {len(value)} 项")
+        return head
+    if isinstance(value, dict):
+        return {key: _sample(item, items) for key, item in value.items()}
+    return value
+
+
+class Payload:
+    """延迟序列化的响应/请求数据，作为日志参数使用
+
+    Args:
+        value: 任意可JSON序列化的对象
+        limit: 序列化后的最大字符数
+        items: 列表保留的项数，为None时不采样
+        indent: JSON缩进
+    """
+    __slots__ = ("value", "limit", "items", "indent")
+
+    def __init__(self, value, limit=PAYLOAD_LIMIT, items=PAYLOAD_ITEMS, indent=None):
+        self.value = value
+        self.limit = limit
+        self.items = items
+        self.indent = indent
+
+    def __str__(self):
+        value = self.value if self.items is None else _sample(self.value, self.items)
+        try:
+            text = json.dumps(value, ensure_ascii=False, indent=self.indent, default=str)
+        except (TypeError, ValueError):
+            text = repr(value)
+        if self.limit and len(text) > self.limit:
+            return f"{text[:self.limit]}……（共 {len(text)} 字符，已截断）"
+        return text
+
+
+class RedactedHeaders:
+    """延迟格式化的请求头，Cookie等字段替换为***"""
+    __slots__ = ("headers",)
+
+    def __init__(self, headers):
+        self.headers = headers
+
+    def __str__(self):
+        return json.dumps({key: "***" if key.lower() in SENSITIVE_HEADERS else value
+                           for key, value in (self.headers or {}).items()}, ensure_ascii=False)
+
+
+class ColorFormatter(logging.Formatter):
+    """与原来的调试输出相同的样式：DEBUG青色、WARNING黄色、ERROR红色，INFO原样输出"""
+    def format(self, record):
+        message = super().format(record)
+        color = _COLORS.get(record.levelno)
+        if color is None:
+            return message
+        return f"{color}[{record.levelname}] {message}\033[0m"
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # 标准的QueueHandler在调用线程里格式化消息，这里原样放入队列，由后台线程格式化；
+    # 因此记录日志后不应再修改作为参数传入的对象
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level=logging.DEBUG, stream=None):
+    """为libbooking日志配置后台线程输出，重复调用只修改级别
+
+    Args:
+        level: 日志级别；各实例的debug开关仍然决定是否输出调试信息
+        stream: 输出流，默认标准输出
+
+    Returns:
+        QueueListener
+    """
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    with _setup_lock:
+        logger.setLevel(level)
+        if _listener is not None:
+            return _listener
+        records = queue.SimpleQueue()
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.setFormatter(ColorFormatter("%(message)s"))
+        _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+        logger.addHandler(_DeferredQueueHandler(records))
+        logger.propagate = False
+        _listener.start()
+        atexit.register(flush_logs)
+    return _listener
+
+
+def flush_logs():
+    """等待队列中的日志全部输出并停止后台线程（程序退出时自动调用）"""
+    global _listener
+    with _setup_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in list(logging.getLogger(LOGGER_NAME).handlers):
+            if isinstance(handler, _DeferredQueueHandler):
+                logging.getLogger(LOGGER_NAME).removeHandler(handler)
+
+
+def set_level(level):
+    """修改libbooking日志级别，level可以是"DEBUG"、"INFO"等名称"""
+    logging.getLogger(LOGGER_NAME).setLevel(level.upper() if isinstance(level, str) else level)
+
+
+def get_logger(name=None):
+    """libbooking下的子logger；调用方还没有为libbooking配置输出时自动配置后台线程输出"""
+    base = logging.getLogger(LOGGER_NAME)
+    if not base.handlers:
+        setup_logging()
+    return base.getChild(name) if name else base
@@ -0,0 +1,223 @@
+"""
+耗时统计
+按接口、HTTP状态码和返回的code记录请求延迟直方图，并记录登录各步骤、座位解析、可视化、二维码生成等阶段的耗时，
+可导出为JSON或Prometheus文本格式
+
+记录一次只是在响应开头查找code、一次二分查找和几次加法（几微秒），在请求读完之后进行，不影响预约请求的发出时刻
+"""
+import bisect
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# 直方图各桶的上界（秒），与Prometheus客户端的默认桶相同
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 在响应体开头查找code字段，ic-web接口的响应都以 {"code":...} 开头，不必解析整个JSON
+_CODE_PATTERN = re.compile(rb'"code"\s*:\s*"?(-?\d+)', re.IGNORECASE)
+_CODE_WINDOW = 256
+
+
+def result_code_of(content):
+    """响应体中的code字段（字符串），不是ic-web的JSON响应时返回空字符串"""
+    match = _CODE_PATTERN.search(content, 0, _CODE_WINDOW)
+    return match.group(1).decode("ascii") if match else ""
+
+
+class Histogram:
+    """固定桶的延迟直方图，counts[i]为落在第i个桶（最后一个为+Inf）中的次数，另外记录最小值和最大值"""
+    __slots__ = ("buckets", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """按桶估计的分位数（秒），在桶内线性插值，并限制在观测到的最小值和最大值之间"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        estimate = self.max
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index < len(self.buckets):
+                    lower = self.buckets[index - 1] if index else 0.0
+                    estimate = lower + (self.buckets[index] - lower) * (rank - seen) / count
+                break
+            seen += count
+        return min(max(estimate, self.min), self.max)
+
+    def cumulative(self):
+        """[(上界, 累计次数)]，最后一项的上界为"+Inf\""""
+        total = 0
+        result = []
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_dict(self):
+        p50, p99 = self.quantile(0.5), self.quantile(0.99)
+        return {"count": self.count, "sum_ms": round(self.sum * 1000, 3),
+                "mean_ms": round(self.sum / self.count * 1000, 3) if self.count else None,
+                "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+                "p99_ms": round(p99 * 1000, 3) if p99 is not None else None,
+                "buckets": {str(bound): total for bound, total in self.cumulative()}}
+
+
+class StageTimer:
+    """按顺序计时的多个阶段，begin开始新阶段时自动结束上一个阶段
+
+    Args:
+        metrics: Metrics
+        prefix: 阶段名前缀，例如"login"得到login_step1、login_step2……
+    """
+    def __init__(self, metrics, prefix):
+        self.metrics = metrics
+        self.prefix = prefix
+        self._stage = None
+        self._started = 0.0
+
+    def begin(self, name):
+        self.end()
+        self._stage = f"{self.prefix}_{name}"
+        self._started = time.perf_counter()
+
+    def end(self):
+        """结束当前阶段（没有进行中的阶段时什么也不做），阶段之间的等待不计入"""
+        if self._stage is not None:
+            self.metrics.observe_stage(self._stage, time.perf_counter() - self._started)
+            self._stage = None
+
+
+class Metrics:
+    """请求延迟与阶段耗时的统计，多个线程可以同时记录
+
+    Args:
+        buckets: 直方图各桶的上界（秒）
+        namespace: Prometheus指标名前缀
+    """
+    def __init__(self, buckets=BUCKETS, namespace="libbooking"):
+        self.buckets = tuple(buckets)
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._requests = {}  # (接口, 状态码, code) -> Histogram
+        self._stages = {}  # 阶段名 -> Histogram
+
+    def observe_request(self, endpoint, status, code, seconds):
+        """记录一次请求，status为HTTP状态码（出错时为"error"），code为响应中的code字段"""
+        key = (endpoint, str(status), code)
+        with self._lock:
+            histogram = self._requests.get(key)
+            if histogram is None:
+                histogram = self._requests[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def observe_stage(self, stage, seconds):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        """with metrics.timed("seat_parse"): ... 记录代码块的耗时（抛出异常时也记录）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started)
+
+    def stage(self, name):
+        """记录函数每次调用耗时的装饰器"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timed(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def timer(self, prefix):
+        return StageTimer(self, prefix)
+
+    def reset(self):
+        with self._lock:
+            self._requests.clear()
+            self._stages.clear()
+
+    def snapshot(self):
+        """导出为可JSON序列化的字典
+
+        Returns:
+            dict: requests（每个接口/状态码/code一项）和stages（每个阶段一项），均含count、sum_ms、mean_ms、
+            p50_ms、p99_ms和累计的buckets
+        """
+        with self._lock:
+            requests = [{"endpoint": endpoint, "status": status, "code": code, **histogram.to_dict()}
+                        for (endpoint, status, code), histogram in sorted(self._requests.items())]
+            stages = [{"stage": stage, **histogram.to_dict()} for stage, histogram in sorted(self._stages.items())]
+        return {"requests": requests, "stages": stages}
+
+    def to_json(self, indent=None):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
+
+    def format_prometheus(self):
+        """Prometheus文本格式（version 0.0.4）"""
+        with self._lock:
+            families = [
+                (f"{self.namespace}_request_duration_seconds", "ic-web接口请求耗时",
+                 [({"endpoint": endpoint, "status": status, "code": code}, histogram)
+                  for (endpoint, status, code), histogram in sorted(self._requests.items())]),
+                (f"{self.namespace}_stage_duration_seconds", "登录、解析、绘图等阶段耗时",
+                 [({"stage": stage}, histogram) for stage, histogram in sorted(self._stages.items())]),
+            ]
+            lines = []
+            for name, help_text, series in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in series:
+                    text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+                    for bound, total in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{text},le="{bound}"}} {total}')
+                    lines.append(f"{name}_sum{{{text}}} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{{{text}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def format_report(self):
+        """生成可打印的耗时报告"""
+        snapshot = self.snapshot()
+        lines = []
+        for item in snapshot["requests"]:
+            code = f" code={item['code']}" if item["code"] else ""
+            lines.append(f"{item['endpoint']} [{item['status']}{code}]: {item['count']} 次, "
+                         f"平均 {item['mean_ms']:.1f} ms, P50 {item['p50_ms']:.1f} ms, P99 {item['p99_ms']:.1f} ms")
+        for item in snapshot["stages"]:
+            lines.append(f"{item['stage']}: {item['count']} 次, 平均 {item['mean_ms']:.1f} ms, "
+                         f"P50 {item['p50_ms']:.1f} ms, P99 {item['p99_ms']:.1f} ms")
+        return "\n".join(lines) if lines else "暂无耗时记录"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# 进程内默认的统计，连接池、登录流程和LibraryBooking都记录到这里
+METRICS = Metrics()
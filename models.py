@@ -0,0 +1,243 @@
+"""
+座位数据模型
+Seat/Room/Interval使用__slots__，时间统一为从零点起的分钟数（整数），坐标预先解析为浮点数。
+get_seats_info只解析一次接口数据，之后所有查询都直接比较整数；
+Seat和Room同时支持按原来的字典键访问（seat["devId"]、seat["reserved_times"]等），to_dict可还原原来的字典结构
+"""
+from collections.abc import Mapping
+from datetime import datetime
+
+OPENING_MINUTES = 8 * 60 + 30
+CLOSING_MINUTES = 21 * 60 + 45
+
+
+def to_minutes(hhmm):
+    """"HH:MM" 转为从零点起的分钟数"""
+    hour, minute = hhmm.split(":")[:2]
+    return int(hour) * 60 + int(minute)
+
+
+def to_hhmm(minutes):
+    """从零点起的分钟数转为 "HH:MM" """
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def as_minutes(value):
+    """"HH:MM" 或分钟数统一为分钟数"""
+    return to_minutes(value) if isinstance(value, str) else int(value)
+
+
+class Interval:
+    """半开时间段 [start, end)，单位为从零点起的分钟数"""
+    __slots__ = ("start", "end")
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_hhmm(cls, start, end):
+        return cls(to_minutes(start), to_minutes(end))
+
+    @classmethod
+    def from_timestamps(cls, start_ms, end_ms):
+        """由接口返回的毫秒时间戳构建"""
+        start = datetime.fromtimestamp(start_ms / 1000)
+        end = datetime.fromtimestamp(end_ms / 1000)
+        return cls(start.hour * 60 + start.minute, end.hour * 60 + end.minute)
+
+    @property
+    def minutes(self):
+        return self.end - self.start
+
+    def overlaps(self, start, end):
+        return start < self.end and end > self.start
+
+    def to_dict(self):
+        return {"start": to_hhmm(self.start), "end": to_hhmm(self.end)}
+
+    def __eq__(self, other):
+        return isinstance(other, Interval) and self.start == other.start and self.end == other.end
+
+    def __hash__(self):
+        return hash((self.start, self.end))
+
+    def __repr__(self):
+        return f"Interval({to_hhmm(self.start)}-{to_hhmm(self.end)})"
+
+
+class Seat:
+    """一个座位在某一天的状态
+
+    Attributes:
+        dev_id: 座位devId，预约时使用
+        name: 座位号（devName），如203-013
+        x, y: 座位坐标，接口未提供坐标时为None
+        intervals: 按开始时间排序的已预约Interval元组
+        room_id, room_name: 所在房间（可选）
+    """
+    __slots__ = ("dev_id", "name", "x", "y", "intervals", "room_id", "room_name")
+
+    # 兼容原来的字典结构：字典键 -> 取值函数
+    _LEGACY_KEYS = {
+        "devId": lambda seat: seat.dev_id,
+        "devName": lambda seat: seat.name,
+        "coordinate": lambda seat: seat.coordinate,
+        "reserved_times": lambda seat: seat.reserved_times,
+        "roomName": lambda seat: seat.room_name,
+        "roomId": lambda seat: seat.room_id,
+    }
+
+    def __init__(self, dev_id, name, x=None, y=None, intervals=(), room_id=None, room_name=None):
+        self.dev_id = dev_id
+        self.name = name
+        self.x = x
+        self.y = y
+        self.intervals = tuple(sorted(intervals, key=lambda interval: interval.start))
+        self.room_id = room_id
+        self.room_name = room_name
+
+    @staticmethod
+    def parse_coordinate(coordinate):
+        """解析 "x,y" 坐标字符串，无效时返回 (None, None)"""
+        parts = (coordinate or "").split(",")
+        if len(parts) < 2:
+            return None, None
+        try:
+            return float(parts[0]), float(parts[1])
+        except ValueError:
+            return None, None
+
+    @classmethod
+    def from_api(cls, seat, room_id=None):
+        """由/ic-web/reserve返回的座位数据构建"""
+        x, y = cls.parse_coordinate(seat.get("coordinate", ""))
+        intervals = [Interval.from_timestamps(resv["startTime"], resv["endTime"]) for resv in seat.get("resvInfo", [])]
+        return cls(seat["devId"], seat["devName"], x, y, intervals, room_id)
+
+    @classmethod
+    def from_dict(cls, seat_info):
+        """由原来的座位字典构建"""
+        x, y = cls.parse_coordinate(seat_info.get("coordinate", ""))
+        intervals = [Interval.from_hhmm(resv["start"], resv["end"]) for resv in seat_info.get("reserved_times", [])]
+        return cls(seat_info["devId"], seat_info["devName"], x, y, intervals, seat_info.get("roomId"),
+                   seat_info.get("roomName"))
+
+    @property
+    def coordinate(self):
+        return "" if self.x is None else f"{self.x:g},{self.y:g}"
+
+    @property
+    def reserved_times(self):
+        return [interval.to_dict() for interval in self.intervals]
+
+    def with_room(self, room_name, room_id=None):
+        """返回带有房间信息的副本，用作跨房间的候选座位"""
+        return Seat(self.dev_id, self.name, self.x, self.y, self.intervals, room_id or self.room_id, room_name)
+
+    def is_free(self, start, end):
+        """在 [start, end) 内是否没有预约，start/end可以是 "HH:MM" 或分钟数"""
+        start, end = as_minutes(start), as_minutes(end)
+        for interval in self.intervals:
+            if interval.start >= end:
+                return True
+            if interval.end > start:
+                return False
+        return True
+
+    def is_reserved_at(self, minute):
+        """某一时刻是否处于预约中（含两端）"""
+        minute = as_minutes(minute)
+        return any(interval.start <= minute <= interval.end for interval in self.intervals)
+
+    def free_intervals(self, opening=OPENING_MINUTES, closing=CLOSING_MINUTES):
+        """开馆时间内的空闲时段列表"""
+        free = []
+        cursor = opening
+        for interval in self.intervals:
+            if cursor < interval.start:
+                free.append(Interval(cursor, min(interval.start, closing)))
+            cursor = max(cursor, interval.end)
+        if cursor < closing:
+            free.append(Interval(cursor, closing))
+        return free
+
+    def to_dict(self):
+        """还原为原来的座位字典结构"""
+        seat_info = {
+            "devId": self.dev_id,
+            "devName": self.name,
+            "coordinate": self.coordinate,
+            "reserved_times": self.reserved_times,
+        }
+        if self.room_name is not None:
+            seat_info["roomName"] = self.room_name
+        return seat_info
+
+    def __getitem__(self, key):
+        getter = self._LEGACY_KEYS.get(key)
+        if getter is None:
+            raise KeyError(key)
+        value = getter(self)
+        if value is None and key in ("roomName", "roomId"):
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __repr__(self):
+        room = f", room={self.room_name}" if self.room_name else ""
+        return f"Seat({self.name}, devId={self.dev_id}{room}, reserved={list(self.intervals)})"
+
+
+class Room(Mapping):
+    """一个房间在某一天的所有座位，按座位号访问（与原来的 {座位号: 座位字典} 用法相同）
+
+    Attributes:
+        room_id: 房间ID
+        date: 日期 MMDD
+        seats: {座位号: Seat}
+    """
+    __slots__ = ("room_id", "date", "seats")
+
+    def __init__(self, room_id, date, seats):
+        self.room_id = room_id
+        self.date = date
+        self.seats = seats
+
+    @classmethod
+    def from_api(cls, room_id, date, data):
+        """由/ic-web/reserve返回的座位列表构建"""
+        seats = {}
+        for item in data:
+            seat = Seat.from_api(item, room_id)
+            seats[seat.name] = seat
+        return cls(room_id, date, seats)
+
+    @classmethod
+    def from_dicts(cls, room_id, date, seats_info):
+        """由原来的 {座位号: 座位字典} 构建"""
+        return cls(room_id, date, {name: Seat.from_dict(seat_info) for name, seat_info in seats_info.items()})
+
+    def __getitem__(self, name):
+        return self.seats[name]
+
+    def __iter__(self):
+        return iter(self.seats)
+
+    def __len__(self):
+        return len(self.seats)
+
+    def to_dict(self):
+        """还原为原来的 {座位号: 座位字典} 结构"""
+        return {name: seat.to_dict() for name, seat in self.seats.items()}
+
+    def __repr__(self):
+        return f"Room({self.room_id}, {self.date}, {len(self.seats)} seats)"
@@ -0,0 +1,143 @@
+"""
+座位占用矩阵
+把一个房间一天的座位预约情况表示为 座位 × 时间槽 的NumPy布尔矩阵（True表示该时间槽已被预约），
+“某时段全部空闲的座位”“每个座位最长连续空闲”“每个时间槽的空闲座位数”等查询都是一次向量化运算
+"""
+import numpy as np
+from models import to_hhmm, to_minutes
+
+OPENING_TIME = "08:30"
+CLOSING_TIME = "21:45"
+SLOT_MINUTES = 5
+
+
+class OccupancyMatrix:
+    """一个房间一天的座位占用矩阵
+
+    时间槽从开馆时间起每slot_minutes分钟一个；预约时间不在槽边界上时向外取整（部分占用的槽视为已占用），
+    查询时段同样向外取整，因此查询结果偏保守，不会把实际被占用的座位报告为空闲
+
+    Attributes:
+        seat_names: 行对应的座位号列表
+        seat_ids: 行对应的devId数组
+        busy: 形状为 (座位数, 时间槽数) 的布尔矩阵
+    """
+    def __init__(self, seat_names, seat_ids, busy, opening=OPENING_TIME, slot_minutes=SLOT_MINUTES):
+        self.seat_names = list(seat_names)
+        self.seat_ids = np.asarray(seat_ids)
+        self.busy = busy
+        self.opening = to_minutes(opening)
+        self.slot_minutes = slot_minutes
+        self._names = np.array(self.seat_names, dtype=object)
+        self._rows = {name: row for row, name in enumerate(self.seat_names)}
+
+    @classmethod
+    def from_intervals(cls, seat_names, seat_ids, rows, starts, ends, opening=OPENING_TIME, closing=CLOSING_TIME,
+                       slot_minutes=SLOT_MINUTES):
+        """由预约区间构建矩阵
+
+        Args:
+            rows, starts, ends: 等长序列，每个预约区间所在的行及其开始、结束分钟数
+        """
+        opening_minutes = to_minutes(opening)
+        slots = -(-(to_minutes(closing) - opening_minutes) // slot_minutes)
+        rows = np.asarray(rows, dtype=np.intp)
+        starts = np.asarray(starts, dtype=np.int64) - opening_minutes
+        ends = np.asarray(ends, dtype=np.int64) - opening_minutes
+        start_slots = np.clip(starts // slot_minutes, 0, slots)
+        end_slots = np.clip(-(-ends // slot_minutes), 0, slots)
+
+        # 差分数组：区间起点+1、终点-1，按行累加后大于0的槽即被占用
+        diff = np.zeros((len(seat_names), slots + 1), dtype=np.int32)
+        valid = end_slots > start_slots
+        np.add.at(diff, (rows[valid], start_slots[valid]), 1)
+        np.add.at(diff, (rows[valid], end_slots[valid]), -1)
+        busy = np.cumsum(diff[:, :-1], axis=1) > 0
+        return cls(seat_names, seat_ids, busy, opening, slot_minutes)
+
+    @classmethod
+    def from_seats_info(cls, seats_info, opening=OPENING_TIME, closing=CLOSING_TIME, slot_minutes=SLOT_MINUTES):
+        """由get_seats_info返回的Room（或 {座位号: Seat}）构建矩阵"""
+        rows, starts, ends = [], [], []
+        for row, seat in enumerate(seats_info.values()):
+            for interval in seat.intervals:
+                rows.append(row)
+                starts.append(interval.start)
+                ends.append(interval.end)
+        return cls.from_intervals(list(seats_info), [seat.dev_id for seat in seats_info.values()],
+                                  rows, starts, ends, opening, closing, slot_minutes)
+
+    @property
+    def slots(self):
+        return self.busy.shape[1]
+
+    def slot_range(self, start, end):
+        """把时段 [start, end) 向外取整为时间槽下标范围"""
+        start = to_minutes(start) if isinstance(start, str) else start
+        end = to_minutes(end) if isinstance(end, str) else end
+        first = max(0, (start - self.opening) // self.slot_minutes)
+        last = min(self.slots, -(-(end - self.opening) // self.slot_minutes))
+        return first, last
+
+    def slot_start(self, slot):
+        """时间槽的开始时间 "HH:MM" """
+        return to_hhmm(self.opening + slot * self.slot_minutes)
+
+    def free_mask(self, start, end):
+        """在 [start, end) 内全部空闲的座位的布尔掩码，时段为空或完全不在开馆时间内时全为False"""
+        first, last = self.slot_range(start, end)
+        if last <= first:
+            return np.zeros(len(self.seat_names), dtype=bool)
+        return ~self.busy[:, first:last].any(axis=1)
+
+    def free_seats(self, start, end):
+        """在 [start, end) 内全部空闲的座位号列表"""
+        return self._names[self.free_mask(start, end)].tolist()
+
+    def is_free(self, seat_name, start, end):
+        first, last = self.slot_range(start, end)
+        return last > first and not self.busy[self._rows[seat_name], first:last].any()
+
+    def busy_at(self, minute):
+        """在某一时刻已被预约的座位的布尔掩码，时刻不在开馆时间内时全为False"""
+        minute = to_minutes(minute) if isinstance(minute, str) else minute
+        slot = (minute - self.opening) // self.slot_minutes
+        if not 0 <= slot < self.slots:
+            return np.zeros(len(self.seat_names), dtype=bool)
+        return self.busy[:, slot]
+
+    def free_count_per_slot(self):
+        """每个时间槽的空闲座位数"""
+        return (~self.busy).sum(axis=0)
+
+    def longest_free_run(self):
+        """每个座位最长连续空闲的时间槽数及其起始槽
+
+        Returns:
+            (lengths, starts): 两个长度为座位数的整数数组，没有空闲的座位起始槽为-1
+        """
+        seats = len(self.seat_names)
+        padded = np.zeros((seats, self.slots + 2), dtype=np.int8)
+        padded[:, 1:-1] = ~self.busy
+        edges = np.diff(padded, axis=1)
+        # 按行优先顺序，每行的第k个上升沿与第k个下降沿一一对应
+        run_rows, run_starts = np.nonzero(edges == 1)
+        _, run_ends = np.nonzero(edges == -1)
+        run_lengths = run_ends - run_starts
+
+        lengths = np.zeros(seats, dtype=np.int64)
+        starts = np.full(seats, -1, dtype=np.int64)
+        if run_lengths.size:
+            # 先按行、再按长度降序、再按起点升序排序，每行第一个即最长（同长取最早）
+            order = np.lexsort((run_starts, -run_lengths, run_rows))
+            first = order[np.r_[True, run_rows[order][1:] != run_rows[order][:-1]]]
+            lengths[run_rows[first]] = run_lengths[first]
+            starts[run_rows[first]] = run_starts[first]
+        return lengths, starts
+
+    def free_intervals(self, seat_name):
+        """某个座位的空闲时段列表 [{"start": "HH:MM", "end": "HH:MM"}]"""
+        free = ~self.busy[self._rows[seat_name]]
+        edges = np.diff(np.r_[0, free.astype(np.int8), 0])
+        return [{"start": self.slot_start(start), "end": self.slot_start(end)}
+                for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))]
@@ -0,0 +1,255 @@
+"""
+周期预约规则
+把“每周一/三/五 预约203-013（备选203-014）08:30-21:45，提前一天06:15开火”这样的规则
+展开为未来N天的具体预约任务，时间段预先按split_time_periods拆分。
+规划是增量的：只有内容发生变化的规则会被重新展开，其余规则只补充进入规划窗口的新日期
+"""
+import hashlib
+import json
+from datetime import datetime, time as dtime, timedelta
+from async_booking import AsyncLibraryBooking
+from jobs import BookingJob, FINISHED_STATES
+
+# 星期名称 -> ISO星期几（周一为1）
+WEEKDAY_NAMES = {
+    "mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6, "sun": 7,
+    "周一": 1, "周二": 2, "周三": 3, "周四": 4, "周五": 5, "周六": 6, "周日": 7, "周天": 7,
+}
+
+
+def parse_weekdays(values):
+    """解析星期列表，支持ISO数字（1=周一 … 7=周日）、英文缩写和中文，返回ISO星期几的有序元组"""
+    if isinstance(values, str):
+        values = values.replace("，", ",").replace("/", ",").split(",")
+    weekdays = set()
+    for value in values:
+        if isinstance(value, str):
+            value = value.strip().lower()
+            if value in WEEKDAY_NAMES:
+                weekdays.add(WEEKDAY_NAMES[value])
+                continue
+            if value[:3] in WEEKDAY_NAMES:
+                weekdays.add(WEEKDAY_NAMES[value[:3]])
+                continue
+        number = int(value)
+        if not 1 <= number <= 7:
+            raise ValueError(f"无效的星期: {value}")
+        weekdays.add(number)
+    return tuple(sorted(weekdays))
+
+
+class RecurringRule:
+    """周期预约规则
+
+    Args:
+        rule_id: 规则ID，展开的任务ID为 规则ID-YYYYMMDD
+        account: 账号（学号）
+        weekdays: 预约哪些星期的座位，见parse_weekdays
+        room: 房间编号
+        seats: 按优先级排列的座位号列表，其他房间的座位写成 房间编号:座位号
+        start, end: 预约时间段 HH:MM
+        fire_time: 开火时刻 HH:MM[:SS]
+        days_ahead: 提前几天开火，默认提前一天
+        parallelism: 同时尝试的候选座位数
+        enabled: 是否启用
+        auto_fill: 自动补充的备选座位数，见BookingJob
+    """
+    __slots__ = ("rule_id", "account", "weekdays", "room", "seats", "start", "end", "fire_time", "days_ahead",
+                 "parallelism", "enabled", "auto_fill")
+
+    def __init__(self, rule_id, account, weekdays, room, seats, start, end, fire_time="06:15", days_ahead=1,
+                 parallelism=2, enabled=True, auto_fill=0):
+        self.rule_id = str(rule_id)
+        self.account = str(account)
+        self.weekdays = parse_weekdays(weekdays)
+        self.room = str(room)
+        self.seats = [str(seat) for seat in seats]
+        self.start = start
+        self.end = end
+        self.fire_time = fire_time
+        self.days_ahead = int(days_ahead)
+        self.parallelism = int(parallelism)
+        self.enabled = bool(enabled)
+        self.auto_fill = int(auto_fill)
+
+    @classmethod
+    def from_dict(cls, data):
+        seats = data["seats"]
+        if isinstance(seats, str):
+            seats = [seat.strip() for seat in seats.replace("，", ",").split(",") if seat.strip()]
+        return cls(
+            rule_id=data["id"],
+            account=data["account"],
+            weekdays=data["weekdays"],
+            room=data["room"],
+            seats=seats,
+            start=data["start"],
+            end=data["end"],
+            fire_time=data.get("fire_time", "06:15"),
+            days_ahead=data.get("days_ahead", 1),
+            parallelism=data.get("parallelism", 2),
+            enabled=data.get("enabled", True),
+            auto_fill=data.get("auto_fill", 0),
+        )
+
+    def to_dict(self):
+        data = {
+            "id": self.rule_id,
+            "account": self.account,
+            "weekdays": list(self.weekdays),
+            "room": self.room,
+            "seats": self.seats,
+            "start": self.start,
+            "end": self.end,
+            "fire_time": self.fire_time,
+            "days_ahead": self.days_ahead,
+            "parallelism": self.parallelism,
+            "enabled": self.enabled,
+        }
+        # 未使用自动补充时不写入，保持已有规则的指纹不变
+        if self.auto_fill:
+            data["auto_fill"] = self.auto_fill
+        return data
+
+    def version(self):
+        """规则内容的指纹，规则修改后指纹改变"""
+        text = json.dumps(self.to_dict(), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+    def fire_at(self, booking_date):
+        """预约booking_date当天座位的开火时间"""
+        parts = [int(part) for part in self.fire_time.split(":")]
+        fire_clock = dtime(parts[0], parts[1], parts[2] if len(parts) > 2 else 0)
+        return datetime.combine(booking_date - timedelta(days=self.days_ahead), fire_clock)
+
+    def expand(self, today, horizon_days, now=None):
+        """展开为today起horizon_days天内、开火时间尚未过去的任务
+
+        Returns:
+            {任务ID: BookingJob}
+        """
+        if not self.enabled:
+            return {}
+        now = now or datetime.now()
+        time_periods = AsyncLibraryBooking.split_time_periods(self.start, self.end)
+        if not time_periods:
+            return {}
+        version = self.version()
+        jobs = {}
+        for offset in range(horizon_days):
+            booking_date = today + timedelta(days=offset)
+            fire_at = self.fire_at(booking_date)
+            if booking_date.isoweekday() not in self.weekdays or fire_at <= now:
+                continue
+            job = BookingJob(
+                account=self.account,
+                date=booking_date.strftime("%m%d"),
+                room=self.room,
+                seats=self.seats,
+                start=self.start,
+                end=self.end,
+                fire_at=fire_at,
+                parallelism=self.parallelism,
+                job_id=f"{self.rule_id}-{booking_date.strftime('%Y%m%d')}",
+                periods=time_periods,
+                rule_id=self.rule_id,
+                rule_version=version,
+                auto_fill=self.auto_fill,
+            )
+            jobs[job.job_id] = job
+        return jobs
+
+
+def load_rules(rules_file):
+    """从规则文件加载规则列表，无效的规则打印警告后跳过"""
+    with open(rules_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    rules = []
+    for item in data.get("rules", []) if isinstance(data, dict) else data:
+        try:
+            rules.append(RecurringRule.from_dict(item))
+        except (KeyError, ValueError, TypeError) as e:
+            print(f"\033[33m[WARNING] 忽略无效规则 {item}: {str(e)}\033[0m")
+    return rules
+
+
+class WeeklyPlanner:
+    """增量展开周期规则
+
+    规划器记住每条规则的指纹及其展开出的任务：规则未修改时只补充新进入窗口的日期，
+    规则修改时只重新展开该规则，规则删除时移除它尚未执行的任务
+
+    Args:
+        horizon_days: 规划窗口天数
+    """
+    def __init__(self, horizon_days=7):
+        self.horizon_days = horizon_days
+        self.versions = {}  # 规则ID -> 指纹
+        self.planned = {}  # 规则ID -> {任务ID: BookingJob}
+
+    def seed(self, jobs):
+        """用已有任务（例如从任务文件加载的）初始化规划状态，避免重复展开"""
+        for job in jobs:
+            if job.rule_id:
+                self.versions.setdefault(job.rule_id, job.rule_version)
+                self.planned.setdefault(job.rule_id, {})[job.job_id] = job
+
+    def update(self, rules, today=None, now=None):
+        """按最新的规则列表更新规划
+
+        Returns:
+            (added, removed): 新增或替换的BookingJob列表，以及需要移除的任务ID列表
+        """
+        now = now or datetime.now()
+        today = today or now.date()
+        added, removed = [], []
+        current = {rule.rule_id: rule for rule in rules}
+
+        for rule_id in list(self.planned):
+            if rule_id not in current:
+                removed.extend(job_id for job_id, job in self.planned.pop(rule_id).items()
+                               if job.status not in FINISHED_STATES)
+                self.versions.pop(rule_id, None)
+
+        for rule_id, rule in current.items():
+            version = rule.version()
+            expanded = rule.expand(today, self.horizon_days, now)
+            planned = self.planned.setdefault(rule_id, {})
+            if self.versions.get(rule_id) != version:
+                # 规则被修改：未执行的旧任务全部替换，已结束的任务保留
+                for job_id, job in list(planned.items()):
+                    if job.status not in FINISHED_STATES:
+                        del planned[job_id]
+                        if job_id not in expanded:
+                            removed.append(job_id)
+                for job_id, job in expanded.items():
+                    if job_id not in planned:
+                        planned[job_id] = job
+                        added.append(job)
+                self.versions[rule_id] = version
+            else:
+                # 规则未变：只补充新进入窗口的日期
+                for job_id, job in expanded.items():
+                    if job_id not in planned:
+                        planned[job_id] = job
+                        added.append(job)
+        return added, removed
+
+    def prune(self, before):
+        """移除开火时间早于before的已结束任务，返回移除的任务ID列表
+
+        这些任务的开火时间已过，不会再被展开，移除后规划状态不会随守护进程运行时间增长
+        """
+        pruned = []
+        for planned in self.planned.values():
+            for job_id, job in list(planned.items()):
+                if job.expired(before):
+                    del planned[job_id]
+                    pruned.append(job_id)
+        return pruned
+
+    def jobs(self):
+        """规划中的所有任务，按开火时间排序"""
+        return sorted((job for planned in self.planned.values() for job in planned.values()),
+                      key=lambda job: job.fire_at)
+
@@ -0,0 +1,269 @@
+"""
+高精度定时开火
+根据多次探测请求的HTTP Date响应头估计本机与预约服务器的时钟偏差和往返时延(RTT)，
+在单调时钟上先粗略睡眠再短暂自旋，于服务器时间 T0 - RTT/2 时刻发出请求
+"""
+import asyncio
+import statistics
+import time
+from email.utils import parsedate_to_datetime
+
+
+class SystemClock:
+    """真实时钟"""
+    def time(self):
+        """当前墙上时间（epoch秒）"""
+        return time.time()
+
+    def monotonic(self):
+        return time.perf_counter()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    async def async_sleep(self, seconds):
+        await asyncio.sleep(max(seconds, 0))
+
+    def pause(self):
+        """自旋等待中的一次空转"""
+        pass
+
+
+class VirtualClock:
+    """虚拟时钟，睡眠立即返回并推进时间，用于在不真正等待的情况下测试定时逻辑
+
+    Args:
+        start: 初始墙上时间（epoch秒）
+        oversleep: 每次睡眠额外多睡的秒数，用于模拟系统调度延迟
+        tick: 自旋时每次空转推进的秒数
+    """
+    def __init__(self, start=0.0, oversleep=0.0, tick=0.00005):
+        self._now = float(start)
+        self.oversleep = oversleep
+        self.tick = tick
+
+    def time(self):
+        return self._now
+
+    def monotonic(self):
+        return self._now
+
+    def advance(self, seconds):
+        self._now += seconds
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self._now += seconds + self.oversleep
+
+    async def async_sleep(self, seconds):
+        self.sleep(seconds)
+        await asyncio.sleep(0)
+
+    def pause(self):
+        self._now += self.tick
+
+
+class ClockSync:
+    """时钟同步结果
+
+    Attributes:
+        offset: 服务器时间 - 本机时间（秒）
+        uncertainty: offset的误差半径（秒）
+        rtt: 探测请求的最小往返时延（秒）
+        samples: 有效探测次数
+    """
+    __slots__ = ("offset", "uncertainty", "rtt", "samples")
+
+    def __init__(self, offset=0.0, uncertainty=None, rtt=0.0, samples=0):
+        self.offset = offset
+        self.uncertainty = uncertainty
+        self.rtt = rtt
+        self.samples = samples
+
+    def server_to_local(self, server_time):
+        """把服务器时间换算为本机墙上时间"""
+        return server_time - self.offset
+
+    def __repr__(self):
+        uncertainty = f"±{self.uncertainty * 1000:.1f}ms" if self.uncertainty is not None else "未知"
+        return (f"ClockSync(offset={self.offset * 1000:.1f}ms {uncertainty}, "
+                f"rtt={self.rtt * 1000:.1f}ms, samples={self.samples})")
+
+
+def parse_http_date(value):
+    """解析HTTP Date响应头为epoch秒，无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def compute_clock_sync(samples):
+    """由探测样本计算时钟偏差
+
+    Date头只精确到秒，服务器生成响应时的真实时间S满足 D <= S < D+1，
+    且生成时刻位于本机的 [t_send, t_recv] 之间，因此每个样本都给出偏差的一个区间：
+    D - t_recv <= offset < D + 1 - t_send。多个样本取交集即可把误差缩小到远小于1秒；
+    若交集为空（服务器时钟抖动），退回到RTT最小样本的NTP中点估计
+
+    Args:
+        samples: (t_send, t_recv, server_date) 元组列表，时间均为epoch秒
+
+    Returns:
+        ClockSync
+    """
+    valid = [(t_send, t_recv, date) for t_send, t_recv, date in samples if date is not None and t_recv >= t_send]
+    if not valid:
+        return ClockSync()
+
+    rtt = min(t_recv - t_send for t_send, t_recv, _ in valid)
+    low = max(date - t_recv for t_send, t_recv, date in valid)
+    high = min(date + 1 - t_send for t_send, t_recv, date in valid)
+    if low <= high:
+        return ClockSync((low + high) / 2, (high - low) / 2, rtt, len(valid))
+
+    t_send, t_recv, date = min(valid, key=lambda sample: sample[1] - sample[0])
+    offset = date + 0.5 - (t_send + t_recv) / 2
+    return ClockSync(offset, 0.5 + (t_recv - t_send) / 2, rtt, len(valid))
+
+
+def _probe_spacing(count):
+    # 让各次探测落在不同的亚秒相位上，使区间交集尽快收窄
+    return 1.0 / count + 0.013
+
+
+def estimate_clock_offset(probe, count=8, clock=None, spacing=None):
+    """发送多次探测请求估计服务器时钟偏差
+
+    Args:
+        probe: 无参可调用对象，发送一次请求并返回Date响应头字符串
+        count: 探测次数
+        clock: 时钟（可选，默认真实时钟）
+        spacing: 两次探测之间的间隔秒数（可选）
+
+    Returns:
+        ClockSync
+    """
+    clock = clock or SystemClock()
+    spacing = _probe_spacing(count) if spacing is None else spacing
+    samples = []
+    for i in range(count):
+        if i:
+            clock.sleep(spacing)
+        t_send = clock.time()
+        try:
+            date = parse_http_date(probe())
+        except Exception:
+            continue
+        samples.append((t_send, clock.time(), date))
+    return compute_clock_sync(samples)
+
+
+async def estimate_clock_offset_async(probe, count=8, clock=None, spacing=None):
+    """estimate_clock_offset的协程版本，probe为返回Date响应头的协程函数"""
+    clock = clock or SystemClock()
+    spacing = _probe_spacing(count) if spacing is None else spacing
+    samples = []
+    for i in range(count):
+        if i:
+            await clock.async_sleep(spacing)
+        t_send = clock.time()
+        try:
+            date = parse_http_date(await probe())
+        except Exception:
+            continue
+        samples.append((t_send, clock.time(), date))
+    return compute_clock_sync(samples)
+
+
+def wait_until(deadline, clock=None, spin=0.005):
+    """等待到单调时钟的deadline：先粗略睡眠到deadline前spin秒，再自旋
+
+    Returns:
+        实际到达时刻相对deadline的延迟（秒）
+    """
+    clock = clock or SystemClock()
+    while True:
+        remaining = deadline - clock.monotonic()
+        if remaining <= spin:
+            break
+        clock.sleep(remaining - spin)
+    while clock.monotonic() < deadline:
+        clock.pause()
+    return clock.monotonic() - deadline
+
+
+async def wait_until_async(deadline, clock=None, spin=0.005):
+    """wait_until的协程版本，自旋阶段会短暂占用事件循环"""
+    clock = clock or SystemClock()
+    while True:
+        remaining = deadline - clock.monotonic()
+        if remaining <= spin:
+            break
+        await clock.async_sleep(remaining - spin)
+    while clock.monotonic() < deadline:
+        clock.pause()
+    return clock.monotonic() - deadline
+
+
+class FireScheduler:
+    """按服务器时间定时开火，并记录每次开火的抖动
+
+    Args:
+        clock: 时钟（可选，默认真实时钟；测试时可传入VirtualClock）
+        spin: 自旋等待的时长（秒），越长越准但越耗CPU
+    """
+    def __init__(self, clock=None, spin=0.005):
+        self.clock = clock or SystemClock()
+        self.spin = spin
+        self.jitters = []  # 每次开火实际时刻 - 目标时刻（秒）
+
+    def local_deadline(self, server_t0, sync=None, compensate_rtt=True):
+        """计算服务器时间T0对应的本机单调时钟开火时刻
+
+        开火时刻为本机时间 T0 - offset - RTT/2，使请求恰好在T0到达服务器
+        """
+        sync = sync or ClockSync()
+        local_wall = sync.server_to_local(server_t0)
+        if compensate_rtt:
+            local_wall -= sync.rtt / 2
+        return self.clock.monotonic() + (local_wall - self.clock.time())
+
+    def fire_at(self, server_t0, action, sync=None, compensate_rtt=True):
+        """等待到服务器时间server_t0后执行action
+
+        Returns:
+            action的返回值
+        """
+        deadline = self.local_deadline(server_t0, sync, compensate_rtt)
+        self.jitters.append(wait_until(deadline, self.clock, self.spin))
+        return action()
+
+    async def fire_at_async(self, server_t0, action, sync=None, compensate_rtt=True):
+        """fire_at的协程版本，action为协程函数"""
+        deadline = self.local_deadline(server_t0, sync, compensate_rtt)
+        self.jitters.append(await wait_until_async(deadline, self.clock, self.spin))
+        return await action()
+
+    def jitter_stats(self):
+        """返回开火抖动统计（毫秒）"""
+        if not self.jitters:
+            return {"count": 0}
+        values = sorted(j * 1000 for j in self.jitters)
+        return {
+            "count": len(values),
+            "mean_ms": statistics.fmean(values),
+            "p50_ms": values[len(values) // 2],
+            "p99_ms": values[min(len(values) - 1, int(len(values) * 0.99))],
+            "max_ms": values[-1],
+        }
+
+    def format_jitter_report(self):
+        stats = self.jitter_stats()
+        if not stats["count"]:
+            return "暂无开火记录"
+        return (f"开火 {stats['count']} 次, 抖动 平均 {stats['mean_ms']:.3f} ms, "
+                f"P50 {stats['p50_ms']:.3f} ms, P99 {stats['p99_ms']:.3f} ms, 最大 {stats['max_ms']:.3f} ms")
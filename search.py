@@ -0,0 +1,185 @@
+"""
+跨房间最佳座位搜索
+在全馆快照上按可配置的目标给座位打分，返回前k个：
+- 覆盖所需时段的连续空闲时长越长越好
+- 全天空闲时段越不零碎（空档越少）越好
+- 优先的房间或楼层加分
+- 离收藏座位越近越好（按get_seats_info返回的坐标，只比较同一房间内的座位）
+
+每个房间首次查询时建立索引：占用矩阵、每个时间槽所在空闲段的起止槽、每个座位的空闲段数以及坐标数组，
+之后每次搜索只做数组运算，不再逐个座位遍历预约记录
+"""
+import numpy as np
+
+# 默认权重：连续空闲每小时、每个空档、优先房间/楼层、与收藏座位的距离（每distance_scale个坐标单位）
+DEFAULT_WEIGHTS = {"block": 1.0, "gaps": 0.5, "room": 2.0, "floor": 1.0, "distance": 1.0}
+
+
+def room_floor(room_number):
+    """房间编号对应的楼层，如203 -> 2、5C -> 5，无法识别时返回None"""
+    return room_number[0] if room_number and room_number[0].isdigit() else None
+
+
+class _RoomIndex:
+    """一个房间一天的搜索索引"""
+    __slots__ = ("room", "matrix", "run_start", "run_end", "gaps", "xs", "ys")
+
+    def __init__(self, room, matrix):
+        self.room = room
+        self.matrix = matrix
+        slots = matrix.slots
+        busy = matrix.busy
+        positions = np.arange(slots)
+        # run_end[i, s]: 从槽s起第一个被占用的槽（没有则为slots）；run_start[i, s]: 槽s之前最后一个被占用的槽+1
+        next_busy = np.where(busy, positions, slots)
+        self.run_end = np.minimum.accumulate(next_busy[:, ::-1], axis=1)[:, ::-1]
+        prev_busy = np.where(busy, positions, -1)
+        self.run_start = np.maximum.accumulate(prev_busy, axis=1) + 1
+        # 空档数：全天空闲段被预约分隔成几段，减一
+        free = ~busy
+        runs = (free[:, 1:] & ~free[:, :-1]).sum(axis=1) + free[:, 0]
+        self.gaps = np.maximum(runs - 1, 0)
+        seats = list(room.values())
+        self.xs = np.array([np.nan if seat.x is None else seat.x for seat in seats])
+        self.ys = np.array([np.nan if seat.y is None else seat.y for seat in seats])
+
+
+class SeatSearch:
+    """在LibrarySnapshot上搜索最佳座位
+
+    Args:
+        snapshot: LibrarySnapshot
+        weights: 覆盖DEFAULT_WEIGHTS中的部分权重（可选）
+        distance_scale: 距离按多少个坐标单位计为1（默认100）
+    """
+    def __init__(self, snapshot, weights=None, distance_scale=100.0):
+        self.snapshot = snapshot
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.distance_scale = distance_scale
+        self._indexes = {}  # (日期, 房间编号) -> _RoomIndex
+
+    def index(self, date_str, room_number):
+        key = (date_str, room_number)
+        index = self._indexes.get(key)
+        if index is None and key in self.snapshot.rooms:
+            index = self._indexes[key] = _RoomIndex(self.snapshot.rooms[key],
+                                                    self.snapshot.matrix(date_str, room_number))
+        return index
+
+    def _favourite_points(self, date_str, favourites):
+        """收藏座位按房间分组的坐标 {房间编号: [(x, y)]}"""
+        points = {}
+        for name in favourites or []:
+            name = name.rpartition(":")[2].strip()
+            seat = self.snapshot.find_seat(date_str, name)
+            if seat is None or seat.x is None:
+                continue
+            room_number = self.snapshot.seat_room(date_str, name)
+            points.setdefault(room_number, []).append((seat.x, seat.y))
+        return points
+
+    def search(self, date_str, start, end, k=10, rooms=None, preferred_rooms=None, preferred_floors=None,
+               favourites=None, exclude=None, min_block=0):
+        """搜索在 [start, end) 内全部空闲的座位，按得分从高到低返回前k个
+
+        Args:
+            rooms: 只在这些房间中搜索（可选，默认全馆）
+            preferred_rooms: 优先的房间编号列表
+            preferred_floors: 优先的楼层列表，如 ["2", "3"]
+            favourites: 收藏座位号列表（可写成 房间编号:座位号），越近得分越高
+            exclude: 不参与排序的座位号集合
+            min_block: 覆盖所需时段的连续空闲至少多少分钟
+
+        Returns:
+            [{"seat": 带房间名称的Seat, "room": 房间编号, "score", "block_start", "block_end", "block_minutes",
+              "gaps", "distance"}]，distance为到同房间最近收藏座位的坐标距离（没有时为None）
+        """
+        weights = self.weights
+        preferred_rooms = {str(room) for room in preferred_rooms or []}
+        preferred_floors = {str(floor) for floor in preferred_floors or []}
+        favourite_points = self._favourite_points(date_str, favourites)
+        exclude = set(exclude or [])
+
+        candidates = []  # (得分数组, 房间编号, 行号数组, 连续空闲起止槽, 空档数, 距离)
+        for room_number in rooms or self.snapshot.room_numbers(date_str):
+            index = self.index(date_str, room_number)
+            if index is None:
+                continue
+            matrix = index.matrix
+            first, last = matrix.slot_range(start, end)
+            rows = np.flatnonzero(matrix.free_mask(start, end))
+            if not rows.size:
+                continue
+            anchor = min(first, matrix.slots - 1)
+            block_start = index.run_start[rows, anchor]
+            block_end = np.maximum(index.run_end[rows, anchor], last)
+            block_minutes = (block_end - block_start) * matrix.slot_minutes
+            keep = block_minutes >= min_block
+            rows, block_start, block_end, block_minutes = rows[keep], block_start[keep], block_end[keep], block_minutes[keep]
+            if not rows.size:
+                continue
+
+            gaps = index.gaps[rows]
+            score = weights["block"] * block_minutes / 60 - weights["gaps"] * gaps
+            if room_number in preferred_rooms:
+                score = score + weights["room"]
+            if room_floor(room_number) in preferred_floors:
+                score = score + weights["floor"]
+
+            distance = np.full(rows.size, np.nan)
+            points = favourite_points.get(room_number)
+            if points:
+                px, py = np.array(points).T
+                dx = index.xs[rows, None] - px[None, :]
+                dy = index.ys[rows, None] - py[None, :]
+                distance = np.sqrt(dx * dx + dy * dy).min(axis=1)
+                score = score - weights["distance"] * np.nan_to_num(distance / self.distance_scale, nan=3.0)
+            elif favourite_points:
+                # 有收藏座位但不在本房间，按最远距离处理
+                score = score - weights["distance"] * 3.0
+            candidates.append((score, room_number, rows, block_start, block_end, gaps, distance))
+
+        if not candidates:
+            return []
+
+        scores = np.concatenate([item[0] for item in candidates])
+        owners = np.concatenate([np.full(item[2].size, number) for number, item in enumerate(candidates)])
+        offsets = np.concatenate([np.arange(item[2].size) for item in candidates])
+        wanted = min(len(scores), k + len(exclude))
+        # 只对前k个（加上可能被排除的座位）做完整排序
+        top = np.argpartition(-scores, wanted - 1)[:wanted] if wanted < len(scores) else np.arange(len(scores))
+        top = top[np.lexsort((top, -scores[top]))]
+
+        results = []
+        for position in top:
+            score, room_number, rows, block_start, block_end, gaps, distance = candidates[owners[position]]
+            offset = offsets[position]
+            index = self._indexes[(date_str, room_number)]
+            name = index.matrix.seat_names[rows[offset]]
+            if name in exclude:
+                continue
+            matrix = index.matrix
+            results.append({
+                "seat": index.room[name].with_room(self.snapshot.room_name(room_number)),
+                "room": room_number,
+                "score": round(float(score[offset]), 3),
+                "block_start": matrix.slot_start(int(block_start[offset])),
+                "block_end": matrix.slot_start(int(block_end[offset])),
+                "block_minutes": int((block_end[offset] - block_start[offset]) * matrix.slot_minutes),
+                "gaps": int(gaps[offset]),
+                "distance": None if np.isnan(distance[offset]) else round(float(distance[offset]), 1),
+            })
+            if len(results) >= k:
+                break
+        return results
+
+
+def format_results(results):
+    """搜索结果的文本列表"""
+    lines = []
+    for rank, item in enumerate(results, 1):
+        distance = f", 距收藏座位 {item['distance']:.0f}" if item["distance"] is not None else ""
+        lines.append(f"  {rank}. {item['seat'].name} ({item['seat'].room_name}) 连续空闲 {item['block_start']}-"
+                     f"{item['block_end']} ({item['block_minutes']} 分钟), 空档 {item['gaps']}{distance}, "
+                     f"得分 {item['score']:.2f}")
+    return "\n".join(lines)
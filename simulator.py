@@ -0,0 +1,415 @@
+"""
+抢座风暴模拟器
+在虚拟时间中模拟放座时刻N个客户端同时向 POST /ic-web/reserve 提交预约，比较不同抢座策略的成功率：
+- 拆分后的各时间段逐段提交 vs 并发提交（submit_periods的concurrent）
+- 只抢首选座位 vs 按优先级尝试备选座位（race_candidates）
+- 在本机时钟到达T0时开火 vs 先按Date响应头估计时钟偏差再开火（compute_clock_sync + FireScheduler.local_deadline）
+
+服务器端直接使用fake_server.FakeLibrary的先到先得规则（未到放座时刻拒绝、座位冲突、同一账号时间冲突），
+客户端的重试按RetryPolicy、时间段按split_time_periods拆分，校时与开火时刻的计算也调用项目中的原函数；
+网络只用单程延迟分布表示，没有真正的请求，单核每分钟可以模拟几千次放座，可以离线调参
+
+用法:
+    python simulator.py --releases 2000 --competitors 150 --seats 80 --time 08:30-21:45 --skew 0.5
+    python simulator.py --releases 5000 --workers 4 --margin 0.02
+"""
+import argparse
+import heapq
+import itertools
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from email.utils import formatdate
+import numpy as np
+from async_booking import AsyncLibraryBooking, RetryPolicy
+from fake_server import FakeLibrary, Latency, ReleaseStorm, STORM_ACC_BASE
+from models import to_minutes
+from scheduler import ClockSync, FireScheduler, VirtualClock, estimate_clock_offset
+
+# 虚拟时间中的放座时刻（服务器时钟，epoch秒）与预约日期
+RELEASE_T0 = 1780000000.0
+RELEASE_DATE = "2026-05-29"
+# 本客户端的appAccNo
+OWN_ACC_NO = 1
+
+
+class EventQueue(VirtualClock):
+    """离散事件队列：本身是一个虚拟时钟，按时间顺序执行回调，时间相同时按加入的先后"""
+    def __init__(self, start=0.0):
+        super().__init__(start)
+        self._heap = []
+        self._seq = 0
+
+    def at(self, when, callback, *args):
+        self._seq += 1
+        heapq.heappush(self._heap, (when, self._seq, callback, args))
+
+    def run(self):
+        heap = self._heap
+        while heap:
+            when, _, callback, args = heapq.heappop(heap)
+            if when > self._now:
+                self._now = when
+            callback(*args)
+
+
+class SampledLatency:
+    """按Latency的分布预先批量抽取的单程延迟（秒），用完后从头循环；比逐个抽取快一个数量级"""
+    __slots__ = ("sample",)
+
+    def __init__(self, latency, seed, size=4096):
+        rng = np.random.default_rng(seed)
+        values = latency.median / 1000 * np.exp(rng.normal(0.0, latency.sigma, size))
+        self.sample = itertools.cycle(values.tolist()).__next__
+
+
+class SkewedClock:
+    """本机时钟：墙上时间比服务器（真实时间）慢offset秒，单调时钟与虚拟时钟一致"""
+    def __init__(self, clock, offset):
+        self.clock = clock
+        self.offset = offset
+
+    def time(self):
+        return self.clock.time() - self.offset
+
+    def monotonic(self):
+        return self.clock.monotonic()
+
+    def sleep(self, seconds):
+        self.clock.sleep(seconds)
+
+
+class SimClient:
+    """在虚拟时间中按race_candidates/submit_periods的逻辑抢座的客户端
+
+    Args:
+        events: EventQueue
+        library: 服务器状态（FakeLibrary）
+        acc_no: appAccNo
+        seats: 按优先级排列的候选座位devId
+        periods: (开始分钟数, 结束分钟数) 列表
+        concurrent: 各时间段并发提交还是逐段提交
+        parallelism: 同时尝试的候选座位数
+        retry: 每个时间段的RetryPolicy
+        latency: 单程延迟（Latency）
+        source: 在服务器统计中的来源名
+    """
+    def __init__(self, events, library, acc_no, seats, periods, concurrent=True, parallelism=1, retry=None,
+                 latency=None, source="client"):
+        self.events = events
+        self.library = library
+        self.acc_no = acc_no
+        self.seats = seats
+        self.periods = periods
+        self.concurrent = concurrent
+        self.parallelism = max(1, parallelism)
+        self.retry = retry or RetryPolicy()
+        self.latency = latency or Latency()
+        self.source = source
+        self.results = [None] * len(seats)  # 每个候选座位各时间段是否成功，未尝试为None
+        # 与race_candidates相同：同时尝试多个座位时逐段竞争，只尝试一个座位时一次提交整个计划
+        self.batch = len(periods) if min(self.parallelism, len(seats)) <= 1 else 1
+        self.first = 0  # 当前竞争的第一个时间段
+        self.next = 0
+        self.in_flight = 0
+        self.winners = []  # 本轮抢到时间段的候选座位下标
+        self.holder = None  # 抢到时间段、剩余时间段只向其提交的候选座位下标
+        self._queued = {}  # 候选座位下标 -> 逐段提交时还未发出的时间段
+        self._waiting = {}  # 候选座位下标 -> 本次提交还未有结果的时间段数
+        self.won = None  # 全部时间段成功的候选座位下标
+        self.won_at = None
+        self.early = 0  # 被"未开放"拒绝的次数
+
+    def fire(self, at):
+        self.events.at(at, self._launch)
+
+    def _launch(self):
+        # 出现成功的座位后不再发起新的尝试，已在途的照常完成
+        while self.in_flight < self.parallelism and self.next < len(self.seats) and not self.winners:
+            index = self.next
+            self.next += 1
+            self.in_flight += 1
+            self._submit(index, range(self.first, min(self.first + self.batch, len(self.periods))))
+
+    def _submit(self, index, periods):
+        if self.results[index] is None:
+            self.results[index] = [None] * len(self.periods)
+        periods = list(periods)
+        self._waiting[index] = len(periods)
+        self._queued[index] = [] if self.concurrent else periods[1:]
+        for period in (periods if self.concurrent else periods[:1]):
+            self._send(index, period, 1)
+
+    def _send(self, index, period, attempt, delay=0.0):
+        self.events.at(self.events.time() + delay + self.latency.sample(), self._arrive, index, period, attempt)
+
+    def _arrive(self, index, period, attempt):
+        start, end = self.periods[period]
+        code, message, _ = self.library.reserve(self.acc_no, self.seats[index], RELEASE_DATE, start, end,
+                                                self.source)
+        self.events.at(self.events.time() + self.latency.sample(), self._respond, index, period, attempt, code,
+                       message)
+
+    def _respond(self, index, period, attempt, code, message):
+        if code and "未开放" in message:
+            self.early += 1
+        if code and attempt < self.retry.attempts and self.retry.should_retry({"code": code, "message": message}):
+            self._send(index, period, attempt + 1, self.retry.delay)
+            return
+        self.results[index][period] = code == 0
+        self._waiting[index] -= 1
+        if self._queued[index]:
+            self._send(index, self._queued[index].pop(0), 1)
+            return
+        if self._waiting[index]:
+            return
+        if index == self.holder:
+            self._settle()
+            return
+        self.in_flight -= 1
+        if any(self.results[index][self.first:self.first + self.batch]):
+            self.winners.append(index)
+        if self.in_flight:
+            return
+        if self.winners:
+            # 保留排名最靠前的座位，剩余时间段只向它提交
+            self.holder = min(self.winners)
+            rest = range(self.first + self.batch, len(self.periods))
+            if rest:
+                self._submit(self.holder, rest)
+            else:
+                self._settle()
+        elif self.next < len(self.seats):
+            self._launch()
+        elif self.first + self.batch < len(self.periods):
+            # 当前时间段所有座位都失败，竞争下一个时间段
+            self.first += self.batch
+            self.next = 0
+            self._launch()
+
+    def _settle(self):
+        if all(self.results[self.holder]):
+            self.won = self.holder
+            self.won_at = self.events.time()
+
+    def outcome(self):
+        """(是否全部时间段成功, 胜出座位的排名, 获得的时间段数)"""
+        if self.won is not None:
+            return True, self.won + 1, len(self.periods)
+        if self.holder is None:
+            return False, None, 0
+        return False, None, sum(bool(result) for result in self.results[self.holder])
+
+
+class Strategy:
+    """一种抢座策略
+
+    Args:
+        name: 名称
+        concurrent: 各时间段并发提交（True）还是逐段提交（False）
+        fallbacks: 首选座位之外的备选座位数
+        parallelism: 同时尝试的候选座位数
+        corrected: 是否先估计服务器时钟偏差，再按FireScheduler.local_deadline（补偿RTT/2）开火；
+            否则在本机时钟读数到达T0时开火
+        retry: 每个时间段的RetryPolicy
+        margin: 开火时刻额外推迟的秒数（负数为提前）
+    """
+    __slots__ = ("name", "concurrent", "fallbacks", "parallelism", "corrected", "retry", "margin")
+
+    def __init__(self, name, concurrent=True, fallbacks=0, parallelism=1, corrected=True, retry=None, margin=0.0):
+        self.name = name
+        self.concurrent = concurrent
+        self.fallbacks = fallbacks
+        self.parallelism = parallelism
+        self.corrected = corrected
+        self.retry = retry or RetryPolicy()
+        self.margin = margin
+
+
+def default_strategies(fallbacks=4, parallelism=2, retry=None, margin=0.0):
+    """逐段/并发 × 单座/备选 × 固定/校时 共8种策略"""
+    return [Strategy(f"{'并发' if concurrent else '逐段'}/{'备选' if fallback else '单座'}/{'校时' if corrected else '固定'}",
+                     concurrent, fallbacks if fallback else 0, parallelism if fallback else 1, corrected, retry,
+                     margin if corrected else 0.0)
+            for concurrent in (False, True) for fallback in (False, True) for corrected in (False, True)]
+
+
+class StormScenario:
+    """一次放座的环境参数
+
+    Args:
+        competitors: 竞争客户端数
+        seats: 房间座位数
+        start, end: 本客户端要预约的时间段，按split_time_periods拆分
+        latency_ms, sigma: 单程延迟的中位数（毫秒）和对数标准差，所有客户端相同
+        clock_skew: 本机时钟偏差范围（秒），每次放座在 [-clock_skew, clock_skew] 内均匀抽取
+        fire_bias, fire_spread: 竞争者开火时刻相对T0的平均偏移和标准差（秒）
+        full_day: 竞争者中预约全部时间段的比例，其余只预约第一段
+        seat_rank: 本客户端首选座位的热门排名（0为最热门），备选座位依次往后
+        skew: 座位热门程度的Zipf指数
+        competitor_fallbacks: 竞争者的备选座位数
+        probes: 校时探测次数
+    """
+    def __init__(self, competitors=150, seats=80, start="08:30", end="21:45", latency_ms=25.0, sigma=0.6,
+                 clock_skew=0.5, fire_bias=0.05, fire_spread=0.15, full_day=0.5, seat_rank=10, skew=1.1,
+                 competitor_fallbacks=2, probes=8):
+        self.competitors = competitors
+        self.seats = seats
+        self.periods = [(to_minutes(period_start), to_minutes(period_end))
+                        for period_start, period_end in AsyncLibraryBooking.split_time_periods(start, end)]
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.clock_skew = clock_skew
+        self.fire_bias = fire_bias
+        self.fire_spread = fire_spread
+        self.full_day = full_day
+        self.seat_rank = seat_rank
+        self.skew = skew
+        self.competitor_fallbacks = competitor_fallbacks
+        self.probes = probes
+
+
+def probe_clock(clock, offset, latency, count):
+    """用estimate_clock_offset在虚拟时间中校时：每次探测经过一个往返，服务器返回只精确到秒的Date头
+
+    Args:
+        clock: 虚拟时钟（服务器时间），探测会推进它
+        offset: 本机时钟比服务器慢的秒数
+    """
+    def probe():
+        clock.advance(latency.sample())
+        date = formatdate(clock.time(), usegmt=True)
+        clock.advance(latency.sample())
+        return date
+
+    return estimate_clock_offset(probe, count, SkewedClock(clock, offset))
+
+
+def simulate_release(scenario, strategy, seed):
+    """模拟一次放座中本客户端按strategy抢座
+
+    同一个seed下竞争者的开火时刻、座位偏好和本机时钟偏差都相同，不同策略之间可以直接比较
+
+    Returns:
+        dict: success、rank、periods（获得的时间段数）、time_ms（从T0到成功的毫秒数）、early、offset_error_ms
+    """
+    rng = random.Random(seed)
+    events = EventQueue(start=RELEASE_T0 - 120)
+    library = FakeLibrary(1, scenario.seats, clock=events, release_at=RELEASE_T0)
+    storm = ReleaseStorm(scenario.competitors, skew=scenario.skew, fallbacks=scenario.competitor_fallbacks,
+                         seed=seed)
+    order = storm.popularity(library)
+    latency = Latency(scenario.latency_ms, scenario.sigma)
+    competitor_latency = SampledLatency(latency, seed)
+    for index, plan in enumerate(storm.choose(library)):
+        periods = scenario.periods if rng.random() < scenario.full_day else scenario.periods[:1]
+        client = SimClient(events, library, STORM_ACC_BASE + index, plan, periods, retry=RetryPolicy(5, 0.1),
+                           latency=competitor_latency, source="storm")
+        client.fire(RELEASE_T0 + rng.gauss(scenario.fire_bias, scenario.fire_spread))
+
+    offset = rng.uniform(-scenario.clock_skew, scenario.clock_skew)
+    own_latency = SampledLatency(latency, seed * 7919 + 1, 64)
+    sync = probe_clock(events, offset, own_latency, scenario.probes) if strategy.corrected else ClockSync()
+    scheduler = FireScheduler(SkewedClock(events, offset))
+    fire_at = scheduler.local_deadline(RELEASE_T0, sync, compensate_rtt=strategy.corrected) + strategy.margin
+    seats = order[scenario.seat_rank:scenario.seat_rank + 1 + strategy.fallbacks]
+    client = SimClient(events, library, OWN_ACC_NO, seats, scenario.periods, strategy.concurrent,
+                       strategy.parallelism, strategy.retry, own_latency)
+    client.fire(fire_at)
+    events.run()
+
+    success, rank, periods = client.outcome()
+    return {"success": success, "rank": rank, "periods": periods, "early": client.early,
+            "time_ms": (client.won_at - RELEASE_T0) * 1000 if success else None,
+            "offset_error_ms": (sync.offset - offset) * 1000 if strategy.corrected else None}
+
+
+def run_batch(scenario, strategies, seeds):
+    """对每个seed依次模拟所有策略，返回每个策略的汇总计数"""
+    totals = [{"releases": 0, "success": 0, "first_choice": 0, "periods": 0, "early": 0, "times": []}
+              for _ in strategies]
+    for seed in seeds:
+        for total, strategy in zip(totals, strategies):
+            result = simulate_release(scenario, strategy, seed)
+            total["releases"] += 1
+            total["success"] += result["success"]
+            total["first_choice"] += result["rank"] == 1
+            total["periods"] += result["periods"]
+            total["early"] += result["early"]
+            if result["success"]:
+                total["times"].append(result["time_ms"])
+    return totals
+
+
+def run(scenario, strategies, releases, workers=1, seed=0):
+    """模拟releases次放座，workers大于1时分到多个进程
+
+    Returns:
+        与strategies顺序一致的汇总列表
+    """
+    seeds = list(range(seed, seed + releases))
+    if workers <= 1:
+        return run_batch(scenario, strategies, seeds)
+    chunks = [seeds[index::workers] for index in range(workers)]
+    with ProcessPoolExecutor(workers) as executor:
+        parts = list(executor.map(run_batch, [scenario] * workers, [strategies] * workers, chunks))
+    totals = parts[0]
+    for part in parts[1:]:
+        for total, other in zip(totals, part):
+            for key, value in other.items():
+                total[key] += value
+    return totals
+
+
+def format_report(scenario, strategies, totals):
+    periods = len(scenario.periods)
+    lines = [f"{'策略':<12} {'成功率':>14} {'首选座位':>8} {'平均获得时段':>10} {'成功用时P50':>10} {'未开放拒绝':>8}"]
+    for strategy, total in zip(strategies, totals):
+        count = total["releases"]
+        rate = total["success"] / count
+        margin = 1.96 * math.sqrt(rate * (1 - rate) / count)
+        times = sorted(total["times"])
+        p50 = f"{times[len(times) // 2]:.0f} ms" if times else "-"
+        lines.append(f"{strategy.name:<12} {rate * 100:7.1f}% ±{margin * 100:4.1f}% "
+                     f"{total['first_choice'] / count * 100:7.1f}% {total['periods'] / count:7.2f}/{periods} "
+                     f"{p50:>12} {total['early'] / count:10.2f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抢座风暴模拟器：比较不同抢座策略的成功率")
+    parser.add_argument("--releases", type=int, default=1000, help="模拟的放座次数")
+    parser.add_argument("--competitors", type=int, default=150, help="竞争客户端数")
+    parser.add_argument("--seats", type=int, default=80, help="房间座位数")
+    parser.add_argument("--time", default="08:30-21:45", help="预约时间段 HH:MM-HH:MM")
+    parser.add_argument("--latency", type=float, default=25, help="单程延迟中位数（毫秒）")
+    parser.add_argument("--sigma", type=float, default=0.6, help="单程延迟的对数标准差")
+    parser.add_argument("--skew", type=float, default=0.5, help="本机时钟偏差范围（秒）")
+    parser.add_argument("--seat-rank", type=int, default=10, help="首选座位的热门排名（0为最热门）")
+    parser.add_argument("--fallbacks", type=int, default=4, help="备选策略的备选座位数")
+    parser.add_argument("--parallelism", type=int, default=2, help="备选策略同时尝试的座位数")
+    parser.add_argument("--retry-attempts", type=int, default=2, help="每个时间段最多尝试次数")
+    parser.add_argument("--retry-delay", type=float, default=0.2, help="重试间隔（秒）")
+    parser.add_argument("--margin", type=float, default=0.0, help="校时策略的开火时刻额外推迟秒数")
+    parser.add_argument("--workers", type=int, default=1, help="进程数")
+    parser.add_argument("--seed", type=int, default=0, help="起始随机种子")
+    args = parser.parse_args()
+
+    start, end = args.time.split("-")
+    scenario = StormScenario(args.competitors, args.seats, start, end, args.latency, args.sigma, args.skew,
+                             seat_rank=args.seat_rank)
+    strategies = default_strategies(args.fallbacks, args.parallelism,
+                                    RetryPolicy(args.retry_attempts, args.retry_delay), args.margin)
+    started = time.perf_counter()
+    totals = run(scenario, strategies, args.releases, args.workers, args.seed)
+    elapsed = time.perf_counter() - started
+    print(f"{args.releases} 次放座 × {len(strategies)} 种策略，{args.competitors} 个竞争者，{args.seats} 个座位，"
+          f"时间段 {len(scenario.periods)} 段，本机时钟偏差 ±{args.skew}s")
+    print(format_report(scenario, strategies, totals))
+    print(f"耗时 {elapsed:.1f} 秒，每分钟 {args.releases / elapsed * 60:.0f} 次放座（每次放座模拟全部策略），"
+          f"即每分钟 {args.releases * len(strategies) / elapsed * 60:.0f} 次单策略模拟")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+全馆座位快照
+把多个日期、所有房间的座位信息合并为一个带索引的结构：按 (日期, 房间编号) 取Room，按 (日期, 座位号) 取座位，
+“某天某时段全馆有哪些空闲座位”由每个房间的占用矩阵各做一次向量化查询得到
+"""
+from occupancy import OccupancyMatrix
+
+
+class LibrarySnapshot:
+    """全馆座位快照
+
+    Args:
+        rooms_info: get_rooms_info返回的 {房间编号: 房间信息}
+
+    Attributes:
+        rooms: {(日期, 房间编号): Room}
+        timings: {(日期, 房间编号): 请求耗时毫秒}
+        failed: 获取失败的 (日期, 房间编号) 列表
+        elapsed: 整个快照的耗时（秒）
+    """
+    def __init__(self, rooms_info):
+        self.rooms_info = rooms_info
+        self.rooms = {}
+        self.timings = {}
+        self.failed = []
+        self.elapsed = 0.0
+        self._by_date = {}  # 日期 -> [房间编号]
+        self._seat_index = {}  # (日期, 座位号) -> 房间编号
+        self._matrices = {}  # (日期, 房间编号) -> OccupancyMatrix
+
+    @classmethod
+    def from_room(cls, rooms_info, date_str, room_number, room):
+        """由单个房间的座位信息构建快照，用于在一个房间内搜索"""
+        snapshot = cls(rooms_info)
+        snapshot.add(date_str, room_number, room, 0.0)
+        return snapshot
+
+    def add(self, date_str, room_number, room, elapsed_ms):
+        """加入一个房间一天的座位信息，room为None表示获取失败；同一房间同一天再次加入时替换原来的记录"""
+        key = (date_str, room_number)
+        self.timings[key] = elapsed_ms
+        if room is None:
+            if key not in self.failed:
+                self.failed.append(key)
+            return
+        if key in self.failed:
+            self.failed.remove(key)
+        previous = self.rooms.get(key)
+        if previous is None:
+            self._by_date.setdefault(date_str, []).append(room_number)
+        else:
+            for name in previous:
+                if self._seat_index.get((date_str, name)) == room_number:
+                    del self._seat_index[(date_str, name)]
+        self.rooms[key] = room
+        for name in room:
+            self._seat_index[(date_str, name)] = room_number
+        self._matrices.pop(key, None)
+
+    @property
+    def dates(self):
+        return list(self._by_date)
+
+    @property
+    def seat_count(self):
+        return sum(len(room) for room in self.rooms.values())
+
+    def room_numbers(self, date_str):
+        return list(self._by_date.get(date_str, []))
+
+    def room_name(self, room_number):
+        info = self.rooms_info.get(room_number)
+        return info["name"] if info else room_number
+
+    def matrix(self, date_str, room_number):
+        """某房间某天的座位占用矩阵，首次使用时构建"""
+        key = (date_str, room_number)
+        matrix = self._matrices.get(key)
+        if matrix is None and key in self.rooms:
+            matrix = self._matrices[key] = OccupancyMatrix.from_seats_info(self.rooms[key])
+        return matrix
+
+    def seat_room(self, date_str, seat_name):
+        """座位所在的房间编号，找不到时返回None"""
+        return self._seat_index.get((date_str, seat_name))
+
+    def find_seat(self, date_str, seat_name):
+        """按座位号查找座位，返回带房间名称的Seat，找不到时返回None"""
+        room_number = self._seat_index.get((date_str, seat_name))
+        if room_number is None:
+            return None
+        return self.rooms[(date_str, room_number)][seat_name].with_room(self.room_name(room_number))
+
+    def free_seats(self, date_str, start, end, room_numbers=None):
+        """某天 [start, end) 内全部空闲的座位
+
+        Args:
+            room_numbers: 只在这些房间中查找（可选，默认全馆）
+
+        Returns:
+            带房间名称的Seat列表，按房间编号、座位号排序
+        """
+        seats = []
+        for room_number in sorted(room_numbers or self._by_date.get(date_str, [])):
+            room = self.rooms.get((date_str, room_number))
+            if room is None:
+                continue
+            room_name = self.room_name(room_number)
+            for name in self.matrix(date_str, room_number).free_seats(start, end):
+                seats.append(room[name].with_room(room_name))
+        return seats
+
+    def free_count(self, date_str, start, end):
+        """某天 [start, end) 内每个房间全部空闲的座位数 {房间编号: 座位数}"""
+        return {room_number: int(self.matrix(date_str, room_number).free_mask(start, end).sum())
+                for room_number in sorted(self._by_date.get(date_str, []))}
+
+    def stats(self):
+        """快照统计：请求数、座位数、总耗时、吞吐量以及最慢的房间"""
+        requests = len(self.timings)
+        elapsed = self.elapsed or 1e-9
+        slowest = sorted(self.timings.items(), key=lambda item: item[1], reverse=True)[:5]
+        return {
+            "requests": requests,
+            "failed": len(self.failed),
+            "seats": self.seat_count,
+            "elapsed_ms": self.elapsed * 1000,
+            "rooms_per_second": requests / elapsed,
+            "seats_per_second": self.seat_count / elapsed,
+            "slowest": [(date_str, room_number, ms) for (date_str, room_number), ms in slowest],
+        }
+
+    def format_report(self):
+        """快照统计的文本报告"""
+        stats = self.stats()
+        lines = [f"共 {stats['requests']} 个请求（失败 {stats['failed']} 个），{stats['seats']} 个座位，"
+                 f"耗时 {stats['elapsed_ms']:.0f} ms，吞吐 {stats['rooms_per_second']:.1f} 房间/秒、"
+                 f"{stats['seats_per_second']:.0f} 座位/秒"]
+        for (date_str, room_number), ms in sorted(self.timings.items()):
+            status = "\033[31m失败\033[0m" if (date_str, room_number) in self.failed else \
+                f"{len(self.rooms[(date_str, room_number)])} 个座位"
+            lines.append(f"  {date_str} {self.room_name(room_number)}: {ms:.0f} ms, {status}")
+        return "\n".join(lines)
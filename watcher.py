@@ -0,0 +1,295 @@
+"""
+捡漏监控
+有人取消预约、或预约超时未签到（resvStatus 1029）被系统取消时，座位会重新变为空闲。
+SeatWatcher轮询 /ic-web/reserve，用diff_rooms把每个房间的座位占用与上一次查询比较，
+一旦有符合条件的座位在目标时段变为空闲就立即预约
+
+- 所有监控任务共用一个连接池：同一轮中每个 (日期, 房间) 只查询一次，结果分发给关注它的所有任务
+- 每个房间的轮询间隔独立调整：发现变化或处于热门时间段时缩短到最短间隔，没有变化时逐步加长
+- 所有查询共用一个全局请求预算（令牌桶），任务再多也不会超过每分钟的查询上限；预约请求不占用预算
+"""
+import asyncio
+from datetime import datetime
+from async_booking import AsyncLibraryBooking, gather_bounded
+from feed import diff_rooms
+from logs import get_logger
+from models import to_minutes
+from scheduler import SystemClock
+
+# 预约开始后这段时间内未签到的预约会陆续被系统取消（分钟），期间加快轮询
+NO_SHOW_WINDOW = (0, 35)
+
+
+logger = get_logger("watcher")
+
+
+def _log(message):
+    """带时间戳的捡漏日志，经后台线程写到终端，不阻塞轮询"""
+    logger.info("%s [捡漏] %s", datetime.now().strftime('%H:%M:%S.%f')[:-3], message)
+
+
+class RequestBudget:
+    """令牌桶请求预算
+
+    Args:
+        per_minute: 每分钟最多发出的查询数
+        burst: 短时间内最多连续发出的查询数（可选，默认每分钟预算的1/6）
+        clock: 时钟（可选，默认SystemClock）
+    """
+    def __init__(self, per_minute=60, burst=None, clock=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or max(1, per_minute // 6))
+        self.clock = clock or SystemClock()
+        self.tokens = self.capacity
+        self.spent = 0
+        self._updated = self.clock.monotonic()
+
+    def wait_time(self):
+        """距离下一个令牌可用的秒数"""
+        now = self.clock.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """取走一个令牌，不够时等待"""
+        while True:
+            wait = self.wait_time()
+            if wait <= 0:
+                self.tokens -= 1
+                self.spent += 1
+                return
+            await self.clock.async_sleep(wait)
+
+
+class SeatWatch:
+    """一个捡漏任务，在一个或多个房间中为一个账号抢一个座位
+
+    Args:
+        core: 用来预约的AsyncLibraryBooking（已设置cookie和app_acc_no），不同账号的任务可以共用同一个连接池
+        date_str: 预约日期 (MMDD)
+        room_numbers: 房间编号，或房间编号列表
+        start_time, end_time: 目标时段 (HH:MM)
+        seats: 只接受这些座位号（可选，按优先顺序排列，默认房间内任何座位）
+        name: 任务名（可选，用于输出）
+    """
+    __slots__ = ("core", "date", "room_numbers", "start", "end", "seats", "name", "seen", "result", "attempts",
+                 "_lock")
+
+    def __init__(self, core, date_str, room_numbers, start_time, end_time, seats=None, name=None):
+        if isinstance(room_numbers, (str, int)):
+            room_numbers = [room_numbers]
+        self.core = core
+        self.date = date_str
+        self.room_numbers = [str(number) for number in room_numbers]
+        self.start = start_time
+        self.end = end_time
+        self.seats = list(seats or [])
+        self.name = name or f"{date_str} {','.join(self.room_numbers)} {start_time}-{end_time}"
+        self.seen = set()  # 已经查询过的房间编号，之后只看有变化的座位
+        self.result = None  # 预约成功时为race_candidates的结果
+        self.attempts = 0
+        self._lock = asyncio.Lock()  # 多个房间同时发现空座时，同一任务一次只预约一个
+
+    @property
+    def done(self):
+        return self.result is not None
+
+    def candidates(self, room, newly_free, claimed):
+        """从新空出来的座位中挑出要尝试的座位（按优先顺序）"""
+        names = newly_free - claimed
+        if self.seats:
+            return [room[name] for name in self.seats if name in names]
+        # 没有指定座位时，优先在目标时段前后空闲时间更长的座位
+        start, end = to_minutes(self.start), to_minutes(self.end)
+
+        def free_block(name):
+            return max((interval.minutes for interval in room[name].free_intervals()
+                        if interval.start <= start and interval.end >= end), default=0)
+
+        return [room[name] for name in sorted(names, key=lambda name: (-free_block(name), name))]
+
+
+class _RoomPoll:
+    """一个 (日期, 房间) 的轮询状态"""
+    __slots__ = ("date", "room_number", "room_id", "previous", "interval", "due", "polls", "changes", "errors")
+
+    def __init__(self, date_str, room_number, room_id, interval):
+        self.date = date_str
+        self.room_number = room_number
+        self.room_id = room_id
+        self.previous = None
+        self.interval = interval
+        self.due = 0.0
+        self.polls = 0
+        self.changes = 0
+        self.errors = 0
+
+
+class SeatWatcher:
+    """按房间轮询座位占用，有座位变为空闲时为关注它的任务立即预约
+
+    Args:
+        core: 用于查询的AsyncLibraryBooking
+        rooms_info: get_rooms_info返回的房间信息
+        budget: RequestBudget，或每分钟查询数（默认60）
+        min_interval: 最短轮询间隔（秒）
+        max_interval: 最长轮询间隔（秒）
+        backoff: 没有变化时间隔乘以的倍数
+        hot_windows: 额外的热门时间段 [(HH:MM, HH:MM)]，此时轮询间隔不超过min_interval的2倍；
+            预约日期为今天的任务，目标时段开始后的未签到释放期也视为热门时间段
+        parallelism: 每个任务同时尝试的座位数
+        concurrency: 同时进行的查询数
+        clock: 时钟（可选，默认SystemClock）
+        log: 输出函数（可选）
+    """
+    def __init__(self, core, rooms_info, budget=60, min_interval=3.0, max_interval=60.0, backoff=1.5,
+                 hot_windows=(), parallelism=2, concurrency=8, clock=None, log=None):
+        self.core = core
+        self.rooms_info = rooms_info
+        self.clock = clock or SystemClock()
+        self.budget = budget if isinstance(budget, RequestBudget) else RequestBudget(budget, clock=self.clock)
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.backoff = backoff
+        self.hot_windows = [(to_minutes(start), to_minutes(end)) for start, end in hot_windows]
+        self.parallelism = parallelism
+        self.concurrency = concurrency
+        self.log = log or _log
+        self.watches = []
+        self.polls = {}
+        self.cycles = 0
+        self._stopped = False
+
+    def add(self, watch):
+        """添加一个捡漏任务，有房间不存在时返回None"""
+        if any(number not in self.rooms_info for number in watch.room_numbers):
+            return None
+        for number in watch.room_numbers:
+            key = (watch.date, number)
+            if key not in self.polls:
+                self.polls[key] = _RoomPoll(watch.date, number, self.rooms_info[number]["id"], self.min_interval)
+        self.watches.append(watch)
+        return watch
+
+    def stop(self):
+        """在当前轮结束后停止监控"""
+        self._stopped = True
+
+    @property
+    def pending(self):
+        return [watch for watch in self.watches if not watch.done]
+
+    def _active_polls(self):
+        keys = {(watch.date, number) for watch in self.pending for number in watch.room_numbers}
+        return [poll for key, poll in self.polls.items() if key in keys]
+
+    def _is_hot(self, poll):
+        now = datetime.fromtimestamp(self.clock.time())
+        minute = now.hour * 60 + now.minute
+        if any(start <= minute < end for start, end in self.hot_windows):
+            return True
+        today = now.strftime("%m%d")
+        return any(watch.date == today and poll.room_number in watch.room_numbers and
+                   to_minutes(watch.start) + NO_SHOW_WINDOW[0] <= minute < to_minutes(watch.start) + NO_SHOW_WINDOW[1]
+                   for watch in self.pending)
+
+    def _schedule(self, poll, changed):
+        if changed:
+            poll.interval = self.min_interval
+        else:
+            poll.interval = min(self.max_interval, poll.interval * self.backoff)
+        interval = min(poll.interval, self.min_interval * 2) if self._is_hot(poll) else poll.interval
+        poll.due = self.clock.monotonic() + interval
+
+    async def _poll(self, poll):
+        """查询一个房间，与上一次比较，有变化时为关注它的任务预约"""
+        await self.budget.acquire()
+        room = await self.core.get_seats_info(poll.date, poll.room_id)
+        poll.polls += 1
+        if room is None:
+            poll.errors += 1
+            self._schedule(poll, False)
+            return
+        # 内容没变时get_seats_info返回同一个Room，比较立即结束；否则只有变化的座位参与后续计算
+        changes = diff_rooms(poll.previous, room)
+        poll.previous = room
+        if changes:
+            poll.changes += 1
+            await self._dispatch(poll, room, changes)
+        self._schedule(poll, bool(changes))
+
+    async def _dispatch(self, poll, room, changes):
+        room_name = self.rooms_info[poll.room_number]["name"]
+        claimed = set()
+        attempts = []
+        for watch in self.pending:
+            if watch.date != poll.date or poll.room_number not in watch.room_numbers:
+                continue
+            if poll.room_number in watch.seen:
+                newly_free = {change.name for change in changes if change.kind != "removed" and
+                              change.seat.is_free(watch.start, watch.end) and
+                              (change.previous is None or not change.previous.is_free(watch.start, watch.end))}
+            else:
+                # 第一次看到这个房间时，当前已空闲的座位都可以预约
+                newly_free = {name for name, seat in room.items() if seat.is_free(watch.start, watch.end)}
+                watch.seen.add(poll.room_number)
+            # 同一轮中多个任务不去抢同一个座位
+            candidates = watch.candidates(room, newly_free, claimed)[:self.parallelism]
+            if not candidates:
+                continue
+            claimed.update(seat.name for seat in candidates)
+            self.log(f"{watch.name}: 发现空闲座位 {', '.join(seat.name for seat in candidates)}，立即预约")
+            attempts.append(self._book(watch, [seat.with_room(room_name) for seat in candidates]))
+        await asyncio.gather(*attempts)
+
+    async def _book(self, watch, candidates):
+        async with watch._lock:
+            if not watch.done:
+                await self._race(watch, candidates)
+
+    async def _race(self, watch, candidates):
+        watch.attempts += 1
+        periods = AsyncLibraryBooking.split_time_periods(watch.start, watch.end)
+        race = await watch.core.race_candidates(candidates, periods, watch.date, parallelism=self.parallelism)
+        if race["success"]:
+            watch.result = race
+            self.log(f"\033[32m{watch.name}: 预约成功 {race['seat'].name}\033[0m")
+            return
+        if race["partial"]:
+            # 只抢到部分时间段时撤销，继续等待能覆盖整个时段的座位
+            await watch.core.cancel_periods(race["seat"].dev_id, watch.date, race["periods"])
+        self.log(f"\033[33m{watch.name}: 预约未成功，继续监控\033[0m")
+
+    async def run(self, max_cycles=None):
+        """轮询直到所有任务都预约成功、调用stop()或达到max_cycles轮
+
+        Returns:
+            stats()
+        """
+        self._stopped = False
+        while not self._stopped and (max_cycles is None or self.cycles < max_cycles):
+            polls = self._active_polls()
+            if not polls:
+                break
+            now = self.clock.monotonic()
+            due = [poll for poll in polls if poll.due <= now]
+            if not due:
+                # 最多睡1秒，以便及时响应stop()
+                await self.clock.async_sleep(min(1.0, min(poll.due for poll in polls) - now))
+                continue
+            await gather_bounded([self._poll(poll) for poll in due], self.concurrency)
+            self.cycles += 1
+        return self.stats()
+
+    def stats(self):
+        """监控统计：轮数、查询数、各房间的查询/变化次数和当前间隔、各任务的结果"""
+        return {
+            "cycles": self.cycles,
+            "requests": self.budget.spent,
+            "rooms": {f"{poll.date} {poll.room_number}": {"polls": poll.polls, "changes": poll.changes,
+                                                           "errors": poll.errors, "interval": round(poll.interval, 1)}
+                      for poll in self.polls.values()},
+            "watches": [{"name": watch.name, "done": watch.done, "attempts": watch.attempts,
+                         "seat": watch.result["seat"].name if watch.done else None} for watch in self.watches],
+        }